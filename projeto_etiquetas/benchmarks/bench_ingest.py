@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark de ingestão por formato
+=================================
+
+Gera o mesmo conjunto sintético de registros em Excel (layout de planilha,
+uma OP por aba), CSV e Parquet (layout longo) e mede quantos registros por
+segundo cada leitor de service/readers.py consegue normalizar.
+
+Uso:
+    python benchmarks/bench_ingest.py [--rows 100000] [--ops 50] [--repeat 3]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from service.readers import PARQUET_AVAILABLE, get_reader
+
+
+def build_dataframe(rows: int, ops: int) -> pd.DataFrame:
+    """Cria registros sintéticos no layout longo"""
+    return pd.DataFrame({
+        'op': [f"OP{i % ops:05d}" for i in range(rows)],
+        'unidade': [f"UNIDADE_{i % ops % 7}" for i in range(rows)],
+        'arquivos': [f"arquivo_{i:07d}.pdf" for i in range(rows)],
+        'qtde': [(i % 9) + 1 for i in range(rows)],
+        'nome': [f"Cliente {i % ops}" for i in range(rows)],
+    })
+
+
+def write_excel(df: pd.DataFrame, path: str):
+    """Grava no layout de planilha: uma aba por OP, A1=OP, B1=unidade"""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    for op, grupo in df.groupby('op', sort=False):
+        ws = wb.create_sheet(title=op)
+        ws.append([op, grupo['unidade'].iloc[0]])
+        for arquivo, qtde in zip(grupo['arquivos'], grupo['qtde']):
+            ws.append([arquivo, int(qtde)])
+        ws.append(['', grupo['nome'].iloc[0]])
+    wb.save(path)
+
+
+def measure(path: str, repeat: int) -> tuple:
+    """Retorna (melhor tempo em segundos, registros lidos)"""
+    reader = get_reader(path)
+    melhor = None
+    total = 0
+    for _ in range(repeat):
+        inicio = time.perf_counter()
+        total = sum(1 for _ in reader.iter_records(path))
+        decorrido = time.perf_counter() - inicio
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return melhor, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de ingestão por formato")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--ops", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # Os leitores registram cada linha em DEBUG; no benchmark isso só mede o log
+    logging.disable(logging.DEBUG)
+
+    df = build_dataframe(args.rows, args.ops)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        arquivos = {
+            'xlsx': os.path.join(tmp, 'dados.xlsx'),
+            'csv': os.path.join(tmp, 'dados.csv'),
+        }
+        write_excel(df, arquivos['xlsx'])
+        df.to_csv(arquivos['csv'], index=False)
+        if PARQUET_AVAILABLE:
+            arquivos['parquet'] = os.path.join(tmp, 'dados.parquet')
+            df.to_parquet(arquivos['parquet'], index=False)
+        else:
+            print("pyarrow não instalado: Parquet fora do benchmark")
+
+        print(f"{'formato':<10}{'tamanho (KB)':>14}{'registros':>12}{'tempo (s)':>12}{'registros/s':>14}")
+        for formato, path in arquivos.items():
+            tempo, total = measure(path, args.repeat)
+            tamanho = os.path.getsize(path) / 1024
+            print(f"{formato:<10}{tamanho:>14.0f}{total:>12}{tempo:>12.3f}{total / tempo:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
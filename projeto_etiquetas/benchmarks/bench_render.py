@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark de renderização de etiquetas por formato
+==================================================
+
+Gera o mesmo conjunto sintético de etiquetas 100x50 mm em PDF (uma por
+página), ZPL, TIFF 1-bit, TIFF em tons de cinza e PNG, e mede quantas
+etiquetas por segundo cada serviço produz e o tamanho da saída.
+
+Uso:
+    python benchmarks/bench_render.py [--labels 2000] [--dpi 203] [--repeat 3]
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from service.pdf_service import PDFService
+from service.raster_service import PIL_AVAILABLE, RasterService
+from service.zpl_service import ZPLService
+
+
+def build_registros(labels: int) -> list:
+    """Cria registros sintéticos (id, op, unidade, arquivos, qtde, nome)"""
+    return [
+        (i, f"OP{i % 50:05d}", f"UNIDADE_{i % 7}", f"arquivo_{i:07d}_com_nome_longo_de_exemplo.pdf",
+         (i % 9) + 1, f"Cliente {i % 50}")
+        for i in range(labels)
+    ]
+
+
+def output_size(path: str) -> int:
+    """Tamanho em bytes de um arquivo ou de todos os arquivos de uma pasta"""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, nome)) for nome in os.listdir(path))
+    return os.path.getsize(path)
+
+
+def measure(render, path: str, repeat: int) -> float:
+    """Retorna o melhor tempo em segundos de render(path)"""
+    melhor = None
+    for _ in range(repeat):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        inicio = time.perf_counter()
+        render(path)
+        decorrido = time.perf_counter() - inicio
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return melhor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de renderização de etiquetas por formato")
+    parser.add_argument("--labels", type=int, default=2000)
+    parser.add_argument("--dpi", type=int, default=203)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.disable(logging.DEBUG)
+
+    registros = build_registros(args.labels)
+    pdf_service = PDFService()
+    zpl_service = ZPLService(dpi=args.dpi)
+
+    formatos = {
+        'pdf': ('etiquetas.pdf',
+                lambda path: pdf_service.generate_labels_pdf(registros, path, label_size_mm=(100, 50),
+                                                             single_per_page=True)),
+        'zpl': ('etiquetas.zpl', lambda path: zpl_service.generate_labels_zpl(registros, path)),
+    }
+    if PIL_AVAILABLE:
+        raster_1 = RasterService(dpi=args.dpi, mode='1')
+        raster_l = RasterService(dpi=args.dpi, mode='L')
+        formatos['tiff-1bit'] = ('etiquetas_1.tif', lambda path: raster_1.generate_labels_tiff(registros, path))
+        formatos['tiff-cinza'] = ('etiquetas_l.tif', lambda path: raster_l.generate_labels_tiff(registros, path))
+        formatos['png-1bit'] = ('png', lambda path: raster_1.generate_labels_png(registros, path))
+    else:
+        print("Pillow não instalado: TIFF/PNG fora do benchmark")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'formato':<12}{'tamanho (KB)':>14}{'etiquetas':>12}{'tempo (s)':>12}{'etiquetas/s':>14}")
+        for formato, (nome, render) in formatos.items():
+            path = os.path.join(tmp, nome)
+            tempo = measure(render, path, args.repeat)
+            tamanho = output_size(path) / 1024
+            print(f"{formato:<12}{tamanho:>14.0f}{args.labels:>12}{tempo:>12.3f}{args.labels / tempo:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
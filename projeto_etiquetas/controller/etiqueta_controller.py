@@ -1,117 +1,264 @@
 from model.database import Database
 from service.excel_service import ExcelService
 from service.pdf_service import PDFService
-from typing import List, Tuple, Optional
-from tkinter import messagebox
+from service.zpl_service import ZPLService
+from service.raster_service import RasterService
+from service.print_spooler import PrintSpooler, parse_printers
+from service.job_queue import JobContext, JobQueue
+from service.status_journal import StatusJournal
+from service.render_cache import RenderCache
+from service.export_service import EXPORT_FORMATS, ExportService, ProgressCallback
+from service.label_template import LabelTemplate, load_template
+from service.exceptions import (
+    DatabaseError, ImportCancelledError, NoRecordsError, TemplateError
+)
+from typing import Callable, Iterable, List, Sized, Tuple, Optional
+from datetime import date
+import io
 import os
+from itertools import islice
+import sqlite3
 import logging
 
 # Configurar logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Registros lidos, deduplicados e gravados por vez na importação
+IMPORT_CHUNK_SIZE = 50000
+
+# Exemplos de duplicatas guardados no resumo da importação
+MAX_DUPLICATE_EXAMPLES = 100
+
 class EtiquetaController:
     def __init__(self):
         """Inicializa o controller com os serviços necessários"""
         # Permite configurar o banco via variável de ambiente SQLITE_DB_URL
         db_url = os.environ.get('SQLITE_DB_URL', 'sqlitecloud://cv0idhxxhk.g2.sqlite.cloud:8860/auth.sqlitecloud?apikey=4gtJpnQlCzrAfmGgn9QOdDrFDvalmk3APBcawzNvssc')
         self.database = Database(db_url)
+        # Mudanças de status gravadas localmente e enviadas ao banco em segundo plano
+        self.status_journal = self._create_status_journal()
         self.excel_service = ExcelService()
-        self.pdf_service = PDFService()
+        # Etiquetas já renderizadas, reaproveitadas em reimpressões (PDF e imagem)
+        self.render_cache = self._create_render_cache()
+        # Layout das etiquetas (ETIQUETAS_TEMPLATE ou o template padrão), o mesmo em todos os formatos
+        self.template = load_template(os.environ.get('ETIQUETAS_TEMPLATE'))
+        self.pdf_service = PDFService(render_cache=self.render_cache, template=self.template)
+        # Exportação CSV/XLSX/Parquet em fluxo
+        self.export_service = ExportService()
+        # Um serviço ZPL por resolução de impressora (criado sob demanda)
+        self._zpl_services = {}
+        self._raster_services = {}
+        # Spooler de impressão direta (criado sob demanda em get_print_spooler)
+        self._print_spooler = None
+        # Fila de etiquetas/relatórios em segundo plano (criada sob demanda em get_job_queue)
+        self._job_queue = None
     
-    def import_excel_file(self, file_path: str) -> bool:
+    @staticmethod
+    def _create_render_cache() -> Optional[RenderCache]:
+        """
+        Abre o cache de renderização em ETIQUETAS_RENDER_CACHE (limite em
+        ETIQUETAS_RENDER_CACHE_MB); sem cache se a pasta não for gravável
+        """
+        try:
+            max_mb = int(os.environ.get('ETIQUETAS_RENDER_CACHE_MB', '256'))
+            if max_mb <= 0:
+                return None
+            return RenderCache(max_bytes=max_mb * 1024 * 1024)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            logger.warning(f"Cache de renderização desativado: {e}")
+            return None
+
+    def _create_status_journal(self) -> Optional[StatusJournal]:
+        """
+        Abre o diário de status em ETIQUETAS_STATUS_JOURNAL (padrão:
+        status_journal.db na pasta do projeto) e inicia o envio ao banco;
+        sem diário (status gravado direto no banco) se o arquivo não abrir
+        """
+        db_path = os.environ.get(
+            'ETIQUETAS_STATUS_JOURNAL',
+            os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'status_journal.db')
+        )
+        try:
+            journal = StatusJournal(db_path, apply=self.database.apply_status_changes)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Diário de status desativado: {e}")
+            return None
+        journal.start()
+        return journal
+
+    def import_excel_file(self, file_path: str,
+                          confirmar_problemas: Optional[Callable[[dict], bool]] = None,
+                          chunk_size: int = IMPORT_CHUNK_SIZE) -> dict:
         """
-        Importa dados de um arquivo Excel para o banco de dados
+        Importa dados de um arquivo (Excel, CSV ou Parquet) para o banco de dados
+        
+        O arquivo é lido em blocos de chunk_size registros, cada bloco é
+        deduplicado contra o banco e gravado, então arquivos grandes não são
+        carregados inteiros na memória. Com confirmar_problemas o arquivo é
+        percorrido uma vez antes para montar o relatório de qualidade, e nada
+        é gravado se a importação for recusada. Se um bloco falhar, os
+        anteriores já estão gravados; importar de novo grava só o restante.
         
         Args:
-            file_path (str): Caminho para o arquivo Excel
+            file_path (str): Caminho para o arquivo
+            confirmar_problemas (Callable, opcional): Chamado com o relatório de
+                qualidade quando houver registros com problemas. Se retornar False
+                a importação é cancelada. Sem callback a importação continua.
+            chunk_size (int): Registros por bloco
             
         Returns:
-            bool: True se importado com sucesso, False caso contrário
+            dict: Resumo da importação (lidos, importados, duplicatas, qualidade)
+
+        Raises:
+            ExcelReadError: Arquivo inexistente ou ilegível
+            NoRecordsError: Nenhum registro válido ou novo para importar
+            ImportCancelledError: Importação recusada por confirmar_problemas
+            DatabaseError: Falha ao gravar no banco
         """
-        try:
-            # Lê os dados do Excel
-            registros = self.excel_service.read_excel_data(file_path)
-            
-            if registros is None:
-                return False
-            
-            if not registros:
-                messagebox.showwarning("Aviso", "Nenhum registro válido encontrado no arquivo!")
-                return False
-            
-            # Valida qualidade dos dados
-            qualidade = self.excel_service.validate_data_quality(registros)
-            
-            if qualidade['registros_com_problemas'] > 0:
-                problemas_text = "\n".join(qualidade['problemas'][:5])
-                if qualidade['registros_com_problemas'] > 5:
-                    problemas_text += f"\n... e mais {qualidade['registros_com_problemas'] - 5} problemas"
-                
-                resposta = messagebox.askyesno(
-                    "Dados com Problemas",
-                    f"Encontrados {qualidade['registros_com_problemas']} registros com problemas:\n\n" +
-                    problemas_text + "\n\n" +
-                    f"Registros válidos: {qualidade['registros_validos']}\n\n" +
-                    "Deseja continuar mesmo assim?"
-                )
-                
-                if not resposta:
-                    return False
-            
+        qualidade = None
+        if confirmar_problemas is not None:
+            # Primeira passada só valida: a confirmação vem antes de gravar qualquer bloco
+            qualidade = self._empty_quality()
+            for lote in self._iter_import_chunks(file_path, chunk_size):
+                self._merge_quality(qualidade, lote)
+            if qualidade['registros_com_problemas'] > 0 and not confirmar_problemas(qualidade):
+                raise ImportCancelledError("Importação cancelada: dados com problemas")
+
+        validar = qualidade is None
+        if validar:
+            qualidade = self._empty_quality()
+        total_lidos = 0
+        total_importados = 0
+        total_duplicatas = 0
+        duplicatas = []
+
+        for lote in self._iter_import_chunks(file_path, chunk_size):
+            if validar:
+                self._merge_quality(qualidade, lote)
+            total_lidos += len(lote)
+
             # Verifica duplicatas em vez de perguntar sobre limpar dados
-            verificacao_duplicatas = self.database.check_duplicates(registros)
-            
-            if verificacao_duplicatas['total_duplicatas'] > 0:
-                duplicatas_info = []
-                for dup in verificacao_duplicatas['duplicatas'][:5]:  # Mostra até 5 exemplos
-                    novo = dup['novo']
-                    existente = dup['existente']
-                    status_qtde = "✓ mesma qtde" if dup['mesmo_qtde'] else f"⚠️ qtde diferente ({existente[4]} → {novo[3]})"
-                    duplicatas_info.append(f"• OP: {novo[0]} | Unidade: {novo[1]} | Arquivo: {novo[2]} ({status_qtde})")
-                
-                duplicatas_text = "\n".join(duplicatas_info)
-                if verificacao_duplicatas['total_duplicatas'] > 5:
-                    duplicatas_text += f"\n... e mais {verificacao_duplicatas['total_duplicatas'] - 5} duplicatas"
-                
-                messagebox.showerror(
-                    "Dados Duplicados Encontrados",
-                    f"Encontradas {verificacao_duplicatas['total_duplicatas']} duplicatas que não serão importadas:\n\n" +
-                    duplicatas_text + "\n\n" +
-                    f"Registros novos que serão importados: {verificacao_duplicatas['total_novos']}\n\n" +
-                    "Para evitar duplicatas, apenas registros únicos serão adicionados."
-                )
-                
-                # Se não há registros novos, cancela a importação
-                if verificacao_duplicatas['total_novos'] == 0:
-                    messagebox.showwarning(
-                        "Nenhum Registro Novo",
-                        "Todos os registros já existem no banco de dados.\nNenhum dado foi importado."
-                    )
-                    return False
-                
-                # Usa apenas os registros novos
-                registros = verificacao_duplicatas['novos']
-            
+            verificacao_duplicatas = self.database.check_duplicates(lote)
+            total_duplicatas += verificacao_duplicatas['total_duplicatas']
+            duplicatas.extend(verificacao_duplicatas['duplicatas'][:MAX_DUPLICATE_EXAMPLES - len(duplicatas)])
+
             # Insere apenas os registros novos (sem duplicatas)
-            success = self.database.insert_multiple_registros(registros)
-            
-            if success:
-                messagebox.showinfo(
-                    "Sucesso",
-                    f"Importação concluída!\n\n" +
-                    f"Registros importados: {len(registros)}\n" +
-                    f"Total de registros no banco: {self.get_total_registros()}"
-                )
-                return True
-            else:
-                messagebox.showerror("Erro", "Falha ao salvar os dados no banco!")
-                return False
-                
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro durante importação:\n{str(e)}")
-            return False
+            novos = verificacao_duplicatas['novos']
+            if novos and not self.database.insert_multiple_registros(novos):
+                raise DatabaseError("Falha ao salvar os dados no banco!")
+            total_importados += len(novos)
+
+        # Se não há registros novos, nada foi gravado
+        if total_importados == 0:
+            raise NoRecordsError(
+                "Todos os registros já existem no banco de dados.\nNenhum dado foi importado."
+            )
+
+        return {
+            'arquivo': file_path,
+            'registros_lidos': total_lidos,
+            'registros_importados': total_importados,
+            'total_duplicatas': total_duplicatas,
+            'duplicatas': duplicatas,
+            'qualidade': qualidade
+        }
+
+    def _iter_import_chunks(self, file_path: str, chunk_size: int) -> Iterable[List[Tuple]]:
+        """Registros do arquivo em blocos (lidos sob demanda pelo leitor do formato)"""
+        registros = self.excel_service.iter_data(file_path)
+        return iter(lambda: list(islice(registros, max(1, chunk_size))), [])
+
+    @staticmethod
+    def _empty_quality() -> dict:
+        return {'total_registros': 0, 'registros_validos': 0, 'registros_com_problemas': 0, 'problemas': []}
+
+    def _merge_quality(self, qualidade: dict, lote: List[Tuple]):
+        """Acumula em qualidade a validação de mais um bloco (mesmo formato de validate_data_quality)"""
+        parcial = self.excel_service.validate_data_quality(lote, primeira_linha=qualidade['total_registros'] + 1)
+        for campo in ('total_registros', 'registros_validos', 'registros_com_problemas'):
+            qualidade[campo] += parcial[campo]
+        qualidade['problemas'] = (qualidade['problemas'] + parcial['problemas'])[:10]
+
+    @staticmethod
+    def format_quality_issues(qualidade: dict) -> str:
+        """
+        Monta o texto de aviso para registros com problemas de qualidade
+
+        Args:
+            qualidade (dict): Relatório de validate_data_quality
+
+        Returns:
+            str: Texto pronto para exibição
+        """
+        problemas_text = "\n".join(qualidade['problemas'][:5])
+        if qualidade['registros_com_problemas'] > 5:
+            problemas_text += f"\n... e mais {qualidade['registros_com_problemas'] - 5} problemas"
+
+        return (
+            f"Encontrados {qualidade['registros_com_problemas']} registros com problemas:\n\n" +
+            problemas_text + "\n\n" +
+            f"Registros válidos: {qualidade['registros_validos']}"
+        )
+
+    @staticmethod
+    def format_import_summary(resultado: dict) -> str:
+        """
+        Monta o texto de resumo de uma importação
+
+        Args:
+            resultado (dict): Retorno de import_excel_file
+
+        Returns:
+            str: Texto pronto para exibição
+        """
+        texto = (
+            f"Importação concluída!\n\n" +
+            f"Registros lidos: {resultado['registros_lidos']}\n" +
+            f"Registros importados: {resultado['registros_importados']}"
+        )
+
+        if resultado['total_duplicatas'] > 0:
+            duplicatas_info = []
+            for dup in resultado['duplicatas'][:5]:  # Mostra até 5 exemplos
+                novo = dup['novo']
+                existente = dup['existente']
+                status_qtde = "✓ mesma qtde" if dup['mesmo_qtde'] else f"⚠️ qtde diferente ({existente[4]} → {novo[3]})"
+                duplicatas_info.append(f"• OP: {novo[0]} | Unidade: {novo[1]} | Arquivo: {novo[2]} ({status_qtde})")
+
+            duplicatas_text = "\n".join(duplicatas_info)
+            if resultado['total_duplicatas'] > 5:
+                duplicatas_text += f"\n... e mais {resultado['total_duplicatas'] - 5} duplicatas"
+
+            texto += (
+                f"\n\nDuplicatas ignoradas: {resultado['total_duplicatas']}\n\n" +
+                duplicatas_text
+            )
+
+        return texto
     
+    def _with_pending_status(self, registros: List[Tuple]) -> List[Tuple]:
+        """Aplica aos registros lidos do banco os status do diário ainda não enviados"""
+        if self.status_journal is None:
+            return registros
+        return self.status_journal.apply_overrides(registros)
+
+    def apply_pending_status(self, registros: List[Tuple]) -> List[Tuple]:
+        """
+        Atualiza o status de registros já carregados com o diário, sem consultar o banco
+        
+        Args:
+            registros (List[Tuple]): Registros em memória (ex.: os da tela)
+            
+        Returns:
+            List[Tuple]: Os mesmos registros, com o status do diário quando houver
+        """
+        return self._with_pending_status(registros)
+
+    def pending_status_count(self) -> int:
+        """Registros com mudança de status ainda não enviada ao banco"""
+        return self.status_journal.pending_count() if self.status_journal is not None else 0
+
     def get_all_registros(self) -> List[Tuple]:
         """
         Retorna todos os registros do banco
@@ -119,7 +266,7 @@ class EtiquetaController:
         Returns:
             List[Tuple]: Lista com todos os registros
         """
-        return self.database.get_all_registros()
+        return self._with_pending_status(self.database.get_all_registros())
 
     def get_registros_page(self, page: int = 1, page_size: int = 50) -> tuple:
         """
@@ -132,7 +279,8 @@ class EtiquetaController:
         Returns:
             tuple: (registros, total_registros)
         """
-        return self.database.get_registros_paginated(page, page_size)
+        registros, total = self.database.get_registros_paginated(page, page_size)
+        return self._with_pending_status(registros), total
     
     def search_registros(self, campo: str, valor: str) -> List[Tuple]:
         """
@@ -148,7 +296,7 @@ class EtiquetaController:
         if not valor.strip():
             return self.get_all_registros()
         
-        return self.database.search_registros(campo, valor)
+        return self._with_pending_status(self.database.search_registros(campo, valor))
     
     def delete_registro(self, registro_id: int) -> bool:
         """
@@ -179,103 +327,884 @@ class EtiquetaController:
         """
         Atualiza o status de registros específicos
         
+        Com o diário de status, a mudança é gravada localmente e enviada ao
+        banco em segundo plano (quem gera etiquetas não espera o banco); as
+        leituras do controller já mostram o novo status.
+        
         Args:
             ids (List[int]): Lista de IDs dos registros
             status (str): Novo status
             
         Returns:
-            bool: True se atualizado com sucesso
+            bool: True se atualizado (ou gravado no diário) com sucesso
         """
+        if self.status_journal is not None:
+            try:
+                return self.status_journal.record(ids, status)
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Diário de status indisponível, gravando direto no banco: {e}")
         return self.database.update_status_by_ids(ids, status)
     
-    def generate_labels_pdf(self, registros: List[Tuple], output_path: str) -> bool:
+    def generate_labels_pdf(self, registros: Iterable[Tuple], output_path: str,
+                            workers: int = 1, max_pages_per_file: Optional[int] = None,
+                            copies: bool = False, number_copies: bool = False, update_status: bool = True) -> dict:
         """
-        Gera PDF com etiquetas dos registros selecionados
+        Gera PDF com etiquetas dos registros selecionados e marca-os como impressos
+        
+        Aceita lista ou qualquer iterável (por exemplo, o cursor de
+        Database.iter_registros); os registros são consumidos uma única vez
+        enquanto o PDF é desenhado, guardando apenas os ids.
+        
+        Com mais de um worker (ou com limite de páginas por arquivo) o PDF é
+        renderizado em paralelo por PDFService.generate_labels_pdf_parallel.
+        O modo de cópias é sempre em série: cada etiqueta distinta é desenhada
+        uma vez e as cópias só a referenciam.
         
         Args:
-            registros (List[Tuple]): Lista de registros
+            registros (Iterable[Tuple]): Registros (id, op, unidade, arquivos, qtde, nome, status)
             output_path (str): Caminho para salvar o PDF
+            workers (int): Processos de renderização (1 = em série)
+            max_pages_per_file (int): Divide o resultado em arquivos com no máximo N páginas
+            copies (bool): Uma etiqueta por unidade (qtde cópias de cada registro)
+            number_copies (bool): Numera as cópias ("n/N")
+            update_status (bool): Marca os registros como "Impresso" (False: quem chama atualiza)
             
         Returns:
-            bool: True se gerado com sucesso
+            dict: Resumo da geração (arquivo, arquivos, total de etiquetas, status atualizado)
+
+        Raises:
+            NoRecordsError: Nenhum registro informado
+            TemplateError: Numeração pedida e template sem o campo 'copia'
+            PDFGenerationError: Falha ao gerar o PDF
         """
-        if not registros:
-            messagebox.showwarning("Aviso", "Nenhum registro selecionado para gerar etiquetas!")
-            return False
+        if isinstance(registros, Sized) and len(registros) == 0:
+            raise NoRecordsError("Nenhum registro selecionado para gerar etiquetas!")
         
+        # Agora geramos uma etiqueta por registro selecionado. A quantidade
+        # (qtde) será exibida em cada etiqueta. Os ids são coletados à medida
+        # que o PDF consome os registros.
+        ids = []
+        registros_com_id = self._iter_collecting_ids(registros, ids)
+
+        # Gera o PDF — para Zebra 10x5 cm (100x50 mm) imprimimos 1 etiqueta por página
+        # Usuário já solicitou etiquetas Zebra 10x5: usamos label_size_mm=(100,50) e single_per_page=True
+        try:
+            if copies:
+                if workers > 1 or max_pages_per_file:
+                    logger.info("Modo de cópias gera o PDF em série, sem divisão em arquivos")
+                self.pdf_service.generate_labels_pdf(registros_com_id, output_path, label_size_mm=(100, 50),
+                                                     single_per_page=True, copies=True, number_copies=number_copies)
+                arquivos = [output_path]
+            elif workers > 1 or max_pages_per_file:
+                arquivos = self.pdf_service.generate_labels_pdf_parallel(
+                    registros_com_id, output_path, label_size_mm=(100, 50), single_per_page=True,
+                    workers=workers, max_pages_per_file=max_pages_per_file
+                )
+            else:
+                self.pdf_service.generate_labels_pdf(registros_com_id, output_path, label_size_mm=(100, 50), single_per_page=True)
+                arquivos = [output_path]
+        except NoRecordsError:
+            raise NoRecordsError("Nenhum registro selecionado para gerar etiquetas!")
+        
+        # Atualiza status dos registros para "Impresso"
+        status_atualizado = update_status and self.update_status_by_ids(ids, "Impresso")
+        if update_status and not status_atualizado:
+            logger.warning(f"PDF gerado, mas o status de {len(ids)} registros não foi atualizado")
+
+        return {
+            'arquivo': arquivos[0],
+            'arquivos': arquivos,
+            'total_etiquetas': len(ids),
+            'status_atualizado': status_atualizado
+        }
+    
+    @staticmethod
+    def _iter_collecting_ids(registros: Iterable[Tuple], ids: List[int]):
+        """
+        Repassa os registros guardando o id (primeira coluna) de cada um em `ids`
+        (etiquetas separadoras, sem id, ficam de fora)
+        """
+        for registro in registros:
+            if registro[0] is not None:
+                ids.append(registro[0])
+            yield registro
+    
+    def _get_zpl_service(self, dpi: int) -> ZPLService:
+        """Serviço ZPL da resolução pedida (logo e formato fixo convertidos uma vez)"""
+        zpl_service = self._zpl_services.get(dpi)
+        if zpl_service is None:
+            zpl_service = self._zpl_services.setdefault(dpi, ZPLService(dpi=dpi, label_size_mm=(100, 50),
+                                                                  template=self.template))
+        return zpl_service
+    
+    def generate_labels_zpl(self, registros: Iterable[Tuple], output_path: str,
+                            dpi: int = 203, copies: int = 1, update_status: bool = True) -> dict:
+        """
+        Gera as etiquetas em ZPL (Zebra) e marca os registros como impressos
+        
+        Mesmo layout do PDF 100x50 mm, mas em comandos nativos da impressora:
+        o arquivo .zpl pode ser enviado direto à Zebra, sem rasterizar páginas.
+        
+        Args:
+            registros (Iterable[Tuple]): Registros (id, op, unidade, arquivos, qtde, nome, status)
+            output_path (str): Caminho do arquivo .zpl
+            dpi (int): Resolução da impressora (203 ou 300)
+            copies (int): Cópias de cada etiqueta
+            update_status (bool): Marca os registros como "Impresso" (False: quem chama atualiza)
+            
+        Returns:
+            dict: Resumo da geração (arquivo, arquivos, total de etiquetas, status atualizado)
+
+        Raises:
+            NoRecordsError: Nenhum registro informado
+            ZPLGenerationError: Falha ao gerar o ZPL
+        """
+        if isinstance(registros, Sized) and len(registros) == 0:
+            raise NoRecordsError("Nenhum registro selecionado para gerar etiquetas!")
+        
+        ids = []
         try:
-            # Agora geramos uma etiqueta por registro selecionado. A quantidade
-            # (qtde) será exibida em cada etiqueta.
-            total_etiquetas = len(registros)
-
-            # Confirma a geração
-            resposta = messagebox.askyesno(
-                "Confirmar Geração",
-                f"Serão geradas {total_etiquetas} etiquetas (1 por registro) para {len(registros)} registros.\n\n" +
-                "Deseja continuar?"
+            self._get_zpl_service(dpi).generate_labels_zpl(self._iter_collecting_ids(registros, ids), output_path, copies=copies)
+        except NoRecordsError:
+            raise NoRecordsError("Nenhum registro selecionado para gerar etiquetas!")
+        
+        # Atualiza status dos registros para "Impresso"
+        status_atualizado = update_status and self.update_status_by_ids(ids, "Impresso")
+        if update_status and not status_atualizado:
+            logger.warning(f"ZPL gerado, mas o status de {len(ids)} registros não foi atualizado")
+
+        return {
+            'arquivo': output_path,
+            'arquivos': [output_path],
+            'total_etiquetas': len(ids),
+            'status_atualizado': status_atualizado
+        }
+    
+    def _get_raster_service(self, dpi: int, mode: str) -> RasterService:
+        """Serviço raster reaproveitado por (dpi, modo) (cache de textos e logo)"""
+        raster_service = self._raster_services.get((dpi, mode))
+        if raster_service is None:
+            raster_service = self._raster_services.setdefault(
+                (dpi, mode), RasterService(dpi=dpi, label_size_mm=(100, 50), mode=mode,
+                                           render_cache=self.render_cache, template=self.template))
+        return raster_service
+
+    def set_template(self, path: str) -> LabelTemplate:
+        """
+        Troca o template das etiquetas (JSON ou YAML) em todos os formatos
+
+        Os serviços são recriados com o novo layout; o cache de renderização
+        continua válido, pois a chave inclui a impressão digital do template.
+
+        Args:
+            path (str): Caminho do template
+
+        Returns:
+            LabelTemplate: Template carregado
+
+        Raises:
+            TemplateError: Arquivo inexistente ou inválido (o template atual é mantido)
+        """
+        template = load_template(path)
+        self.close()
+        self.template = template
+        self.pdf_service = PDFService(render_cache=self.render_cache, template=template)
+        self._zpl_services = {}
+        self._raster_services = {}
+        logger.info(f"Template de etiqueta: {template.nome}")
+        return template
+
+    def close(self):
+        """Encerra a fila de trabalhos, o spooler, o diário de status e os pools de renderização"""
+        if self._job_queue is not None:
+            # Trabalhos interrompidos voltam para a fila e são refeitos no próximo início
+            self._job_queue.stop()
+            self._job_queue = None
+        if self._print_spooler is not None:
+            # Antes do diário: envios em andamento ainda registram o status "Impresso"
+            self._print_spooler.stop()
+            self._print_spooler = None
+        if self.status_journal is not None and not self.status_journal.stop():
+            logger.warning(f"{self.status_journal.pending_count()} mudanças de status ficam no diário "
+                           f"e serão enviadas ao banco na próxima execução")
+        self.pdf_service.close()
+        for raster_service in self._raster_services.values():
+            raster_service.close()
+
+    def generate_labels_raster(self, registros: Iterable[Tuple], output_path: str,
+                               dpi: int = 203, mode: str = '1', workers: int = 1,
+                               update_status: bool = True) -> dict:
+        """
+        Gera as etiquetas como imagens na resolução da impressora
+
+        Caminhos terminados em .tif/.tiff geram um único TIFF de várias
+        páginas; qualquer outro caminho é tratado como pasta e recebe um PNG
+        numerado por etiqueta.
+
+        Args:
+            registros (Iterable[Tuple]): Registros (id, op, unidade, arquivos, qtde, nome, status)
+            output_path (str): Arquivo .tif/.tiff ou pasta de saída dos PNGs
+            dpi (int): Resolução da impressora (ex.: 203, 300)
+            mode (str): '1' (preto e branco, 1 bit) ou 'L' (tons de cinza)
+            workers (int): Processos de renderização (1 = no próprio processo)
+            update_status (bool): Marca os registros como "Impresso" (False: quem chama atualiza)
+
+        Returns:
+            dict: Resumo da geração (arquivo, arquivos, total de etiquetas, status atualizado)
+
+        Raises:
+            NoRecordsError: Nenhum registro informado
+            RasterGenerationError: Falha ao gerar as imagens
+        """
+        if isinstance(registros, Sized) and len(registros) == 0:
+            raise NoRecordsError("Nenhum registro selecionado para gerar etiquetas!")
+
+        raster_service = self._get_raster_service(dpi, mode)
+        ids = []
+        try:
+            if output_path.lower().endswith(('.tif', '.tiff')):
+                raster_service.generate_labels_tiff(self._iter_collecting_ids(registros, ids), output_path,
+                                                    workers=workers)
+                arquivos = [output_path]
+            else:
+                arquivos = raster_service.generate_labels_png(self._iter_collecting_ids(registros, ids), output_path,
+                                                              workers=workers)
+        except NoRecordsError:
+            raise NoRecordsError("Nenhum registro selecionado para gerar etiquetas!")
+
+        # Atualiza status dos registros para "Impresso"
+        status_atualizado = update_status and self.update_status_by_ids(ids, "Impresso")
+        if update_status and not status_atualizado:
+            logger.warning(f"Imagens geradas, mas o status de {len(ids)} registros não foi atualizado")
+
+        return {
+            'arquivo': arquivos[0],
+            'arquivos': arquivos,
+            'total_etiquetas': len(ids),
+            'status_atualizado': status_atualizado
+        }
+
+    def get_print_spooler(self, printers: Optional[str] = None) -> PrintSpooler:
+        """
+        Retorna o spooler de impressão, iniciando-o na primeira chamada
+        
+        As impressoras vêm de `printers` ou da variável de ambiente
+        ETIQUETAS_PRINTERS ("zebra1=10.0.0.5,zebra2=10.0.0.6:9100/2"); a fila
+        fica em ETIQUETAS_SPOOL_DB (padrão: spool.db na pasta do projeto).
+        Quando um job termina, os registros dele passam para "Impresso".
+        Jobs finalizados há mais de 7 dias são apagados ao criar o spooler.
+        
+        Raises:
+            ValueError: Nenhuma impressora configurada
+        """
+        if self._print_spooler is None:
+            spec = printers or os.environ.get('ETIQUETAS_PRINTERS', '')
+            db_path = os.environ.get(
+                'ETIQUETAS_SPOOL_DB',
+                os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'spool.db')
+            )
+            self._print_spooler = PrintSpooler(
+                parse_printers(spec), db_path,
+                on_printed=lambda ids: self.update_status_by_ids(ids, "Impresso")
+            )
+            # Histórico antigo sai da fila (jobs finalizados há mais de 7 dias)
+            self._print_spooler.purge_finished()
+            self._print_spooler.start()
+        return self._print_spooler
+    
+    def print_labels(self, registros: Iterable[Tuple], formato: str = 'zpl', dpi: int = 203,
+                     printer: Optional[str] = None) -> dict:
+        """
+        Renderiza as etiquetas e coloca o job na fila de impressão direta
+        
+        O status dos registros só muda para "Impresso" quando a impressora
+        recebe o job (ver get_print_spooler).
+        
+        Args:
+            registros (Iterable[Tuple]): Registros (id, op, unidade, arquivos, qtde, nome, status)
+            formato (str): 'zpl' (Zebra nativo) ou 'pdf' (impressoras com PDF direto)
+            dpi (int): Resolução da Zebra (ZPL)
+            printer (str): Nome de uma impressora específica (padrão: a menos carregada)
+            
+        Returns:
+            dict: Resumo (job_id, total de etiquetas, tamanho em bytes)
+
+        Raises:
+            NoRecordsError: Nenhum registro informado
+            ZPLGenerationError / PDFGenerationError: Falha ao renderizar
+            ValueError: Nenhuma impressora configurada ou impressora desconhecida
+        """
+        if isinstance(registros, Sized) and len(registros) == 0:
+            raise NoRecordsError("Nenhum registro selecionado para imprimir!")
+        
+        spooler = self.get_print_spooler()
+        ids = []
+        buffer = io.BytesIO()
+        try:
+            if formato == 'zpl':
+                self._get_zpl_service(dpi).generate_labels_zpl(self._iter_collecting_ids(registros, ids), buffer)
+            else:
+                self.pdf_service.generate_labels_pdf(self._iter_collecting_ids(registros, ids), buffer,
+                                                     label_size_mm=(100, 50), single_per_page=True)
+        except NoRecordsError:
+            raise NoRecordsError("Nenhum registro selecionado para imprimir!")
+        
+        payload = buffer.getvalue()
+        job_id = spooler.submit(payload, formato=formato, registro_ids=ids, printer=printer)
+        return {
+            'job_id': job_id,
+            'total_etiquetas': len(ids),
+            'bytes': len(payload)
+        }
+    
+    def generate_labels_file(self, registros: Iterable[Tuple], output_path: str,
+                             update_status: bool = True) -> dict:
+        """
+        Gera as etiquetas no formato da extensão: ZPL (.zpl), TIFF 1-bit (.tif/.tiff) ou PDF
+        
+        Returns:
+            dict: Resumo da geração (arquivo, arquivos, total de etiquetas, status atualizado)
+        """
+        if output_path.lower().endswith('.zpl'):
+            return self.generate_labels_zpl(registros, output_path, update_status=update_status)
+        if output_path.lower().endswith(('.tif', '.tiff')):
+            return self.generate_labels_raster(registros, output_path, update_status=update_status)
+        return self.generate_labels_pdf(registros, output_path, update_status=update_status)
+    
+    def get_job_queue(self, start: bool = True) -> JobQueue:
+        """
+        Retorna a fila de trabalhos em segundo plano, iniciando-a na primeira chamada
+        
+        A fila fica em ETIQUETAS_JOBS_DB (padrão: jobs.db na pasta do projeto)
+        e executa até ETIQUETAS_JOB_WORKERS trabalhos ao mesmo tempo (padrão 2).
+        Trabalhos que ficaram na fila quando o programa fechou são retomados.
+        Quando um trabalho de etiquetas termina, os registros dele passam para
+        "Impresso" em um único UPDATE.
+        
+        Args:
+            start (bool): Inicia a execução (False: só consultar/alterar a fila)
+        """
+        if self._job_queue is None:
+            db_path = os.environ.get(
+                'ETIQUETAS_JOBS_DB',
+                os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'jobs.db')
             )
+            self._job_queue = JobQueue(
+                db_path,
+                handlers={'etiquetas': self._run_labels_job, 'etiquetas_lote': self._run_labels_batch_job,
+                          'relatorio': self._run_report_job},
+                max_workers=int(os.environ.get('ETIQUETAS_JOB_WORKERS', '2')),
+                on_completed=lambda ids: self.update_status_by_ids(ids, "Impresso"),
+                permanent_errors=(NoRecordsError, TemplateError, ValueError)
+            )
+        if start:
+            self._job_queue.start()
+        return self._job_queue
+    
+    def submit_labels_job(self, output_path: str, op: Optional[str] = None,
+                          registros: Optional[List[Tuple]] = None) -> int:
+        """
+        Coloca na fila a geração das etiquetas de uma OP ou de uma seleção
+        
+        Com `op` os registros são lidos do banco quando o trabalho começa;
+        com `registros` a seleção é gravada no próprio trabalho. O formato
+        segue a extensão do arquivo (ver generate_labels_file).
+        
+        Args:
+            output_path (str): Caminho do arquivo de etiquetas
+            op (str): OP exata
+            registros (List[Tuple]): Registros selecionados (alternativa a `op`)
             
-            if not resposta:
-                return False
+        Returns:
+            int: Id do trabalho
+
+        Raises:
+            NoRecordsError: Nenhum registro informado
+        """
+        params = self._job_params(output_path, op, registros)
+        alvo = f"OP {op}" if op is not None else f"{len(registros)} registro(s)"
+        return self.get_job_queue().submit('etiquetas', params,
+                                           descricao=f"Etiquetas {alvo} -> {os.path.basename(output_path)}")
+    
+    def submit_report_job(self, output_path: str, op: Optional[str] = None,
+                          registros: Optional[List[Tuple]] = None) -> int:
+        """
+        Coloca na fila a lista simples (relatório PDF) de uma OP ou de uma seleção
+        
+        Args:
+            output_path (str): Caminho do PDF
+            op (str): OP exata
+            registros (List[Tuple]): Registros selecionados (alternativa a `op`)
             
-            # Gera o PDF — para Zebra 10x5 cm (100x50 mm) imprimimos 1 etiqueta por página
-            # Usuário já solicitou etiquetas Zebra 10x5: usamos label_size_mm=(100,50) e single_per_page=True
-            success = self.pdf_service.generate_labels_pdf(registros, output_path, label_size_mm=(100, 50), single_per_page=True)
+        Returns:
+            int: Id do trabalho
+
+        Raises:
+            NoRecordsError: Nenhum registro informado
+        """
+        params = self._job_params(output_path, op, registros)
+        alvo = f"OP {op}" if op is not None else f"{len(registros)} registro(s)"
+        return self.get_job_queue().submit('relatorio', params,
+                                           descricao=f"Relatório {alvo} -> {os.path.basename(output_path)}")
+    
+    def submit_labels_batch_job(self, output_path: str, ops: Optional[Iterable[str]] = None,
+                                separators: bool = False) -> int:
+        """
+        Coloca na fila as etiquetas de várias OPs em um único documento (ver generate_labels_batch)
+        
+        Args:
+            output_path (str): Caminho do arquivo de etiquetas (.pdf, .zpl ou .tif)
+            ops (Iterable[str]): OPs do lote (None = todos os registros pendentes)
+            separators (bool): Etiqueta separadora antes de cada OP
             
-            if success:
-                # Atualiza status dos registros para "Impresso"
-                ids = [registro[0] for registro in registros]  # Primeira coluna é o ID
-                self.update_status_by_ids(ids, "Impresso")
-                
-                messagebox.showinfo(
-                    "Sucesso",
-                    f"PDF gerado com sucesso!\n\n" +
-                    f"Arquivo: {output_path}\n" +
-                    f"Etiquetas geradas: {total_etiquetas}\n" +
-                    f"Status atualizado para: Impresso"
-                )
-                return True
-            else:
-                messagebox.showerror("Erro", "Falha ao gerar o PDF!")
-                return False
-                
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao gerar PDF:\n{str(e)}")
-            return False
+        Returns:
+            int: Id do trabalho
+
+        Raises:
+            NoRecordsError: Lista de OPs vazia
+        """
+        ops = self._batch_ops(ops)
+        alvo = f"{len(ops)} OP(s)" if ops is not None else "pendentes"
+        return self.get_job_queue().submit(
+            'etiquetas_lote', {'arquivo': output_path, 'ops': ops, 'separadores': separators},
+            descricao=f"Etiquetas em lote ({alvo}) -> {os.path.basename(output_path)}"
+        )
+    
+    @staticmethod
+    def _job_params(output_path: str, op: Optional[str], registros: Optional[List[Tuple]]) -> dict:
+        """Parâmetros gravados no trabalho (a OP ou a própria seleção)"""
+        if op is not None:
+            return {'arquivo': output_path, 'op': op}
+        if not registros:
+            raise NoRecordsError("Nenhum registro selecionado!")
+        return {'arquivo': output_path, 'registros': [list(registro) for registro in registros]}
+    
+    def _job_registros(self, params: dict, ctx: JobContext, order_by_op: bool = False) -> Iterable[Tuple]:
+        """
+        Registros de um trabalho, informando o progresso e parando se ele for cancelado
+        """
+        if 'op' in params:
+            total = self.database.count_registros(op=params['op'])
+            registros = self.database.iter_registros(op=params['op'], order_by_op=order_by_op)
+        else:
+            registros = [tuple(registro) for registro in params['registros']]
+            total = len(registros)
+            if order_by_op:
+                registros = self._grouped_by_op(registros)
+        return self._job_progress(registros, total, ctx)
+    
+    @staticmethod
+    def _job_progress(registros: Iterable[Tuple], total: Optional[int], ctx: JobContext) -> Iterable[Tuple]:
+        """Repassa os registros informando o progresso e parando se o trabalho for cancelado"""
+        ctx.progress(0, total)
+        feitos = 0
+        for registro in registros:
+            ctx.check_cancelled()
+            yield registro
+            feitos += 1
+            ctx.progress(feitos)
+    
+    @staticmethod
+    def _remove_partial(output_path: str):
+        """Apaga o arquivo incompleto de um trabalho interrompido"""
+        try:
+            if os.path.isfile(output_path):
+                os.remove(output_path)
+        except OSError as e:
+            logger.warning(f"Não foi possível remover o arquivo incompleto {output_path}: {e}")
+    
+    def _run_labels_job(self, params: dict, ctx: JobContext) -> dict:
+        """Handler da fila: gera as etiquetas e devolve os ids para o UPDATE único ao final"""
+        ids = []
+        try:
+            resultado = self.generate_labels_file(
+                self._iter_collecting_ids(self._job_registros(params, ctx), ids), params['arquivo'],
+                update_status=False
+            )
+        except BaseException:
+            self._remove_partial(params['arquivo'])
+            raise
+        return {
+            'arquivo': resultado['arquivo'],
+            'arquivos': resultado['arquivos'],
+            'total_etiquetas': resultado['total_etiquetas'],
+            'registro_ids': ids
+        }
+    
+    def _run_labels_batch_job(self, params: dict, ctx: JobContext) -> dict:
+        """Handler da fila: lote de OPs em um documento, com um UPDATE único ao final"""
+        ids = []
+        ops_geradas = []
+        ops = params.get('ops')
+        registros = self._job_progress(
+            self._iter_batch(ops), self.database.count_registros(**self._batch_filter(ops)), ctx
+        )
+        try:
+            resultado = self.generate_labels_file(
+                self._batch_labels(registros, params.get('separadores', False), ids, ops_geradas),
+                params['arquivo'], update_status=False
+            )
+        except BaseException:
+            self._remove_partial(params['arquivo'])
+            raise
+        return {
+            'arquivo': resultado['arquivo'],
+            'arquivos': resultado['arquivos'],
+            'total_etiquetas': resultado['total_etiquetas'],
+            'ops': ops_geradas,
+            'registro_ids': ids
+        }
+    
+    def _run_report_job(self, params: dict, ctx: JobContext) -> dict:
+        """Handler da fila: gera a lista simples ordenada por OP"""
+        try:
+            return self.generate_list_pdf(self._job_registros(params, ctx, order_by_op=True), params['arquivo'])
+        except BaseException:
+            self._remove_partial(params['arquivo'])
+            raise
+    
+    @staticmethod
+    def _batch_ops(ops: Optional[Iterable[str]]) -> Optional[List[str]]:
+        """OPs distintas do lote em ordem (None = todos os pendentes)"""
+        if ops is None:
+            return None
+        ops = sorted(set(ops))
+        if not ops:
+            raise NoRecordsError("Nenhuma OP selecionada!")
+        return ops
+    
+    @staticmethod
+    def _batch_filter(ops: Optional[List[str]]) -> dict:
+        """Filtro do lote: as OPs pedidas ou, sem OPs, os registros pendentes"""
+        return {'ops': ops} if ops is not None else {'status': 'Pendente'}
+    
+    def _iter_batch(self, ops: Optional[List[str]]) -> Iterable[Tuple]:
+        """Registros do lote em uma única consulta, agrupados por OP e com os totais de cada OP"""
+        return self.database.iter_registros(order_by_op=True, with_op_totals=True, **self._batch_filter(ops))
+    
+    @staticmethod
+    def _batch_labels(registros: Iterable[Tuple], separators: bool, ids: List[int],
+                      ops: List[str]) -> Iterable[Tuple]:
+        """
+        Repassa os registros do lote (ordenados por OP) sem as colunas de totais,
+        guardando os ids e as OPs e, se pedido, abrindo cada OP com uma etiqueta
+        separadora (sem id: não entra na atualização de status)
+        """
+        op_atual = None
+        for registro in registros:
+            if registro[1] != op_atual:
+                op_atual = registro[1]
+                ops.append(op_atual)
+                if separators:
+                    registros_op, qtde_op = registro[-2], registro[-1]
+                    yield (None, op_atual, registro[2], f"INÍCIO DA OP {op_atual} - {registros_op} etiqueta(s)",
+                           qtde_op, "SEPARADOR", None)
+            ids.append(registro[0])
+            yield registro[:7]
+    
+    def generate_labels_batch(self, output_path: str, ops: Optional[Iterable[str]] = None,
+                              separators: bool = False) -> dict:
+        """
+        Gera as etiquetas de várias OPs (ou de todos os pendentes) em um único documento
+        
+        Os registros vêm de uma única consulta (op = ANY(...)), agrupados por
+        OP, e são desenhados à medida que chegam; ao final, todos passam para
+        "Impresso" em um único UPDATE. O formato segue a extensão do arquivo
+        (ver generate_labels_file).
+        
+        Args:
+            output_path (str): Caminho do arquivo (.pdf, .zpl ou .tif)
+            ops (Iterable[str]): OPs do lote (None = todos os registros pendentes)
+            separators (bool): Etiqueta separadora antes de cada OP (OP, unidade, total de etiquetas e qtde)
+            
+        Returns:
+            dict: Resumo da geração (arquivo, arquivos, total de etiquetas, OPs, status atualizado)
+
+        Raises:
+            NoRecordsError: Nenhuma OP informada ou nenhum registro encontrado
+            DatabaseError: Falha ao ler o banco
+            PDFGenerationError / ZPLGenerationError / RasterGenerationError: Falha ao gerar
+        """
+        ops = self._batch_ops(ops)
+        ids = []
+        ops_geradas = []
+        try:
+            resultado = self.generate_labels_file(
+                self._batch_labels(self._iter_batch(ops), separators, ids, ops_geradas), output_path,
+                update_status=False
+            )
+        except NoRecordsError:
+            raise NoRecordsError("Nenhum registro encontrado para o lote de OPs")
+        
+        status_atualizado = self.update_status_by_ids(ids, "Impresso")
+        if not status_atualizado:
+            logger.warning(f"Lote gerado, mas o status de {len(ids)} registros não foi atualizado")
+        
+        return {
+            'arquivo': resultado['arquivo'],
+            'arquivos': resultado['arquivos'],
+            'total_etiquetas': len(ids),
+            'ops': ops_geradas,
+            'status_atualizado': status_atualizado
+        }
+    
+    def print_labels_batch(self, ops: Optional[Iterable[str]] = None, separators: bool = False,
+                           formato: str = 'zpl', dpi: int = 203, printer: Optional[str] = None) -> dict:
+        """
+        Envia as etiquetas de várias OPs (ou de todos os pendentes) como um único job de impressão
+        
+        Mesma consulta e mesmas separadoras de generate_labels_batch; o
+        status muda quando a impressora recebe o job (ver print_labels).
+        
+        Returns:
+            dict: Resumo (job_id, total de etiquetas, tamanho em bytes, OPs)
+
+        Raises:
+            NoRecordsError: Nenhuma OP informada ou nenhum registro encontrado
+            ZPLGenerationError / PDFGenerationError: Falha ao renderizar
+            ValueError: Nenhuma impressora configurada ou impressora desconhecida
+        """
+        ops = self._batch_ops(ops)
+        ops_geradas = []
+        resultado = self.print_labels(
+            self._batch_labels(self._iter_batch(ops), separators, [], ops_geradas),
+            formato=formato, dpi=dpi, printer=printer
+        )
+        resultado['ops'] = ops_geradas
+        return resultado
     
-    def generate_list_pdf(self, registros: List[Tuple], output_path: str) -> bool:
+    def generate_labels_pdf_for_op(self, op: str, output_path: str,
+                                   workers: int = 1, max_pages_per_file: Optional[int] = None,
+                                   copies: bool = False, number_copies: bool = False) -> dict:
         """
-        Gera PDF com lista simples dos registros
+        Gera as etiquetas de uma OP lendo os registros do banco em lotes
+        
+        Os registros não são carregados de uma vez: o cursor do servidor
+        alimenta o PDF diretamente, com memória constante mesmo em OPs grandes.
         
         Args:
-            registros (List[Tuple]): Lista de registros
+            op (str): OP exata
             output_path (str): Caminho para salvar o PDF
+            workers (int): Processos de renderização (1 = em série)
+            max_pages_per_file (int): Divide o resultado em arquivos com no máximo N páginas
+            copies (bool): Uma etiqueta por unidade (qtde cópias de cada registro)
+            number_copies (bool): Numera as cópias ("n/N")
             
         Returns:
-            bool: True se gerado com sucesso
+            dict: Resumo da geração (arquivo, total de etiquetas, status atualizado)
+
+        Raises:
+            NoRecordsError: A OP não tem registros
+            DatabaseError: Falha ao ler o banco
+            PDFGenerationError: Falha ao gerar o PDF
         """
-        if not registros:
-            messagebox.showwarning("Aviso", "Nenhum registro selecionado!")
-            return False
+        try:
+            return self.generate_labels_pdf(self.database.iter_registros(op=op), output_path,
+                                            workers=workers, max_pages_per_file=max_pages_per_file,
+                                            copies=copies, number_copies=number_copies)
+        except NoRecordsError:
+            raise NoRecordsError(f"Nenhum registro encontrado para a OP {op}")
+    
+    def preview_labels_pdf(self, registros: Iterable[Tuple], max_pages: Optional[int] = 1,
+                           copies: bool = False, number_copies: bool = False) -> bytes:
+        """
+        Renderiza as etiquetas em memória para prévia (por padrão só a primeira página)
+        
+        Não altera o status dos registros e só lê os registros necessários
+        para as páginas pedidas.
+        
+        Args:
+            registros (Iterable[Tuple]): Registros (id, op, unidade, arquivos, qtde, nome, status)
+            max_pages (int): Páginas renderizadas (None = todas)
+            copies (bool): Uma etiqueta por unidade (qtde cópias de cada registro)
+            number_copies (bool): Numera as cópias ("n/N")
+            
+        Returns:
+            bytes: Conteúdo do PDF
+
+        Raises:
+            NoRecordsError: Nenhum registro informado
+            TemplateError: Numeração pedida e template sem o campo 'copia'
+            PDFGenerationError: Falha ao gerar o PDF
+        """
+        if isinstance(registros, Sized) and len(registros) == 0:
+            raise NoRecordsError("Nenhum registro selecionado para gerar etiquetas!")
         
         try:
-            success = self.pdf_service.generate_simple_list_pdf(registros, output_path)
+            return self.pdf_service.render_labels_pdf(registros, label_size_mm=(100, 50), single_per_page=True,
+                                                      copies=copies, number_copies=number_copies,
+                                                      max_pages=max_pages)
+        except NoRecordsError:
+            raise NoRecordsError("Nenhum registro selecionado para gerar etiquetas!")
+    
+    @staticmethod
+    def _grouped_by_op(registros: Iterable[Tuple]) -> Iterable[Tuple]:
+        """
+        Agrupa por OP uma seleção em memória (para os subtotais do relatório);
+        iteradores (cursor do banco) já devem vir ordenados por OP
+        """
+        if isinstance(registros, Sized):
+            return sorted(registros, key=lambda registro: registro[1])
+        return registros
+    
+    def render_list_pdf(self, registros: Iterable[Tuple]) -> bytes:
+        """
+        Gera a lista simples dos registros em memória
+        
+        Args:
+            registros (Iterable[Tuple]): Registros (lista ou iterador ordenado por OP)
             
-            if success:
-                messagebox.showinfo(
-                    "Sucesso",
-                    f"Relatório gerado com sucesso!\n\n" +
-                    f"Arquivo: {output_path}\n" +
-                    f"Registros: {len(registros)}"
-                )
-                return True
+        Returns:
+            bytes: Conteúdo do PDF
+
+        Raises:
+            NoRecordsError: Nenhum registro informado
+            PDFGenerationError: Falha ao gerar o PDF
+        """
+        if isinstance(registros, Sized) and len(registros) == 0:
+            raise NoRecordsError("Nenhum registro selecionado!")
+        
+        return self.pdf_service.render_simple_list_pdf(self._grouped_by_op(registros))
+    
+    def generate_list_pdf(self, registros: Iterable[Tuple], output_path: str) -> dict:
+        """
+        Gera PDF com lista simples dos registros, com subtotais por OP
+        
+        Aceita lista (a seleção da tela, agrupada por OP aqui) ou o cursor de
+        Database.iter_registros(order_by_op=True): as páginas são gravadas à
+        medida que os registros chegam, com memória constante.
+        
+        Args:
+            registros (Iterable[Tuple]): Registros
+            output_path (str): Caminho para salvar o PDF
+            
+        Returns:
+            dict: Resumo da geração (arquivo, total de registros, quantidade, OPs e páginas)
+
+        Raises:
+            NoRecordsError: Nenhum registro informado
+            DatabaseError: Falha ao ler o banco
+            PDFGenerationError: Falha ao gerar o PDF
+        """
+        if isinstance(registros, Sized) and len(registros) == 0:
+            raise NoRecordsError("Nenhum registro selecionado!")
+        
+        resumo = self.pdf_service.report_service.generate_list_report(self._grouped_by_op(registros), output_path)
+        if resumo['total_registros'] == 0:
+            raise NoRecordsError("Nenhum registro selecionado!")
+
+        return {
+            'arquivo': output_path,
+            'total_registros': resumo['total_registros'],
+            'total_qtde': resumo['total_qtde'],
+            'total_ops': resumo['total_ops'],
+            'paginas': resumo['paginas']
+        }
+    
+    def generate_aggregate_report(self, agrupamento: str, output_path: str, op: Optional[str] = None,
+                                  status: Optional[str] = None, data_inicio: Optional[date] = None,
+                                  data_fim: Optional[date] = None) -> dict:
+        """
+        Gera um relatório de totais (por unidade, status e/ou dia) agregado no banco
+        
+        O formato segue a extensão: .csv gera CSV, qualquer outra gera PDF.
+        
+        Args:
+            agrupamento (str): 'unidade', 'status', 'dia' ou 'unidade_status'
+            output_path (str): Caminho do relatório
+            op (str): Filtra pela OP (opcional)
+            status (str): Filtra pelo status (opcional)
+            data_inicio (date): Registros criados a partir deste dia (opcional)
+            data_fim (date): Registros criados até este dia, inclusive (opcional)
+            
+        Returns:
+            dict: Resumo da geração (arquivo, grupos, total de registros e quantidade)
+
+        Raises:
+            ValueError: Agrupamento desconhecido
+            NoRecordsError: Nenhum registro nos filtros
+            DatabaseError: Falha ao consultar o banco
+            PDFGenerationError / ReportError: Falha ao gravar o relatório
+        """
+        linhas = self.database.get_aggregate_report(agrupamento, op=op, status=status,
+                                                    data_inicio=data_inicio, data_fim=data_fim)
+        # Só a linha do total geral (nivel, registros, ops, qtde nas últimas posições): nada nos filtros
+        if not any(linha[-4] == 0 for linha in linhas):
+            raise NoRecordsError("Nenhum registro encontrado para o relatório")
+
+        filtros = []
+        if op is not None:
+            filtros.append(f"OP {op}")
+        if status is not None:
+            filtros.append(f"status {status}")
+        if data_inicio is not None:
+            filtros.append(f"de {data_inicio.strftime('%d/%m/%Y')}")
+        if data_fim is not None:
+            filtros.append(f"até {data_fim.strftime('%d/%m/%Y')}")
+
+        report_service = self.pdf_service.report_service
+        if output_path.lower().endswith('.csv'):
+            resumo = report_service.write_aggregate_csv(agrupamento, linhas, output_path)
+        else:
+            resumo = report_service.generate_aggregate_report(agrupamento, linhas, output_path,
+                                                              filtros=', '.join(filtros))
+
+        return {
+            'arquivo': output_path,
+            'grupos': resumo['grupos'],
+            'total_registros': resumo['total_registros'],
+            'total_qtde': resumo['total_qtde']
+        }
+    
+    def export_registros(self, output_path: str, op: Optional[str] = None, status: Optional[str] = None,
+                         data_inicio: Optional[date] = None, data_fim: Optional[date] = None,
+                         progress: Optional[ProgressCallback] = None) -> dict:
+        """
+        Exporta os registros para CSV, XLSX ou Parquet, conforme a extensão do arquivo
+        
+        Lê direto do banco sem carregar a tabela: o CSV sai do COPY do
+        PostgreSQL e XLSX/Parquet de um cursor do servidor. Pode rodar em
+        uma thread; progress(feitos, total) é chamado a cada lote, na
+        thread da exportação.
+        
+        Args:
+            output_path (str): Caminho do arquivo (.csv, .xlsx, .parquet)
+            op (str): Filtra pela OP (opcional)
+            status (str): Filtra pelo status (opcional)
+            data_inicio (date): Registros criados a partir deste dia (opcional)
+            data_fim (date): Registros criados até este dia, inclusive (opcional)
+            progress (Callable): progress(feitos, total) (opcional)
+            
+        Returns:
+            dict: Resumo (arquivo, formato, total de registros)
+
+        Raises:
+            ValueError: Extensão sem formato de exportação
+            DatabaseError: Falha ao ler o banco
+            ReportError: Falha ao gravar o arquivo (ou pacote do formato ausente)
+        """
+        formato = EXPORT_FORMATS.get(os.path.splitext(output_path)[1].lower())
+        if formato is None:
+            raise ValueError(f"Formato de exportação não suportado: {output_path} (use .csv, .xlsx ou .parquet)")
+
+        filtros = {'op': op, 'status': status, 'data_inicio': data_inicio, 'data_fim': data_fim}
+        total = self.database.count_registros(**filtros)
+        if formato == 'csv':
+            exportados = self.export_service.write_csv(
+                lambda stream: self.database.copy_registros_csv(stream, **filtros), output_path, progress, total
+            )
+        else:
+            registros = self.database.iter_registros(with_created_at=True, **filtros)
+            if formato == 'xlsx':
+                exportados = self.export_service.write_xlsx(registros, output_path, progress, total)
             else:
-                messagebox.showerror("Erro", "Falha ao gerar o relatório!")
-                return False
-                
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao gerar relatório:\n{str(e)}")
-            return False
+                exportados = self.export_service.write_parquet(registros, output_path, progress, total)
+
+        return {
+            'arquivo': output_path,
+            'formato': formato,
+            'total_registros': exportados
+        }
     
     def get_excel_preview(self, file_path: str) -> Optional[dict]:
         """
@@ -327,37 +1256,21 @@ class EtiquetaController:
             list: Lista de tuplas de registros
         """
         # Usa a busca existente por campo 'op' para simplificar
-        return self.database.search_registros('op', op)
+        return self._with_pending_status(self.database.search_registros('op', op))
     
     def clear_all_data(self) -> bool:
         """
-        Limpa todos os dados do banco
+        Limpa todos os dados do banco (a confirmação fica a cargo de quem chama)
         
         Returns:
             bool: True se limpo com sucesso
+
+        Raises:
+            DatabaseError: Falha ao excluir os registros
         """
-        try:
-            resposta = messagebox.askyesno(
-                "Confirmar Exclusão",
-                "Tem certeza que deseja excluir TODOS os registros?\n\n" +
-                "Esta ação não pode ser desfeita!"
-            )
-            
-            if not resposta:
-                return False
-            
-            success = self.database.clear_all_registros()
-            
-            if success:
-                messagebox.showinfo("Sucesso", "Todos os registros foram excluídos!")
-                return True
-            else:
-                messagebox.showerror("Erro", "Falha ao excluir os registros!")
-                return False
-                
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao excluir registros:\n{str(e)}")
-            return False
+        if not self.database.clear_all_registros():
+            raise DatabaseError("Falha ao excluir os registros!")
+        return True
     
     def get_pdf_info(self) -> dict:
         """
@@ -18,6 +18,7 @@ Funcionalidades:
 - Gerar etiquetas em PDF
 - Gerar relatórios em PDF
 - Gerenciar registros (excluir, limpar)
+- Linha de comando sem interface gráfica (import, labels, print, report, export, jobs, stats, watch)
 
 Autor: Sistema Automático
 Data: 2025
@@ -25,16 +26,20 @@ Data: 2025
 
 import sys
 import os
-import tkinter as tk
-from tkinter import messagebox
+import time
+import argparse
+from datetime import date
 
 # Adiciona o diretório do projeto ao path para imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-def check_dependencies():
+def check_dependencies(gui: bool = True):
     """
     Verifica se todas as dependências estão instaladas
     
+    Args:
+        gui (bool): Se True, também exibe o erro em uma messagebox
+        
     Returns:
         bool: True se todas as dependências estão disponíveis
     """
@@ -71,8 +76,13 @@ pip install -r requirements.txt"""
         
         print(error_msg)
         
+        if not gui:
+            return False
+        
         # Tenta mostrar messagebox se tkinter estiver disponível
         try:
+            import tkinter as tk
+            from tkinter import messagebox
             root = tk.Tk()
             root.withdraw()  # Esconde a janela principal
             messagebox.showerror("Dependências não encontradas", error_msg)
@@ -141,15 +151,426 @@ def main():
     except ImportError as e:
         error_msg = f"Erro ao importar módulos da aplicação: {e}"
         print(error_msg)
-        messagebox.showerror("Erro de Importação", error_msg)
+        _show_gui_error("Erro de Importação", error_msg)
         return False
         
     except Exception as e:
         error_msg = f"Erro inesperado: {e}"
         print(error_msg)
-        messagebox.showerror("Erro", error_msg)
+        _show_gui_error("Erro", error_msg)
         return False
 
+def _show_gui_error(title: str, message: str):
+    """
+    Mostra um erro em messagebox, se houver interface gráfica disponível
+    """
+    try:
+        from tkinter import messagebox
+        messagebox.showerror(title, message)
+    except Exception:
+        pass
+
+def _create_controller():
+    """
+    Cria o controller sem nenhuma dependência de interface gráfica
+    """
+    from controller.etiqueta_controller import EtiquetaController
+    return EtiquetaController()
+
+def cmd_import(args) -> int:
+    """
+    Importa um ou mais arquivos Excel sem interface gráfica
+    """
+    from service.exceptions import EtiquetaError
+
+    controller = _create_controller()
+
+    def confirmar_problemas(qualidade):
+        print(controller.format_quality_issues(qualidade))
+        return not args.strict
+
+    falhas = 0
+    for file_path in args.files:
+        print(f"\n>> {file_path}")
+        try:
+            resultado = controller.import_excel_file(file_path, confirmar_problemas=confirmar_problemas)
+            print(controller.format_import_summary(resultado))
+        except EtiquetaError as e:
+            falhas += 1
+            print(f"Falha ao importar {file_path}: {e}")
+
+    return 1 if falhas else 0
+
+def cmd_labels(args) -> int:
+    """
+    Gera o PDF de etiquetas de uma OP sem interface gráfica
+    """
+    from service.exceptions import EtiquetaError
+
+    if args.format is None:
+        saida = args.output.lower()
+        if saida.endswith(".zpl"):
+            args.format = "zpl"
+        elif saida.endswith((".tif", ".tiff")):
+            args.format = "tiff"
+        else:
+            args.format = "pdf"
+    if (args.copies or args.number_copies or args.preview) and args.format != "pdf":
+        print("--copies, --number-copies e --preview só se aplicam ao PDF")
+        return 1
+    lote = args.ops is not None or args.pending
+    if lote and (args.copies or args.number_copies or args.preview or args.format == "png"):
+        print("Lotes (--ops/--pending) geram PDF, ZPL ou TIFF, sem --copies/--preview")
+        return 1
+    if args.separators and not lote:
+        print("--separators só se aplica a lotes (--ops/--pending)")
+        return 1
+
+    controller = _create_controller()
+    try:
+        if args.template:
+            controller.set_template(args.template)
+        if lote:
+            # Uma única consulta para todas as OPs, um arquivo e um UPDATE de status
+            resultado = controller.generate_labels_batch(args.output, ops=args.ops, separators=args.separators)
+            print(f"Lote com {len(resultado['ops'])} OP(s)")
+        elif args.preview:
+            # Só a primeira página, em memória; o status dos registros não muda
+            pdf = controller.preview_labels_pdf(
+                controller.database.iter_registros(op=args.op),
+                copies=args.copies or args.number_copies, number_copies=args.number_copies
+            )
+            with open(args.output, "wb") as f:
+                f.write(pdf)
+            print(f"Prévia da OP {args.op} ({len(pdf) / 1024:.1f} KB) -> {args.output}")
+            return 0
+        elif args.format == "zpl":
+            # ZPL nativo para Zebra: a OP também é lida em lotes do banco
+            resultado = controller.generate_labels_zpl(
+                controller.database.iter_registros(op=args.op), args.output, dpi=args.dpi
+            )
+        elif args.format in ("tiff", "png"):
+            # Imagens na resolução da impressora (TIFF multipágina ou pasta de PNGs)
+            resultado = controller.generate_labels_raster(
+                controller.database.iter_registros(op=args.op), args.output, dpi=args.dpi,
+                mode="L" if args.grayscale else "1", workers=args.workers
+            )
+        else:
+            # Lê a OP em lotes direto do banco para o PDF
+            resultado = controller.generate_labels_pdf_for_op(
+                args.op, args.output, workers=args.workers, max_pages_per_file=args.max_pages,
+                copies=args.copies or args.number_copies, number_copies=args.number_copies
+            )
+    except EtiquetaError as e:
+        print(f"Falha ao gerar etiquetas {'do lote' if lote else f'da OP {args.op}'}: {e}")
+        return 1
+    finally:
+        controller.close()
+
+    print(f"Etiquetas geradas: {resultado['total_etiquetas']} -> {', '.join(resultado['arquivos'])}")
+    if not resultado['status_atualizado']:
+        print("Atenção: o status dos registros não foi atualizado.")
+    return 0
+
+def cmd_print(args) -> int:
+    """
+    Envia as etiquetas de uma OP direto para impressoras de rede (TCP 9100)
+    """
+    from service.exceptions import EtiquetaError
+
+    controller = _create_controller()
+    try:
+        spooler = controller.get_print_spooler(args.printers)
+    except ValueError as e:
+        print(f"Impressoras inválidas: {e} (use --printers ou ETIQUETAS_PRINTERS)")
+        controller.close()
+        return 1
+
+    try:
+        if args.template:
+            controller.set_template(args.template)
+        if args.ops is not None or args.pending:
+            resultado = controller.print_labels_batch(
+                ops=args.ops, separators=args.separators, formato=args.format,
+                dpi=args.dpi, printer=args.printer
+            )
+        else:
+            resultado = controller.print_labels(
+                controller.database.iter_registros(op=args.op), formato=args.format,
+                dpi=args.dpi, printer=args.printer
+            )
+        print(f"Job {resultado['job_id']}: {resultado['total_etiquetas']} etiquetas "
+              f"({resultado['bytes'] / 1024:.1f} KB) na fila")
+
+        # Aguarda a fila (inclusive jobs antigos pendentes) esvaziar
+        concluido = spooler.wait(args.timeout)
+    except (EtiquetaError, ValueError) as e:
+        print(f"Falha ao imprimir etiquetas {f'da OP {args.op}' if args.op else 'do lote'}: {e}")
+        return 1
+    finally:
+        spooler.stop()
+        # Envia ao banco o status "Impresso" guardado no diário pelos jobs concluídos
+        controller.close()
+
+    resumo = spooler.queue_summary()
+    print(f"Fila: {resumo['concluido']} concluídos, {resumo['falha']} com falha, "
+          f"{resumo['pendente'] + resumo['enviando']} pendentes")
+    return 0 if concluido and resumo['falha'] == 0 else 1
+
+def cmd_report(args) -> int:
+    """
+    Gera o relatório (lista ou totais agregados) sem interface gráfica
+    """
+    from service.exceptions import EtiquetaError
+
+    if args.by is None and (args.status or args.date_from or args.date_to or args.output.lower().endswith(".csv")):
+        print("--status, --from, --to e saída .csv só se aplicam aos relatórios de totais (--by)")
+        return 1
+
+    controller = _create_controller()
+    try:
+        if args.by:
+            # Totais calculados no banco (GROUP BY ROLLUP)
+            resultado = controller.generate_aggregate_report(
+                args.by, args.output, op=args.op, status=args.status,
+                data_inicio=args.date_from, data_fim=args.date_to
+            )
+            print(f"Relatório gerado: {resultado['grupos']} grupos, {resultado['total_registros']} registros, "
+                  f"qtde {resultado['total_qtde']} -> {resultado['arquivo']}")
+            return 0
+        # Cursor do servidor agrupado por OP: o relatório sai página a página
+        resultado = controller.generate_list_pdf(
+            controller.database.iter_registros(op=args.op, order_by_op=True), args.output
+        )
+    except EtiquetaError as e:
+        print(f"Falha ao gerar relatório: {e}")
+        return 1
+
+    print(f"Relatório gerado: {resultado['total_registros']} registros, {resultado['total_ops']} OPs, "
+          f"{resultado['paginas']} páginas -> {resultado['arquivo']}")
+    return 0
+
+def cmd_export(args) -> int:
+    """
+    Exporta os registros para CSV, XLSX ou Parquet direto do banco
+    """
+    from service.exceptions import EtiquetaError
+
+    def progresso(feitos, total):
+        print(f"\r  {feitos}/{total} registros", end="", flush=True)
+
+    controller = _create_controller()
+    try:
+        resultado = controller.export_registros(
+            args.output, op=args.op, status=args.status,
+            data_inicio=args.date_from, data_fim=args.date_to, progress=progresso
+        )
+    except (EtiquetaError, ValueError) as e:
+        print(f"\nFalha ao exportar registros: {e}")
+        return 1
+
+    print(f"\nExportados: {resultado['total_registros']} registros ({resultado['formato']}) -> {resultado['arquivo']}")
+    return 0
+
+def cmd_jobs(args) -> int:
+    """
+    Lista, cancela, repete ou executa os trabalhos da fila em segundo plano
+    """
+    controller = _create_controller()
+    queue = controller.get_job_queue(start=args.run)
+    try:
+        if args.cancel is not None:
+            if not queue.cancel(args.cancel):
+                print(f"Trabalho {args.cancel} não está pendente nem em execução")
+                return 1
+            print(f"Trabalho {args.cancel} cancelado")
+        if args.retry is not None:
+            if not queue.retry(args.retry):
+                print(f"Trabalho {args.retry} não falhou nem foi cancelado")
+                return 1
+            print(f"Trabalho {args.retry} de volta à fila")
+        if args.clear:
+            print(f"{queue.remove_finished()} trabalhos finalizados removidos")
+        if args.run:
+            # Executa os pendentes (inclusive os deixados pela interface) até a fila esvaziar
+            concluido = queue.wait(args.timeout)
+            if not concluido:
+                print("Tempo esgotado com trabalhos ainda na fila")
+    finally:
+        controller.close()
+
+    for job in queue.list_jobs(limit=args.limit):
+        progresso = f"{job.feitos}/{job.total}" if job.total else str(job.feitos)
+        erro = f" - {job.erro}" if job.erro else ""
+        print(f"#{job.id:<5} {job.status:<10} {progresso:>13}  {job.descricao}{erro}")
+    resumo = queue.queue_summary()
+    print(f"Fila: {resumo['pendente']} pendentes, {resumo['executando']} em execução, "
+          f"{resumo['concluido']} concluídos, {resumo['falha']} com falha, {resumo['cancelado']} cancelados")
+    return 1 if args.run and (resumo['falha'] or not concluido) else 0
+
+def cmd_stats(args) -> int:
+    """
+    Imprime as estatísticas do banco
+    """
+    stats = _create_controller().get_statistics()
+    print(f"Registros: {stats['total_registros']}")
+    print(f"OPs: {stats['total_ops']}")
+    print(f"Unidades: {stats['total_unidades']}")
+    print(f"Qtde Total: {stats['total_quantidade']}")
+    return 0
+
+def cmd_watch(args) -> int:
+    """
+    Monitora uma pasta e importa as planilhas que chegarem
+    """
+    from service.watch_service import HotFolderWatcher
+
+    watcher = HotFolderWatcher(
+        args.folder,
+        _create_controller().database,
+        workers=args.workers,
+        interval=args.interval
+    )
+
+    if args.once:
+        # Duas varreduras: a primeira registra os arquivos, a segunda confirma que estão completos
+        watcher.scan()
+        time.sleep(args.interval)
+        try:
+            resultados = watcher.run_once()
+        finally:
+            watcher.close()
+        for resultado in resultados:
+            print(f"{resultado['arquivo']}: {resultado['status']} - "
+                  f"{resultado['registros_importados']}/{resultado['registros_lidos']} registros")
+        return 1 if any(r['status'] == 'falha' for r in resultados) else 0
+
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Monta o parser dos subcomandos de linha de comando
+    """
+    parser = argparse.ArgumentParser(
+        prog="main.py",
+        description="Sistema de Gestão de Etiquetas - modo linha de comando"
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    p_import = subparsers.add_parser("import", help="Importa arquivos Excel para o banco")
+    p_import.add_argument("files", nargs="+", metavar="FILE", help="Arquivos Excel")
+    p_import.add_argument("--strict", action="store_true",
+                          help="Cancela a importação se houver registros com problemas")
+    p_import.set_defaults(func=cmd_import)
+
+    p_labels = subparsers.add_parser("labels", help="Gera PDF de etiquetas de uma OP (ou de um lote de OPs)")
+    alvo_labels = p_labels.add_mutually_exclusive_group(required=True)
+    alvo_labels.add_argument("--op", help="Ordem de produção")
+    alvo_labels.add_argument("--ops", nargs="+", metavar="OP",
+                             help="Lote: várias OPs em um único arquivo (formato pela extensão)")
+    alvo_labels.add_argument("--pending", action="store_true",
+                             help="Lote: todos os registros pendentes em um único arquivo")
+    p_labels.add_argument("--separators", action="store_true",
+                          help="Etiqueta separadora antes de cada OP (lote)")
+    p_labels.add_argument("-o", "--output", required=True, help="Arquivo de saída (.pdf, .zpl, .tif ou pasta para PNG)")
+    p_labels.add_argument("--format", choices=["pdf", "zpl", "tiff", "png"], default=None,
+                          help="Formato de saída (padrão: pela extensão do arquivo)")
+    p_labels.add_argument("--dpi", type=int, choices=[203, 300], default=203,
+                          help="Resolução da impressora (ZPL, TIFF e PNG)")
+    p_labels.add_argument("--grayscale", action="store_true",
+                          help="Imagens em tons de cinza em vez de 1 bit (TIFF e PNG)")
+    p_labels.add_argument("--workers", type=int, default=1, help="Processos de renderização em paralelo")
+    p_labels.add_argument("--max-pages", type=int, default=None,
+                          help="Divide o PDF em arquivos com no máximo N páginas")
+    p_labels.add_argument("--copies", action="store_true",
+                          help="PDF com uma etiqueta por unidade (qtde cópias de cada registro)")
+    p_labels.add_argument("--number-copies", action="store_true",
+                          help="Numera as cópias (n/N); implica --copies")
+    p_labels.add_argument("--preview", action="store_true",
+                          help="Gera só a primeira página, sem marcar os registros como impressos (PDF)")
+    p_labels.add_argument("--template", default=None,
+                          help="Template da etiqueta, JSON ou YAML (padrão: ETIQUETAS_TEMPLATE ou o padrão)")
+    p_labels.set_defaults(func=cmd_labels)
+
+    p_print = subparsers.add_parser("print", help="Envia etiquetas de uma OP direto para impressoras de rede")
+    alvo_print = p_print.add_mutually_exclusive_group(required=True)
+    alvo_print.add_argument("--op", help="Ordem de produção")
+    alvo_print.add_argument("--ops", nargs="+", metavar="OP", help="Lote: várias OPs em um único job")
+    alvo_print.add_argument("--pending", action="store_true", help="Lote: todos os registros pendentes")
+    p_print.add_argument("--separators", action="store_true", help="Etiqueta separadora antes de cada OP (lote)")
+    p_print.add_argument("--printers", default=None,
+                         help="Impressoras: nome=host[:porta][/conexões],... (padrão: ETIQUETAS_PRINTERS)")
+    p_print.add_argument("--printer", default=None, help="Força uma impressora pelo nome")
+    p_print.add_argument("--format", choices=["zpl", "pdf"], default="zpl", help="Formato enviado")
+    p_print.add_argument("--dpi", type=int, choices=[203, 300], default=203, help="Resolução da Zebra (ZPL)")
+    p_print.add_argument("--template", default=None, help="Template da etiqueta, JSON ou YAML")
+    p_print.add_argument("--timeout", type=float, default=300.0, help="Tempo máximo de espera da fila (s)")
+    p_print.set_defaults(func=cmd_print)
+
+    p_report = subparsers.add_parser("report", help="Gera relatório (lista ou totais) em PDF ou CSV")
+    p_report.add_argument("--op", help="Filtra por ordem de produção")
+    p_report.add_argument("-o", "--output", required=True, help="Arquivo de saída (.pdf; .csv para totais)")
+    p_report.add_argument("--by", choices=["unidade", "status", "dia", "unidade_status"], default=None,
+                          help="Totais por unidade, status e/ou dia em vez da lista de registros")
+    p_report.add_argument("--status", default=None, help="Filtra pelo status (totais)")
+    p_report.add_argument("--from", dest="date_from", type=date.fromisoformat, default=None,
+                          help="Registros criados a partir do dia AAAA-MM-DD (totais)")
+    p_report.add_argument("--to", dest="date_to", type=date.fromisoformat, default=None,
+                          help="Registros criados até o dia AAAA-MM-DD, inclusive (totais)")
+    p_report.set_defaults(func=cmd_report)
+
+    p_export = subparsers.add_parser("export", help="Exporta os registros para CSV, XLSX ou Parquet")
+    p_export.add_argument("-o", "--output", required=True, help="Arquivo de saída (.csv, .xlsx ou .parquet)")
+    p_export.add_argument("--op", default=None, help="Filtra por ordem de produção")
+    p_export.add_argument("--status", default=None, help="Filtra pelo status")
+    p_export.add_argument("--from", dest="date_from", type=date.fromisoformat, default=None,
+                          help="Registros criados a partir do dia AAAA-MM-DD")
+    p_export.add_argument("--to", dest="date_to", type=date.fromisoformat, default=None,
+                          help="Registros criados até o dia AAAA-MM-DD, inclusive")
+    p_export.set_defaults(func=cmd_export)
+
+    p_jobs = subparsers.add_parser("jobs", help="Lista e controla a fila de etiquetas/relatórios em segundo plano")
+    p_jobs.add_argument("--cancel", type=int, metavar="ID", help="Cancela um trabalho")
+    p_jobs.add_argument("--retry", type=int, metavar="ID", help="Devolve à fila um trabalho com falha ou cancelado")
+    p_jobs.add_argument("--clear", action="store_true", help="Remove os trabalhos finalizados")
+    p_jobs.add_argument("--run", action="store_true", help="Executa os trabalhos pendentes e sai")
+    p_jobs.add_argument("--timeout", type=float, default=None, help="Tempo máximo de execução com --run (s)")
+    p_jobs.add_argument("--limit", type=int, default=20, help="Trabalhos listados")
+    p_jobs.set_defaults(func=cmd_jobs)
+
+    p_stats = subparsers.add_parser("stats", help="Mostra estatísticas do banco")
+    p_stats.set_defaults(func=cmd_stats)
+
+    p_watch = subparsers.add_parser("watch", help="Importa planilhas que chegarem em uma pasta")
+    p_watch.add_argument("folder", help="Pasta monitorada")
+    p_watch.add_argument("--workers", type=int, default=4, help="Arquivos lidos em paralelo")
+    p_watch.add_argument("--interval", type=float, default=2.0, help="Intervalo entre varreduras (s)")
+    p_watch.add_argument("--once", action="store_true", help="Importa o que houver na pasta e sai")
+    p_watch.set_defaults(func=cmd_watch)
+
+    return parser
+
+def run_cli(argv) -> int:
+    """
+    Executa um subcomando de linha de comando sem criar janela Tk
+    
+    Args:
+        argv (list): Argumentos (sem o nome do programa)
+        
+    Returns:
+        int: Código de saída do processo
+    """
+    args = build_parser().parse_args(argv)
+
+    if not check_dependencies(gui=False):
+        return 1
+
+    return args.func(args)
+
 def print_help():
     """
     Imprime informações de ajuda
@@ -163,6 +584,18 @@ USO:
     python main.py --help          - Mostra esta ajuda
     python main.py --sample        - Cria arquivo Excel de exemplo
 
+LINHA DE COMANDO (sem interface gráfica):
+    python main.py import FILE...              - Importa um ou mais arquivos Excel
+    python main.py labels --op X -o out.pdf    - Gera etiquetas de uma OP
+    python main.py labels --ops X Y -o out.pdf - Lote de OPs em um arquivo (--pending: todos pendentes)
+    python main.py print --op X --printers H   - Envia etiquetas direto às impressoras (TCP 9100)
+    python main.py report [--op X] -o out.pdf  - Gera relatório em PDF
+    python main.py export -o dados.xlsx        - Exporta registros (.csv, .xlsx, .parquet)
+    python main.py jobs [--run]                - Lista (ou executa) a fila de trabalhos em segundo plano
+    python main.py stats                       - Mostra estatísticas do banco
+    python main.py watch PASTA [--workers N]   - Importa planilhas que chegarem na pasta
+                                                 (move para PASTA/done ou PASTA/failed)
+
 ESTRUTURA DO EXCEL:
     A1: OP (ordem de produção)     - Ex: "OP001"
     A2+: arquivos desta OP         - Ex: "arquivo1.txt", "arquivo2.pdf"
@@ -206,6 +639,12 @@ if __name__ == "__main__":
                 print(f"Arquivo criado: {sample_file}")
                 print("\nUse este arquivo para testar a importação.")
             sys.exit(0)
+        elif sys.argv[1] in ["import", "labels", "print", "report", "export", "jobs", "stats", "watch"]:
+            try:
+                sys.exit(run_cli(sys.argv[1:]))
+            except KeyboardInterrupt:
+                print("\n\nOperação interrompida pelo usuário.")
+                sys.exit(130)
         else:
             print(f"Argumento desconhecido: {sys.argv[1]}")
             print("Use --help para ver as opções disponíveis.")
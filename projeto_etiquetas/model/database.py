@@ -2,12 +2,27 @@ import psycopg2
 import psycopg2.extras
 import os
 import logging
-from typing import List, Tuple
+from datetime import date
+from typing import BinaryIO, Dict, Iterator, List, Optional, Sequence, Tuple
+from uuid import uuid4
+
+from service.exceptions import DatabaseError
 
 # Configurar logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Colunas exportadas (CSV/XLSX/Parquet), na ordem dos arquivos
+EXPORT_COLUMNS = ('id', 'op', 'unidade', 'arquivos', 'qtde', 'nome', 'status', 'created_at')
+
+# Relatórios agregados: expressões SQL de cada dimensão do GROUP BY ROLLUP, na ordem
+AGGREGATE_DIMENSIONS = {
+    'unidade': ('unidade',),
+    'status': ('status',),
+    'dia': ('created_at::date',),
+    'unidade_status': ('unidade', 'status'),
+}
+
 
 class Database:
     def __init__(self, db_path: str = None):
@@ -70,6 +85,37 @@ class Database:
         """Retorna uma nova conexão via psycopg2."""
         return psycopg2.connect(**self.db_config)
 
+    @staticmethod
+    def _where_clause(op: Optional[str] = None, status: Optional[str] = None,
+                      data_inicio: Optional[date] = None, data_fim: Optional[date] = None,
+                      ops: Optional[Sequence[str]] = None) -> Tuple[str, list]:
+        """
+        Monta o WHERE dos filtros comuns (OP ou lista de OPs, status e dias de criação, inclusive)
+
+        Returns:
+            Tuple[str, list]: (" WHERE ..." ou "", parâmetros)
+        """
+        condicoes = []
+        params = []
+        if op is not None:
+            condicoes.append('op = %s')
+            params.append(op)
+        if ops is not None:
+            # Um único parâmetro (array), qualquer que seja o número de OPs
+            condicoes.append('op = ANY(%s)')
+            params.append(list(ops))
+        if status is not None:
+            condicoes.append('status = %s')
+            params.append(status)
+        if data_inicio is not None:
+            condicoes.append('created_at >= %s')
+            params.append(data_inicio)
+        if data_fim is not None:
+            condicoes.append('created_at < %s::date + 1')
+            params.append(data_fim)
+        where = f" WHERE {' AND '.join(condicoes)}" if condicoes else ''
+        return where, params
+
     def _migrate_add_nome_column(self):
         """Adiciona a coluna 'nome' à tabela se ela não existir"""
         conn = None
@@ -252,6 +298,66 @@ class Database:
             except Exception:
                 pass
 
+    def iter_registros(self, op: Optional[str] = None, status: Optional[str] = None,
+                       itersize: int = 2000, order_by_op: bool = False,
+                       data_inicio: Optional[date] = None, data_fim: Optional[date] = None,
+                       with_created_at: bool = False, ops: Optional[Sequence[str]] = None,
+                       with_op_totals: bool = False) -> Iterator[Tuple]:
+        """
+        Percorre os registros com um cursor do lado do servidor
+
+        Os registros chegam em lotes de `itersize` linhas, então a memória
+        usada não cresce com o tamanho da OP/tabela. A conexão fica aberta
+        até o iterador ser consumido ou fechado.
+
+        Args:
+            op (str): Filtra pela OP exata (opcional)
+            status (str): Filtra pelo status (opcional)
+            itersize (int): Linhas buscadas por ida ao servidor
+            order_by_op (bool): Agrupa por OP (ordem de OP e id), para subtotais em fluxo
+            data_inicio (date): Registros criados a partir deste dia (opcional)
+            data_fim (date): Registros criados até este dia, inclusive (opcional)
+            with_created_at (bool): Acrescenta created_at ao fim de cada tupla (exportação)
+            ops (Sequence[str]): Filtra por várias OPs exatas na mesma consulta (opcional)
+            with_op_totals (bool): Acrescenta o número de registros e a soma de qtde da OP
+                                   de cada linha (calculados na mesma consulta)
+
+        Yields:
+            Tuple: (id, op, unidade, arquivos, qtde, nome, status[, created_at][, registros_op, qtde_op])
+                   em ordem de id
+
+        Raises:
+            DatabaseError: Falha ao consultar o banco
+        """
+        where, params = self._where_clause(op, status, data_inicio, data_fim, ops)
+        colunas = ', '.join(EXPORT_COLUMNS if with_created_at else EXPORT_COLUMNS[:-1])
+        if with_op_totals:
+            colunas += ', COUNT(*) OVER (PARTITION BY op), COALESCE(SUM(qtde) OVER (PARTITION BY op), 0)'
+        ordem = 'op, id' if order_by_op else 'id'
+
+        conn = None
+        try:
+            conn = self._get_connection()
+            # Cursor nomeado = DECLARE CURSOR no servidor (buscado em lotes)
+            cursor = conn.cursor(name=f"etiquetas_iter_{uuid4().hex}")
+            cursor.itersize = itersize
+            cursor.execute(
+                f'SELECT {colunas} FROM etiquetas{where} ORDER BY {ordem}',
+                params
+            )
+            for row in cursor:
+                yield row
+            cursor.close()
+        except psycopg2.Error as e:
+            print(f"Erro ao percorrer registros: {e}")
+            raise DatabaseError(f"Erro ao percorrer registros: {e}") from e
+        finally:
+            try:
+                if conn:
+                    conn.close()
+            except Exception:
+                pass
+
     def search_registros(self, campo: str, valor: str) -> List[Tuple]:
         """Busca registros por um campo específico."""
         conn = None
@@ -317,18 +423,53 @@ class Database:
         try:
             conn = self._get_connection()
             cursor = conn.cursor()
-            placeholders = ','.join(['%s'] * len(ids))
-            query = f'UPDATE etiquetas SET status = %s WHERE id IN ({placeholders})'
-            cursor.execute(query, [status] + ids)
+            # Um único parâmetro (array) em vez de um placeholder por id
+            cursor.execute('UPDATE etiquetas SET status = %s WHERE id = ANY(%s)', (status, list(ids)))
             conn.commit()
             return cursor.rowcount > 0
         except Exception as e:
-            print(f"Erro ao atualizar status dos registros {ids}: {e}")
+            print(f"Erro ao atualizar status de {len(ids)} registros: {e}")
             return False
         finally:
             if conn:
                 conn.close()
 
+    def apply_status_changes(self, mudancas: Dict[str, List[int]]) -> int:
+        """
+        Aplica várias mudanças de status em uma única transação
+
+        Um UPDATE por status (ids em um único parâmetro array); ou todas as
+        mudanças são gravadas, ou nenhuma.
+
+        Args:
+            mudancas (dict): {status: [ids]}
+
+        Returns:
+            int: Registros atualizados (ids inexistentes são ignorados)
+
+        Raises:
+            DatabaseError: Falha ao gravar no banco
+        """
+        conn = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            atualizados = 0
+            for status, ids in mudancas.items():
+                cursor.execute('UPDATE etiquetas SET status = %s WHERE id = ANY(%s)', (status, list(ids)))
+                atualizados += cursor.rowcount
+            conn.commit()
+            return atualizados
+        except psycopg2.Error as e:
+            print(f"Erro ao aplicar mudanças de status: {e}")
+            raise DatabaseError(f"Erro ao aplicar mudanças de status: {e}") from e
+        finally:
+            try:
+                if conn:
+                    conn.close()
+            except Exception:
+                pass
+
     def clear_all_registros(self) -> bool:
         """Limpa todos os registros da tabela."""
         conn = None
@@ -365,7 +506,17 @@ class Database:
             
             duplicatas = []
             novos = []
-            
+
+            # Busca de uma vez os registros existentes das OPs envolvidas e
+            # compara em memória, em vez de uma consulta por registro
+            ops = list({registro[0] for registro in registros})
+            cursor.execute('''
+                SELECT id, op, unidade, arquivos, qtde, nome, status
+                FROM etiquetas
+                WHERE op = ANY(%s)
+            ''', (ops,))
+            existentes = {(row[1], row[2], row[3]): row for row in cursor.fetchall()}
+
             for registro in registros:
                 # Suporta tanto formato antigo (4 elementos) quanto novo (5 elementos)
                 if len(registro) == 4:
@@ -373,16 +524,10 @@ class Database:
                     nome = ""
                 else:
                     op, unidade, arquivos, qtde, nome = registro[:5]
-                
+
                 # Verifica se já existe registro com mesma OP, unidade e arquivo
-                cursor.execute('''
-                    SELECT id, op, unidade, arquivos, qtde, nome, status 
-                    FROM etiquetas 
-                    WHERE op = ? AND unidade = ? AND arquivos = ?
-                ''', (op, unidade, arquivos))
-                
-                existente = cursor.fetchone()
-                
+                existente = existentes.get((op, unidade, arquivos))
+
                 if existente:
                     duplicatas.append({
                         'novo': (op, unidade, arquivos, qtde, nome),
@@ -470,3 +615,123 @@ class Database:
                     conn.close()
             except Exception:
                 pass
+
+    def get_aggregate_report(self, agrupamento: str, op: Optional[str] = None, status: Optional[str] = None,
+                             data_inicio: Optional[date] = None, data_fim: Optional[date] = None) -> List[Tuple]:
+        """
+        Totais por unidade, status e/ou dia calculados no banco (GROUP BY ROLLUP)
+
+        Só as linhas agregadas saem do servidor, então o tempo depende do
+        número de grupos e não do número de registros. O ROLLUP acrescenta
+        os subtotais de cada nível e o total geral, ordenados logo após os
+        grupos que resumem.
+
+        Args:
+            agrupamento (str): Chave de AGGREGATE_DIMENSIONS ('unidade', 'status', 'dia', 'unidade_status')
+            op (str): Filtra pela OP exata (opcional)
+            status (str): Filtra pelo status (opcional)
+            data_inicio (date): Registros criados a partir deste dia (opcional)
+            data_fim (date): Registros criados até este dia, inclusive (opcional)
+
+        Returns:
+            List[Tuple]: (chaves..., nivel, registros, ops, qtde) por grupo; nivel é o
+                         número de dimensões agregadas (0 = grupo, len(chaves) = total geral)
+
+        Raises:
+            ValueError: Agrupamento desconhecido
+            DatabaseError: Falha ao consultar o banco
+        """
+        dimensoes = AGGREGATE_DIMENSIONS.get(agrupamento)
+        if dimensoes is None:
+            raise ValueError(f"Agrupamento desconhecido: {agrupamento} (use {', '.join(AGGREGATE_DIMENSIONS)})")
+
+        where, params = self._where_clause(op, status, data_inicio, data_fim)
+        chaves = ', '.join(dimensoes)
+        # Subtotal de cada grupo logo depois dos detalhes dele; total geral por último
+        ordem = ', '.join(f'GROUPING({d}), {d}' for d in dimensoes)
+
+        conn = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT {chaves}, GROUPING({chaves}), COUNT(*), COUNT(DISTINCT op), COALESCE(SUM(qtde), 0)
+                FROM etiquetas{where}
+                GROUP BY ROLLUP({chaves})
+                ORDER BY {ordem}
+            ''', params)
+            n = len(dimensoes)
+            # GROUPING() devolve um bit por dimensão agregada; o nível é a contagem de bits
+            return [row[:n] + (bin(row[n]).count('1'),) + tuple(row[n + 1:]) for row in cursor.fetchall()]
+        except psycopg2.Error as e:
+            print(f"Erro ao gerar relatório agregado: {e}")
+            raise DatabaseError(f"Erro ao gerar relatório agregado: {e}") from e
+        finally:
+            try:
+                if conn:
+                    conn.close()
+            except Exception:
+                pass
+
+    def count_registros(self, op: Optional[str] = None, status: Optional[str] = None,
+                        data_inicio: Optional[date] = None, data_fim: Optional[date] = None,
+                        ops: Optional[Sequence[str]] = None) -> int:
+        """
+        Conta os registros dos filtros (total para o progresso das exportações)
+
+        Raises:
+            DatabaseError: Falha ao consultar o banco
+        """
+        where, params = self._where_clause(op, status, data_inicio, data_fim, ops)
+        conn = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            cursor.execute(f'SELECT COUNT(*) FROM etiquetas{where}', params)
+            return cursor.fetchone()[0]
+        except psycopg2.Error as e:
+            print(f"Erro ao contar registros: {e}")
+            raise DatabaseError(f"Erro ao contar registros: {e}") from e
+        finally:
+            try:
+                if conn:
+                    conn.close()
+            except Exception:
+                pass
+
+    def copy_registros_csv(self, output: BinaryIO, op: Optional[str] = None, status: Optional[str] = None,
+                           data_inicio: Optional[date] = None, data_fim: Optional[date] = None):
+        """
+        Exporta os registros em CSV com COPY ... TO STDOUT
+
+        O próprio servidor formata o CSV (cabeçalho, separador ';') e o
+        psycopg2 repassa os dados direto para `output`, sem montar tuplas
+        Python: é o caminho mais rápido e a memória não cresce com a tabela.
+
+        Args:
+            output (BinaryIO): Destino com write() (arquivo aberto em modo binário)
+            op, status, data_inicio, data_fim: Filtros, como em iter_registros
+
+        Raises:
+            DatabaseError: Falha ao consultar o banco
+        """
+        where, params = self._where_clause(op, status, data_inicio, data_fim)
+        conn = None
+        try:
+            conn = self._get_connection()
+            cursor = conn.cursor()
+            # COPY não aceita parâmetros: os valores entram já escapados pelo mogrify
+            consulta = cursor.mogrify(f'SELECT {", ".join(EXPORT_COLUMNS)} FROM etiquetas{where} ORDER BY id', params)
+            cursor.copy_expert(
+                b"COPY (" + consulta + b") TO STDOUT WITH (FORMAT csv, HEADER true, DELIMITER ';', ENCODING 'UTF8')",
+                output
+            )
+        except psycopg2.Error as e:
+            print(f"Erro ao exportar registros: {e}")
+            raise DatabaseError(f"Erro ao exportar registros: {e}") from e
+        finally:
+            try:
+                if conn:
+                    conn.close()
+            except Exception:
+                pass
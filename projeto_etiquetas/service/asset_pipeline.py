@@ -0,0 +1,191 @@
+"""
+Pré-processamento de logos e imagens para a resolução da impressora.
+
+A logo original (500x500 px, ~25 KB) é reduzida uma única vez para o
+tamanho físico da caixa na resolução de destino e convertida para a forma
+que cada saída usa: 1-bit pontilhado (térmicas), tons de cinza, JPEG ou
+PNG otimizados (impressoras de folha). O resultado fica em cache no disco,
+identificado pelo hash do arquivo de origem e pelo destino (tamanho, dpi,
+modo), e é reaproveitado entre execuções e entre processos.
+"""
+import hashlib
+import os
+import tempfile
+from typing import Dict, NamedTuple, Optional, Tuple
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Modos de destino: '1' (pontilhado), 'L' (cinza), 'jpeg', 'png' e 'auto'
+# ('png' se a origem tiver transparência, senão 'jpeg')
+TARGET_MODES = ('1', 'L', 'jpeg', 'png', 'auto')
+
+# Modos na resolução do dispositivo: a imagem é ampliada se preciso, pois
+# cada pixel vira um ponto da impressora
+_DEVICE_MODES = ('1', 'L')
+
+# Muda quando o processamento muda, invalidando o cache antigo
+_PIPELINE_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'etiquetas', 'assets')
+
+
+class PreparedAsset(NamedTuple):
+    """Imagem pronta para a impressora, gravada no cache"""
+    path: str
+    size: Tuple[int, int]
+    mode: str
+    has_alpha: bool
+
+
+def _points_to_px(points: float, dpi: int) -> int:
+    """Converte pontos (1/72") em pixels na resolução informada"""
+    return max(1, int(round(points * dpi / 72.0)))
+
+
+class AssetPipeline:
+    def __init__(self, cache_dir: Optional[str] = None):
+        """
+        Inicializa o pipeline de assets
+
+        Args:
+            cache_dir (str): Pasta do cache (padrão: ETIQUETAS_ASSET_CACHE ou ~/.cache/etiquetas/assets)
+        """
+        self.cache_dir = cache_dir or os.environ.get('ETIQUETAS_ASSET_CACHE', DEFAULT_CACHE_DIR)
+        # Hash por (caminho, mtime, tamanho) e assets já preparados neste processo
+        self._hashes: Dict[Tuple[str, int, int], str] = {}
+        self._prepared: Dict[Tuple, PreparedAsset] = {}
+
+    def source_hash(self, source_path: str) -> str:
+        """
+        SHA-256 do arquivo de origem (recalculado só se o arquivo mudar)
+
+        Args:
+            source_path (str): Caminho da imagem de origem
+
+        Returns:
+            str: Hash hexadecimal do conteúdo
+        """
+        stat = os.stat(source_path)
+        key = (os.path.abspath(source_path), stat.st_mtime_ns, stat.st_size)
+        digest = self._hashes.get(key)
+        if digest is None:
+            sha = hashlib.sha256()
+            with open(source_path, 'rb') as f:
+                for bloco in iter(lambda: f.read(1 << 16), b''):
+                    sha.update(bloco)
+            digest = self._hashes[key] = sha.hexdigest()
+        return digest
+
+    def prepare(self, source_path: str, width_pt: float, height_pt: float, dpi: int,
+                mode: str = 'auto') -> Optional[PreparedAsset]:
+        """
+        Retorna a imagem reduzida para a caixa width_pt x height_pt em dpi
+
+        A proporção é mantida (a imagem cabe inteira na caixa). Na primeira
+        chamada para um destino a imagem é processada e gravada no cache;
+        as seguintes só devolvem o caminho.
+
+        Args:
+            source_path (str): Imagem de origem (JPG/PNG)
+            width_pt (float): Largura da caixa em pontos
+            height_pt (float): Altura da caixa em pontos
+            dpi (int): Resolução de destino
+            mode (str): '1', 'L', 'jpeg', 'png' ou 'auto'
+
+        Returns:
+            PreparedAsset | None: Asset preparado ou None se Pillow não estiver instalado
+
+        Raises:
+            ValueError: Modo de destino não suportado
+        """
+        if mode not in TARGET_MODES:
+            raise ValueError(f"Modo de asset não suportado: {mode} (use {', '.join(TARGET_MODES)})")
+        if not PIL_AVAILABLE:
+            return None
+
+        box = (_points_to_px(width_pt, dpi), _points_to_px(height_pt, dpi))
+        digest = self.source_hash(source_path)
+        key = (digest, box, dpi, mode)
+        asset = self._prepared.get(key)
+        if asset is None:
+            asset = self._prepared[key] = self._prepare_cached(source_path, digest, box, dpi, mode)
+        return asset
+
+    def _prepare_cached(self, source_path: str, digest: str, box: Tuple[int, int], dpi: int,
+                        mode: str) -> PreparedAsset:
+        """Processa a imagem ou reaproveita o arquivo já gravado no cache"""
+        with Image.open(source_path) as img:
+            img.load()
+            has_alpha = img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info
+            if has_alpha:
+                img = img.convert('RGBA')
+                # Canal alfa todo opaco não precisa de máscara no PDF
+                has_alpha = img.getchannel('A').getextrema()[0] < 255
+
+            if mode == 'auto':
+                mode = 'png' if has_alpha else 'jpeg'
+            if mode != 'png':
+                has_alpha = False
+
+            extensao = 'jpg' if mode == 'jpeg' else 'png'
+            stem = os.path.splitext(os.path.basename(source_path))[0]
+            nome = f"{stem}-{digest[:16]}-{box[0]}x{box[1]}-{dpi}-{mode}-v{_PIPELINE_VERSION}.{extensao}"
+            path = os.path.join(self.cache_dir, nome)
+
+            if os.path.exists(path):
+                with Image.open(path) as cached:
+                    return PreparedAsset(path, cached.size, mode, has_alpha)
+
+            result = self._convert(img, box, mode, has_alpha)
+
+        self._write_atomic(result, path, mode, dpi)
+        return PreparedAsset(path, result.size, mode, has_alpha)
+
+    @staticmethod
+    def _convert(img, box: Tuple[int, int], mode: str, has_alpha: bool):
+        """
+        Reduz e converte a imagem para o modo de destino
+
+        Transparência vira branco (papel), exceto no PNG com alfa, que a
+        mantém para a máscara do PDF.
+        """
+        if has_alpha:
+            img = img.convert('RGBA')
+        else:
+            rgba = img.convert('RGBA')
+            fundo = Image.new('RGBA', rgba.size, (255, 255, 255, 255))
+            img = Image.alpha_composite(fundo, rgba).convert('RGB')
+
+        if mode in _DEVICE_MODES:
+            # Um pixel por ponto da impressora (amplia se a origem for menor)
+            img = ImageOps.contain(img, box, Image.LANCZOS)
+        elif img.width > box[0] or img.height > box[1]:
+            # Para o PDF só reduz: ampliar não acrescenta detalhe
+            img.thumbnail(box, Image.LANCZOS)
+
+        if mode == '1':
+            # Floyd-Steinberg: meios-tons viram padrão de pontos
+            return img.convert('L').convert('1')
+        if mode == 'L':
+            return img.convert('L')
+        return img
+
+    def _write_atomic(self, image, path: str, mode: str, dpi: int):
+        """Grava no cache via arquivo temporário (outros processos nunca leem pela metade)"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if mode == 'jpeg':
+                    image.save(f, format='JPEG', quality=85, optimize=True, dpi=(dpi, dpi))
+                else:
+                    image.save(f, format='PNG', optimize=True, dpi=(dpi, dpi))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
@@ -1,8 +1,9 @@
 import pandas as pd
 import os
+import time
 import logging
-from typing import List, Tuple, Optional
-from tkinter import messagebox
+from typing import Iterator, List, Tuple, Optional
+from service.exceptions import ExcelReadError, NoRecordsError
 
 # Configurar logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -17,6 +18,8 @@ class ExcelService:
         """
         Valida se o arquivo Excel tem a estrutura esperada
         
+        Lê apenas as duas primeiras linhas da primeira planilha.
+        
         Args:
             file_path (str): Caminho para o arquivo Excel
             
@@ -24,15 +27,19 @@ class ExcelService:
             bool: True se a estrutura estiver correta, False caso contrário
         """
         try:
-            # Lê o arquivo Excel
-            df = pd.read_excel(file_path, header=None)
+            preview = self.get_excel_preview(file_path, max_rows=2)
+            if not preview or not preview['sheets']:
+                return False
+            
+            sheet = preview['sheets'][0]
+            rows = sheet['preview_data']
             
             # Verifica se tem pelo menos 2 linhas e 2 colunas
-            if df.shape[0] < 2 or df.shape[1] < 2:
+            if len(rows) < 2 or max(len(row) for row in rows) < 2:
                 return False
             
             # Verifica se A1 contém algo (OP) e B1 contém algo (unidade)
-            if pd.isna(df.iloc[0, 0]) or pd.isna(df.iloc[0, 1]):
+            if not rows[0][0] or not rows[0][1]:
                 return False
             
             return True
@@ -41,7 +48,41 @@ class ExcelService:
             print(f"Erro ao validar estrutura do Excel: {e}")
             return False
     
-    def read_excel_data(self, file_path: str) -> Optional[List[Tuple[str, str, str, int]]]:
+    def read_data(self, file_path: str) -> List[Tuple[str, str, str, int, str]]:
+        """
+        Lê registros de qualquer formato suportado (Excel, CSV ou Parquet)
+        
+        Args:
+            file_path (str): Caminho para o arquivo
+            
+        Returns:
+            List[Tuple]: Lista de tuplas (op, unidade, arquivos, qtde, nome)
+
+        Raises:
+            ExcelReadError: Formato não suportado, arquivo inexistente ou ilegível
+            NoRecordsError: Nenhum registro válido
+        """
+        from service.readers import get_reader
+        return get_reader(file_path).read_records(file_path)
+    
+    def iter_data(self, file_path: str) -> Iterator[Tuple[str, str, str, int, str]]:
+        """
+        Percorre os registros de qualquer formato suportado sob demanda
+        
+        CSV e Parquet são lidos em blocos; use no lugar de read_data quando
+        os registros puderem ser processados aos poucos.
+        
+        Yields:
+            Tuple: (op, unidade, arquivos, qtde, nome)
+
+        Raises:
+            ExcelReadError: Formato não suportado, arquivo inexistente ou ilegível
+            NoRecordsError: Nenhum registro válido
+        """
+        from service.readers import get_reader
+        return get_reader(file_path).stream_records(file_path)
+    
+    def read_excel_data(self, file_path: str) -> List[Tuple[str, str, str, int, str]]:
         """
         Lê os dados de todas as planilhas do Excel e retorna uma lista de registros
         
@@ -49,21 +90,23 @@ class ExcelService:
             file_path (str): Caminho para o arquivo Excel
             
         Returns:
-            Optional[List[Tuple]]: Lista de tuplas (op, unidade, arquivos, qtde) ou None se erro
+            List[Tuple]: Lista de tuplas (op, unidade, arquivos, qtde, nome)
+
+        Raises:
+            ExcelReadError: Arquivo inexistente ou ilegível
+            NoRecordsError: Nenhuma planilha com registros válidos
         """
+        if not os.path.exists(file_path):
+            raise ExcelReadError(f"Arquivo não encontrado: {file_path}")
+
         try:
-            if not os.path.exists(file_path):
-                messagebox.showerror("Erro", "Arquivo não encontrado!")
-                return None
-            
             # Lê todas as planilhas do arquivo Excel
             try:
                 excel_file = pd.ExcelFile(file_path)
                 sheet_names = excel_file.sheet_names
                 print(f"Planilhas encontradas: {sheet_names}")
             except Exception as e:
-                messagebox.showerror("Erro", f"Erro ao acessar arquivo Excel:\n{str(e)}")
-                return None
+                raise ExcelReadError(f"Erro ao acessar arquivo Excel:\n{str(e)}") from e
             
             todos_registros = []
             planilhas_processadas = 0
@@ -182,77 +225,139 @@ class ExcelService:
                     continue
             
             if not todos_registros:
-                messagebox.showwarning("Aviso", 
+                raise NoRecordsError(
                     f"Nenhum registro válido encontrado em nenhuma das {len(sheet_names)} planilhas!\n\n" +
                     "Estrutura esperada por planilha:\n" +
                     "A1 = OP (identificador da ordem de produção)\n" +
                     "A2 em diante = arquivos\n" +
                     "B1 = unidade (nome da unidade)\n" +
                     "B2 em diante = quantidade")
-                return None
             
-            messagebox.showinfo("Importação", 
-                f"Processamento concluído!\n\n" +
-                f"Planilhas processadas: {planilhas_processadas}/{len(sheet_names)}\n" +
-                f"Total de registros encontrados: {len(todos_registros)}")
+            print(f"Processamento concluído: {planilhas_processadas}/{len(sheet_names)} planilhas, "
+                  f"{len(todos_registros)} registros")
             
             return todos_registros
             
+        except (ExcelReadError, NoRecordsError):
+            raise
         except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao ler arquivo Excel:\n{str(e)}")
-            return None
+            raise ExcelReadError(f"Erro ao ler arquivo Excel:\n{str(e)}") from e
     
     def get_excel_preview(self, file_path: str, max_rows: int = 10) -> Optional[dict]:
         """
         Retorna uma prévia dos dados do Excel para validação
         
+        Lê só as primeiras max_rows linhas (e até 5 colunas) de cada planilha,
+        sem carregar as planilhas inteiras. O total de linhas de cada planilha
+        é estimado pelas dimensões gravadas no arquivo.
+        
         Args:
             file_path (str): Caminho para o arquivo Excel
             max_rows (int): Número máximo de linhas para prévia
             
         Returns:
-            Optional[dict]: Dicionário com informações da prévia ou None se erro
+            Optional[dict]: Dicionário com informações da prévia ou None se erro.
+                As chaves op, unidade, total_rows, total_cols e preview_data
+                se referem à primeira planilha; 'sheets' traz o resumo de todas.
         """
         try:
             if not os.path.exists(file_path):
                 return None
             
-            # Lê o arquivo Excel
-            df = pd.read_excel(file_path, header=None)
+            inicio = time.perf_counter()
             
-            # Informações básicas
-            info = {
-                'total_rows': len(df),
-                'total_cols': len(df.columns) if not df.empty else 0,
-                'op': str(df.iloc[0, 0]).strip() if len(df) > 0 and not pd.isna(df.iloc[0, 0]) else "N/A",
-                'unidade': str(df.iloc[0, 1]).strip() if len(df) > 0 and len(df.columns) > 1 and not pd.isna(df.iloc[0, 1]) else "N/A",
-                'preview_data': []
-            }
+            if file_path.lower().endswith('.xls'):
+                sheets = self._preview_sheets_xls(file_path, max_rows)
+            else:
+                sheets = self._preview_sheets_xlsx(file_path, max_rows)
             
-            # Dados de prévia (máximo max_rows linhas)
-            end_row = min(len(df), max_rows)
-            for i in range(end_row):
-                row_data = []
-                for j in range(min(len(df.columns), 5)):  # Máximo 5 colunas
-                    cell_value = df.iloc[i, j]
-                    if pd.isna(cell_value):
-                        row_data.append("")
-                    else:
-                        row_data.append(str(cell_value))
-                info['preview_data'].append(row_data)
+            primeira = sheets[0] if sheets else None
             
-            return info
+            return {
+                'total_rows': (primeira['linhas_estimadas'] or len(primeira['preview_data'])) if primeira else 0,
+                'total_cols': primeira['colunas'] if primeira else 0,
+                'op': primeira['op'] if primeira else "N/A",
+                'unidade': primeira['unidade'] if primeira else "N/A",
+                'preview_data': primeira['preview_data'] if primeira else [],
+                'total_sheets': len(sheets),
+                'sheets': sheets,
+                'tempo_ms': (time.perf_counter() - inicio) * 1000
+            }
             
         except Exception as e:
             print(f"Erro ao obter prévia do Excel: {e}")
             return None
     
-    def validate_data_quality(self, registros: List[Tuple[str, str, str, int]]) -> dict:
+    def _sheet_summary(self, sheet_name: str, rows: List[list], linhas_estimadas, colunas) -> dict:
+        """
+        Monta o resumo de uma planilha a partir das primeiras linhas lidas
+        """
+        # Remove linhas vazias do fim (read-only completa com None até max_row)
+        while rows and not any(rows[-1]):
+            rows.pop()
+        
+        primeira = rows[0] if rows else []
+        op = primeira[0] if len(primeira) > 0 and primeira[0] else "N/A"
+        unidade = primeira[1] if len(primeira) > 1 and primeira[1] else "N/A"
+        
+        return {
+            'nome': sheet_name,
+            'op': op,
+            'unidade': unidade,
+            # None quando o arquivo não grava as dimensões (comum em exportações de terceiros)
+            'linhas_estimadas': linhas_estimadas,
+            'colunas': colunas if colunas is not None else max((len(r) for r in rows), default=0),
+            'preview_data': rows
+        }
+    
+    def _preview_sheets_xlsx(self, file_path: str, max_rows: int) -> List[dict]:
+        """
+        Prévia de .xlsx com openpyxl em modo read-only (lê só as linhas pedidas)
+        """
+        from openpyxl import load_workbook
+        
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            sheets = []
+            for sheet_name in wb.sheetnames:
+                ws = wb[sheet_name]
+                if not hasattr(ws, 'iter_rows'):
+                    continue  # chartsheet
+                
+                # Dimensões gravadas no arquivo (podem faltar em arquivos de terceiros)
+                max_col = ws.max_column
+                n_cols = min(max_col, 5) if max_col else 5
+                
+                rows = []
+                for row in ws.iter_rows(min_row=1, max_row=max_rows, max_col=n_cols, values_only=True):
+                    rows.append(["" if value is None else str(value).strip() for value in row])
+                
+                sheets.append(self._sheet_summary(sheet_name, rows, ws.max_row, max_col))
+            return sheets
+        finally:
+            wb.close()
+    
+    def _preview_sheets_xls(self, file_path: str, max_rows: int) -> List[dict]:
+        """
+        Prévia de .xls (formato antigo) lendo apenas max_rows linhas de cada planilha
+        """
+        frames = pd.read_excel(file_path, sheet_name=None, header=None, nrows=max_rows)
+        sheets = []
+        for sheet_name, df in frames.items():
+            rows = [
+                ["" if pd.isna(value) else str(value).strip() for value in row[:5]]
+                for row in df.itertuples(index=False, name=None)
+            ]
+            sheets.append(self._sheet_summary(sheet_name, rows, None, len(df.columns)))
+        return sheets
+    
+    def validate_data_quality(self, registros: List[Tuple[str, str, str, int]], primeira_linha: int = 1) -> dict:
         """
         Valida a qualidade dos dados extraídos
         
         Args:
             registros (List[Tuple]): Lista de registros
+            primeira_linha (int): Número da linha do primeiro registro (validação em blocos)
             
         Returns:
             dict: Relatório de qualidade dos dados
@@ -268,7 +373,7 @@ class ExcelService:
         registros_validos = 0
         problemas = []
         
-        for i, registro in enumerate(registros, 1):
+        for i, registro in enumerate(registros, primeira_linha):
             # Desempacota os dados - pode ter 4 ou 5 elementos
             if len(registro) == 4:
                 op, unidade, arquivo, qtde = registro
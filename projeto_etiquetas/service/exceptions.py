@@ -0,0 +1,51 @@
+"""
+Exceções tipadas dos serviços e do controller.
+
+Os serviços e o controller não falam com a interface: em caso de erro eles
+levantam uma destas exceções e quem chama (view Tkinter, CLI, watcher etc.)
+decide como apresentar a mensagem.
+"""
+
+
+class EtiquetaError(Exception):
+    """Erro base do sistema de etiquetas"""
+
+
+class ExcelReadError(EtiquetaError):
+    """Falha ao abrir ou interpretar um arquivo de entrada"""
+
+
+class NoRecordsError(EtiquetaError):
+    """Nenhum registro válido para processar"""
+
+
+class ImportCancelledError(EtiquetaError):
+    """Importação cancelada por quem chamou (ex.: usuário recusou dados com problemas)"""
+
+
+class DatabaseError(EtiquetaError):
+    """Falha ao gravar ou ler dados no banco"""
+
+
+class PDFGenerationError(EtiquetaError):
+    """Falha ao gerar um documento PDF"""
+
+
+class ZPLGenerationError(EtiquetaError):
+    """Falha ao gerar um job ZPL para impressoras Zebra"""
+
+
+class RasterGenerationError(EtiquetaError):
+    """Falha ao gerar etiquetas em imagem (TIFF/PNG)"""
+
+
+class TemplateError(EtiquetaError):
+    """Template de etiqueta inválido ou não encontrado"""
+
+
+class ReportError(EtiquetaError):
+    """Falha ao gravar um relatório ou exportação fora do PDF (ex.: CSV)"""
+
+
+class JobCancelledError(EtiquetaError):
+    """Trabalho da fila em segundo plano cancelado (ou interrompido pelo encerramento da fila)"""
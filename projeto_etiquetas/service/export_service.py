@@ -0,0 +1,215 @@
+"""
+Exportação dos registros para CSV, XLSX e Parquet em fluxo.
+
+Os dados chegam de um cursor do servidor (Database.iter_registros) ou, no
+CSV, direto do COPY do PostgreSQL, e são gravados à medida que chegam:
+nenhum formato monta a tabela inteira em memória. O progresso é informado
+a cada lote por um callback progress(feitos, total).
+"""
+from typing import BinaryIO, Callable, Iterable, Optional, Tuple
+
+from service.exceptions import ReportError
+
+try:
+    from openpyxl import Workbook
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# Cabeçalho dos arquivos exportados (mesma ordem de Database.EXPORT_COLUMNS)
+EXPORT_HEADERS = ('id', 'op', 'unidade', 'arquivos', 'qtde', 'nome', 'status', 'created_at')
+
+# Formato pela extensão do arquivo
+EXPORT_FORMATS = {'.csv': 'csv', '.xlsx': 'xlsx', '.parquet': 'parquet', '.pq': 'parquet'}
+
+# Linhas de dados por planilha no XLSX (limite do Excel menos o cabeçalho)
+XLSX_MAX_ROWS = 1048575
+
+# Registros entre duas chamadas de progresso (e por row group no Parquet)
+PROGRESS_STEP = 50000
+
+ProgressCallback = Callable[[int, Optional[int]], None]
+
+
+class _ProgressWriter:
+    """
+    Repassa a escrita ao arquivo contando as linhas (progresso do COPY)
+
+    O COPY grava uma linha por chamada de write(); o progresso é avisado a
+    cada PROGRESS_STEP linhas, descontando o cabeçalho.
+    """
+
+    def __init__(self, stream: BinaryIO, progress: Optional[ProgressCallback] = None,
+                 total: Optional[int] = None):
+        self.stream = stream
+        self.progress = progress
+        self.total = total
+        self.linhas = -1  # cabeçalho
+        self._proximo_aviso = PROGRESS_STEP
+
+    def write(self, data: bytes):
+        self.stream.write(data)
+        self.linhas += data.count(b'\n')
+        if self.progress is not None and self.linhas >= self._proximo_aviso:
+            self._proximo_aviso = self.linhas + PROGRESS_STEP
+            self.progress(self.linhas, self.total)
+
+
+class ExportService:
+    def write_csv(self, copy: Callable[[BinaryIO], None], output_path: str,
+                  progress: Optional[ProgressCallback] = None, total: Optional[int] = None) -> int:
+        """
+        Grava o CSV produzido por copy(stream) (ex.: Database.copy_registros_csv)
+
+        O arquivo começa com o BOM do UTF-8, para o Excel reconhecer os
+        acentos; o restante (cabeçalho e linhas) vem pronto do COPY.
+
+        Args:
+            copy (Callable): Escreve o CSV no stream recebido
+            output_path (str): Caminho do .csv
+            progress (Callable): progress(feitos, total) a cada lote (opcional)
+            total (int): Total esperado, repassado ao progresso (opcional)
+
+        Returns:
+            int: Registros exportados
+
+        Raises:
+            ReportError: Falha ao gravar o arquivo
+            DatabaseError: Falha no COPY
+        """
+        try:
+            with open(output_path, 'wb') as f:
+                f.write(b'\xef\xbb\xbf')
+                writer = _ProgressWriter(f, progress, total)
+                copy(writer)
+        except OSError as e:
+            print(f"Erro ao exportar CSV: {e}")
+            raise ReportError(f"Erro ao exportar CSV: {e}") from e
+
+        feitos = max(writer.linhas, 0)
+        if progress is not None:
+            progress(feitos, total)
+        return feitos
+
+    def write_xlsx(self, rows: Iterable[Tuple], output_path: str, progress: Optional[ProgressCallback] = None,
+                   total: Optional[int] = None) -> int:
+        """
+        Grava os registros em XLSX no modo write-only do openpyxl
+
+        No modo write-only cada linha vai para um arquivo temporário assim
+        que é acrescentada, então a memória não cresce com o número de
+        linhas. Acima do limite do Excel os registros continuam em novas
+        planilhas (registros_2, registros_3, ...).
+
+        Args:
+            rows (Iterable[Tuple]): Linhas na ordem de EXPORT_HEADERS
+            output_path (str): Caminho do .xlsx
+            progress (Callable): progress(feitos, total) a cada lote (opcional)
+            total (int): Total esperado, repassado ao progresso (opcional)
+
+        Returns:
+            int: Registros exportados
+
+        Raises:
+            ReportError: openpyxl ausente ou falha ao gravar o arquivo
+        """
+        if not OPENPYXL_AVAILABLE:
+            raise ReportError("Exportação XLSX requer o pacote 'openpyxl'. Instale com: pip install openpyxl")
+
+        try:
+            wb = Workbook(write_only=True)
+            ws = None
+            feitos = 0
+            for row in rows:
+                if feitos % XLSX_MAX_ROWS == 0:
+                    ws = self._new_sheet(wb, feitos // XLSX_MAX_ROWS + 1)
+                ws.append(row)
+                feitos += 1
+                if progress is not None and feitos % PROGRESS_STEP == 0:
+                    progress(feitos, total)
+            if ws is None:
+                self._new_sheet(wb, 1)
+            wb.save(output_path)
+        except OSError as e:
+            print(f"Erro ao exportar XLSX: {e}")
+            raise ReportError(f"Erro ao exportar XLSX: {e}") from e
+
+        if progress is not None:
+            progress(feitos, total)
+        return feitos
+
+    @staticmethod
+    def _new_sheet(wb, numero: int):
+        """Planilha com o cabeçalho (write-only: larguras antes da primeira linha)"""
+        ws = wb.create_sheet('registros' if numero == 1 else f'registros_{numero}')
+        for letra, largura in zip('ABCDEFGH', (8, 14, 24, 40, 8, 20, 12, 20)):
+            ws.column_dimensions[letra].width = largura
+        ws.append(EXPORT_HEADERS)
+        return ws
+
+    def write_parquet(self, rows: Iterable[Tuple], output_path: str, progress: Optional[ProgressCallback] = None,
+                      total: Optional[int] = None, batch_size: int = PROGRESS_STEP) -> int:
+        """
+        Grava os registros em Parquet, um row group por lote
+
+        Cada lote de `batch_size` linhas vira um row group comprimido e é
+        descartado em seguida; só um lote fica em memória.
+
+        Args:
+            rows (Iterable[Tuple]): Linhas na ordem de EXPORT_HEADERS
+            output_path (str): Caminho do .parquet
+            progress (Callable): progress(feitos, total) a cada lote (opcional)
+            total (int): Total esperado, repassado ao progresso (opcional)
+            batch_size (int): Linhas por row group
+
+        Returns:
+            int: Registros exportados
+
+        Raises:
+            ReportError: pyarrow ausente ou falha ao gravar o arquivo
+        """
+        if not PARQUET_AVAILABLE:
+            raise ReportError("Exportação Parquet requer o pacote 'pyarrow'. Instale com: pip install pyarrow")
+
+        schema = pa.schema([
+            ('id', pa.int64()), ('op', pa.string()), ('unidade', pa.string()), ('arquivos', pa.string()),
+            ('qtde', pa.int64()), ('nome', pa.string()), ('status', pa.string()),
+            ('created_at', pa.timestamp('us')),
+        ])
+        feitos = 0
+        try:
+            with pq.ParquetWriter(output_path, schema, compression='zstd') as writer:
+                lote = []
+                for row in rows:
+                    lote.append(row)
+                    if len(lote) == batch_size:
+                        feitos += self._write_row_group(writer, schema, lote)
+                        lote = []
+                        if progress is not None:
+                            progress(feitos, total)
+                # Último lote (ou um row group vazio, para o arquivo ter o schema)
+                if lote or feitos == 0:
+                    feitos += self._write_row_group(writer, schema, lote)
+        except (OSError, pa.ArrowException) as e:
+            print(f"Erro ao exportar Parquet: {e}")
+            raise ReportError(f"Erro ao exportar Parquet: {e}") from e
+
+        if progress is not None:
+            progress(feitos, total)
+        return feitos
+
+    @staticmethod
+    def _write_row_group(writer, schema, lote) -> int:
+        """Transpõe o lote em colunas e grava como um row group"""
+        colunas = list(zip(*lote)) if lote else [()] * len(schema)
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(coluna, type=campo.type) for coluna, campo in zip(colunas, schema)], schema=schema
+        ))
+        return len(lote)
@@ -0,0 +1,514 @@
+"""
+Fila de trabalhos em segundo plano (etiquetas e relatórios).
+
+Os trabalhos ficam em uma tabela SQLite local, então sobrevivem ao
+fechamento do programa: o que estava em andamento volta para a fila e é
+refeito no próximo início. Um conjunto limitado de threads executa os
+trabalhos; cada um informa o progresso e pode ser cancelado no meio.
+Falhas passageiras são repetidas com espera crescente, e os registros de
+um trabalho concluído são repassados de uma vez a on_completed (ex.:
+marcar como "Impresso" em um único UPDATE).
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from service.exceptions import JobCancelledError
+
+# Configurar logging
+logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Estados de um trabalho na fila
+STATUS_PENDENTE = 'pendente'
+STATUS_EXECUTANDO = 'executando'
+STATUS_CONCLUIDO = 'concluido'
+STATUS_FALHA = 'falha'
+STATUS_CANCELADO = 'cancelado'
+
+# Intervalo mínimo entre duas gravações de progresso de um trabalho, em segundos
+PROGRESS_INTERVAL = 0.5
+
+
+class Job(NamedTuple):
+    """Trabalho da fila"""
+    id: int
+    tipo: str
+    descricao: str
+    params: dict
+    status: str
+    feitos: int
+    total: Optional[int]
+    tentativas: int
+    erro: Optional[str]
+    resultado: Optional[dict]
+    criado_em: float
+    atualizado_em: float
+
+
+class JobContext:
+    """Passado ao handler de um trabalho: progresso e pedido de cancelamento"""
+
+    def __init__(self, queue: 'JobQueue', job: Job):
+        self.queue = queue
+        self.job = job
+        self.feitos = 0
+        self.total = None
+        self._ultimo_aviso = 0.0
+
+    def progress(self, feitos: int, total: Optional[int] = None):
+        """Informa o progresso (gravado na fila no máximo a cada PROGRESS_INTERVAL)"""
+        self.feitos = feitos
+        if total is not None:
+            self.total = total
+        agora = time.time()
+        if agora - self._ultimo_aviso >= PROGRESS_INTERVAL:
+            self._ultimo_aviso = agora
+            self.queue._set_progress(self.job.id, self.feitos, self.total)
+
+    def cancelled(self) -> bool:
+        """True se o trabalho foi cancelado ou a fila está sendo encerrada"""
+        return self.queue._interrupted(self.job.id)
+
+    def check_cancelled(self):
+        """
+        Interrompe o handler se o trabalho foi cancelado
+
+        Raises:
+            JobCancelledError: Trabalho cancelado ou fila encerrada
+        """
+        if self.cancelled():
+            raise JobCancelledError(f"Trabalho {self.job.id} cancelado")
+
+
+# handler(params, ctx) -> resultado; a chave 'registro_ids' do resultado vai para on_completed
+JobHandler = Callable[[dict, JobContext], dict]
+
+
+class JobQueue:
+    def __init__(self, db_path: str, handlers: Dict[str, JobHandler], max_workers: int = 2,
+                 on_completed: Optional[Callable[[List[int]], bool]] = None,
+                 max_retries: int = 3, retry_delay: float = 2.0, poll_interval: float = 0.5,
+                 permanent_errors: Tuple[type, ...] = ()):
+        """
+        Inicializa a fila
+
+        Args:
+            db_path (str): Arquivo SQLite da fila de trabalhos
+            handlers (dict): Função que executa cada tipo de trabalho
+            max_workers (int): Trabalhos executados ao mesmo tempo
+            on_completed (Callable): Chamado com os ids dos registros de cada trabalho concluído
+                                     (ex.: marcar como "Impresso" no banco)
+            max_retries (int): Tentativas por trabalho antes de marcar como falha
+            retry_delay (float): Espera base entre tentativas (dobra a cada falha), em segundos
+            poll_interval (float): Intervalo de verificação da fila quando ociosa
+            permanent_errors (tuple): Exceções que não adianta repetir (falha na primeira vez)
+        """
+        self.db_path = db_path
+        self.handlers = dict(handlers)
+        self.max_workers = max(1, max_workers)
+        self.on_completed = on_completed
+        self.max_retries = max(1, max_retries)
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self.permanent_errors = permanent_errors
+
+        # Trabalhos em execução e os que tiveram cancelamento pedido no meio
+        self._running: Set[int] = set()
+        self._cancel_requested: Set[int] = set()
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._dispatcher: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        self._init_queue()
+
+    # ------------------------------------------------------------------
+    # Fila persistente
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        """Abre uma conexão com a fila (uma por operação, como em Database)"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _init_queue(self):
+        """Cria a tabela da fila e devolve à fila trabalhos interrompidos no meio"""
+        db_dir = os.path.dirname(os.path.abspath(self.db_path))
+        os.makedirs(db_dir, exist_ok=True)
+
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS render_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tipo TEXT NOT NULL,
+                    descricao TEXT NOT NULL DEFAULT '',
+                    params TEXT NOT NULL DEFAULT '{}',
+                    status TEXT NOT NULL DEFAULT 'pendente',
+                    feitos INTEGER NOT NULL DEFAULT 0,
+                    total INTEGER,
+                    tentativas INTEGER NOT NULL DEFAULT 0,
+                    proximo_inicio REAL NOT NULL DEFAULT 0,
+                    erro TEXT,
+                    resultado TEXT,
+                    criado_em REAL NOT NULL,
+                    atualizado_em REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_render_jobs_status ON render_jobs (status, id)')
+            # Trabalhos em execução quando o programa fechou voltam para a fila, do zero
+            conn.execute('UPDATE render_jobs SET status = ?, feitos = 0 WHERE status = ?',
+                         (STATUS_PENDENTE, STATUS_EXECUTANDO))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def submit(self, tipo: str, params: dict, descricao: str = '') -> int:
+        """
+        Coloca um trabalho na fila
+
+        Args:
+            tipo (str): Tipo do trabalho (chave de `handlers`)
+            params (dict): Parâmetros do handler (serializáveis em JSON)
+            descricao (str): Texto mostrado na lista de trabalhos
+
+        Returns:
+            int: Id do trabalho
+
+        Raises:
+            ValueError: Tipo de trabalho desconhecido
+        """
+        if tipo not in self.handlers:
+            raise ValueError(f"Tipo de trabalho desconhecido: {tipo}")
+
+        agora = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.execute('''
+                INSERT INTO render_jobs (tipo, descricao, params, criado_em, atualizado_em)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (tipo, descricao, json.dumps(params), agora, agora))
+            conn.commit()
+            job_id = cursor.lastrowid
+        finally:
+            conn.close()
+
+        self._wake.set()
+        return job_id
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        Cancela um trabalho pendente ou em execução
+
+        Trabalhos em execução param no próximo ponto de verificação do
+        handler (em geral, o próximo registro).
+
+        Returns:
+            bool: True se havia o que cancelar
+        """
+        conn = self._connect()
+        try:
+            cursor = conn.execute('UPDATE render_jobs SET status = ?, atualizado_em = ? WHERE id = ? AND status = ?',
+                                  (STATUS_CANCELADO, time.time(), job_id, STATUS_PENDENTE))
+            conn.commit()
+            if cursor.rowcount:
+                return True
+        finally:
+            conn.close()
+
+        with self._lock:
+            if job_id in self._running:
+                self._cancel_requested.add(job_id)
+                return True
+        return False
+
+    def retry(self, job_id: int) -> bool:
+        """
+        Devolve à fila um trabalho que falhou ou foi cancelado
+
+        Returns:
+            bool: True se o trabalho voltou para a fila
+        """
+        conn = self._connect()
+        try:
+            cursor = conn.execute('''
+                UPDATE render_jobs
+                SET status = ?, feitos = 0, tentativas = 0, proximo_inicio = 0, erro = NULL, atualizado_em = ?
+                WHERE id = ? AND status IN (?, ?)
+            ''', (STATUS_PENDENTE, time.time(), job_id, STATUS_FALHA, STATUS_CANCELADO))
+            conn.commit()
+            reenviado = cursor.rowcount > 0
+        finally:
+            conn.close()
+
+        if reenviado:
+            self._wake.set()
+        return reenviado
+
+    def remove_finished(self) -> int:
+        """
+        Apaga da fila os trabalhos concluídos, com falha ou cancelados
+
+        Returns:
+            int: Trabalhos removidos
+        """
+        conn = self._connect()
+        try:
+            cursor = conn.execute('DELETE FROM render_jobs WHERE status IN (?, ?, ?)',
+                                  (STATUS_CONCLUIDO, STATUS_FALHA, STATUS_CANCELADO))
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    _JOB_COLUMNS = ('id, tipo, descricao, params, status, feitos, total, tentativas, erro, resultado, '
+                    'criado_em, atualizado_em')
+
+    @staticmethod
+    def _row_to_job(row) -> Job:
+        return Job(row[0], row[1], row[2], json.loads(row[3]), row[4], row[5], row[6], row[7], row[8],
+                   json.loads(row[9]) if row[9] else None, row[10], row[11])
+
+    def get_job(self, job_id: int) -> Optional[Job]:
+        """Trabalho pelo id (None se não existe)"""
+        conn = self._connect()
+        try:
+            row = conn.execute(f'SELECT {self._JOB_COLUMNS} FROM render_jobs WHERE id = ?', (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._row_to_job(row) if row else None
+
+    def list_jobs(self, limit: int = 100, status: Optional[str] = None) -> List[Job]:
+        """
+        Trabalhos mais recentes primeiro
+
+        Args:
+            limit (int): Máximo de trabalhos
+            status (str): Só os trabalhos neste estado (opcional)
+        """
+        conn = self._connect()
+        try:
+            if status is None:
+                rows = conn.execute(f'SELECT {self._JOB_COLUMNS} FROM render_jobs ORDER BY id DESC LIMIT ?',
+                                    (limit,)).fetchall()
+            else:
+                rows = conn.execute(f'SELECT {self._JOB_COLUMNS} FROM render_jobs WHERE status = ? '
+                                    f'ORDER BY id DESC LIMIT ?', (status, limit)).fetchall()
+        finally:
+            conn.close()
+        return [self._row_to_job(row) for row in rows]
+
+    def queue_summary(self) -> Dict[str, int]:
+        """
+        Quantidade de trabalhos em cada estado
+
+        Returns:
+            dict: {'pendente': n, 'executando': n, 'concluido': n, 'falha': n, 'cancelado': n}
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT status, COUNT(*) FROM render_jobs GROUP BY status').fetchall()
+        finally:
+            conn.close()
+        resumo = {STATUS_PENDENTE: 0, STATUS_EXECUTANDO: 0, STATUS_CONCLUIDO: 0, STATUS_FALHA: 0,
+                  STATUS_CANCELADO: 0}
+        resumo.update(dict(rows))
+        return resumo
+
+    def _pending_jobs(self, limit: int) -> List[Job]:
+        """Trabalhos pendentes prontos para iniciar, na ordem de chegada"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(f'''
+                SELECT {self._JOB_COLUMNS}
+                FROM render_jobs
+                WHERE status = ? AND proximo_inicio <= ?
+                ORDER BY id
+                LIMIT ?
+            ''', (STATUS_PENDENTE, time.time(), limit)).fetchall()
+        finally:
+            conn.close()
+        return [self._row_to_job(row) for row in rows]
+
+    def _claim(self, job_id: int) -> bool:
+        """Passa um trabalho para "executando" se ele ainda estiver pendente (não cancelado)"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute('UPDATE render_jobs SET status = ?, atualizado_em = ? WHERE id = ? AND status = ?',
+                                  (STATUS_EXECUTANDO, time.time(), job_id, STATUS_PENDENTE))
+            conn.commit()
+            return cursor.rowcount > 0
+        finally:
+            conn.close()
+
+    def _set_progress(self, job_id: int, feitos: int, total: Optional[int]):
+        """Grava o progresso de um trabalho em execução"""
+        conn = self._connect()
+        try:
+            conn.execute('UPDATE render_jobs SET feitos = ?, total = COALESCE(?, total), atualizado_em = ? '
+                         'WHERE id = ?', (feitos, total, time.time(), job_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _finish(self, job_id: int, status: str, feitos: int = 0, total: Optional[int] = None,
+                erro: Optional[str] = None, resultado: Optional[dict] = None,
+                incrementar: bool = False, proximo_inicio: float = 0):
+        """Registra o fim (ou o reagendamento) de uma execução"""
+        conn = self._connect()
+        try:
+            conn.execute('''
+                UPDATE render_jobs
+                SET status = ?, feitos = ?, total = COALESCE(?, total), erro = ?, resultado = ?,
+                    tentativas = tentativas + ?, proximo_inicio = ?, atualizado_em = ?
+                WHERE id = ?
+            ''', (status, feitos, total, erro, json.dumps(resultado) if resultado is not None else None,
+                  1 if incrementar else 0, proximo_inicio, time.time(), job_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Execução
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Inicia a execução em segundo plano (inclusive dos trabalhos que ficaram na fila)"""
+        if self._dispatcher is not None:
+            return
+        self._stop_event.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name='job-dispatcher', daemon=True)
+        self._dispatcher.start()
+        logger.info(f"Fila de trabalhos iniciada com {self.max_workers} worker(s)")
+
+    def stop(self, wait: bool = True):
+        """
+        Para a fila; trabalhos em execução são interrompidos e voltam para a
+        fila (retomados no próximo start). Com wait=True aguarda as threads.
+        """
+        self._stop_event.set()
+        self._wake.set()
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+            self._dispatcher = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Aguarda até não haver trabalhos pendentes nem em execução
+
+        Returns:
+            bool: True se a fila esvaziou dentro do timeout
+        """
+        limite = None if timeout is None else time.time() + timeout
+        while True:
+            resumo = self.queue_summary()
+            with self._lock:
+                ativos = len(self._running)
+            if resumo[STATUS_PENDENTE] == 0 and resumo[STATUS_EXECUTANDO] == 0 and ativos == 0:
+                return True
+            if limite is not None and time.time() >= limite:
+                return False
+            time.sleep(min(self.poll_interval, 0.1))
+
+    def _interrupted(self, job_id: int) -> bool:
+        return self._stop_event.is_set() or job_id in self._cancel_requested
+
+    def _dispatch_loop(self):
+        """Inicia os trabalhos da fila até stop() ser chamado"""
+        while not self._stop_event.is_set():
+            try:
+                iniciados = self._dispatch_once()
+            except Exception as e:
+                logger.error(f"Erro no despacho da fila de trabalhos: {e}")
+                iniciados = 0
+            if not iniciados:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _dispatch_once(self) -> int:
+        """
+        Inicia trabalhos pendentes enquanto houver worker livre
+
+        Returns:
+            int: Trabalhos iniciados nesta rodada
+        """
+        with self._lock:
+            livres = self.max_workers - len(self._running)
+        if livres <= 0:
+            return 0
+
+        iniciados = 0
+        for job in self._pending_jobs(livres):
+            # Pode ter sido cancelado entre a consulta e agora
+            if not self._claim(job.id):
+                continue
+            with self._lock:
+                self._running.add(job.id)
+            self._executor.submit(self._run_job, job)
+            iniciados += 1
+        return iniciados
+
+    def _run_job(self, job: Job):
+        """Executa um trabalho e registra o resultado"""
+        ctx = JobContext(self, job)
+        try:
+            handler = self.handlers.get(job.tipo)
+            if handler is None:
+                raise ValueError(f"Tipo de trabalho desconhecido: {job.tipo}")
+            resultado = handler(job.params, ctx) or {}
+        except JobCancelledError:
+            if job.id in self._cancel_requested:
+                self._finish(job.id, STATUS_CANCELADO, ctx.feitos, ctx.total, erro="Cancelado")
+                logger.info(f"Trabalho {job.id} cancelado")
+            else:
+                # Fila encerrada no meio: refeito do zero no próximo início
+                self._finish(job.id, STATUS_PENDENTE)
+        except Exception as e:
+            self._handle_failure(job, ctx, e)
+        else:
+            registro_ids = resultado.pop('registro_ids', None)
+            if registro_ids:
+                resultado['status_atualizado'] = self._notify_completed(registro_ids)
+            self._finish(job.id, STATUS_CONCLUIDO, ctx.feitos, ctx.total, resultado=resultado)
+            logger.info(f"Trabalho {job.id} concluído: {job.descricao}")
+        finally:
+            with self._lock:
+                self._running.discard(job.id)
+                self._cancel_requested.discard(job.id)
+            self._wake.set()
+
+    def _handle_failure(self, job: Job, ctx: JobContext, erro: Exception):
+        """Reagenda o trabalho com espera crescente ou marca como falha"""
+        logger.warning(f"Falha no trabalho {job.id} ({job.descricao}): {erro}")
+        tentativas = job.tentativas + 1
+        if isinstance(erro, self.permanent_errors) or tentativas >= self.max_retries:
+            self._finish(job.id, STATUS_FALHA, ctx.feitos, ctx.total, erro=str(erro), incrementar=True)
+        else:
+            espera = self.retry_delay * (2 ** (tentativas - 1))
+            self._finish(job.id, STATUS_PENDENTE, erro=str(erro), incrementar=True,
+                         proximo_inicio=time.time() + espera)
+
+    def _notify_completed(self, ids: List[int]) -> bool:
+        """Repassa de uma vez os registros do trabalho para quem acompanha o status (ex.: banco)"""
+        if self.on_completed is None:
+            return False
+        try:
+            if self.on_completed(ids):
+                return True
+            logger.warning(f"Trabalho concluído, mas o status de {len(ids)} registros não foi atualizado")
+        except Exception as e:
+            logger.error(f"Erro ao atualizar status dos registros do trabalho: {e}")
+        return False
@@ -0,0 +1,49 @@
+"""
+Registro leve de etiqueta compartilhado pelos renderizadores.
+"""
+from typing import Iterable, Iterator, NamedTuple, Tuple
+
+
+class LabelRecord(NamedTuple):
+    """Campos impressos em uma etiqueta"""
+    op: str
+    unidade: str
+    arquivo: str
+    qtde: int
+    nome: str
+
+
+def iter_label_records(registros: Iterable[Tuple]) -> Iterator[LabelRecord]:
+    """
+    Converte registros do banco em LabelRecord sob demanda
+
+    Aceita qualquer iterável (lista, gerador, cursor do banco), sem
+    materializar a lista inteira. Cada registro gera UMA etiqueta; a
+    quantidade (qtde) é exibida na própria etiqueta.
+
+    Args:
+        registros (Iterable[Tuple]): Registros (id, op, unidade, arquivos, qtde[, nome, ...])
+
+    Yields:
+        LabelRecord: Uma etiqueta por registro válido
+    """
+    for registro in registros:
+        # registro = (id, op, unidade, arquivos, qtde, nome) - agora com nome adicional
+        if len(registro) < 5:
+            continue
+
+        if len(registro) == 5:
+            # Formato antigo sem nome
+            _, op, unidade, arquivos, qtde = registro
+            nome = ""
+        else:
+            # Formato novo com nome
+            _, op, unidade, arquivos, qtde, nome = registro[:6]
+
+        yield LabelRecord(
+            str(op),
+            str(unidade),
+            str(arquivos),
+            int(qtde) if qtde is not None else 0,
+            str(nome) if nome else ""
+        )
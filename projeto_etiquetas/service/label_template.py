@@ -0,0 +1,395 @@
+"""
+Templates declarativos de etiqueta e plano de renderização.
+
+O layout da etiqueta (campos, fontes, entrelinhas, caixa da logo, margens,
+limite de linhas e corte) fica em um arquivo JSON (ou YAML, se o PyYAML
+estiver instalado), como assets/templates/etiqueta_padrao.json. Por job,
+o template é compilado em um RenderPlan para o tamanho da etiqueta: as
+partes fixas viram uma lista de operações com coordenadas já calculadas e
+os campos variáveis viram regras prontas (posição x, largura útil, fonte,
+passo) que só precisam dos dados de cada etiqueta. PDF, ZPL e imagem
+executam o mesmo plano.
+
+Coordenadas em pontos tipográficos (1/72"), com origem no canto inferior
+esquerdo, como no PDF.
+"""
+import hashlib
+import json
+import os
+from typing import List, NamedTuple, Optional, Tuple
+
+from reportlab.lib.units import mm
+from reportlab.pdfbase.pdfmetrics import standardFonts
+
+from service.exceptions import TemplateError
+from service.label_record import LabelRecord
+from service.text_layout import TextLayout
+
+try:
+    import yaml
+    YAML_AVAILABLE = True
+except ImportError:
+    YAML_AVAILABLE = False
+
+DEFAULT_TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                     'assets', 'templates', 'etiqueta_padrao.json')
+
+# Campos disponíveis: os da etiqueta, a data do job (desenhada fora do cache de renderização)
+# e a numeração "n/N" das cópias (só no modo de cópias do PDF)
+CAMPOS = LabelRecord._fields + ('data', 'copia')
+CAMPO_DATA = 'data'
+CAMPO_COPIA = 'copia'
+ALINHAMENTOS = ('esquerda', 'direita')
+
+
+class LabelTemplate(NamedTuple):
+    """Template validado; a impressão digital identifica o layout no cache de renderização"""
+    nome: str
+    definicao: dict
+    fingerprint: str
+
+
+class RectOp(NamedTuple):
+    """Retângulo sem preenchimento (borda)"""
+    x: float
+    y: float
+    largura: float
+    altura: float
+    espessura: float
+
+
+class LogoOp(NamedTuple):
+    """Caixa da logo (a imagem é centralizada dentro dela)"""
+    x: float
+    y: float
+    largura: float
+    altura: float
+
+
+class HLineOp(NamedTuple):
+    """Linha horizontal (separador)"""
+    x1: float
+    x2: float
+    y: float
+    espessura: float
+    cinza: float
+
+
+class TextOp(NamedTuple):
+    """
+    Texto com a linha de base em y; x é a borda esquerda, ou a direita
+    quando alinhamento == 'direita'
+    """
+    x: float
+    y: float
+    texto: str
+    fonte: str
+    tamanho: float
+    alinhamento: str
+
+
+class _FlowField(NamedTuple):
+    campo: str
+    rotulo: str
+    fonte: str
+    tamanho: float
+    entrelinha: float
+    max_linhas: Optional[int]
+    cortar_em: Optional[int]
+    espaco_antes: float
+    espaco_depois: float
+    omitir_vazio: bool
+
+
+class _FixedField(NamedTuple):
+    campo: str
+    rotulo: str
+    fonte: str
+    tamanho: float
+    alinhamento: str
+    x: float
+    y: float
+
+
+def _numero(secao: dict, chave: str, contexto: str, padrao=None, minimo: float = 0) -> float:
+    """Lê um número não negativo do template"""
+    valor = secao.get(chave, padrao)
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)) or valor < minimo:
+        raise TemplateError(f"{contexto}: '{chave}' deve ser um número >= {minimo} (recebido: {valor!r})")
+    return float(valor)
+
+
+def _inteiro_opcional(secao: dict, chave: str, contexto: str) -> Optional[int]:
+    """Lê um inteiro positivo opcional do template"""
+    valor = secao.get(chave)
+    if valor is None:
+        return None
+    if isinstance(valor, bool) or not isinstance(valor, int) or valor < 1:
+        raise TemplateError(f"{contexto}: '{chave}' deve ser um inteiro >= 1 (recebido: {valor!r})")
+    return valor
+
+
+def _campo_texto(secao: dict, contexto: str) -> Tuple[str, str, str, float]:
+    """Valida campo, rótulo, fonte e tamanho comuns a todos os textos"""
+    campo = secao.get('campo')
+    if campo not in CAMPOS:
+        raise TemplateError(f"{contexto}: campo inválido {campo!r} (use {', '.join(CAMPOS)})")
+    rotulo = secao.get('rotulo', '')
+    if not isinstance(rotulo, str):
+        raise TemplateError(f"{contexto}: 'rotulo' deve ser texto")
+    fonte = secao.get('fonte', 'Helvetica')
+    if fonte not in standardFonts:
+        raise TemplateError(f"{contexto}: fonte {fonte!r} não é uma das fontes padrão do PDF")
+    tamanho = _numero(secao, 'tamanho_pt', contexto, minimo=1)
+    return campo, rotulo, fonte, tamanho
+
+
+def parse_template(definicao: dict, nome: Optional[str] = None) -> LabelTemplate:
+    """
+    Valida a definição de um template
+
+    Args:
+        definicao (dict): Conteúdo do template (ver assets/templates/etiqueta_padrao.json)
+        nome (str): Nome usado nas mensagens (padrão: chave 'nome' do template)
+
+    Returns:
+        LabelTemplate: Template validado
+
+    Raises:
+        TemplateError: Estrutura ou valores inválidos
+    """
+    if not isinstance(definicao, dict):
+        raise TemplateError("Template deve ser um objeto JSON")
+    nome = nome or str(definicao.get('nome', 'template'))
+
+    _numero(definicao, 'margem_mm', nome, padrao=3)
+    for secao in ('borda', 'logo', 'separador'):
+        if definicao.get(secao) is not None and not isinstance(definicao[secao], dict):
+            raise TemplateError(f"{nome}: '{secao}' deve ser um objeto ou null")
+    if definicao.get('borda'):
+        _numero(definicao['borda'], 'espessura_pt', f"{nome}.borda", padrao=1)
+    if definicao.get('logo'):
+        _numero(definicao['logo'], 'largura_mm', f"{nome}.logo", minimo=1)
+        _numero(definicao['logo'], 'altura_mm', f"{nome}.logo", minimo=1)
+    if definicao.get('separador'):
+        separador = definicao['separador']
+        _numero(separador, 'altura_pt', f"{nome}.separador")
+        _numero(separador, 'espessura_pt', f"{nome}.separador", padrao=0.5)
+        cinza = _numero(separador, 'cinza', f"{nome}.separador", padrao=0)
+        if cinza > 1:
+            raise TemplateError(f"{nome}.separador: 'cinza' vai de 0 (preto) a 1 (branco)")
+
+    bloco = definicao.get('bloco') or {}
+    if not isinstance(bloco, dict) or not isinstance(bloco.get('campos', []), list):
+        raise TemplateError(f"{nome}: 'bloco' deve ter uma lista 'campos'")
+    _numero(bloco, 'primeira_linha_pt', f"{nome}.bloco", padrao=14)
+    _numero(bloco, 'folga_logo_mm', f"{nome}.bloco", padrao=3)
+    for i, campo in enumerate(bloco.get('campos', [])):
+        contexto = f"{nome}.bloco.campos[{i}]"
+        if not isinstance(campo, dict):
+            raise TemplateError(f"{contexto}: deve ser um objeto")
+        if _campo_texto(campo, contexto)[0] in (CAMPO_DATA, CAMPO_COPIA):
+            raise TemplateError(f"{contexto}: data e número da cópia só podem ficar no rodapé")
+        _numero(campo, 'entrelinha_pt', contexto, minimo=1)
+        _numero(campo, 'espaco_antes_pt', contexto, padrao=0)
+        _numero(campo, 'espaco_depois_pt', contexto, padrao=0)
+        _inteiro_opcional(campo, 'max_linhas', contexto)
+        _inteiro_opcional(campo, 'cortar_em', contexto)
+
+    rodape = definicao.get('rodape', [])
+    if not isinstance(rodape, list):
+        raise TemplateError(f"{nome}: 'rodape' deve ser uma lista")
+    for i, campo in enumerate(rodape):
+        contexto = f"{nome}.rodape[{i}]"
+        if not isinstance(campo, dict):
+            raise TemplateError(f"{contexto}: deve ser um objeto")
+        _campo_texto(campo, contexto)
+        _numero(campo, 'base_pt', contexto, padrao=0)
+        if campo.get('alinhamento', 'esquerda') not in ALINHAMENTOS:
+            raise TemplateError(f"{contexto}: 'alinhamento' deve ser {' ou '.join(ALINHAMENTOS)}")
+
+    canonico = json.dumps(definicao, sort_keys=True, ensure_ascii=False)
+    fingerprint = hashlib.sha256(canonico.encode('utf-8')).hexdigest()
+    return LabelTemplate(nome, definicao, fingerprint)
+
+
+def load_template(path: Optional[str] = None) -> LabelTemplate:
+    """
+    Carrega e valida um template de arquivo JSON (ou YAML)
+
+    Args:
+        path (str): Caminho do template (padrão: assets/templates/etiqueta_padrao.json)
+
+    Returns:
+        LabelTemplate: Template validado
+
+    Raises:
+        TemplateError: Arquivo inexistente, ilegível ou inválido
+    """
+    path = path or DEFAULT_TEMPLATE_PATH
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if path.lower().endswith(('.yaml', '.yml')):
+                if not YAML_AVAILABLE:
+                    raise TemplateError("Templates YAML requerem o pacote 'PyYAML'. Instale com: pip install pyyaml")
+                definicao = yaml.safe_load(f)
+            else:
+                definicao = json.load(f)
+    except TemplateError:
+        raise
+    except (OSError, ValueError) as e:
+        raise TemplateError(f"Erro ao ler template {path}: {e}") from e
+    except Exception as e:
+        # Erros de sintaxe do YAML
+        raise TemplateError(f"Erro ao ler template {path}: {e}") from e
+    return parse_template(definicao, nome=os.path.basename(path))
+
+
+class RenderPlan:
+    def __init__(self, template: LabelTemplate, label_width: float, label_height: float,
+                 text_layout: TextLayout):
+        """
+        Compila o template para um tamanho de etiqueta (uma vez por job)
+
+        Args:
+            template (LabelTemplate): Template validado
+            label_width (float): Largura da etiqueta em pontos
+            label_height (float): Altura da etiqueta em pontos
+            text_layout (TextLayout): Medição e quebra de texto (com cache) do serviço
+        """
+        self.template = template
+        self.fingerprint = template.fingerprint
+        self.label_width = label_width
+        self.label_height = label_height
+        self.text_layout = text_layout
+
+        definicao = template.definicao
+        padding = definicao.get('margem_mm', 3) * mm
+        self.padding = padding
+
+        # --- Partes fixas, com coordenadas finais ---
+        static_ops = []
+        borda = definicao.get('borda')
+        if borda:
+            static_ops.append(RectOp(0, 0, label_width, label_height, borda.get('espessura_pt', 1)))
+
+        logo = definicao.get('logo')
+        logo_width = 0
+        if logo:
+            logo_width, logo_height = logo['largura_mm'] * mm, logo['altura_mm'] * mm
+            # Canto superior direito, dentro da margem
+            static_ops.append(LogoOp(label_width - padding - logo_width, label_height - padding - logo_height,
+                                     logo_width, logo_height))
+
+        separador = definicao.get('separador')
+        if separador:
+            static_ops.append(HLineOp(padding, label_width - padding, padding + separador['altura_pt'],
+                                      separador.get('espessura_pt', 0.5), separador.get('cinza', 0)))
+        self.static_ops: Tuple = tuple(static_ops)
+
+        # --- Bloco de texto: x, largura útil e primeira linha já calculados ---
+        bloco = definicao.get('bloco') or {}
+        self.text_x = padding
+        self.start_y = label_height - padding - bloco.get('primeira_linha_pt', 14)
+        self.max_width = label_width - 2 * padding
+        if logo:
+            self.max_width -= logo_width + bloco.get('folga_logo_mm', 3) * mm
+        self._flow = tuple(
+            _FlowField(c['campo'], c.get('rotulo', ''), c.get('fonte', 'Helvetica'), c['tamanho_pt'],
+                       c['entrelinha_pt'], c.get('max_linhas'), c.get('cortar_em'),
+                       c.get('espaco_antes_pt', 0), c.get('espaco_depois_pt', 0), bool(c.get('omitir_vazio')))
+            for c in bloco.get('campos', [])
+        )
+
+        # --- Rodapé: posições absolutas ---
+        fixos = []
+        for c in definicao.get('rodape', []):
+            alinhamento = c.get('alinhamento', 'esquerda')
+            x = label_width - padding if alinhamento == 'direita' else padding
+            fixos.append(_FixedField(c['campo'], c.get('rotulo', ''), c.get('fonte', 'Helvetica'),
+                                     c['tamanho_pt'], alinhamento, x, padding + c.get('base_pt', 0)))
+        self._fixed = tuple(f for f in fixos if f.campo not in (CAMPO_DATA, CAMPO_COPIA))
+        self._job_fixed = tuple(f for f in fixos if f.campo == CAMPO_DATA)
+        self._copy_fixed = tuple(f for f in fixos if f.campo == CAMPO_COPIA)
+        self.has_copy_numbering = bool(self._copy_fixed)
+
+        # Fontes usadas pelo plano (nomes internos entram na chave do cache de PDF)
+        self.fonts = tuple(sorted({f.fonte for f in self._flow + self._fixed + self._job_fixed + self._copy_fixed}))
+
+    def text_ops(self, etiqueta: LabelRecord) -> List[TextOp]:
+        """
+        Textos de uma etiqueta, exceto a data do job e o número da cópia
+
+        Args:
+            etiqueta (LabelRecord): Dados da etiqueta
+
+        Returns:
+            List[TextOp]: Textos com posição final, na ordem de desenho
+        """
+        ops = []
+        wrap_text = self.text_layout.wrap_text
+        current_y = self.start_y
+        for campo in self._flow:
+            valor = getattr(etiqueta, campo.campo)
+            if campo.omitir_vazio and not valor:
+                continue
+            current_y -= campo.espaco_antes
+            linhas = wrap_text(f"{campo.rotulo}{valor}", campo.fonte, campo.tamanho, self.max_width)
+            limite = campo.max_linhas or len(linhas)
+            for i, line in enumerate(linhas[:limite]):
+                if campo.cortar_em and i == limite - 1 and len(linhas) > limite:
+                    line = f"{line[:campo.cortar_em]}..."
+                ops.append(TextOp(self.text_x, current_y, line, campo.fonte, campo.tamanho, 'esquerda'))
+                current_y -= campo.entrelinha
+            current_y -= campo.espaco_depois
+
+        for campo in self._fixed:
+            ops.append(TextOp(campo.x, campo.y, f"{campo.rotulo}{getattr(etiqueta, campo.campo)}",
+                              campo.fonte, campo.tamanho, campo.alinhamento))
+        return ops
+
+    def job_ops(self, data_geracao: str) -> List[TextOp]:
+        """
+        Textos que mudam por job e não por etiqueta (a data de geração)
+
+        Args:
+            data_geracao (str): Data/hora do job
+
+        Returns:
+            List[TextOp]: Textos com posição final
+        """
+        return [TextOp(campo.x, campo.y, f"{campo.rotulo}{data_geracao}", campo.fonte, campo.tamanho,
+                       campo.alinhamento)
+                for campo in self._job_fixed]
+
+    def copy_ops(self, numero: int, total: int) -> List[TextOp]:
+        """
+        Numeração de uma cópia ("n/N"), desenhada por página no modo de cópias
+
+        Args:
+            numero (int): Cópia atual (a partir de 1)
+            total (int): Total de cópias da etiqueta
+
+        Returns:
+            List[TextOp]: Textos com posição final (vazia se o template não tiver o campo 'copia')
+        """
+        return [TextOp(campo.x, campo.y, f"{campo.rotulo}{numero}/{total}", campo.fonte, campo.tamanho,
+                       campo.alinhamento)
+                for campo in self._copy_fixed]
+
+
+def compile_template(template: LabelTemplate, label_width: float, label_height: float,
+                     text_layout: TextLayout) -> RenderPlan:
+    """
+    Compila o template em plano de renderização para o tamanho da etiqueta
+
+    Args:
+        template (LabelTemplate): Template validado
+        label_width (float): Largura da etiqueta em pontos
+        label_height (float): Altura da etiqueta em pontos
+        text_layout (TextLayout): Medição e quebra de texto do serviço
+
+    Returns:
+        RenderPlan: Plano executado pelos backends (PDF, ZPL, imagem)
+    """
+    return RenderPlan(template, label_width, label_height, text_layout)
@@ -0,0 +1,133 @@
+"""
+Cópias de etiquetas em PDF sem redesenhar nem duplicar o conteúdo.
+
+O ReportLab desenha cada etiqueta distinta uma única vez (uma página por
+etiqueta, o "mestre"). As cópias são acrescentadas ao mestre como
+atualização incremental do PDF: cada cópia é só um objeto de página que
+aponta para o mesmo conteúdo e os mesmos recursos da página mestre (mais,
+se pedida, uma linha com a numeração "n/N"). Uma cópia custa pouco mais de
+cem bytes e nenhuma medição de texto, então jobs de 100 mil cópias saem
+em segundos.
+
+Requer pypdf para ler os números dos objetos do mestre.
+"""
+import io
+from typing import BinaryIO, Callable, List, Optional, Tuple, Union
+
+try:
+    from pypdf import PdfReader
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PYPDF_AVAILABLE = False
+
+
+class _CountingWriter:
+    """Repassa a escrita e conta os bytes (posições da tabela xref)"""
+
+    def __init__(self, stream: BinaryIO, offset: int = 0):
+        self.stream = stream
+        self.offset = offset
+
+    def write(self, data: bytes):
+        self.stream.write(data)
+        self.offset += len(data)
+
+
+def _serialize(obj) -> bytes:
+    """Serializa um objeto lido pelo pypdf (dicionário, array, referência)"""
+    buffer = io.BytesIO()
+    obj.write_to_stream(buffer)
+    return buffer.getvalue()
+
+
+def write_shared_copies(master: bytes, sequencia: List[Tuple[int, int]], output: Union[str, BinaryIO],
+                        numbering: Optional[Callable[[int, int], str]] = None,
+                        max_pages: Optional[int] = None) -> int:
+    """
+    Grava o PDF final: o mestre seguido das páginas de cópia, na ordem de `sequencia`
+
+    As páginas do mestre deixam de fazer parte da árvore de páginas (ficam
+    só como fonte do conteúdo compartilhado); o documento passa a ter uma
+    página por cópia.
+
+    Args:
+        master (bytes): PDF do ReportLab com uma página por etiqueta distinta
+        sequencia (List[Tuple[int, int]]): (página do mestre, quantidade de cópias) por registro, em ordem
+        output (str | BinaryIO): Caminho do PDF ou stream binário
+        numbering (Callable): numbering(numero, total) -> operadores da numeração "n/N" (opcional)
+        max_pages (int): Grava só as primeiras N cópias, mantendo o total da numeração (prévia)
+
+    Returns:
+        int: Total de páginas (cópias) no documento
+    """
+    reader = PdfReader(io.BytesIO(master))
+    trailer = reader.trailer
+    pages_id = reader.root_object.raw_get('/Pages').idnum
+    prev_xref = int(master[master.rindex(b'startxref') + len(b'startxref'):].split()[0])
+    proximo_id = int(trailer['/Size'])
+
+    if isinstance(output, str):
+        with open(output, 'wb') as f:
+            return _write_update(f, master, reader, sequencia, numbering, max_pages, pages_id, prev_xref, proximo_id)
+    return _write_update(output, master, reader, sequencia, numbering, max_pages, pages_id, prev_xref, proximo_id)
+
+
+def _write_update(stream: BinaryIO, master: bytes, reader, sequencia: List[Tuple[int, int]],
+                  numbering: Optional[Callable[[int, int], str]], max_pages: Optional[int], pages_id: int,
+                  prev_xref: int, proximo_id: int) -> int:
+    """Grava o mestre e a atualização incremental (objetos novos, árvore de páginas, xref e trailer)"""
+    out = _CountingWriter(stream)
+    out.write(master)
+    if not master.endswith(b'\n'):
+        out.write(b'\n')
+
+    primeiro_id = proximo_id
+    offsets = []
+
+    def novo_objeto(corpo: bytes) -> int:
+        nonlocal proximo_id
+        offsets.append(out.offset)
+        out.write(b'%d 0 obj\n' % proximo_id + corpo + b'\nendobj\n')
+        proximo_id += 1
+        return proximo_id - 1
+
+    # Recursos de cada página mestre viram um objeto compartilhado pelas cópias
+    mestres = []
+    for page in reader.pages:
+        recursos_id = novo_objeto(_serialize(page.raw_get('/Resources')))
+        mestres.append((_serialize(page.raw_get('/Contents')), _serialize(page.raw_get('/MediaBox')), recursos_id))
+
+    kids = []
+    for pagina, total in sequencia:
+        contents, mediabox, recursos_id = mestres[pagina]
+        for numero in range(1, total + 1):
+            if max_pages and len(kids) == max_pages:
+                break
+            if numbering is not None:
+                dados = numbering(numero, total).encode('latin-1')
+                numero_id = novo_objeto(b'<< /Length %d >>\nstream\n' % len(dados) + dados + b'\nendstream')
+                contents_ref = b'[ ' + contents + b' %d 0 R ]' % numero_id
+            else:
+                contents_ref = contents
+            kids.append(novo_objeto(
+                b'<< /Type /Page /Parent %d 0 R /MediaBox ' % pages_id + mediabox
+                + b' /Resources %d 0 R /Contents ' % recursos_id + contents_ref + b' >>'
+            ))
+
+    # Nova árvore de páginas, no mesmo número de objeto (o catálogo continua válido)
+    pages_offset = out.offset
+    out.write(b'%d 0 obj\n<< /Type /Pages /Count %d /Kids [ ' % (pages_id, len(kids))
+              + b''.join(b'%d 0 R ' % kid for kid in kids) + b'] >>\nendobj\n')
+
+    xref_offset = out.offset
+    # Começa pelo objeto 0 (cabeça da lista livre), como esperam os leitores
+    out.write(b'xref\n0 1\n0000000000 65535 f \n%d 1\n%010d 00000 n \n' % (pages_id, pages_offset))
+    out.write(b'%d %d\n' % (primeiro_id, len(offsets)))
+    out.write(b''.join(b'%010d 00000 n \n' % offset for offset in offsets))
+
+    trailer = b'/Size %d /Root ' % proximo_id + _serialize(reader.trailer.raw_get('/Root'))
+    for chave in ('/Info', '/ID'):
+        if chave in reader.trailer:
+            trailer += b' ' + chave.encode('ascii') + b' ' + _serialize(reader.trailer.raw_get(chave))
+    out.write(b'trailer\n<< ' + trailer + b' /Prev %d >>\nstartxref\n%d\n%%%%EOF\n' % (prev_xref, xref_offset))
+    return len(kids)
@@ -5,21 +5,163 @@ from reportlab.lib.colors import black, white, blue
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.platypus import Paragraph, Frame
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from reportlab.lib.utils import ImageReader
+from reportlab.lib.rl_accel import escapePDF, fp_str
+from reportlab.pdfbase import pdfdoc
+from reportlab.pdfbase.pdfutils import asciiBase85Decode
 from reportlab.graphics import renderPDF
 from reportlab.graphics.shapes import Drawing, Rect, String
-from typing import List, Tuple
+from typing import BinaryIO, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+import io
 import os
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from datetime import datetime
+from service.exceptions import EtiquetaError, PDFGenerationError, NoRecordsError, TemplateError
+from service.text_layout import TextLayout
+from service.label_record import LabelRecord, iter_label_records
+from service.asset_pipeline import AssetPipeline
+from service.render_cache import RenderCache
+from service.pdf_copies import write_shared_copies
+from service.report_service import ReportService
+from service.label_template import (HLineOp, LabelTemplate, LogoOp, RectOp, RenderPlan, TextOp,
+                                    compile_template, load_template)
 try:
     from reportlab.graphics import renderPDF
     from svglib.svglib import svg2rlg
     SVG_AVAILABLE = True
 except ImportError:
     SVG_AVAILABLE = False
+try:
+    from pypdf import PdfReader, PdfWriter
+    from pypdf.generic import NameObject, NumberObject, StreamObject
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PYPDF_AVAILABLE = False
+
+# Versão do layout da etiqueta: mudar invalida os trechos guardados no cache de renderização
+LABEL_TEMPLATE_VERSION = 1
+
+# Etiquetas consultadas/gravadas no cache de renderização por vez
+_RENDER_CACHE_BATCH = 256
+
+# Streams das etiquetas só com Flate, sem a camada ASCII85 (texto puro, ~25%
+# maior antes de comprimir): PDFs cerca de 12% menores e mais rápidos de gerar
+# e de enviar. O ReportLab só tem a opção global (rl_config.useA85); em vez de
+# mexer nela, o documento do canvas das etiquetas troca os filtros dos próprios
+# objetos quando eles são registrados. Relatórios e outros PDFs gerados ao mesmo
+# tempo continuam com a configuração do ReportLab.
+class _FlateDocument(pdfdoc.PDFDocument):
+    """PDFDocument que grava páginas, forms e imagens só com Flate"""
+
+    def Reference(self, obj, name=None):
+        if isinstance(obj, (pdfdoc.PDFPage, pdfdoc.PDFFormXObject)) and obj.compression and not obj.Contents:
+            # Páginas e forms chegam aqui com o conteúdo pronto (showPage/endForm);
+            # com o stream já montado, o ReportLab não escolhe os filtros ao salvar
+            stream = pdfdoc.PDFStream(content=obj.stream, filters=[pdfdoc.PDFZCompress])
+            stream.__Comment__ = "page stream" if isinstance(obj, pdfdoc.PDFPage) else "xobject form stream"
+            obj.Contents = stream
+            obj.compression = 0
+        elif isinstance(obj, pdfdoc.PDFImageXObject) and 'ASCII85Decode' in obj._filters:
+            obj.streamContent = asciiBase85Decode(obj.streamContent)
+            obj._filters = tuple(f for f in obj._filters if f != 'ASCII85Decode')
+        return super().Reference(obj, name)
+
+
+class _FlateCanvas(canvas.Canvas):
+    """Canvas das etiquetas (ver _FlateDocument)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._doc.__class__ = _FlateDocument
+
+
+class LabelLayout(NamedTuple):
+    """
+    Disposição das etiquetas de um job (imutável, uma por chamada)
+
+    label_width/label_height são as dimensões em que a etiqueta é desenhada;
+    com single_per_page coincidem com a página.
+    """
+    page_size: Tuple[float, float]
+    margin: float
+    label_width: float
+    label_height: float
+    labels_per_row: int
+    labels_per_page: int
+    single_per_page: bool
+
+    def label_origin(self, slot: int) -> Tuple[float, float]:
+        """Canto inferior esquerdo da etiqueta na posição `slot` da página"""
+        if self.single_per_page:
+            return 0, 0
+        row, col = divmod(slot, self.labels_per_row)
+        return (self.margin + col * self.label_width,
+                self.page_size[1] - self.margin - (row + 1) * self.label_height)
+
+
+# Serviço de cada processo do pool de renderização (logo e caches ficam quentes entre lotes)
+_worker_service = None
+
+
+def _init_render_worker(logo_dpi: int, logo_mode: str, render_cache_config: Optional[Tuple[str, int]],
+                        template: LabelTemplate):
+    """Inicializa o PDFService do processo do pool"""
+    global _worker_service
+    render_cache = RenderCache(*render_cache_config) if render_cache_config else None
+    _worker_service = PDFService(logo_dpi=logo_dpi, logo_mode=logo_mode, render_cache=render_cache,
+                                 template=template)
+
+
+def _render_shard_worker(registros: List[Tuple], label_size_mm: Optional[Tuple[float, float]],
+                         single_per_page: bool, incluir_pdf: bool,
+                         data_geracao: str) -> Tuple[Optional[bytes], List[bytes]]:
+    """
+    Renderiza um lote de etiquetas em um processo do pool (precisa ser função de módulo)
+
+    Além de desenhar, o próprio worker extrai o conteúdo de cada página
+    (já comprimido), para que o processo principal só precise montar o
+    documento final.
+
+    Returns:
+        Tuple: (PDF do lote se incluir_pdf, conteúdo comprimido de cada página)
+    """
+    buffer = io.BytesIO()
+    _worker_service.generate_labels_pdf(registros, buffer, label_size_mm=label_size_mm,
+                                        single_per_page=single_per_page, data_geracao=data_geracao)
+    pdf_bytes = buffer.getvalue()
+    conteudos = [zlib.compress(page.get_contents().get_data())
+                 for page in PdfReader(io.BytesIO(pdf_bytes)).pages]
+    return (pdf_bytes if incluir_pdf else None), conteudos
+
+
+def _content_stream(conteudo: bytes):
+    """Stream de conteúdo de página a partir de bytes já comprimidos (FlateDecode)"""
+    return StreamObject.initialize_from_dictionary({
+        NameObject('/Filter'): NameObject('/FlateDecode'),
+        NameObject('/Length'): NumberObject(len(conteudo)),
+        '__streamdata__': conteudo
+    })
+
 
 class PDFService:
-    def __init__(self):
-        """Inicializa o serviço de geração de PDF"""
+    def __init__(self, logo_dpi: int = 300, logo_mode: str = 'auto',
+                 render_cache: Optional[RenderCache] = None, template: Optional[LabelTemplate] = None):
+        """
+        Inicializa o serviço de geração de PDF
+
+        Args:
+            logo_dpi (int): Resolução em que a logo é embutida (a da impressora)
+            logo_mode (str): 'auto' (JPEG, ou PNG se houver transparência), 'jpeg', 'png',
+                             '1' (pontilhada, para térmicas) ou 'L' (cinza)
+            render_cache (RenderCache): Cache dos textos já renderizados de cada etiqueta (opcional)
+            template (LabelTemplate): Layout da etiqueta (padrão: assets/templates/etiqueta_padrao.json)
+
+        Raises:
+            TemplateError: Template padrão ausente ou inválido
+        """
         self.page_width, self.page_height = A4
         # Configurações da etiqueta (em mm convertido para pontos)
         self.label_width = 80 * mm
@@ -30,178 +172,526 @@ class PDFService:
         self.labels_per_row = int((self.page_width - 2 * self.margin) // self.label_width)
         self.labels_per_col = int((self.page_height - 2 * self.margin) // self.label_height)
         self.labels_per_page = self.labels_per_row * self.labels_per_col
+        
+        # Logo carregada sob demanda uma única vez e geometria por tamanho de caixa
+        self._logo_asset = None
+        self._logo_geometry = {}
+        
+        # Logo reduzida para a resolução da impressora (cache em disco entre execuções)
+        self.logo_dpi = logo_dpi
+        self.logo_mode = logo_mode
+        self.asset_pipeline = AssetPipeline()
+        self.render_cache = render_cache
+        
+        # Medição e quebra de texto com cache (OP/unidade se repetem entre etiquetas)
+        self.text_layout = TextLayout()
+        
+        # Layout declarativo, compilado por tamanho de etiqueta a cada job
+        self.template = template or load_template()
+        
+        # Relatórios (lista de registros) gravados página a página
+        self.report_service = ReportService()
+        
+        # Pools de processos da renderização paralela, por número de workers
+        # (criados sob demanda e reaproveitados; jobs simultâneos não derrubam o pool um do outro)
+        self._render_pools: Dict[int, ProcessPoolExecutor] = {}
+        # Protege o que é criado sob demanda; o desenho em si não altera o serviço
+        self._lock = threading.RLock()
     
-    def generate_labels_pdf(self, registros: List[Tuple], output_path: str, label_size_mm: Tuple[float, float] = None, single_per_page: bool = False) -> bool:
+    def generate_labels_pdf(self, registros: Iterable[Tuple], output_path: Union[str, BinaryIO],
+                            label_size_mm: Tuple[float, float] = None, single_per_page: bool = False,
+                            copies: bool = False, number_copies: bool = False,
+                            max_pages: Optional[int] = None, data_geracao: Optional[str] = None) -> bool:
         """
         Gera PDF com etiquetas baseado nos registros
         
+        Os registros são consumidos sob demanda: aceita lista, gerador ou
+        cursor do banco, e cada página é finalizada assim que fica cheia,
+        sem materializar a lista de etiquetas.
+        
+        No modo de cópias cada registro vira qtde etiquetas (uma por
+        unidade). Cada etiqueta distinta é desenhada uma única vez como form
+        XObject e as cópias só referenciam o form, então o arquivo cresce
+        poucos bytes por cópia.
+        
+        Com max_pages a geração para ao completar a N-ésima página, sem ler
+        o restante dos registros (prévia rápida, ver render_labels_pdf).
+        
         Args:
-            registros (List[Tuple]): Lista de registros (id, op, unidade, arquivos, qtde)
-            output_path (str): Caminho para salvar o PDF
+            registros (Iterable[Tuple]): Registros (id, op, unidade, arquivos, qtde[, nome])
+            output_path (str | BinaryIO): Caminho do PDF ou stream binário (BytesIO, socket, pipe)
+            copies (bool): Uma etiqueta por unidade (qtde cópias de cada registro)
+            number_copies (bool): Numera as cópias ("n/N") no campo 'copia' do template
+            max_pages (int): Gera só as primeiras N páginas (opcional)
+            data_geracao (str): Data impressa nas etiquetas (padrão: agora; os lotes
+                                da geração paralela recebem a mesma do job)
             
         Returns:
-            bool: True se gerado com sucesso, False caso contrário
+            bool: True se gerado com sucesso
+
+        Raises:
+            NoRecordsError: Nenhuma etiqueta a gerar
+            TemplateError: Numeração pedida e template sem o campo 'copia'
+            PDFGenerationError: Falha ao desenhar ou salvar o PDF
         """
         try:
-            # Decide dimensões da etiqueta (em pontos)
-            if label_size_mm:
-                lw = label_size_mm[0] * mm
-                lh = label_size_mm[1] * mm
-            else:
-                lw = self.label_width
-                lh = self.label_height
-
-            # Se for uma etiqueta por página (Zebra), vamos criar um PDF com o tamanho da etiqueta
-            if single_per_page:
-                page_size = (lw, lh)
-                margin = 3 * mm
-            else:
-                page_size = A4
-                margin = self.margin
-
-            # Cria o canvas
-            c = canvas.Canvas(output_path, pagesize=page_size)
-
-            # Prepara as etiquetas
-            etiquetas = self._prepare_labels_data(registros)
-
-            if not etiquetas:
-                return False
-
-            # Determina como as etiquetas serão dispostas na página atual
-            page_width, page_height = page_size
-            labels_per_row = int((page_width - 2 * margin) // lw) if not single_per_page else 1
-            labels_per_col = int((page_height - 2 * margin) // lh) if not single_per_page else 1
-            labels_per_page = max(1, labels_per_row * labels_per_col)
-
-            # Gera as etiquetas
-            total_labels = len(etiquetas)
-            current_label = 0
-
-            while current_label < total_labels:
-                # Desenha as etiquetas da página atual
-                labels_on_page = min(labels_per_page, total_labels - current_label)
-
-                for i in range(labels_on_page):
-                    row = i // labels_per_row
-                    col = i % labels_per_row
-
-                    # Calcula posição da etiqueta
-                    if single_per_page:
-                        # Para 1 etiqueta por página, desenhamos a etiqueta ocupando toda a página
-                        x = 0
-                        y = 0
-                        effective_lw = page_width
-                        effective_lh = page_height
-                        effective_margin = 0
+            # Geometria e data ficam no job: o serviço pode atender vários jobs ao mesmo tempo
+            layout = self._page_layout(label_size_mm, single_per_page)
+            plan = self._compile_plan(layout)
+            data_geracao = data_geracao or datetime.now().strftime("%d/%m/%Y %H:%M")
+            if copies and number_copies and not plan.has_copy_numbering:
+                raise TemplateError(f"Template {plan.template.nome} não tem o campo 'copia' para numerar as cópias")
+            # Uma etiqueta por página: as cópias reaproveitam o conteúdo da página da etiqueta
+            # (pdf_copies); nas folhas com várias etiquetas, cada cópia referencia um form
+            shared_pages = copies and layout.single_per_page and PYPDF_AVAILABLE
+            copy_forms: Dict[str, str] = {}
+            master_pages: Dict[str, int] = {}
+            sequencia: List[Tuple[int, int]] = []
+
+            # Cria o canvas (o arquivo só é escrito em c.save())
+            destino = io.BytesIO() if shared_pages else output_path
+            c = _FlateCanvas(destino, pagesize=layout.page_size)
+            # Fontes do template registradas em ordem fixa: os nomes internos (F1, F2...)
+            # não dependem da primeira etiqueta, e os lotes da geração paralela coincidem
+            for nome in plan.fonts:
+                c._doc.getInternalFontName(nome)
+
+            total_labels = 0
+            slot = 0
+            paginas = 1
+            completo = False  # max_pages atingido
+            etiquetas = iter_label_records(registros)
+            # Prévia: não lê (nem consulta no cache) mais registros que as páginas pedidas
+            tamanho_lote = min(_RENDER_CACHE_BATCH, max_pages * layout.labels_per_page) if max_pages else _RENDER_CACHE_BATCH
+
+            # Em lotes, para consultar o cache de renderização de uma vez por lote
+            for lote in iter(lambda: list(islice(etiquetas, tamanho_lote)), []):
+                for etiqueta, text_code in zip(lote, self._label_text_codes(c, lote, plan)):
+                    if shared_pages:
+                        if max_pages and total_labels >= max_pages:
+                            completo = True
+                            break
+                        # Só a primeira ocorrência de cada etiqueta é desenhada (página mestre)
+                        pagina = master_pages.get(text_code)
+                        if pagina is None:
+                            if master_pages:
+                                c.showPage()
+                            pagina = master_pages[text_code] = len(master_pages)
+                            self._draw_single_label_custom(c, etiqueta, 0, 0, plan, data_geracao, text_code=text_code)
+                        sequencia.append((pagina, max(1, etiqueta.qtde)))
+                        total_labels += max(1, etiqueta.qtde)
+                        continue
+
+                    if copies:
+                        form_name = self._ensure_copy_form(c, plan, text_code, data_geracao, copy_forms)
+                        total_copias = max(1, etiqueta.qtde)
                     else:
-                        x = margin + col * lw
-                        y = page_height - margin - (row + 1) * lh
-                        effective_lw = lw
-                        effective_lh = lh
-                        effective_margin = margin
-
-                    # Temporariamente substitui dimensões internas para desenhar corretamente
-                    old_lw, old_lh, old_margin = self.label_width, self.label_height, self.margin
-                    self.label_width, self.label_height, self.margin = effective_lw, effective_lh, effective_margin
-                    try:
-                        self._draw_single_label_custom(c, etiquetas[current_label + i], x, y)
-                    finally:
-                        self.label_width, self.label_height, self.margin = old_lw, old_lh, old_margin
-
-                current_label += labels_on_page
-
-                # Se ainda há etiquetas, cria nova página
-                if current_label < total_labels:
-                    c.showPage()
+                        total_copias = 1
+
+                    for numero in range(1, total_copias + 1):
+                        # Página cheia: finaliza antes de desenhar a próxima etiqueta
+                        if slot == layout.labels_per_page:
+                            if max_pages and paginas == max_pages:
+                                completo = True
+                                break
+                            c.showPage()
+                            slot = 0
+                            paginas += 1
+
+                        x, y = layout.label_origin(slot)
+                        if copies:
+                            self._draw_copy(c, form_name, x, y, plan, numero, total_copias, number_copies)
+                        else:
+                            self._draw_single_label_custom(c, etiqueta, x, y, plan, data_geracao, text_code=text_code)
+                        slot += 1
+                        total_labels += 1
+                    if completo:
+                        break
+                if completo:
+                    break
+
+            if total_labels == 0:
+                raise NoRecordsError("Nenhuma etiqueta para gerar")
+
+            if shared_pages:
+                numbering = self._copy_numbering(c, plan) if number_copies else None
+                c.save()
+                write_shared_copies(destino.getvalue(), sequencia, output_path, numbering, max_pages=max_pages)
+                return True
 
             # Salva o PDF
             c.save()
             return True
-            
+        
+        except EtiquetaError:
+            # NoRecordsError ou erro vindo da fonte dos registros (ex.: DatabaseError)
+            raise
         except Exception as e:
             print(f"Erro ao gerar PDF: {e}")
-            return False
+            raise PDFGenerationError(f"Erro ao gerar PDF: {e}") from e
     
-    def _prepare_labels_data(self, registros: List[Tuple]) -> List[dict]:
+    def render_labels_pdf(self, registros: Iterable[Tuple], label_size_mm: Tuple[float, float] = None,
+                          single_per_page: bool = False, copies: bool = False, number_copies: bool = False,
+                          max_pages: Optional[int] = None) -> bytes:
         """
-        Prepara os dados das etiquetas expandindo por quantidade
+        Gera o PDF de etiquetas em memória e retorna os bytes
+        
+        Para prévias (max_pages=1), envio pela rede ou direto ao spooler,
+        sem arquivo temporário. Mesmos parâmetros de generate_labels_pdf.
+        
+        Returns:
+            bytes: Conteúdo do PDF
+
+        Raises:
+            NoRecordsError: Nenhuma etiqueta a gerar
+            TemplateError: Numeração pedida e template sem o campo 'copia'
+            PDFGenerationError: Falha ao desenhar o PDF
+        """
+        buffer = io.BytesIO()
+        self.generate_labels_pdf(registros, buffer, label_size_mm=label_size_mm, single_per_page=single_per_page,
+                                 copies=copies, number_copies=number_copies, max_pages=max_pages)
+        return buffer.getvalue()
+    
+    def _page_layout(self, label_size_mm: Optional[Tuple[float, float]], single_per_page: bool) -> LabelLayout:
+        """
+        Calcula a disposição das etiquetas na página
+        
+        Returns:
+            LabelLayout: Página, margem, tamanho da etiqueta e etiquetas por linha/página
+        """
+        # Decide dimensões da etiqueta (em pontos)
+        if label_size_mm:
+            lw = label_size_mm[0] * mm
+            lh = label_size_mm[1] * mm
+        else:
+            lw = self.label_width
+            lh = self.label_height
+
+        # Se for uma etiqueta por página (Zebra), vamos criar um PDF com o tamanho da etiqueta
+        if single_per_page:
+            return LabelLayout((lw, lh), 0, lw, lh, 1, 1, True)
+
+        page_size = A4
+        margin = self.margin
+        page_width, page_height = page_size
+        labels_per_row = max(1, int((page_width - 2 * margin) // lw))
+        labels_per_col = int((page_height - 2 * margin) // lh)
+        labels_per_page = max(1, labels_per_row * labels_per_col)
+        return LabelLayout(page_size, margin, lw, lh, labels_per_row, labels_per_page, False)
+    
+    def generate_labels_pdf_parallel(self, registros: Iterable[Tuple], output_path: str,
+                                     label_size_mm: Tuple[float, float] = None, single_per_page: bool = False,
+                                     workers: Optional[int] = None, shard_size: int = 500,
+                                     max_pages_per_file: Optional[int] = None) -> List[str]:
+        """
+        Gera o PDF de etiquetas em paralelo, em lotes renderizados por um pool de processos
+        
+        O fluxo de registros é dividido em lotes de `shard_size` etiquetas
+        (arredondado para páginas inteiras) e cada lote é desenhado em um
+        processo do pool. O processo principal só monta o documento, na
+        ordem original: todas as páginas apontam para os mesmos recursos
+        (fontes, template e logo) do primeiro lote, então a logo é embutida
+        uma vez. Isso vale porque todo lote registra as fontes do template na
+        mesma ordem e recebe a mesma data de geração. Com `max_pages_per_file` o resultado é dividido em vários
+        arquivos (nome_001.pdf, nome_002.pdf, ...) para impressoras com pouca
+        memória.
+        
+        Sem pypdf, ou com um único worker e sem divisão, gera em série com
+        generate_labels_pdf.
         
         Args:
-            registros (List[Tuple]): Lista de registros do banco
+            registros (Iterable[Tuple]): Registros (id, op, unidade, arquivos, qtde[, nome])
+            output_path (str): Caminho do PDF (base dos nomes no modo dividido)
+            label_size_mm (Tuple[float, float]): Tamanho da etiqueta em mm
+            single_per_page (bool): Uma etiqueta por página (Zebra)
+            workers (int): Processos do pool (padrão: número de CPUs)
+            shard_size (int): Etiquetas por lote
+            max_pages_per_file (int): Máximo de páginas por arquivo (opcional)
             
         Returns:
-            List[dict]: Lista de etiquetas individuais
-        """
-        # Agora cada registro gera UMA etiqueta. A quantidade (qtde) será
-        # exibida na própria etiqueta ao invés de criar múltiplas cópias.
-        etiquetas = []
-
-        for registro in registros:
-            # registro = (id, op, unidade, arquivos, qtde, nome) - agora com nome adicional
-            if len(registro) >= 5:
-                if len(registro) == 5:
-                    # Formato antigo sem nome
-                    _, op, unidade, arquivos, qtde = registro
-                    nome = ""
-                else:
-                    # Formato novo com nome
-                    _, op, unidade, arquivos, qtde, nome = registro[:6]
-                
-                etiqueta = {
-                    'op': str(op),
-                    'unidade': str(unidade),
-                    'arquivo': str(arquivos),
-                    'qtde': int(qtde) if qtde is not None else 0,
-                    'nome': str(nome) if nome else ""
-                }
-                etiquetas.append(etiqueta)
-
-        return etiquetas
+            List[str]: Arquivos gerados, em ordem
+
+        Raises:
+            NoRecordsError: Nenhuma etiqueta a gerar
+            PDFGenerationError: Falha ao desenhar, juntar ou salvar o PDF
+        """
+        workers = workers or os.cpu_count() or 1
+        if not PYPDF_AVAILABLE or (workers <= 1 and not max_pages_per_file):
+            if not PYPDF_AVAILABLE:
+                print("pypdf não instalado: gerando etiquetas em série (pip install pypdf)")
+            self.generate_labels_pdf(registros, output_path, label_size_mm=label_size_mm,
+                                     single_per_page=single_per_page)
+            return [output_path]
+
+        layout = self._page_layout(label_size_mm, single_per_page)
+        page_size, labels_per_page = layout.page_size, layout.labels_per_page
+        # Lotes com páginas inteiras, para o resultado ser igual ao da geração em série
+        shard_size = max(labels_per_page, -(-shard_size // labels_per_page) * labels_per_page)
+        # Uma data para o job inteiro (cada lote roda em outro processo, em outro momento)
+        data_geracao = datetime.now().strftime("%d/%m/%Y %H:%M")
+
+        try:
+            pool = self._get_render_pool(workers)
+            registros_iter = iter(registros)
+            pendentes = []
+
+            def enviar_lote() -> bool:
+                lote = list(islice(registros_iter, shard_size))
+                if lote:
+                    # Só o primeiro lote devolve o PDF, de onde vêm os recursos compartilhados
+                    pendentes.append(pool.submit(_render_shard_worker, lote, label_size_mm,
+                                                 single_per_page, not lotes_enviados, data_geracao))
+                    lotes_enviados.append(len(lote))
+                return bool(lote)
+
+            lotes_enviados = []
+
+            arquivos = []
+            pagina_base = None
+            writer = None
+            recursos = None
+            paginas_no_arquivo = 0
+
+            # Mantém no máximo 2 lotes por worker em andamento (memória limitada)
+            while len(pendentes) < 2 * workers and enviar_lote():
+                pass
+
+            while pendentes:
+                pdf_bytes, conteudos = pendentes.pop(0).result()
+                enviar_lote()
+                if pdf_bytes is not None:
+                    pagina_base = PdfReader(io.BytesIO(pdf_bytes)).pages[0]
+
+                for conteudo in conteudos:
+                    if writer is None:
+                        # Primeira página do arquivo: copia os recursos uma única vez
+                        writer = PdfWriter()
+                        page = writer.add_page(pagina_base)
+                        recursos = page.raw_get('/Resources')
+                        paginas_no_arquivo = 0
+                    else:
+                        page = writer.add_blank_page(width=page_size[0], height=page_size[1])
+                        page[NameObject('/Resources')] = recursos
+                    page.replace_contents(_content_stream(conteudo))
+                    paginas_no_arquivo += 1
+
+                    if max_pages_per_file and paginas_no_arquivo >= max_pages_per_file:
+                        arquivos.append(self._write_merged(writer, output_path, len(arquivos) + 1, max_pages_per_file))
+                        writer = None
+
+            if writer is not None:
+                arquivos.append(self._write_merged(writer, output_path, len(arquivos) + 1, max_pages_per_file))
+
+        except EtiquetaError:
+            raise
+        except Exception as e:
+            print(f"Erro ao gerar PDF em paralelo: {e}")
+            raise PDFGenerationError(f"Erro ao gerar PDF em paralelo: {e}") from e
+
+        if not arquivos:
+            raise NoRecordsError("Nenhuma etiqueta para gerar")
+        return arquivos
+    
+    def _write_merged(self, writer, output_path: str, numero: int, max_pages_per_file: Optional[int]) -> str:
+        """
+        Grava um arquivo montado por generate_labels_pdf_parallel
+        
+        Returns:
+            str: Caminho gravado
+        """
+        if max_pages_per_file:
+            base, ext = os.path.splitext(output_path)
+            path = f"{base}_{numero:03d}{ext or '.pdf'}"
+        else:
+            path = output_path
+        
+        with open(path, 'wb') as f:
+            writer.write(f)
+        return path
+    
+    def _get_render_pool(self, workers: int) -> ProcessPoolExecutor:
+        """Pool de renderização mantido entre chamadas (processos já com a logo carregada)"""
+        with self._lock:
+            pool = self._render_pools.get(workers)
+            if pool is None:
+                cache_config = None
+                if self.render_cache is not None:
+                    cache_config = (self.render_cache.db_path, self.render_cache.max_bytes)
+                pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker,
+                                           initargs=(self.logo_dpi, self.logo_mode, cache_config,
+                                                     self.template))
+                self._render_pools[workers] = pool
+            return pool
+    
+    def close(self):
+        """Encerra os pools de renderização paralela"""
+        with self._lock:
+            pools = list(self._render_pools.values())
+            self._render_pools = {}
+        for pool in pools:
+            pool.shutdown(wait=True)
     
-    def _wrap_text(self, text: str, font_name: str, font_size: int, max_width: float, canvas_obj) -> List[str]:
+    def _prepare_labels_data(self, registros: Iterable[Tuple]) -> List[LabelRecord]:
+        """
+        Prepara os dados das etiquetas (uma por registro)
+        
+        Args:
+            registros (Iterable[Tuple]): Registros do banco
+            
+        Returns:
+            List[LabelRecord]: Lista de etiquetas individuais
+        """
+        return list(iter_label_records(registros))
+    
+    def _wrap_text(self, text: str, font_name: str, font_size: int, max_width: float, canvas_obj=None) -> List[str]:
         """
         Quebra texto em múltiplas linhas para caber na largura especificada
         
+        A medição usa as tabelas de largura e o cache LRU de TextLayout;
+        palavras maiores que a linha são quebradas por caractere.
+        
         Args:
             text (str): Texto para quebrar
             font_name (str): Nome da fonte
             font_size (int): Tamanho da fonte
             max_width (float): Largura máxima em pontos
-            canvas_obj: Objeto canvas para calcular largura do texto
+            canvas_obj: Mantido por compatibilidade (não é mais usado)
             
         Returns:
             List[str]: Lista de linhas quebradas
         """
-        if not text:
-            return [""]
-            
-        words = text.split(' ')
-        lines = []
-        current_line = ""
+        return list(self.text_layout.wrap_text(text, font_name, font_size, max_width))
+
+    def _get_logo_asset(self) -> dict:
+        """
+        Retorna a logo carregada uma única vez por instância do serviço
         
-        for word in words:
-            test_line = current_line + (" " if current_line else "") + word
-            text_width = canvas_obj.stringWidth(test_line, font_name, font_size)
-            
-            if text_width <= max_width:
-                current_line = test_line
+        Returns:
+            dict: {'tipo': 'imagem'|'svg'|'fallback', 'size': (w, h) ou None,
+                   'path' e 'reader': arquivo e ImageReader (imagem), 'drawing': Drawing (svg)}
+        """
+        if self._logo_asset is None:
+            with self._lock:
+                if self._logo_asset is None:
+                    self._logo_asset = self._load_logo_asset()
+        return self._logo_asset
+    
+    def _load_logo_asset(self) -> dict:
+        """
+        Localiza e carrega a logo (JPG/PNG, depois SVG, senão fallback desenhado)
+        """
+        assets_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'assets')
+        jpg_path = os.path.join(assets_dir, 'cdg_logo.jpg')
+        png_path = os.path.join(assets_dir, 'cdg_logo.png')
+        svg_path = os.path.join(assets_dir, 'cdg_logo.svg')
+        
+        # 1) Prefer JPG/PNG raster image (mais simples para impressão Zebra)
+        for img_path in (jpg_path, png_path):
+            try:
+                if os.path.exists(img_path):
+                    reader = ImageReader(img_path)
+                    img_w, img_h = reader.getSize()
+                    if img_w > 0 and img_h > 0:
+                        return {'tipo': 'imagem', 'path': img_path, 'reader': reader, 'size': (img_w, img_h)}
+            except Exception:
+                # continua para o próximo formato
+                pass
+        
+        # 2) Tenta usar o SVG se disponível (o desenho é interpretado uma vez só)
+        if SVG_AVAILABLE and os.path.exists(svg_path):
+            try:
+                drawing = svg2rlg(svg_path)
+                if drawing and drawing.width > 0 and drawing.height > 0:
+                    return {'tipo': 'svg', 'drawing': drawing, 'size': (drawing.width, drawing.height)}
+            except Exception as e:
+                print(f"SVG load failed: {e}")
+        
+        return {'tipo': 'fallback', 'size': None}
+    
+    def _get_logo_geometry(self, width: float, height: float) -> Tuple[float, float, float, float, float]:
+        """
+        Escala e posição da logo dentro da caixa (calculadas uma vez por tamanho)
+        
+        Returns:
+            Tuple: (escala, largura, altura, offset_x, offset_y)
+        """
+        key = (round(width, 3), round(height, 3))
+        geometry = self._logo_geometry.get(key)
+        if geometry is None:
+            size = self._get_logo_asset()['size']
+            if size:
+                # Mantém proporção e centraliza
+                scale = min(width / size[0], height / size[1])
+                scaled_width = size[0] * scale
+                scaled_height = size[1] * scale
+                geometry = (scale, scaled_width, scaled_height,
+                            (width - scaled_width) / 2, (height - scaled_height) / 2)
             else:
-                if current_line:
-                    lines.append(current_line)
-                    current_line = word
-                else:
-                    # Palavra muito longa, força quebra
-                    lines.append(word)
-        
-        if current_line:
-            lines.append(current_line)
-            
-        return lines if lines else [""]
-
+                geometry = (1.0, width, height, 0.0, 0.0)
+            self._logo_geometry[key] = geometry
+        return geometry
+    
+    def _ensure_logo_form(self, c: canvas.Canvas, width: float, height: float) -> str:
+        """
+        Define a logo como form XObject no documento (uma vez por canvas e tamanho)
+        
+        A imagem é embutida uma única vez e todas as etiquetas apenas
+        referenciam o mesmo objeto com doForm.
+        
+        Returns:
+            str: Nome do form
+        """
+        name = f"EtqLogo{int(round(width * 100))}x{int(round(height * 100))}"
+        if c.hasForm(name):
+            return name
+        
+        c.beginForm(name, lowerx=0, lowery=0, upperx=width, uppery=height)
+        try:
+            self._draw_logo_asset(c, width, height)
+        except Exception as e:
+            print(f"Erro ao desenhar logo: {e}")
+            self._logo_asset = {'tipo': 'fallback', 'size': None}
+            self._logo_geometry = {}
+            self._draw_fallback_logo(c, 0, 0, width, height)
+        finally:
+            c.endForm()
+        return name
+    
+    def _draw_logo_asset(self, c: canvas.Canvas, width: float, height: float):
+        """
+        Desenha a logo na origem (0, 0) ocupando a caixa width x height
+        """
+        asset = self._get_logo_asset()
+        scale, scaled_width, scaled_height, offset_x, offset_y = self._get_logo_geometry(width, height)
+        
+        if asset['tipo'] == 'imagem':
+            # Versão já reduzida para o tamanho impresso; máscara só se houver transparência
+            prepared = None
+            try:
+                prepared = self.asset_pipeline.prepare(asset['path'], scaled_width, scaled_height,
+                                                       self.logo_dpi, self.logo_mode)
+            except Exception as e:
+                # Sem cache (pasta sem permissão, etc.): usa a imagem original
+                print(f"Erro ao preparar logo: {e}")
+            if prepared is not None:
+                image, mask = prepared.path, ('auto' if prepared.has_alpha else None)
+            else:
+                image, mask = asset['reader'], 'auto'
+            # drawImage expects coords with origin at bottom-left
+            c.drawImage(image, offset_x, offset_y, width=scaled_width, height=scaled_height,
+                        preserveAspectRatio=True, mask=mask)
+        elif asset['tipo'] == 'svg':
+            c.saveState()
+            c.translate(offset_x, offset_y)
+            c.scale(scale, scale)
+            renderPDF.draw(asset['drawing'], c, 0, 0)
+            c.restoreState()
+        else:
+            self._draw_fallback_logo(c, 0, 0, width, height)
+    
     def _draw_logo(self, c: canvas.Canvas, x: float, y: float, width: float, height: float):
         """
-        Desenha a logo da empresa CDG usando o arquivo SVG
+        Desenha a logo da empresa CDG
         
         Args:
             c (canvas.Canvas): Canvas do ReportLab
@@ -211,75 +701,14 @@ class PDFService:
             height (float): Altura da logo
         """
         try:
-            assets_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'assets')
-            jpg_path = os.path.join(assets_dir, 'cdg_logo.jpg')
-            png_path = os.path.join(assets_dir, 'cdg_logo.png')
-            svg_path = os.path.join(assets_dir, 'cdg_logo.svg')
-
-            # 1) Prefer JPG/PNG raster image (mais simples para impressão Zebra)
-            for img_path in (jpg_path, png_path):
-                try:
-                    if os.path.exists(img_path):
-                        # Calcula escala mantendo proporção
-                        from PIL import Image
-                        with Image.open(img_path) as im:
-                            img_w, img_h = im.size
-                        if img_w > 0 and img_h > 0:
-                            scale_x = width / img_w
-                            scale_y = height / img_h
-                            scale = min(scale_x, scale_y)
-                            scaled_width = img_w * scale
-                            scaled_height = img_h * scale
-                            offset_x = (width - scaled_width) / 2
-                            offset_y = (height - scaled_height) / 2
-
-                            # drawImage expects coords with origin at bottom-left
-                            c.drawImage(img_path, x + offset_x, y + offset_y, width=scaled_width, height=scaled_height, preserveAspectRatio=True, mask='auto')
-                            return
-                except Exception:
-                    # continua para o próximo formato
-                    pass
-
-            # 2) Tenta usar o SVG se disponível
-            if SVG_AVAILABLE and os.path.exists(svg_path):
-                try:
-                    drawing = svg2rlg(svg_path)
-                    if drawing:
-                        svg_width = drawing.width
-                        svg_height = drawing.height
-                        if svg_width > 0 and svg_height > 0:
-                            scale_x = width / svg_width
-                            scale_y = height / svg_height
-                            scale = min(scale_x, scale_y)  # Mantém proporção
-
-                            # Centraliza a logo redimensionada
-                            scaled_width = svg_width * scale
-                            scaled_height = svg_height * scale
-                            offset_x = (width - scaled_width) / 2
-                            offset_y = (height - scaled_height) / 2
-
-                            # Salva estado do canvas
-                            c.saveState()
-
-                            # Aplica transformação
-                            c.translate(x + offset_x, y + offset_y)
-                            c.scale(scale, scale)
-
-                            # Desenha o SVG
-                            renderPDF.draw(drawing, c, 0, 0)
-
-                            # Restaura estado
-                            c.restoreState()
-                            return
-                except Exception as e:
-                    # se falhar, cai para fallback
-                    print(f"SVG draw failed: {e}")
-            
-            # Fallback: desenha logo simples se SVG não funcionar
-            self._draw_fallback_logo(c, x, y, width, height)
+            form_name = self._ensure_logo_form(c, width, height)
+            c.saveState()
+            c.translate(x, y)
+            c.doForm(form_name)
+            c.restoreState()
             
         except Exception as e:
-            print(f"Erro ao desenhar logo SVG: {e}")
+            print(f"Erro ao desenhar logo: {e}")
             # Fallback em caso de erro
             self._draw_fallback_logo(c, x, y, width, height)
     
@@ -325,188 +754,250 @@ class PDFService:
         # Restaura o estado das cores
         c.restoreState()
 
-    def _draw_single_label_custom(self, c: canvas.Canvas, etiqueta: dict, x: float, y: float):
+    def _compile_plan(self, layout: LabelLayout) -> RenderPlan:
+        """Compila o template do serviço para o tamanho de etiqueta do job"""
+        return compile_template(self.template, layout.label_width, layout.label_height, self.text_layout)
+
+    def _ensure_label_template(self, c: canvas.Canvas, plan: RenderPlan) -> str:
+        """
+        Define as partes fixas da etiqueta como form XObject (uma vez por canvas e tamanho)
+        
+        Borda, linha separadora e logo são iguais em todas as etiquetas do
+        mesmo tamanho; desenhamos uma vez e cada etiqueta só referencia o form.
+        
+        Returns:
+            str: Nome do form
+        """
+        label_width, label_height = plan.label_width, plan.label_height
+        name = f"EtqTpl{int(round(label_width * 100))}x{int(round(label_height * 100))}"
+        if c.hasForm(name):
+            return name
+        
+        # A logo é definida antes para não aninhar definições de form
+        logo_forms = {op: self._ensure_logo_form(c, op.largura, op.altura)
+                      for op in plan.static_ops if isinstance(op, LogoOp)}
+        
+        c.beginForm(name, lowerx=0, lowery=0, upperx=label_width, uppery=label_height)
+        for op in plan.static_ops:
+            if isinstance(op, RectOp):
+                # --- Borda da etiqueta ---
+                c.setStrokeColor(black)
+                c.setLineWidth(op.espessura)
+                c.rect(op.x, op.y, op.largura, op.altura)
+            elif isinstance(op, LogoOp):
+                # --- Logo ---
+                c.saveState()
+                c.translate(op.x, op.y)
+                c.doForm(logo_forms[op])
+                c.restoreState()
+            elif isinstance(op, HLineOp):
+                # --- Linha separadora antes do rodapé ---
+                c.setStrokeColorRGB(op.cinza, op.cinza, op.cinza)
+                c.setLineWidth(op.espessura)
+                c.line(op.x1, op.y, op.x2, op.y)
+        c.endForm()
+        return name
+    
+    def _draw_single_label_custom(self, c: canvas.Canvas, etiqueta: LabelRecord, x: float, y: float,
+                                  plan: RenderPlan, data_geracao: str, text_code: Optional[str] = None):
         """
         Desenha uma etiqueta personalizada no PDF
         com destaque para OP, unidade, arquivo, quantidade e logo.
+        
+        As partes fixas (borda, logo, separador) vêm do template em form
+        XObject; os textos da etiqueta são um trecho de operadores montado
+        na origem (ou vindo do cache de renderização) e só a data é
+        desenhada na hora.
+
+        Args:
+            plan (RenderPlan): Template compilado para o tamanho da etiqueta do job
+            data_geracao (str): Data/hora do job exibida no rodapé
+            text_code (str): Trecho já montado por _label_text_codes (opcional)
         """
 
-        # --- Borda da etiqueta ---
-        c.setStrokeColor(black)
-        c.setLineWidth(1)
-        c.rect(x, y, self.label_width, self.label_height)
-
-        # --- Configurações de fonte ---
-        title_font_size = 12
-        subtitle_font_size = 9
-        text_font_size = 8
-        small_font_size = 6
-
-        # --- Margens internas ---
-        padding = 3 * mm
-
-        # --- Dimensões da logo ---
-        logo_width = 25 * mm  # Aumentado de 18mm para 25mm
-        logo_height = 14 * mm  # Aumentado de 10mm para 14mm
-
-        # --- Largura disponível para texto ---
-        available_width = self.label_width - (2 * padding) - logo_width - (3 * mm)
-
-        # --- Logo canto superior direito ---
-        logo_x = x + self.label_width - padding - logo_width
-        logo_y = y + self.label_height - padding - logo_height
-        self._draw_logo(c, logo_x, logo_y, logo_width, logo_height)
-
-        # --- Texto canto superior esquerdo ---
-        text_x = x + padding
-        current_y = y + self.label_height - padding - 14
-
-        # --- OP (destaque maior) ---
-        c.setFont("Helvetica-Bold", title_font_size)
-        op_text = f"OP: {etiqueta.get('op', '')}"
-        op_lines = self._wrap_text(op_text, "Helvetica-Bold", title_font_size, available_width, c)
-        for line in op_lines:
-            c.drawString(text_x, current_y, line)
-            current_y -= 14
-
-        current_y -= 3  # espaço extra
-
-        # --- Unidade ---
-        c.setFont("Helvetica-Bold", subtitle_font_size)
-        unidade_text = f"Unidade: {etiqueta.get('unidade', '')}"
-        unidade_lines = self._wrap_text(unidade_text, "Helvetica-Bold", subtitle_font_size, available_width, c)
-        for line in unidade_lines:
-            c.drawString(text_x, current_y, line)
-            current_y -= 11
-
-        current_y -= 2
-
-        # --- Arquivo ---
-        c.setFont("Helvetica", text_font_size)
-        arquivo_text = f"Arquivo: {etiqueta.get('arquivo', '')}"
-        arquivo_lines = self._wrap_text(arquivo_text, "Helvetica", text_font_size, available_width, c)
-
-        # Limite de linhas (2 fixas)
-        max_arquivo_lines = 2
-        for i, line in enumerate(arquivo_lines[:max_arquivo_lines]):
-            if i == max_arquivo_lines - 1 and len(arquivo_lines) > max_arquivo_lines:
-                line = f"{line[:40]}..."
-            c.drawString(text_x, current_y, line)
-            current_y -= 10
-
-        # --- Nome (se disponível) ---
-        nome = etiqueta.get('nome', '')
-        if nome:
-            current_y -= 2  # espaço extra
-            c.setFont("Helvetica-Bold", text_font_size)
-            c.setFillColor(black)
-            nome_text = f"Nome: {nome}"
-            nome_lines = self._wrap_text(nome_text, "Helvetica-Bold", text_font_size, available_width, c)
-            for line in nome_lines[:1]:  # Máximo 1 linha para nome
-                c.drawString(text_x, current_y, line)
-                current_y -= 10
-
-        # --- Linha separadora antes do rodapé ---
-        c.setStrokeColorRGB(0.6, 0.6, 0.6)
-        c.setLineWidth(0.5)
-        c.line(x + padding, y + padding + 12, x + self.label_width - padding, y + padding + 12)
+        # --- Partes fixas (borda, logo e separador) ---
+        template = self._ensure_label_template(c, plan)
+        c.saveState()
+        c.translate(x, y)
+        c.doForm(template)
+
+        # --- Textos da etiqueta (OP, unidade, arquivo, nome e quantidade) ---
+        if text_code is None:
+            text_code = self._label_text_code(c, etiqueta, plan)
+        c.addLiteral(text_code)
+        c.restoreState()
 
-        # --- Rodapé (Data à esquerda / Qtde à direita) ---
-        # Quantidade - fonte maior e mais destacada
-        qtde_font_size = 14  # Fonte maior para quantidade
-        c.setFont("Helvetica-Bold", qtde_font_size)
+        # --- Data (muda a cada geração, fora do cache) ---
+        self._draw_text_ops(c, x, y, plan.job_ops(data_geracao))
+
+    def _draw_text_ops(self, c: canvas.Canvas, x: float, y: float, ops: List[TextOp]):
+        """Desenha textos do plano (data, número da cópia) na etiqueta com origem em (x, y)"""
+        if not ops:
+            return
         c.setFillColor(black)
-        qtde_text = f"Qtde: {etiqueta.get('qtde', 0)}"
-        text_width = c.stringWidth(qtde_text, "Helvetica-Bold", qtde_font_size)
-        qtde_x = x + self.label_width - padding - text_width
-        c.drawString(qtde_x, y + padding + 2, qtde_text)  # +2 para elevar um pouco
+        for op in ops:
+            c.setFont(op.fonte, op.tamanho)
+            c.drawString(x + self._text_op_x(op), y + op.y, op.texto)
 
-        # Data
-        c.setFont("Helvetica", small_font_size)
-        data_geracao = datetime.now().strftime("%d/%m/%Y %H:%M")
-        c.drawString(text_x, y + padding, data_geracao)
+    def _ensure_copy_form(self, c: canvas.Canvas, plan: RenderPlan, text_code: str, data_geracao: str,
+                          copy_forms: Dict[str, str]) -> str:
+        """
+        Form XObject com a etiqueta completa (partes fixas, textos e data), um por etiqueta distinta do job
+
+        Registros com os mesmos textos compartilham o form.
+
+        Args:
+            text_code (str): Trecho de texto da etiqueta (de _label_text_codes)
+            copy_forms (Dict[str, str]): Forms já definidos no job (trecho -> nome)
+
+        Returns:
+            str: Nome do form
+        """
+        name = copy_forms.get(text_code)
+        if name is not None:
+            return name
+
+        # Definido antes para não aninhar definições de form
+        template = self._ensure_label_template(c, plan)
+        name = copy_forms[text_code] = f"EtqCopia{len(copy_forms)}"
+        c.beginForm(name, lowerx=0, lowery=0, upperx=plan.label_width, uppery=plan.label_height)
+        c.doForm(template)
+        c.addLiteral(text_code)
+        self._draw_text_ops(c, 0, 0, plan.job_ops(data_geracao))
+        c.endForm()
+        return name
+
+    def _copy_numbering(self, c: canvas.Canvas, plan: RenderPlan):
+        """
+        Gerador dos operadores da numeração "n/N" das páginas de cópia (pdf_copies)
+
+        As fontes são registradas no documento antes de salvar, para que os
+        nomes internos existam nos recursos compartilhados.
+
+        Returns:
+            Callable[[int, int], str]: numbering(numero, total) -> operadores PDF
+        """
+        fontes = {nome: c._doc.getInternalFontName(nome) for nome in plan.fonts}
+
+        def numbering(numero: int, total: int) -> str:
+            textos = []
+            for op in plan.copy_ops(numero, total):
+                texto = escapePDF(op.texto.encode('cp1252', 'replace').decode('latin-1'))
+                textos.append(f"BT {fontes[op.fonte]} {fp_str(op.tamanho)} Tf 1 0 0 1 "
+                              f"{fp_str(self._text_op_x(op))} {fp_str(op.y)} Tm ({texto}) Tj ET")
+            return f"q 0 g {' '.join(textos)} Q"
 
-    def generate_simple_list_pdf(self, registros: List[Tuple], output_path: str) -> bool:
+        return numbering
+
+    def _draw_copy(self, c: canvas.Canvas, form_name: str, x: float, y: float, plan: RenderPlan,
+                   numero: int, total: int, number_copies: bool):
+        """
+        Posiciona uma cópia (referência ao form da etiqueta) e, se pedido, a numeração "n/N"
+        """
+        c.saveState()
+        c.translate(x, y)
+        c.doForm(form_name)
+        c.restoreState()
+        if number_copies:
+            self._draw_text_ops(c, x, y, plan.copy_ops(numero, total))
+
+    def _text_op_x(self, op: TextOp) -> float:
+        """Borda esquerda do texto (textos alinhados à direita guardam a borda direita)"""
+        if op.alinhamento == 'direita':
+            return op.x - self.text_layout.string_width(op.texto, op.fonte, op.tamanho)
+        return op.x
+
+    def _label_text_codes(self, c: canvas.Canvas, etiquetas: List[LabelRecord], plan: RenderPlan) -> List[str]:
+        """
+        Trechos de texto de um lote de etiquetas, reaproveitando o cache de renderização
+
+        A chave inclui a impressão digital do template, o tamanho da etiqueta
+        e os nomes internos das fontes no documento, que aparecem no próprio trecho.
+
+        Returns:
+            List[str]: Um trecho por etiqueta, na mesma ordem
+        """
+        if self.render_cache is None:
+            return [self._label_text_code(c, etiqueta, plan) for etiqueta in etiquetas]
+
+        # Registra as fontes no documento mesmo que todas as etiquetas venham do cache
+        fontes = tuple(c._doc.getInternalFontName(nome) for nome in plan.fonts)
+        geometria = (round(plan.label_width, 3), round(plan.label_height, 3))
+        chaves = [RenderCache.make_key('pdf', LABEL_TEMPLATE_VERSION, plan.fingerprint, geometria, fontes,
+                                       tuple(etiqueta))
+                  for etiqueta in etiquetas]
+        encontrados = self.render_cache.get_many(chaves)
+
+        codes = []
+        novos = {}
+        for chave, etiqueta in zip(chaves, etiquetas):
+            dados = encontrados.get(chave)
+            if dados is not None:
+                codes.append(dados.decode('latin-1'))
+                continue
+            code = self._label_text_code(c, etiqueta, plan)
+            novos[chave] = code.encode('latin-1')
+            codes.append(code)
+        self.render_cache.put_many(novos)
+        return codes
+
+    def _label_text_code(self, c: canvas.Canvas, etiqueta: LabelRecord, plan: RenderPlan) -> str:
+        """
+        Monta os textos de uma etiqueta como trecho de operadores PDF na origem (0, 0)
+
+        O trecho não depende da posição na página, então pode ser guardado
+        no cache e reaplicado com translate em qualquer etiqueta.
+
+        Returns:
+            str: Operadores BT ... ET com os textos do plano (todos exceto a data)
+        """
+        t = c.beginText()
+        t.setFillColor(black)
+        fonte_atual = None
+        for op in plan.text_ops(etiqueta):
+            if (op.fonte, op.tamanho) != fonte_atual:
+                t.setFont(op.fonte, op.tamanho)
+                fonte_atual = (op.fonte, op.tamanho)
+            t.setTextOrigin(self._text_op_x(op), op.y)
+            t.textOut(op.texto)
+        return t.getCode()
+
+    def generate_simple_list_pdf(self, registros: Iterable[Tuple], output_path: Union[str, BinaryIO]) -> bool:
         """
         Gera PDF com lista simples dos registros (sem etiquetas)
         
+        Os registros são consumidos sob demanda e as páginas gravadas à
+        medida que enchem (ReportService), com subtotais a cada troca de OP.
+        
         Args:
-            registros (List[Tuple]): Lista de registros
-            output_path (str): Caminho para salvar o PDF
+            registros (Iterable[Tuple]): Registros (lista, gerador ou cursor do banco)
+            output_path (str | BinaryIO): Caminho do PDF ou stream binário
             
         Returns:
-            bool: True se gerado com sucesso, False caso contrário
+            bool: True se gerado com sucesso
+
+        Raises:
+            PDFGenerationError: Falha ao desenhar ou salvar o PDF
         """
-        try:
-            c = canvas.Canvas(output_path, pagesize=A4)
-            
-            # Configurações
-            margin = 20 * mm
-            line_height = 15
-            font_size = 10
-            
-            # Cabeçalho
-            c.setFont("Helvetica-Bold", 14)
-            c.drawString(margin, self.page_height - margin, "Relatório de Registros")
-            
-            c.setFont("Helvetica", 8)
-            data_geracao = datetime.now().strftime("%d/%m/%Y às %H:%M")
-            c.drawString(margin, self.page_height - margin - 20, f"Gerado em: {data_geracao}")
-            
-            # Cabeçalho da tabela
-            y_position = self.page_height - margin - 50
-            c.setFont("Helvetica-Bold", font_size)
-            
-            headers = ["ID", "OP", "Unidade", "Arquivo", "Qtde"]
-            col_widths = [30, 80, 120, 200, 50]
-            x_positions = [margin]
-            
-            for width in col_widths[:-1]:
-                x_positions.append(x_positions[-1] + width)
-            
-            # Desenha cabeçalhos
-            for i, header in enumerate(headers):
-                c.drawString(x_positions[i], y_position, header)
-            
-            y_position -= 20
-            
-            # Linha de separação
-            c.line(margin, y_position, margin + sum(col_widths), y_position)
-            y_position -= 10
-            
-            # Dados
-            c.setFont("Helvetica", font_size - 1)
-            
-            for registro in registros:
-                if y_position < margin + 30:  # Nova página se necessário
-                    c.showPage()
-                    y_position = self.page_height - margin
-                
-                # registro = (id, op, unidade, arquivos, qtde)
-                row_data = [
-                    str(registro[0]),  # ID
-                    str(registro[1]),  # OP
-                    str(registro[2])[:15] + "..." if len(str(registro[2])) > 15 else str(registro[2]),  # Unidade
-                    str(registro[3])[:25] + "..." if len(str(registro[3])) > 25 else str(registro[3]),  # Arquivo
-                    str(registro[4])   # Qtde
-                ]
-                
-                for i, data in enumerate(row_data):
-                    c.drawString(x_positions[i], y_position, data)
-                
-                y_position -= line_height
-            
-            # Total de registros
-            y_position -= 20
-            c.setFont("Helvetica-Bold", font_size)
-            c.drawString(margin, y_position, f"Total de registros: {len(registros)}")
-            
-            c.save()
-            return True
+        self.report_service.generate_list_report(registros, output_path)
+        return True
+    
+    def render_simple_list_pdf(self, registros: Iterable[Tuple]) -> bytes:
+        """
+        Gera a lista simples dos registros em memória e retorna os bytes do PDF
+        
+        Args:
+            registros (Iterable[Tuple]): Registros
             
-        except Exception as e:
-            print(f"Erro ao gerar PDF da lista: {e}")
-            return False
+        Returns:
+            bytes: Conteúdo do PDF
+
+        Raises:
+            PDFGenerationError: Falha ao desenhar o PDF
+        """
+        buffer = io.BytesIO()
+        self.generate_simple_list_pdf(registros, buffer)
+        return buffer.getvalue()
     
     def get_label_dimensions_info(self) -> dict:
         """
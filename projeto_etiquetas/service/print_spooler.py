@@ -0,0 +1,472 @@
+"""
+Spooler de impressão direta em impressoras de rede (TCP 9100, "raw").
+
+Os jobs (ZPL ou PDF já renderizados) ficam em uma fila persistente em
+SQLite local, então sobrevivem a uma queda do programa. Um despachante
+distribui os jobs entre as impressoras com menos bytes em andamento,
+respeitando o limite de conexões simultâneas de cada uma; jobs ZPL
+pequenos são agrupados em uma única conexão. Falhas de rede são
+repetidas com espera crescente e, quando o job termina, os registros
+correspondentes passam para o status "Impresso". O conteúdo de um job
+enviado é descartado na hora (só o histórico fica, até purge_finished).
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+# Configurar logging
+logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Porta padrão de impressão "raw" (JetDirect)
+RAW_PORT = 9100
+
+# Histórico de jobs finalizados mantido por padrão em purge_finished (7 dias)
+FINISHED_RETENTION = 7 * 24 * 3600
+
+# Estados de um job na fila
+STATUS_PENDENTE = 'pendente'
+STATUS_ENVIANDO = 'enviando'
+STATUS_CONCLUIDO = 'concluido'
+STATUS_FALHA = 'falha'
+
+
+class Printer(NamedTuple):
+    """Impressora de rede que recebe dados pela porta raw"""
+    name: str
+    host: str
+    port: int = RAW_PORT
+    max_concurrency: int = 1
+
+
+class SpoolJob(NamedTuple):
+    """Job da fila (sem o conteúdo, carregado só no envio)"""
+    id: int
+    formato: str
+    printer: Optional[str]
+    registro_ids: List[int]
+    tentativas: int
+    tamanho: int
+
+
+def parse_printers(spec: str) -> List[Printer]:
+    """
+    Lê a lista de impressoras no formato "nome=host:porta/conexões,..."
+
+    Porta e conexões são opcionais (9100 e 1). Exemplos:
+    "zebra1=10.0.0.5,zebra2=10.0.0.6:9100/2" ou apenas "10.0.0.5,10.0.0.6".
+
+    Raises:
+        ValueError: Especificação inválida
+    """
+    printers = []
+    for item in (p.strip() for p in spec.split(',') if p.strip()):
+        name, _, endereco = item.rpartition('=')
+        endereco, _, conexoes = endereco.partition('/')
+        host, _, porta = endereco.partition(':')
+        if not host:
+            raise ValueError(f"Impressora sem endereço: '{item}'")
+        printers.append(Printer(
+            name=name or host,
+            host=host,
+            port=int(porta) if porta else RAW_PORT,
+            max_concurrency=max(1, int(conexoes)) if conexoes else 1
+        ))
+    if not printers:
+        raise ValueError("Nenhuma impressora informada")
+    return printers
+
+
+class PrintSpooler:
+    def __init__(self, printers: Iterable[Printer], db_path: str,
+                 on_printed: Optional[Callable[[List[int]], bool]] = None,
+                 max_retries: int = 3, retry_delay: float = 2.0,
+                 batch_max_bytes: int = 256 * 1024, timeout: float = 30.0,
+                 poll_interval: float = 0.5):
+        """
+        Inicializa o spooler
+
+        Args:
+            printers (Iterable[Printer]): Impressoras disponíveis
+            db_path (str): Arquivo SQLite da fila de jobs
+            on_printed (Callable): Chamado com os ids dos registros de cada job concluído
+                                   (ex.: marcar como "Impresso" no banco)
+            max_retries (int): Tentativas por job antes de marcar como falha
+            retry_delay (float): Espera base entre tentativas (dobra a cada falha), em segundos
+            batch_max_bytes (int): Tamanho máximo de um lote de jobs ZPL enviados juntos
+            timeout (float): Timeout de conexão e envio por impressora, em segundos
+            poll_interval (float): Intervalo de verificação da fila quando ociosa
+        """
+        self.printers: Dict[str, Printer] = {p.name: p for p in printers}
+        if not self.printers:
+            raise ValueError("Nenhuma impressora configurada")
+
+        self.db_path = db_path
+        self.on_printed = on_printed
+        self.max_retries = max(1, max_retries)
+        self.retry_delay = retry_delay
+        self.batch_max_bytes = batch_max_bytes
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+
+        # Carga atual de cada impressora (conexões e bytes em andamento)
+        self._active: Dict[str, int] = {name: 0 for name in self.printers}
+        self._inflight_bytes: Dict[str, int] = {name: 0 for name in self.printers}
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._dispatcher: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        self._init_queue()
+
+    # ------------------------------------------------------------------
+    # Fila persistente
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        """Abre uma conexão com a fila (uma por operação, como em Database)"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _init_queue(self):
+        """Cria a tabela da fila e devolve à fila jobs interrompidos no meio do envio"""
+        db_dir = os.path.dirname(os.path.abspath(self.db_path))
+        os.makedirs(db_dir, exist_ok=True)
+
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS print_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    formato TEXT NOT NULL,
+                    printer TEXT,
+                    payload BLOB NOT NULL,
+                    tamanho INTEGER NOT NULL,
+                    registro_ids TEXT NOT NULL DEFAULT '[]',
+                    status TEXT NOT NULL DEFAULT 'pendente',
+                    tentativas INTEGER NOT NULL DEFAULT 0,
+                    proximo_envio REAL NOT NULL DEFAULT 0,
+                    impressora_usada TEXT,
+                    erro TEXT,
+                    criado_em REAL NOT NULL,
+                    atualizado_em REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_print_jobs_status ON print_jobs (status, id)')
+            # Jobs que estavam sendo enviados quando o programa caiu voltam para a fila
+            conn.execute('UPDATE print_jobs SET status = ? WHERE status = ?', (STATUS_PENDENTE, STATUS_ENVIANDO))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def submit(self, payload: bytes, formato: str = 'zpl', registro_ids: Optional[List[int]] = None,
+               printer: Optional[str] = None) -> int:
+        """
+        Coloca um job na fila
+
+        Args:
+            payload (bytes): Conteúdo enviado à impressora (ZPL ou PDF)
+            formato (str): 'zpl' ou 'pdf' (só ZPL é agrupado com outros jobs)
+            registro_ids (List[int]): Registros marcados como impressos quando o job terminar
+            printer (str): Força uma impressora específica (padrão: a menos carregada)
+
+        Returns:
+            int: Id do job
+        """
+        if printer is not None and printer not in self.printers:
+            raise ValueError(f"Impressora desconhecida: {printer}")
+
+        agora = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.execute('''
+                INSERT INTO print_jobs (formato, printer, payload, tamanho, registro_ids, criado_em, atualizado_em)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (formato, printer, sqlite3.Binary(payload), len(payload),
+                  json.dumps(list(registro_ids or [])), agora, agora))
+            conn.commit()
+            job_id = cursor.lastrowid
+        finally:
+            conn.close()
+
+        self._wake.set()
+        return job_id
+
+    def submit_file(self, file_path: str, registro_ids: Optional[List[int]] = None,
+                    printer: Optional[str] = None) -> int:
+        """
+        Coloca um arquivo .zpl ou .pdf na fila (formato pela extensão)
+
+        Returns:
+            int: Id do job
+        """
+        formato = 'zpl' if file_path.lower().endswith('.zpl') else 'pdf'
+        with open(file_path, 'rb') as f:
+            return self.submit(f.read(), formato=formato, registro_ids=registro_ids, printer=printer)
+
+    def _pending_jobs(self, limit: int = 200) -> List[SpoolJob]:
+        """Jobs pendentes prontos para envio, na ordem de chegada"""
+        conn = self._connect()
+        try:
+            rows = conn.execute('''
+                SELECT id, formato, printer, registro_ids, tentativas, tamanho
+                FROM print_jobs
+                WHERE status = ? AND proximo_envio <= ?
+                ORDER BY id
+                LIMIT ?
+            ''', (STATUS_PENDENTE, time.time(), limit)).fetchall()
+        finally:
+            conn.close()
+        return [SpoolJob(r[0], r[1], r[2], json.loads(r[3]), r[4], r[5]) for r in rows]
+
+    def _load_payloads(self, jobs: List[SpoolJob]) -> bytes:
+        """Carrega e concatena o conteúdo de um lote de jobs, na ordem"""
+        conn = self._connect()
+        try:
+            partes = []
+            for job in jobs:
+                row = conn.execute('SELECT payload FROM print_jobs WHERE id = ?', (job.id,)).fetchone()
+                partes.append(bytes(row[0]))
+        finally:
+            conn.close()
+        return b''.join(partes)
+
+    def _set_status(self, jobs: List[SpoolJob], status: str, printer: Optional[str] = None,
+                    erro: Optional[str] = None, incrementar: bool = False, proximo_envio: float = 0,
+                    descartar_payload: bool = False):
+        """Atualiza o estado de um lote de jobs (descartar_payload: apaga o conteúdo já enviado)"""
+        ids = [job.id for job in jobs]
+        placeholders = ','.join(['?'] * len(ids))
+        conn = self._connect()
+        try:
+            conn.execute(f'''
+                UPDATE print_jobs
+                SET status = ?, impressora_usada = COALESCE(?, impressora_usada), erro = ?,
+                    tentativas = tentativas + ?, proximo_envio = ?, atualizado_em = ?,
+                    payload = CASE WHEN ? THEN X'' ELSE payload END
+                WHERE id IN ({placeholders})
+            ''', [status, printer, erro, 1 if incrementar else 0, proximo_envio, time.time(),
+                  1 if descartar_payload else 0] + ids)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def purge_finished(self, older_than: Optional[float] = FINISHED_RETENTION) -> int:
+        """
+        Apaga da fila os jobs concluídos ou com falha
+
+        Args:
+            older_than (float): Só os finalizados há mais de N segundos (None: todos)
+
+        Returns:
+            int: Jobs removidos
+        """
+        limite = time.time() - older_than if older_than is not None else None
+        conn = self._connect()
+        try:
+            cursor = conn.execute('''
+                DELETE FROM print_jobs
+                WHERE status IN (?, ?) AND (? IS NULL OR atualizado_em <= ?)
+            ''', (STATUS_CONCLUIDO, STATUS_FALHA, limite, limite))
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def queue_summary(self) -> Dict[str, int]:
+        """
+        Quantidade de jobs em cada estado
+
+        Returns:
+            dict: {'pendente': n, 'enviando': n, 'concluido': n, 'falha': n}
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT status, COUNT(*) FROM print_jobs GROUP BY status').fetchall()
+        finally:
+            conn.close()
+        resumo = {STATUS_PENDENTE: 0, STATUS_ENVIANDO: 0, STATUS_CONCLUIDO: 0, STATUS_FALHA: 0}
+        resumo.update(dict(rows))
+        return resumo
+
+    # ------------------------------------------------------------------
+    # Despacho
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Inicia o despachante em segundo plano"""
+        if self._dispatcher is not None:
+            return
+        self._stop_event.clear()
+        # Uma thread por conexão simultânea permitida no total
+        max_workers = sum(p.max_concurrency for p in self.printers.values())
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='spool')
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name='spool-dispatcher', daemon=True)
+        self._dispatcher.start()
+        logger.info(f"Spooler iniciado com {len(self.printers)} impressora(s)")
+
+    def stop(self, wait: bool = True):
+        """Para o despachante; envios em andamento terminam antes de retornar se wait=True"""
+        self._stop_event.set()
+        self._wake.set()
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+            self._dispatcher = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Aguarda até não haver jobs pendentes nem em envio
+
+        Returns:
+            bool: True se a fila esvaziou dentro do timeout
+        """
+        limite = None if timeout is None else time.time() + timeout
+        while True:
+            resumo = self.queue_summary()
+            with self._lock:
+                ativos = sum(self._active.values())
+            if resumo[STATUS_PENDENTE] == 0 and resumo[STATUS_ENVIANDO] == 0 and ativos == 0:
+                return True
+            if limite is not None and time.time() >= limite:
+                return False
+            time.sleep(min(self.poll_interval, 0.1))
+
+    def _dispatch_loop(self):
+        """Distribui os jobs da fila até stop() ser chamado"""
+        while not self._stop_event.is_set():
+            try:
+                enviados = self._dispatch_once()
+            except Exception as e:
+                logger.error(f"Erro no despacho da fila de impressão: {e}")
+                enviados = 0
+            if not enviados:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _free_printers(self) -> List[Printer]:
+        """Impressoras com conexão livre (chamar com _lock)"""
+        return [p for p in self.printers.values() if self._active[p.name] < p.max_concurrency]
+
+    def _dispatch_once(self) -> int:
+        """
+        Envia os jobs prontos para as impressoras livres menos carregadas
+
+        Returns:
+            int: Lotes despachados nesta rodada
+        """
+        with self._lock:
+            if not self._free_printers():
+                return 0
+
+        jobs = self._pending_jobs()
+        despachados = 0
+        usados = set()
+
+        for i, job in enumerate(jobs):
+            if job.id in usados:
+                continue
+
+            with self._lock:
+                candidatas = [p for p in self._free_printers() if job.printer in (None, p.name)]
+                if not candidatas:
+                    if not self._free_printers():
+                        break
+                    continue
+                # Menos bytes em andamento; empate pelo menor número de conexões
+                printer = min(candidatas, key=lambda p: (self._inflight_bytes[p.name], self._active[p.name]))
+
+                lote = self._build_batch(job, jobs[i + 1:], printer, usados)
+                tamanho = sum(j.tamanho for j in lote)
+                self._active[printer.name] += 1
+                self._inflight_bytes[printer.name] += tamanho
+
+            usados.update(j.id for j in lote)
+            self._set_status(lote, STATUS_ENVIANDO, printer=printer.name)
+            self._executor.submit(self._send_batch, printer, lote, tamanho)
+            despachados += 1
+
+        return despachados
+
+    def _build_batch(self, job: SpoolJob, seguintes: List[SpoolJob], printer: Printer, usados: set) -> List[SpoolJob]:
+        """Agrupa jobs ZPL pequenos seguintes ao job em uma única conexão"""
+        lote = [job]
+        if job.formato != 'zpl':
+            return lote
+        tamanho = job.tamanho
+        for outro in seguintes:
+            if outro.id in usados or outro.formato != 'zpl' or outro.printer not in (None, printer.name):
+                continue
+            if tamanho + outro.tamanho > self.batch_max_bytes:
+                break
+            lote.append(outro)
+            tamanho += outro.tamanho
+        return lote
+
+    def _send(self, printer: Printer, data: bytes):
+        """Envia os bytes pela porta raw e encerra a conexão de forma ordenada"""
+        with socket.create_connection((printer.host, printer.port), timeout=self.timeout) as sock:
+            sock.sendall(data)
+            sock.shutdown(socket.SHUT_WR)
+            # Dá um instante para a impressora consumir e fechar do lado dela
+            # (nem todas fecham; não espera o timeout inteiro)
+            sock.settimeout(min(self.timeout, 1.0))
+            try:
+                while sock.recv(4096):
+                    pass
+            except socket.timeout:
+                # Impressora ainda com a conexão aberta: os dados já foram entregues
+                pass
+
+    def _send_batch(self, printer: Printer, lote: List[SpoolJob], tamanho: int):
+        """Envia um lote a uma impressora e registra o resultado"""
+        try:
+            self._send(printer, self._load_payloads(lote))
+        except Exception as e:
+            self._handle_failure(printer, lote, e)
+        else:
+            # Enviado: o conteúdo não é mais necessário (a fila não cresce a cada impressão)
+            self._set_status(lote, STATUS_CONCLUIDO, printer=printer.name, descartar_payload=True)
+            logger.info(f"{len(lote)} job(s) enviados para {printer.name} ({tamanho} bytes)")
+            self._notify_printed(lote)
+        finally:
+            with self._lock:
+                self._active[printer.name] -= 1
+                self._inflight_bytes[printer.name] -= tamanho
+            self._wake.set()
+
+    def _handle_failure(self, printer: Printer, lote: List[SpoolJob], erro: Exception):
+        """Reagenda os jobs com espera crescente ou marca como falha após max_retries"""
+        logger.warning(f"Falha ao enviar {len(lote)} job(s) para {printer.name}: {erro}")
+        for job in lote:
+            tentativas = job.tentativas + 1
+            if tentativas >= self.max_retries:
+                self._set_status([job], STATUS_FALHA, printer=printer.name, erro=str(erro), incrementar=True)
+            else:
+                espera = self.retry_delay * (2 ** (tentativas - 1))
+                self._set_status([job], STATUS_PENDENTE, printer=printer.name, erro=str(erro),
+                                 incrementar=True, proximo_envio=time.time() + espera)
+
+    def _notify_printed(self, lote: List[SpoolJob]):
+        """Repassa os registros impressos para quem acompanha o status (ex.: banco)"""
+        if self.on_printed is None:
+            return
+        ids = [registro_id for job in lote for registro_id in job.registro_ids]
+        if not ids:
+            return
+        try:
+            if not self.on_printed(ids):
+                logger.warning(f"Job impresso, mas o status de {len(ids)} registros não foi atualizado")
+        except Exception as e:
+            logger.error(f"Erro ao atualizar status dos registros impressos: {e}")
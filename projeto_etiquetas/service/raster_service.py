@@ -0,0 +1,518 @@
+"""
+Geração de etiquetas em imagem (raster) na resolução da impressora.
+
+Mesmo layout do PDF e do ZPL, desenhado com Pillow em 1-bit (impressoras
+térmicas) ou em tons de cinza (pré-visualização). As partes fixas
+(borda, separador e logo já pontilhada) são desenhadas uma vez em um
+template que cada etiqueta copia, e cada trecho de texto é rasterizado
+uma única vez e reaproveitado (OP, unidade e nome se repetem muito).
+"""
+import io
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from reportlab.lib.units import mm
+
+from service.exceptions import EtiquetaError, NoRecordsError, RasterGenerationError
+from service.label_record import LabelRecord, iter_label_records
+from service.text_layout import TextLayout
+from service.asset_pipeline import AssetPipeline
+from service.render_cache import RenderCache
+from service.label_template import HLineOp, LabelTemplate, LogoOp, RectOp, TextOp, compile_template, load_template
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Modos de imagem suportados: '1' (1-bit, térmicas) e 'L' (tons de cinza)
+SUPPORTED_MODES = ('1', 'L')
+
+# Fontes TrueType distribuídas com o ReportLab (sempre presentes junto com ele)
+_RL_FONTS_DIR = None
+try:
+    import reportlab
+    _RL_FONTS_DIR = os.path.join(os.path.dirname(reportlab.__file__), 'fonts')
+except ImportError:
+    pass
+
+_FONT_FILES = {
+    False: ('LiberationSans-Regular.ttf', 'Arial.ttf', 'Vera.ttf'),
+    True: ('LiberationSans-Bold.ttf', 'Arial Bold.ttf', 'VeraBd.ttf'),
+}
+
+# Versão do layout da etiqueta: mudar invalida as imagens guardadas no cache de renderização
+LABEL_TEMPLATE_VERSION = 1
+
+# Etiquetas consultadas/gravadas no cache de renderização por vez
+_RENDER_CACHE_BATCH = 256
+
+# Serviço de cada processo do pool de renderização
+_worker_service = None
+
+
+def _init_raster_worker(dpi: int, label_size_mm: Tuple[float, float], mode: str,
+                        render_cache_config: Optional[Tuple[str, int]], template: LabelTemplate):
+    """Inicializa o RasterService do processo do pool"""
+    global _worker_service
+    render_cache = RenderCache(*render_cache_config) if render_cache_config else None
+    _worker_service = RasterService(dpi=dpi, label_size_mm=label_size_mm, mode=mode, render_cache=render_cache,
+                                    template=template)
+
+
+def _render_raster_shard(etiquetas: List[LabelRecord], data_geracao: str,
+                         png_paths: Optional[List[str]]) -> List[bytes]:
+    """
+    Renderiza um lote em um processo do pool (precisa ser função de módulo)
+
+    Com png_paths, grava cada etiqueta no próprio worker e não devolve pixels.
+
+    Returns:
+        List[bytes]: Pixels de cada etiqueta (Image.tobytes) quando png_paths é None
+    """
+    resultado = []
+    for i, body in enumerate(_worker_service._render_bodies(etiquetas)):
+        image = _worker_service._stamp_date(body, data_geracao)
+        if png_paths is not None:
+            image.save(png_paths[i], optimize=False, dpi=(_worker_service.dpi, _worker_service.dpi))
+        else:
+            resultado.append(image.tobytes())
+    return resultado
+
+
+def _find_font(bold: bool, size: int):
+    """Carrega a fonte TrueType disponível mais próxima da Helvetica"""
+    for nome in _FONT_FILES[bold]:
+        candidatos = [nome]
+        if _RL_FONTS_DIR:
+            candidatos.append(os.path.join(_RL_FONTS_DIR, nome))
+        for caminho in candidatos:
+            try:
+                return ImageFont.truetype(caminho, size)
+            except OSError:
+                continue
+    return ImageFont.load_default()
+
+
+class RasterService:
+    def __init__(self, dpi: int = 203, label_size_mm: Tuple[float, float] = (100, 50),
+                 mode: str = '1', text_cache_size: int = 8192,
+                 render_cache: Optional[RenderCache] = None, template: Optional[LabelTemplate] = None):
+        """
+        Inicializa o serviço de etiquetas em imagem
+
+        Args:
+            dpi (int): Resolução de saída (203 ou 300 nas Zebra)
+            label_size_mm (Tuple[float, float]): Tamanho da etiqueta em mm
+            mode (str): '1' (1-bit) ou 'L' (tons de cinza)
+            text_cache_size (int): Trechos de texto rasterizados mantidos em cache
+            render_cache (RenderCache): Cache das etiquetas já desenhadas (opcional)
+            template (LabelTemplate): Layout da etiqueta (padrão: assets/templates/etiqueta_padrao.json)
+
+        Raises:
+            RasterGenerationError: Pillow não instalado
+            ValueError: Modo de imagem não suportado
+            TemplateError: Template padrão ausente ou inválido
+        """
+        if not PIL_AVAILABLE:
+            raise RasterGenerationError("Geração de imagens requer o pacote 'Pillow'. Instale com: pip install Pillow")
+        if mode not in SUPPORTED_MODES:
+            raise ValueError(f"Modo de imagem não suportado: {mode} (use '1' ou 'L')")
+
+        self.dpi = dpi
+        self.mode = mode
+        self.label_size_mm = label_size_mm
+        # Dimensões em pontos tipográficos, as mesmas usadas no PDF
+        self.label_width = label_size_mm[0] * mm
+        self.label_height = label_size_mm[1] * mm
+        self.size = (self._px(self.label_width), self._px(self.label_height))
+
+        # Mesma medição de texto do PDF, para quebrar as linhas nos mesmos lugares
+        self.text_layout = TextLayout()
+        # Tamanho fixo por serviço: o template é compilado uma vez
+        self.template = template or load_template()
+        self.plan = compile_template(self.template, self.label_width, self.label_height, self.text_layout)
+
+        self._fonts = {}
+        self._template = None
+        # Logo reduzida e pontilhada uma vez (cache em disco entre execuções)
+        self.asset_pipeline = AssetPipeline()
+        self.render_cache = render_cache
+        # Máscara da data já no limiar 1-bit: ((texto, fonte, tamanho), máscara)
+        self._date_mask = (None, None)
+        self._text_mask = lru_cache(maxsize=text_cache_size)(self._render_text_mask)
+
+        # Pool de processos (criado sob demanda e reaproveitado)
+        self._pool = None
+        self._pool_workers = 0
+
+    def _px(self, points: float) -> int:
+        """Converte pontos tipográficos (1/72") em pixels na resolução da impressora"""
+        return int(round(points * self.dpi / 72.0))
+
+    def _font(self, bold: bool, size_pt: float):
+        """Fonte no tamanho em pixels equivalente ao tamanho em pontos"""
+        key = (bold, size_pt)
+        font = self._fonts.get(key)
+        if font is None:
+            font = self._fonts.setdefault(key, _find_font(bold, max(1, self._px(size_pt))))
+        return font
+
+    def _render_text_mask(self, text: str, bold: bool, size_pt: float):
+        """
+        Rasteriza um trecho de texto uma vez (use _text_mask, que tem cache)
+
+        Returns:
+            Tuple: (máscara L, deslocamento x, deslocamento y em relação à linha de base)
+        """
+        font = self._font(bold, size_pt)
+        left, top, right, bottom = font.getbbox(text, anchor='ls')
+        mask = Image.new('L', (max(1, right - left), max(1, bottom - top)), 0)
+        ImageDraw.Draw(mask).text((-left, -top), text, fill=255, font=font, anchor='ls')
+        return mask, left, top
+
+    def _draw_text(self, image, x_pt: float, baseline_pt: float, text: str, bold: bool, size_pt: float):
+        """Desenha texto com a linha de base em (x, y) nas coordenadas do PDF (origem embaixo)"""
+        if not text:
+            return
+        mask, left, top = self._text_mask(text, bold, size_pt)
+        x = self._px(x_pt) + left
+        y = self._px(self.label_height - baseline_pt) + top
+        image.paste(0, (x, y, x + mask.width, y + mask.height), mask)
+
+    def _load_logo(self, width_pt: float, height_pt: float):
+        """
+        Logo reduzida para a caixa (proporção mantida), já pontilhada no modo 1-bit
+
+        Returns:
+            Image | None: Imagem L da logo ou None se não houver logo raster
+        """
+        assets_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'assets')
+        for nome in ('cdg_logo.jpg', 'cdg_logo.png'):
+            img_path = os.path.join(assets_dir, nome)
+            if not os.path.exists(img_path):
+                continue
+            try:
+                # Pontilhada uma vez no pipeline; o limiar final preserva os pontos (0/255)
+                prepared = self.asset_pipeline.prepare(img_path, width_pt, height_pt, self.dpi, self.mode)
+                with Image.open(prepared.path) as img:
+                    return img.convert('L')
+            except Exception as e:
+                print(f"Erro ao carregar logo para imagem: {e}")
+        return None
+
+    def _label_template(self):
+        """
+        Partes fixas da etiqueta (borda, logo e separador), desenhadas uma vez
+        """
+        if self._template is not None:
+            return self._template
+
+        template = Image.new('L', self.size, 255)
+        draw = ImageDraw.Draw(template)
+
+        for op in self.plan.static_ops:
+            if isinstance(op, RectOp):
+                # --- Borda da etiqueta ---
+                x1, y1 = self._px(op.x), self._px(self.label_height - op.y - op.altura)
+                x2, y2 = self._px(op.x + op.largura) - 1, self._px(self.label_height - op.y) - 1
+                draw.rectangle((x1, y1, x2, y2), outline=0, width=max(1, self._px(op.espessura)))
+            elif isinstance(op, LogoOp):
+                # --- Logo ---
+                box_x = self._px(op.x)
+                box_y = self._px(self.label_height - op.y - op.altura)
+                box_w, box_h = self._px(op.largura), self._px(op.altura)
+                logo = self._load_logo(op.largura, op.altura)
+                if logo is not None:
+                    template.paste(logo, (box_x + (box_w - logo.width) // 2, box_y + (box_h - logo.height) // 2))
+                else:
+                    # Fallback: caixa preenchida com "CDG" em branco
+                    draw.rectangle((box_x, box_y, box_x + box_w, box_y + box_h), fill=0)
+                    font = self._font(True, 10)
+                    draw.text((box_x + box_w // 2, box_y + box_h // 2), "CDG", fill=255, font=font, anchor='mm')
+            elif isinstance(op, HLineOp):
+                # --- Linha separadora antes do rodapé ---
+                sep_y = self._px(self.label_height - op.y)
+                cinza = 0 if self.mode == '1' else int(round(op.cinza * 255))
+                draw.line((self._px(op.x1), sep_y, self._px(op.x2), sep_y), fill=cinza,
+                          width=max(1, self._px(op.espessura)))
+
+        self._template = template
+        return self._template
+
+    def render_label(self, etiqueta: LabelRecord, data_geracao: Optional[str] = None):
+        """
+        Desenha uma etiqueta
+
+        Segue as mesmas posições, tamanhos e quebras de linha do PDF.
+
+        Args:
+            etiqueta (LabelRecord): Dados da etiqueta
+            data_geracao (str): Data/hora exibida no rodapé (padrão: agora)
+
+        Returns:
+            Image: Imagem no modo configurado ('1' ou 'L')
+        """
+        data_geracao = data_geracao or datetime.now().strftime("%d/%m/%Y %H:%M")
+        return self._stamp_date(self._render_body(etiqueta), data_geracao)
+
+    def _render_body(self, etiqueta: LabelRecord):
+        """
+        Desenha a etiqueta sem a data (a parte que pode ir para o cache de renderização)
+
+        Returns:
+            Image: Imagem no modo configurado ('1' ou 'L')
+        """
+        image = self._label_template().copy()
+
+        for op in self.plan.text_ops(etiqueta):
+            self._draw_text(image, self._text_op_x(op), op.y, op.texto, 'Bold' in op.fonte, op.tamanho)
+
+        if self.mode == '1':
+            # Limiar fixo: texto nítido e pontilhado da logo preservado
+            return image.convert('1', dither=Image.Dither.NONE)
+        return image
+
+    def _text_op_x(self, op: TextOp) -> float:
+        """Borda esquerda do texto, medida com a fonte raster (alinhado à direita guarda a borda direita)"""
+        if op.alinhamento == 'direita':
+            return op.x - self._font('Bold' in op.fonte, op.tamanho).getlength(op.texto) * 72.0 / self.dpi
+        return op.x
+
+    def _stamp_date(self, image, data_geracao: str):
+        """
+        Desenha a data do job nas posições do template (altera e devolve a própria imagem)
+
+        No modo 1-bit a máscara passa pelo mesmo limiar do resto da etiqueta,
+        então o resultado é igual ao de desenhar a data antes do limiar.
+        """
+        for op in self.plan.job_ops(data_geracao):
+            bold = 'Bold' in op.fonte
+            mask, left, top = self._text_mask(op.texto, bold, op.tamanho)
+            if self.mode == '1':
+                # Lido de uma vez: outra thread pode trocar a data entre as duas leituras
+                chave, mask_1bit = self._date_mask
+                if chave != (op.texto, bold, op.tamanho):
+                    # Preto quando o fundo branco cairia abaixo de 128 (cobertura >= 128)
+                    mask_1bit = mask.point(lambda v: 255 if v >= 128 else 0).convert('1')
+                    self._date_mask = ((op.texto, bold, op.tamanho), mask_1bit)
+                mask = mask_1bit
+            x = self._px(self._text_op_x(op)) + left
+            y = self._px(self.label_height - op.y) + top
+            image.paste(0, (x, y, x + mask.width, y + mask.height), mask)
+        return image
+
+    def _render_bodies(self, etiquetas: List[LabelRecord]) -> List:
+        """
+        Corpo (sem data) de um lote de etiquetas, reaproveitando o cache de renderização
+
+        As imagens vão para o cache como pixels comprimidos; a chave inclui
+        impressão digital do template, dpi, modo e tamanho.
+
+        Returns:
+            List[Image]: Uma imagem por etiqueta, na mesma ordem
+        """
+        if self.render_cache is None:
+            return [self._render_body(etiqueta) for etiqueta in etiquetas]
+
+        chaves = [RenderCache.make_key('raster', LABEL_TEMPLATE_VERSION, self.plan.fingerprint, self.dpi,
+                                       self.mode, self.size, tuple(etiqueta))
+                  for etiqueta in etiquetas]
+        encontrados = self.render_cache.get_many(chaves)
+
+        bodies = []
+        novos = {}
+        for chave, etiqueta in zip(chaves, etiquetas):
+            dados = encontrados.get(chave)
+            if dados is not None:
+                bodies.append(Image.frombytes(self.mode, self.size, zlib.decompress(dados)))
+                continue
+            body = self._render_body(etiqueta)
+            novos[chave] = zlib.compress(body.tobytes(), 1)
+            bodies.append(body)
+        self.render_cache.put_many(novos)
+        return bodies
+
+    def iter_images(self, registros: Iterable[Tuple]) -> Iterator:
+        """
+        Percorre as imagens das etiquetas sob demanda (uma data por job)
+
+        Yields:
+            Image: Uma imagem por registro
+        """
+        data_geracao = datetime.now().strftime("%d/%m/%Y %H:%M")
+        etiquetas = iter_label_records(registros)
+        # Em lotes, para consultar o cache de renderização de uma vez por lote
+        for lote in iter(lambda: list(islice(etiquetas, _RENDER_CACHE_BATCH)), []):
+            for body in self._render_bodies(lote):
+                yield self._stamp_date(body, data_geracao)
+
+    def _get_pool(self, workers: int) -> ProcessPoolExecutor:
+        """Pool de renderização mantido entre chamadas (template e fontes já carregados)"""
+        if self._pool is None or self._pool_workers != workers:
+            self.close()
+            cache_config = None
+            if self.render_cache is not None:
+                cache_config = (self.render_cache.db_path, self.render_cache.max_bytes)
+            self._pool = ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_raster_worker,
+                initargs=(self.dpi, self.label_size_mm, self.mode, cache_config, self.template)
+            )
+            self._pool_workers = workers
+        return self._pool
+
+    def close(self):
+        """Encerra o pool de renderização"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+            self._pool_workers = 0
+
+    def _iter_images_parallel(self, registros: Iterable[Tuple], workers: int, shard_size: int,
+                              png_pattern: Optional[str] = None) -> Iterator:
+        """
+        Renderiza em lotes no pool de processos, devolvendo as imagens na ordem
+
+        Com png_pattern os workers gravam os PNGs e são devolvidos os caminhos.
+        """
+        pool = self._get_pool(workers)
+        data_geracao = datetime.now().strftime("%d/%m/%Y %H:%M")
+        # Registros inválidos são descartados aqui, para a numeração dos lotes não ter buracos
+        registros_iter = iter_label_records(registros)
+        pendentes = []
+        enviados = 0
+
+        def enviar_lote() -> bool:
+            nonlocal enviados
+            lote = list(islice(registros_iter, shard_size))
+            if not lote:
+                return False
+            paths = None
+            if png_pattern is not None:
+                paths = [png_pattern.format(enviados + i + 1) for i in range(len(lote))]
+            pendentes.append((pool.submit(_render_raster_shard, lote, data_geracao, paths), paths))
+            enviados += len(lote)
+            return True
+
+        # Mantém no máximo 2 lotes por worker em andamento (memória limitada)
+        while len(pendentes) < 2 * workers and enviar_lote():
+            pass
+
+        while pendentes:
+            future, paths = pendentes.pop(0)
+            pixels = future.result()
+            enviar_lote()
+            if paths is not None:
+                yield from paths
+            else:
+                for dados in pixels:
+                    yield Image.frombytes(self.mode, self.size, dados)
+
+    def generate_labels_tiff(self, registros: Iterable[Tuple], output_path: str,
+                             workers: int = 1, shard_size: int = 200) -> int:
+        """
+        Gera um TIFF de várias páginas (uma etiqueta por página)
+
+        No modo 1-bit usa compressão CCITT Group 4, a mesma dos fax e das
+        impressoras térmicas; em tons de cinza, LZW.
+
+        Args:
+            registros (Iterable[Tuple]): Registros (id, op, unidade, arquivos, qtde[, nome])
+            output_path (str): Caminho do arquivo .tif/.tiff
+            workers (int): Processos de renderização (1 = no próprio processo)
+            shard_size (int): Etiquetas por lote enviado ao pool
+
+        Returns:
+            int: Quantidade de etiquetas
+
+        Raises:
+            NoRecordsError: Nenhuma etiqueta a gerar
+            RasterGenerationError: Falha ao desenhar ou gravar
+        """
+        try:
+            if workers > 1:
+                images = self._iter_images_parallel(registros, workers, shard_size)
+            else:
+                images = self.iter_images(registros)
+
+            primeira = next(images, None)
+            if primeira is None:
+                raise NoRecordsError("Nenhuma etiqueta para gerar")
+
+            total = 1
+
+            def demais():
+                nonlocal total
+                for image in images:
+                    total += 1
+                    yield image
+
+            compression = 'group4' if self.mode == '1' else 'tiff_lzw'
+            primeira.save(output_path, format='TIFF', save_all=True, append_images=demais(),
+                          compression=compression, dpi=(self.dpi, self.dpi))
+            return total
+
+        except EtiquetaError:
+            raise
+        except Exception as e:
+            print(f"Erro ao gerar TIFF: {e}")
+            raise RasterGenerationError(f"Erro ao gerar TIFF: {e}") from e
+
+    def generate_labels_png(self, registros: Iterable[Tuple], output_dir: str, prefix: str = "etiqueta",
+                            workers: int = 1, shard_size: int = 200) -> List[str]:
+        """
+        Gera um PNG numerado por etiqueta (prefix_00001.png, ...)
+
+        Args:
+            registros (Iterable[Tuple]): Registros (id, op, unidade, arquivos, qtde[, nome])
+            output_dir (str): Pasta de saída (criada se necessário)
+            prefix (str): Prefixo dos arquivos
+            workers (int): Processos de renderização (1 = no próprio processo)
+            shard_size (int): Etiquetas por lote enviado ao pool
+
+        Returns:
+            List[str]: Arquivos gerados, em ordem
+
+        Raises:
+            NoRecordsError: Nenhuma etiqueta a gerar
+            RasterGenerationError: Falha ao desenhar ou gravar
+        """
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            pattern = os.path.join(output_dir, f"{prefix}_{{:05d}}.png")
+
+            if workers > 1:
+                arquivos = list(self._iter_images_parallel(registros, workers, shard_size, png_pattern=pattern))
+            else:
+                arquivos = []
+                for i, image in enumerate(self.iter_images(registros), start=1):
+                    path = pattern.format(i)
+                    image.save(path, optimize=False, dpi=(self.dpi, self.dpi))
+                    arquivos.append(path)
+
+            if not arquivos:
+                raise NoRecordsError("Nenhuma etiqueta para gerar")
+            return arquivos
+
+        except EtiquetaError:
+            raise
+        except Exception as e:
+            print(f"Erro ao gerar PNGs: {e}")
+            raise RasterGenerationError(f"Erro ao gerar PNGs: {e}") from e
+
+    def render_png_bytes(self, etiqueta: LabelRecord) -> bytes:
+        """
+        PNG de uma etiqueta em memória (pré-visualização)
+
+        Returns:
+            bytes: Conteúdo PNG
+        """
+        buffer = io.BytesIO()
+        self.render_label(etiqueta).save(buffer, format='PNG', dpi=(self.dpi, self.dpi))
+        return buffer.getvalue()
@@ -0,0 +1,245 @@
+"""
+Leitores de arquivos de entrada.
+
+Cada leitor converte um formato em tuplas normalizadas
+(op, unidade, arquivos, qtde, nome), as mesmas produzidas pela leitura
+do Excel. Além do layout de planilha (A1=OP / B1=unidade), CSV e Parquet
+usam um layout longo, em que cada linha carrega a própria OP:
+
+    op,unidade,arquivos,qtde,nome
+    OP001,UNIDADE_TESTE,arquivo1.txt,5,
+"""
+import os
+import logging
+from abc import ABC, abstractmethod
+from typing import Iterator, List, Tuple
+
+import pandas as pd
+
+from service.exceptions import ExcelReadError, NoRecordsError
+
+try:
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# Configurar logging
+logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Nomes aceitos para cada coluna do layout longo (cabeçalho em minúsculas)
+COLUMN_ALIASES = {
+    'op': ('op', 'ordem', 'ordem_producao'),
+    'unidade': ('unidade',),
+    'arquivos': ('arquivos', 'arquivo'),
+    'qtde': ('qtde', 'quantidade', 'qtd'),
+    'nome': ('nome',),
+}
+
+# Valores da coluna de arquivos que indicam linha de total (ignoradas)
+TOTAL_MARKERS = ('quantidade total', 'qtde total')
+
+
+def _resolve_columns(columns) -> dict:
+    """
+    Mapeia as colunas do arquivo para os campos normalizados
+
+    Returns:
+        dict: campo -> nome da coluna no arquivo (nome é opcional)
+    """
+    lower = {str(col).strip().lower(): col for col in columns}
+    mapping = {}
+    for campo, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in lower:
+                mapping[campo] = lower[alias]
+                break
+
+    faltando = [campo for campo in ('op', 'unidade', 'arquivos', 'qtde') if campo not in mapping]
+    if faltando:
+        raise ExcelReadError(
+            f"Colunas obrigatórias ausentes: {', '.join(faltando)}\n\n" +
+            "Layout esperado: op, unidade, arquivos, qtde[, nome]"
+        )
+    return mapping
+
+
+def _normalize_frame(df: pd.DataFrame, mapping: dict) -> List[Tuple[str, str, str, int, str]]:
+    """
+    Normaliza um bloco do layout longo aplicando as mesmas regras da planilha:
+    descarta linhas sem OP/unidade/arquivo, linhas de total e qtde <= 0.
+    """
+    def texto(campo):
+        if campo not in mapping:
+            return pd.Series('', index=df.index)
+        return df[mapping[campo]].fillna('').astype(str).str.strip()
+
+    op = texto('op')
+    unidade = texto('unidade')
+    arquivos = texto('arquivos')
+    nome = texto('nome')
+    qtde = pd.to_numeric(df[mapping['qtde']], errors='coerce').fillna(0)
+
+    arquivos_lower = arquivos.str.lower()
+    eh_total = (arquivos_lower == 'total')
+    for marcador in TOTAL_MARKERS:
+        eh_total |= arquivos_lower.str.contains(marcador, regex=False)
+
+    validos = (op != '') & (unidade != '') & (arquivos != '') & ~eh_total & (qtde >= 1)
+    if not validos.any():
+        return []
+
+    qtde = qtde[validos].astype('int64')
+    return list(zip(op[validos], unidade[validos], arquivos[validos], qtde.tolist(), nome[validos]))
+
+
+class RecordReader(ABC):
+    """Interface dos leitores: subclasses implementam iter_records"""
+
+    extensions: Tuple[str, ...] = ()
+
+    @abstractmethod
+    def iter_records(self, file_path: str) -> Iterator[Tuple[str, str, str, int, str]]:
+        """
+        Percorre os registros normalizados do arquivo
+
+        Args:
+            file_path (str): Caminho do arquivo
+
+        Yields:
+            Tuple: (op, unidade, arquivos, qtde, nome)
+        """
+
+    def stream_records(self, file_path: str) -> Iterator[Tuple[str, str, str, int, str]]:
+        """
+        Percorre os registros do arquivo sob demanda, com as validações de read_records
+
+        Para importações grandes: o CSV e o Parquet são lidos em blocos, sem
+        carregar o arquivo inteiro.
+
+        Raises:
+            ExcelReadError: Arquivo inexistente ou ilegível
+            NoRecordsError: Nenhum registro válido
+        """
+        if not os.path.exists(file_path):
+            raise ExcelReadError(f"Arquivo não encontrado: {file_path}")
+
+        total = 0
+        try:
+            for registro in self.iter_records(file_path):
+                total += 1
+                yield registro
+        except (ExcelReadError, NoRecordsError):
+            raise
+        except Exception as e:
+            raise ExcelReadError(f"Erro ao ler arquivo {os.path.basename(file_path)}:\n{str(e)}") from e
+
+        if not total:
+            raise NoRecordsError(f"Nenhum registro válido encontrado em {os.path.basename(file_path)}")
+
+        print(f"Arquivo '{os.path.basename(file_path)}': {total} registros")
+
+    def read_records(self, file_path: str) -> List[Tuple[str, str, str, int, str]]:
+        """
+        Lê todos os registros do arquivo (quem puder processar em blocos deve usar stream_records)
+
+        Raises:
+            ExcelReadError: Arquivo inexistente ou ilegível
+            NoRecordsError: Nenhum registro válido
+        """
+        return list(self.stream_records(file_path))
+
+
+class ExcelReader(RecordReader):
+    """Layout de planilha (A1=OP / B1=unidade), uma OP por aba"""
+
+    extensions = ('.xlsx', '.xls')
+
+    def iter_records(self, file_path: str):
+        from service.excel_service import ExcelService
+        return iter(ExcelService().read_excel_data(file_path))
+
+    def read_records(self, file_path: str):
+        from service.excel_service import ExcelService
+        return ExcelService().read_excel_data(file_path)
+
+
+class CSVReader(RecordReader):
+    """Layout longo em CSV, lido em blocos para não carregar o arquivo inteiro"""
+
+    extensions = ('.csv',)
+
+    def __init__(self, chunksize: int = 50000, encoding: str = 'utf-8'):
+        """
+        Args:
+            chunksize (int): Linhas por bloco de leitura
+            encoding (str): Codificação do arquivo
+        """
+        self.chunksize = chunksize
+        self.encoding = encoding
+
+    def _detect_separator(self, file_path: str) -> str:
+        """Detecta ';' (padrão de ERPs em pt-BR) ou ',' pela linha de cabeçalho"""
+        with open(file_path, 'r', encoding=self.encoding, errors='replace') as f:
+            cabecalho = f.readline()
+        return ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+
+    def iter_records(self, file_path: str):
+        sep = self._detect_separator(file_path)
+        mapping = None
+        chunks = pd.read_csv(
+            file_path, sep=sep, dtype=str, chunksize=self.chunksize,
+            encoding=self.encoding, keep_default_na=False, skipinitialspace=True
+        )
+        for chunk in chunks:
+            if mapping is None:
+                mapping = _resolve_columns(chunk.columns)
+            yield from _normalize_frame(chunk, mapping)
+
+
+class ParquetReader(RecordReader):
+    """Layout longo em Parquet, lido por colunas e em lotes com memory-map"""
+
+    extensions = ('.parquet', '.pq')
+
+    def __init__(self, batch_size: int = 65536):
+        """
+        Args:
+            batch_size (int): Linhas por lote de leitura
+        """
+        self.batch_size = batch_size
+
+    def iter_records(self, file_path: str):
+        if not PARQUET_AVAILABLE:
+            raise ExcelReadError("Leitura de Parquet requer o pacote 'pyarrow'. Instale com: pip install pyarrow")
+
+        parquet_file = pq.ParquetFile(file_path, memory_map=True)
+        mapping = _resolve_columns(parquet_file.schema_arrow.names)
+
+        # Lê apenas as colunas usadas
+        colunas = list(dict.fromkeys(mapping.values()))
+        for batch in parquet_file.iter_batches(batch_size=self.batch_size, columns=colunas):
+            yield from _normalize_frame(batch.to_pandas(), mapping)
+
+
+READERS = (ExcelReader, CSVReader, ParquetReader)
+
+SUPPORTED_EXTENSIONS = tuple(ext for reader in READERS for ext in reader.extensions)
+
+
+def get_reader(file_path: str) -> RecordReader:
+    """
+    Escolhe o leitor pela extensão do arquivo
+
+    Raises:
+        ExcelReadError: Extensão não suportada
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    for reader_cls in READERS:
+        if ext in reader_cls.extensions:
+            return reader_cls()
+    raise ExcelReadError(
+        f"Formato não suportado: '{ext or os.path.basename(file_path)}'\n\n" +
+        f"Formatos aceitos: {', '.join(SUPPORTED_EXTENSIONS)}"
+    )
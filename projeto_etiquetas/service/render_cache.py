@@ -0,0 +1,217 @@
+"""
+Cache em disco de etiquetas já renderizadas.
+
+Cada entrada guarda a parte variável de uma etiqueta pronta para uso (o
+trecho de operadores PDF com os textos, por exemplo), identificada por um
+hash dos campos, da geometria e da versão do template. Reimpressões de
+uma OP (etiquetas danificadas, impressora travada) remontam o documento a
+partir desses trechos, sem refazer medição e quebra de texto.
+
+O cache é um arquivo SQLite com limite de tamanho: ao passar do limite, as
+entradas usadas há mais tempo são removidas (LRU). O total ocupado fica
+guardado em uma linha de controle, atualizada a cada gravação, e o horário
+de uso de uma entrada só é regravado quando está velho (leituras seguidas
+das mesmas etiquetas não viram escritas).
+"""
+import hashlib
+import os
+import sqlite3
+import time
+from typing import Dict, Iterable, Optional
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'etiquetas', 'render_cache.db')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Limite de parâmetros por consulta (SQLite antigo aceita 999)
+_BATCH = 500
+
+# Segundos até uma entrada lida ter o horário de uso regravado
+_TOUCH_INTERVAL = 60
+
+
+class RenderCache:
+    def __init__(self, db_path: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Inicializa o cache de renderização
+
+        Args:
+            db_path (str): Arquivo SQLite (padrão: ETIQUETAS_RENDER_CACHE ou ~/.cache/etiquetas/render_cache.db)
+            max_bytes (int): Tamanho máximo dos dados guardados; acima disso remove os menos usados
+        """
+        self.db_path = db_path or os.environ.get('ETIQUETAS_RENDER_CACHE', DEFAULT_CACHE_PATH)
+        self.max_bytes = max_bytes
+        self._init_db()
+
+    @staticmethod
+    def make_key(*partes) -> str:
+        """
+        Chave de conteúdo: hash de tudo que muda o resultado da renderização
+
+        Args:
+            *partes: Tipo de saída, versão do template, geometria e campos da etiqueta
+
+        Returns:
+            str: SHA-256 hexadecimal
+        """
+        return hashlib.sha256(repr(partes).encode('utf-8')).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Abre uma conexão com o cache (uma por operação, como na fila de impressão)"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _init_db(self):
+        """Cria a tabela do cache"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS renders (
+                    chave TEXT PRIMARY KEY,
+                    dados BLOB NOT NULL,
+                    tamanho INTEGER NOT NULL,
+                    usado_em REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_renders_usado_em ON renders (usado_em, tamanho)')
+            # Linha única com o total de bytes (caches antigos: calculado uma vez aqui)
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS renders_meta (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    total INTEGER NOT NULL
+                )
+            ''')
+            conn.execute('''
+                INSERT OR IGNORE INTO renders_meta (id, total)
+                SELECT 1, COALESCE(SUM(tamanho), 0) FROM renders
+            ''')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_many(self, chaves: Iterable[str]) -> Dict[str, bytes]:
+        """
+        Busca várias entradas de uma vez e marca as encontradas como usadas
+
+        Só as entradas marcadas há mais de _TOUCH_INTERVAL segundos são
+        regravadas, em um UPDATE por lote; se nenhuma está, não há escrita.
+        Falhas do cache não interrompem a geração: são tratadas como ausência.
+
+        Args:
+            chaves (Iterable[str]): Chaves geradas por make_key
+
+        Returns:
+            Dict[str, bytes]: Entradas encontradas (chave -> dados)
+        """
+        chaves = list(dict.fromkeys(chaves))
+        encontrados = {}
+        velhas = []
+        agora = time.time()
+        try:
+            conn = self._connect()
+            try:
+                for inicio in range(0, len(chaves), _BATCH):
+                    lote = chaves[inicio:inicio + _BATCH]
+                    marcadores = ','.join('?' * len(lote))
+                    rows = conn.execute(
+                        f'SELECT chave, dados, usado_em FROM renders WHERE chave IN ({marcadores})', lote
+                    ).fetchall()
+                    for chave, dados, usado_em in rows:
+                        encontrados[chave] = bytes(dados)
+                        if agora - usado_em >= _TOUCH_INTERVAL:
+                            velhas.append(chave)
+                for inicio in range(0, len(velhas), _BATCH):
+                    lote = velhas[inicio:inicio + _BATCH]
+                    marcadores = ','.join('?' * len(lote))
+                    conn.execute(f'UPDATE renders SET usado_em = ? WHERE chave IN ({marcadores})', [agora] + lote)
+                if velhas:
+                    conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Erro ao ler cache de renderização: {e}")
+        return encontrados
+
+    def put_many(self, entradas: Dict[str, bytes]):
+        """
+        Grava várias entradas em uma transação e aplica o limite de tamanho
+
+        O total guardado é ajustado pela diferença (entradas substituídas
+        descontam o tamanho antigo); a limpeza só roda quando ele passa do limite.
+
+        Args:
+            entradas (Dict[str, bytes]): chave -> dados renderizados
+        """
+        if not entradas:
+            return
+        try:
+            conn = self._connect()
+            try:
+                # Trava de escrita já no início: o total lido e o ajustado são da mesma versão
+                conn.execute('BEGIN IMMEDIATE')
+                chaves = list(entradas)
+                substituidos = 0
+                for inicio in range(0, len(chaves), _BATCH):
+                    lote = chaves[inicio:inicio + _BATCH]
+                    marcadores = ','.join('?' * len(lote))
+                    substituidos += conn.execute(
+                        f'SELECT COALESCE(SUM(tamanho), 0) FROM renders WHERE chave IN ({marcadores})', lote
+                    ).fetchone()[0]
+                agora = time.time()
+                conn.executemany(
+                    'INSERT OR REPLACE INTO renders (chave, dados, tamanho, usado_em) VALUES (?, ?, ?, ?)',
+                    ((chave, sqlite3.Binary(dados), len(dados), agora) for chave, dados in entradas.items())
+                )
+                total = self._add_total(conn, sum(len(dados) for dados in entradas.values()) - substituidos)
+                if total > self.max_bytes:
+                    self._evict(conn, total)
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Erro ao gravar cache de renderização: {e}")
+
+    @staticmethod
+    def _add_total(conn: sqlite3.Connection, delta: int) -> int:
+        """Ajusta o total guardado e retorna o novo valor"""
+        conn.execute('UPDATE renders_meta SET total = total + ? WHERE id = 1', (delta,))
+        return conn.execute('SELECT total FROM renders_meta WHERE id = 1').fetchone()[0]
+
+    def _evict(self, conn: sqlite3.Connection, total: int):
+        """Remove as entradas usadas há mais tempo até ficar em 90% do limite"""
+        excesso = total - int(self.max_bytes * 0.9)
+        remover = []
+        removidos = 0
+        for chave, tamanho in conn.execute('SELECT chave, tamanho FROM renders ORDER BY usado_em'):
+            remover.append((chave,))
+            removidos += tamanho
+            if removidos >= excesso:
+                break
+        conn.executemany('DELETE FROM renders WHERE chave = ?', remover)
+        self._add_total(conn, -removidos)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Ocupação do cache
+
+        Returns:
+            Dict[str, int]: {'entradas', 'bytes', 'max_bytes'}
+        """
+        conn = self._connect()
+        try:
+            entradas = conn.execute('SELECT COUNT(*) FROM renders').fetchone()[0]
+            total = conn.execute('SELECT total FROM renders_meta WHERE id = 1').fetchone()[0]
+        finally:
+            conn.close()
+        return {'entradas': entradas, 'bytes': total, 'max_bytes': self.max_bytes}
+
+    def clear(self):
+        """Remove todas as entradas"""
+        conn = self._connect()
+        try:
+            conn.execute('DELETE FROM renders')
+            conn.execute('UPDATE renders_meta SET total = 0 WHERE id = 1')
+            conn.commit()
+        finally:
+            conn.close()
@@ -0,0 +1,444 @@
+"""
+Relatórios em PDF gerados em fluxo, com memória constante.
+
+O canvas do ReportLab guarda todas as páginas até o save(); em relatórios
+de centenas de milhares de linhas isso vira centenas de megabytes. Aqui as
+páginas são escritas direto no destino assim que ficam cheias (conteúdo
+comprimido e objeto da página), e só os números dos objetos ficam em
+memória até o fim. Os relatórios usam apenas as fontes padrão do PDF
+(Helvetica), que não precisam ser embutidas.
+
+Cada linha da tabela é um único objeto de texto (BT ... ET), com as colunas
+posicionadas por deslocamento relativo, e os cabeçalhos das colunas se
+repetem em todas as páginas.
+"""
+import csv
+import io
+import zlib
+from datetime import date, datetime
+from functools import lru_cache
+from typing import BinaryIO, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.rl_accel import fp_str
+from reportlab.lib.units import mm
+
+from service.exceptions import EtiquetaError, PDFGenerationError, ReportError
+from service.text_layout import TextLayout
+
+# Nome do recurso de cada fonte usada nos relatórios
+_FONTES = {'Helvetica': 'F1', 'Helvetica-Bold': 'F2'}
+
+# Caracteres que precisam de escape em um literal PDF (bytes acima de 127 podem ir crus)
+_ESCAPES = str.maketrans({'\\': '\\\\', '(': '\\(', ')': '\\)', '\r': '\\r'})
+
+# As posições (y das linhas, deslocamentos das colunas) se repetem em todas as páginas
+_num = lru_cache(maxsize=4096)(fp_str)
+
+
+class ReportColumn(NamedTuple):
+    """
+    Coluna de uma tabela de relatório
+
+    Attributes:
+        titulo (str): Cabeçalho da coluna
+        largura (float): Largura em pontos
+        max_chars (int): Corta o texto com "..." acima deste tamanho (0 = sem corte)
+        alinhamento (str): 'esquerda' ou 'direita'
+    """
+    titulo: str
+    largura: float
+    max_chars: int = 0
+    alinhamento: str = 'esquerda'
+
+
+# Colunas da lista simples de registros
+LIST_COLUMNS = (
+    ReportColumn('ID', 30),
+    ReportColumn('OP', 80),
+    ReportColumn('Unidade', 120, max_chars=15),
+    ReportColumn('Arquivo', 200, max_chars=25),
+    ReportColumn('Qtde', 50),
+)
+
+# Relatórios agregados (Database.get_aggregate_report): título e cabeçalho de cada dimensão
+AGGREGATE_REPORTS = {
+    'unidade': ('Totais por unidade', ('Unidade',)),
+    'status': ('Totais por status', ('Status',)),
+    'dia': ('Totais por dia', ('Dia',)),
+    'unidade_status': ('Totais por unidade e status', ('Unidade', 'Status')),
+}
+
+# Colunas de totais, depois das dimensões, em toda linha agregada
+AGGREGATE_TOTALS = ('Registros', 'OPs', 'Qtde')
+
+
+def _pdf_string(texto: str) -> str:
+    """Texto em WinAnsi (encoding das fontes padrão) escapado para um literal PDF"""
+    return texto.encode('cp1252', 'replace').decode('latin-1').translate(_ESCAPES)
+
+
+class _StreamingPDF:
+    """Escreve um PDF página a página no destino, guardando só as posições dos objetos"""
+
+    def __init__(self, stream: BinaryIO, page_size: Tuple[float, float]):
+        self.stream = stream
+        self.offset = 0
+        self.page_size = page_size
+        # Posição de cada objeto (índice = número - 1); 1 = catálogo, 2 = árvore de páginas
+        self._offsets: List[int] = [0, 0]
+        self._kids: List[int] = []
+
+        self._write(b'%PDF-1.4\n%\x93\x8c\x8b\x9e\n')
+        fontes = ' '.join(
+            f'/{recurso} {self._object(f"<< /Type /Font /Subtype /Type1 /BaseFont /{nome} /Encoding /WinAnsiEncoding >>".encode("ascii"))} 0 R'
+            for nome, recurso in _FONTES.items()
+        )
+        self._resources = f'<< /Font << {fontes} >> /ProcSet [ /PDF /Text ] >>'.encode('ascii')
+
+    def _write(self, data: bytes):
+        self.stream.write(data)
+        self.offset += len(data)
+
+    def _object(self, corpo: bytes, numero: Optional[int] = None) -> int:
+        """Grava um objeto (novo ou reservado) e retorna o número dele"""
+        if numero is None:
+            self._offsets.append(self.offset)
+            numero = len(self._offsets)
+        else:
+            self._offsets[numero - 1] = self.offset
+        self._write(b'%d 0 obj\n' % numero + corpo + b'\nendobj\n')
+        return numero
+
+    @property
+    def page_count(self) -> int:
+        return len(self._kids)
+
+    def add_page(self, conteudo: str):
+        """Comprime e grava o conteúdo de uma página (operadores PDF) e o objeto da página"""
+        dados = zlib.compress(conteudo.encode('latin-1'))
+        conteudo_id = self._object(b'<< /Filter /FlateDecode /Length %d >>\nstream\n' % len(dados)
+                                   + dados + b'\nendstream')
+        largura, altura = self.page_size
+        self._kids.append(self._object(
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [ 0 0 {fp_str(largura)} {fp_str(altura)} ] '
+            f'/Contents {conteudo_id} 0 R /Resources '.encode('ascii') + self._resources + b' >>'
+        ))
+
+    def close(self, titulo: str):
+        """Grava a árvore de páginas, o catálogo, a tabela xref e o trailer"""
+        self._object(b'<< /Type /Pages /Count %d /Kids [ ' % len(self._kids)
+                     + b''.join(b'%d 0 R ' % kid for kid in self._kids) + b'] >>', numero=2)
+        self._object(b'<< /Type /Catalog /Pages 2 0 R >>', numero=1)
+        info_id = self._object(f'<< /Title ({_pdf_string(titulo)}) /Producer (projeto_etiquetas) >>'.encode('latin-1'))
+
+        xref_offset = self.offset
+        self._write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(self._offsets) + 1))
+        self._write(b''.join(b'%010d 00000 n \n' % offset for offset in self._offsets))
+        self._write(b'trailer\n<< /Size %d /Root 1 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                    % (len(self._offsets) + 1, info_id, xref_offset))
+
+
+class _TableWriter:
+    """Monta as páginas de uma tabela: título, cabeçalhos repetidos, linhas e rodapé"""
+
+    def __init__(self, pdf: _StreamingPDF, titulo: str, colunas: Sequence[ReportColumn],
+                 text_layout: TextLayout, subtitulo: str = ''):
+        self.pdf = pdf
+        self.titulo = titulo
+        self.subtitulo = subtitulo
+        self.colunas = colunas
+        self.text_layout = text_layout
+        self.margin = 20 * mm
+        self.line_height = 15
+        self.font_size = 10
+        _, self.page_height = pdf.page_size
+
+        self.x_positions = [self.margin]
+        for coluna in colunas[:-1]:
+            self.x_positions.append(self.x_positions[-1] + coluna.largura)
+        self.table_width = sum(coluna.largura for coluna in colunas)
+
+        self._conteudo: List[str] = []
+        self.y = 0.0
+        self._new_page()
+
+    def _text(self, fonte: str, tamanho: float, x: float, y: float, texto: str) -> str:
+        return f'BT /{_FONTES[fonte]} {fp_str(tamanho)} Tf 1 0 0 1 {fp_str(x)} {fp_str(y)} Tm ({_pdf_string(texto)}) Tj ET'
+
+    def _new_page(self):
+        """Começa uma página com título e cabeçalhos das colunas"""
+        numero = self.pdf.page_count + 1
+        topo = self.page_height - self.margin
+        self._conteudo = [
+            self._text('Helvetica-Bold', 14, self.margin, topo, self.titulo),
+            self._text('Helvetica', 8, self.margin, topo - 20, self.subtitulo),
+            self._text('Helvetica', 8, self.margin + self.table_width - 40, topo - 20, f'Página {numero}'),
+        ]
+        self.y = topo - 50
+        self._row_code([coluna.titulo for coluna in self.colunas], 'Helvetica-Bold', self.font_size)
+        self.y -= 20
+        self.rule()
+        self.y -= 10
+
+    def _flush_page(self):
+        self.pdf.add_page('\n'.join(self._conteudo))
+
+    def _cell(self, valor, coluna: ReportColumn, cortar: bool) -> str:
+        texto = '' if valor is None else str(valor)
+        if cortar and coluna.max_chars and len(texto) > coluna.max_chars:
+            texto = texto[:coluna.max_chars] + '...'
+        return texto
+
+    def _row_code(self, textos: Sequence[str], fonte: str, tamanho: float):
+        """Uma linha inteira em um só objeto de texto (colunas por deslocamento relativo)"""
+        partes = [f'BT /{_FONTES[fonte]} {_num(tamanho)} Tf 1 0 0 1 {_num(self.margin)} {_num(self.y)} Tm']
+        x_atual = self.margin
+        for texto, coluna, x in zip(textos, self.colunas, self.x_positions):
+            if not texto:
+                continue
+            if coluna.alinhamento == 'direita':
+                x = x + coluna.largura - 6 - self.text_layout.string_width(texto, fonte, tamanho)
+            if x != x_atual:
+                partes.append(f'{_num(x - x_atual)} 0 Td')
+                x_atual = x
+            partes.append(f'({_pdf_string(texto)}) Tj')
+        partes.append('ET')
+        self._conteudo.append(' '.join(partes))
+
+    def row(self, valores: Sequence, bold: bool = False):
+        """
+        Acrescenta uma linha (valores na ordem das colunas); a página é fechada se não couber
+
+        Linhas em negrito (subtotais, totais) não são cortadas: o texto pode
+        ocupar as colunas vazias seguintes.
+        """
+        if self.y < self.margin + 30:
+            self._flush_page()
+            self._new_page()
+        textos = [self._cell(valor, coluna, not bold) for valor, coluna in zip(valores, self.colunas)]
+        if bold:
+            self._row_code(textos, 'Helvetica-Bold', self.font_size)
+        else:
+            self._row_code(textos, 'Helvetica', self.font_size - 1)
+        self.y -= self.line_height
+
+    def rule(self, cinza: float = 0.0):
+        """Linha horizontal na largura da tabela"""
+        self._conteudo.append(f'{fp_str(cinza)} G {fp_str(self.margin)} {fp_str(self.y)} m '
+                              f'{fp_str(self.margin + self.table_width)} {fp_str(self.y)} l S')
+
+    def space(self, altura: float):
+        self.y -= altura
+
+    def close(self):
+        self._flush_page()
+
+
+class ReportService:
+    def __init__(self, page_size: Tuple[float, float] = A4):
+        """
+        Inicializa o serviço de relatórios
+
+        Args:
+            page_size (Tuple[float, float]): Tamanho da página em pontos
+        """
+        self.page_size = page_size
+        # Larguras por fonte para alinhar à direita (tabelas de glifos em cache)
+        self.text_layout = TextLayout()
+
+    def _write(self, output: Union[str, BinaryIO], escrever) -> dict:
+        """Abre o destino (caminho ou stream) e grava o relatório; falhas viram PDFGenerationError"""
+        try:
+            if isinstance(output, str):
+                with open(output, 'wb') as f:
+                    return escrever(_StreamingPDF(f, self.page_size))
+            return escrever(_StreamingPDF(output, self.page_size))
+        except EtiquetaError:
+            # Erro vindo da fonte dos registros (ex.: DatabaseError)
+            raise
+        except Exception as e:
+            print(f"Erro ao gerar relatório: {e}")
+            raise PDFGenerationError(f"Erro ao gerar relatório: {e}") from e
+
+    def generate_list_report(self, registros: Iterable[Tuple], output: Union[str, BinaryIO],
+                             titulo: str = "Relatório de Registros") -> dict:
+        """
+        Gera a lista de registros em PDF, com subtotais por OP
+
+        Os registros são consumidos sob demanda (lista, gerador ou cursor do
+        banco) e cada página é gravada assim que fica cheia. Os subtotais
+        saem quando a OP muda, então os registros devem vir agrupados por OP
+        (ex.: Database.iter_registros(order_by_op=True)).
+
+        Args:
+            registros (Iterable[Tuple]): Registros (id, op, unidade, arquivos, qtde, ...)
+            output (str | BinaryIO): Caminho do PDF ou stream binário
+            titulo (str): Título repetido em cada página
+
+        Returns:
+            dict: Resumo (total de registros, quantidade, OPs e páginas)
+
+        Raises:
+            DatabaseError: Falha ao ler o cursor do banco
+            PDFGenerationError: Falha ao gravar o PDF
+        """
+        subtitulo = f"Gerado em: {datetime.now().strftime('%d/%m/%Y às %H:%M')}"
+
+        def escrever(pdf: _StreamingPDF) -> dict:
+            tabela = _TableWriter(pdf, titulo, LIST_COLUMNS, self.text_layout, subtitulo)
+            total_registros = total_qtde = total_ops = 0
+            op_atual = None
+            registros_op = qtde_op = 0
+
+            def subtotal():
+                tabela.row(('', '', f"Subtotal {op_atual}: {registros_op} registros", '', qtde_op), bold=True)
+                tabela.space(5)
+
+            for registro in registros:
+                op = registro[1]
+                if op != op_atual:
+                    if total_registros:
+                        subtotal()
+                    op_atual = op
+                    registros_op = qtde_op = 0
+                    total_ops += 1
+                tabela.row(registro[:5])
+                qtde = registro[4] or 0
+                registros_op += 1
+                qtde_op += qtde
+                total_registros += 1
+                total_qtde += qtde
+
+            if total_registros:
+                subtotal()
+            tabela.space(5)
+            tabela.rule()
+            tabela.space(15)
+            tabela.row(('', '', f"Total de registros: {total_registros} em {total_ops} OPs", '', total_qtde), bold=True)
+            tabela.close()
+            pdf.close(titulo)
+            return {
+                'total_registros': total_registros,
+                'total_qtde': total_qtde,
+                'total_ops': total_ops,
+                'paginas': pdf.page_count
+            }
+
+        return self._write(output, escrever)
+
+    @staticmethod
+    def _aggregate_keys(chaves: Tuple, nivel: int) -> List[str]:
+        """Textos das dimensões de uma linha agregada (subtotais e total geral rotulados)"""
+        n = len(chaves)
+        if nivel == n:
+            return ['Total geral'] + [''] * (n - 1)
+        textos = []
+        for chave in chaves[:n - nivel]:
+            if chave is None:
+                textos.append('(vazio)')
+            elif isinstance(chave, date):
+                textos.append(chave.strftime('%d/%m/%Y'))
+            else:
+                textos.append(str(chave))
+        if nivel:
+            textos[-1] = f"Subtotal {textos[-1]}"
+        return textos + [''] * nivel
+
+    @staticmethod
+    def _aggregate_summary(linhas: List[Tuple], n: int) -> dict:
+        """Grupos e totais gerais (linha do ROLLUP com todas as dimensões agregadas)"""
+        total = next((linha for linha in linhas if linha[n] == n), None)
+        return {
+            'grupos': sum(1 for linha in linhas if linha[n] == 0),
+            'total_registros': total[n + 1] if total else 0,
+            'total_qtde': total[n + 3] if total else 0
+        }
+
+    def generate_aggregate_report(self, agrupamento: str, linhas: List[Tuple], output: Union[str, BinaryIO],
+                                  filtros: str = '') -> dict:
+        """
+        Gera em PDF um relatório agregado vindo de Database.get_aggregate_report
+
+        Args:
+            agrupamento (str): Chave de AGGREGATE_REPORTS
+            linhas (List[Tuple]): (chaves..., nivel, registros, ops, qtde), já com subtotais do ROLLUP
+            output (str | BinaryIO): Caminho do PDF ou stream binário
+            filtros (str): Descrição dos filtros aplicados, impressa no cabeçalho
+
+        Returns:
+            dict: Resumo (grupos, total de registros e quantidade)
+
+        Raises:
+            PDFGenerationError: Falha ao gravar o PDF
+        """
+        titulo, cabecalhos = AGGREGATE_REPORTS[agrupamento]
+        n = len(cabecalhos)
+        # Largura da lista simples: as dimensões dividem o que sobra das colunas de totais
+        largura = (480 - 70 * len(AGGREGATE_TOTALS)) / n
+        colunas = [ReportColumn(cabecalho, largura, max_chars=int(largura / 6)) for cabecalho in cabecalhos]
+        colunas += [ReportColumn(cabecalho, 70, alinhamento='direita') for cabecalho in AGGREGATE_TOTALS]
+        subtitulo = f"Gerado em: {datetime.now().strftime('%d/%m/%Y às %H:%M')}"
+        if filtros:
+            subtitulo += f" | {filtros}"
+
+        def escrever(pdf: _StreamingPDF) -> dict:
+            tabela = _TableWriter(pdf, titulo, colunas, self.text_layout, subtitulo)
+            for linha in linhas:
+                nivel = linha[n]
+                if nivel == n:
+                    tabela.space(5)
+                    tabela.rule()
+                    tabela.space(15)
+                tabela.row(self._aggregate_keys(linha[:n], nivel) + list(linha[n + 1:]), bold=nivel > 0)
+                if 0 < nivel < n:
+                    tabela.space(5)
+            tabela.close()
+            pdf.close(titulo)
+            return dict(self._aggregate_summary(linhas, n), paginas=pdf.page_count)
+
+        return self._write(output, escrever)
+
+    def write_aggregate_csv(self, agrupamento: str, linhas: List[Tuple], output: Union[str, BinaryIO]) -> dict:
+        """
+        Grava um relatório agregado em CSV (separador ';' e UTF-8 com BOM, como o Excel em pt-BR espera)
+
+        A coluna "Nível" distingue grupo, subtotal e total geral para quem
+        for filtrar a planilha.
+
+        Args:
+            agrupamento (str): Chave de AGGREGATE_REPORTS
+            linhas (List[Tuple]): (chaves..., nivel, registros, ops, qtde)
+            output (str | BinaryIO): Caminho do CSV ou stream binário
+
+        Returns:
+            dict: Resumo (grupos, total de registros e quantidade)
+
+        Raises:
+            ReportError: Falha ao gravar o CSV
+        """
+        _, cabecalhos = AGGREGATE_REPORTS[agrupamento]
+        n = len(cabecalhos)
+        niveis = {0: 'grupo', n: 'total'}
+        try:
+            if isinstance(output, str):
+                f = open(output, 'w', newline='', encoding='utf-8-sig')
+            else:
+                f = io.TextIOWrapper(output, encoding='utf-8-sig', newline='')
+            try:
+                writer = csv.writer(f, delimiter=';')
+                writer.writerow(list(cabecalhos) + ['Nível'] + list(AGGREGATE_TOTALS))
+                for linha in linhas:
+                    chaves = [chave.isoformat() if isinstance(chave, date) else chave for chave in linha[:n]]
+                    writer.writerow(chaves + [niveis.get(linha[n], 'subtotal')] + list(linha[n + 1:]))
+            finally:
+                if isinstance(output, str):
+                    f.close()
+                else:
+                    # Devolve o stream a quem chamou, sem fechá-lo
+                    f.flush()
+                    f.detach()
+        except OSError as e:
+            print(f"Erro ao gravar relatório CSV: {e}")
+            raise ReportError(f"Erro ao gravar relatório CSV: {e}") from e
+        return self._aggregate_summary(linhas, n)
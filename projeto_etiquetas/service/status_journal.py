@@ -0,0 +1,279 @@
+"""
+Diário local de mudanças de status, enviado ao banco em segundo plano.
+
+Gerar ou imprimir etiquetas não espera o banco remoto: a mudança de status
+(ex.: "Impresso") é gravada em um SQLite local e confirmada na hora, e uma
+thread envia o diário ao banco em lotes, repetindo com espera crescente
+enquanto o banco estiver lento ou fora do ar. Como o diário fica em disco,
+nada se perde se o programa fechar antes do envio. Enquanto uma mudança
+não chega ao banco, as leituras da tela aplicam o status do diário por cima
+do que veio do banco (atualização otimista).
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Configurar logging
+logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Posição do status nas tuplas de registro (id, op, unidade, arquivos, qtde, nome, status)
+STATUS_INDEX = 6
+
+
+class StatusJournal:
+    def __init__(self, db_path: str, apply: Callable[[Dict[str, List[int]]], int],
+                 batch_size: int = 500, flush_interval: float = 1.0,
+                 retry_delay: float = 2.0, max_retry_delay: float = 60.0):
+        """
+        Inicializa o diário
+
+        Args:
+            db_path (str): Arquivo SQLite do diário
+            apply (Callable): Grava no banco {status: [ids]} em uma transação
+                              (ex.: Database.apply_status_changes); deve levantar exceção em falha
+            batch_size (int): Entradas do diário enviadas por lote
+            flush_interval (float): Intervalo de verificação do diário quando ocioso
+            retry_delay (float): Espera base após uma falha (dobra a cada falha seguida), em segundos
+            max_retry_delay (float): Espera máxima entre tentativas, em segundos
+        """
+        self.db_path = db_path
+        self.apply = apply
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+        # Status ainda não enviados, por id de registro (o mais recente vale)
+        self._overrides: Dict[int, str] = {}
+        self.falhas = 0
+        self.ultimo_erro: Optional[str] = None
+        self._proxima_tentativa = 0.0
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._init_journal()
+
+    # ------------------------------------------------------------------
+    # Diário persistente
+    # ------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        """Abre uma conexão com o diário (uma por operação, como em Database)"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _init_journal(self):
+        """Cria a tabela do diário e carrega o que ficou sem enviar da última execução"""
+        db_dir = os.path.dirname(os.path.abspath(self.db_path))
+        os.makedirs(db_dir, exist_ok=True)
+
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS status_journal (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    registro_ids TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    criado_em REAL NOT NULL
+                )
+            ''')
+            conn.commit()
+            self._overrides = self._load_overrides(conn)
+        finally:
+            conn.close()
+
+        if self._overrides:
+            logger.info(f"Diário de status com {len(self._overrides)} registros aguardando envio ao banco")
+
+    @staticmethod
+    def _load_overrides(conn: sqlite3.Connection) -> Dict[int, str]:
+        """Status pendentes do diário, na ordem em que foram gravados"""
+        overrides = {}
+        for registro_ids, status in conn.execute('SELECT registro_ids, status FROM status_journal ORDER BY id'):
+            for registro_id in json.loads(registro_ids):
+                overrides[registro_id] = status
+        return overrides
+
+    def record(self, ids: Iterable[int], status: str) -> bool:
+        """
+        Grava uma mudança de status no diário (o envio ao banco fica para a thread)
+
+        Args:
+            ids (Iterable[int]): Registros alterados
+            status (str): Novo status
+
+        Returns:
+            bool: True se a mudança foi gravada (False se não havia ids)
+        """
+        ids = list(ids)
+        if not ids:
+            return False
+
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute('INSERT INTO status_journal (registro_ids, status, criado_em) VALUES (?, ?, ?)',
+                             (json.dumps(ids), status, time.time()))
+                conn.commit()
+            finally:
+                conn.close()
+            for registro_id in ids:
+                self._overrides[registro_id] = status
+
+        self._wake.set()
+        return True
+
+    def pending_count(self) -> int:
+        """Registros com mudança de status ainda não enviada ao banco"""
+        with self._lock:
+            return len(self._overrides)
+
+    def apply_overrides(self, registros: Iterable[Tuple]) -> List[Tuple]:
+        """
+        Aplica aos registros lidos do banco os status do diário ainda não enviados
+
+        Args:
+            registros (Iterable[Tuple]): Registros (id, op, unidade, arquivos, qtde, nome, status, ...)
+
+        Returns:
+            List[Tuple]: Os mesmos registros, com o status do diário quando houver
+        """
+        with self._lock:
+            overrides = dict(self._overrides)
+        if not overrides:
+            return list(registros)
+
+        resultado = []
+        for registro in registros:
+            status = overrides.get(registro[0])
+            if status is not None and len(registro) > STATUS_INDEX and registro[STATUS_INDEX] != status:
+                registro = registro[:STATUS_INDEX] + (status,) + registro[STATUS_INDEX + 1:]
+            resultado.append(registro)
+        return resultado
+
+    # ------------------------------------------------------------------
+    # Envio ao banco
+    # ------------------------------------------------------------------
+
+    def flush(self) -> bool:
+        """
+        Envia o diário ao banco, em lotes, até esvaziar
+
+        Cada lote é reduzido ao status mais recente de cada registro e
+        gravado em uma única transação; só então sai do diário.
+
+        Returns:
+            bool: True se o diário ficou vazio; False se o banco falhou
+        """
+        with self._flush_lock:
+            while True:
+                conn = self._connect()
+                try:
+                    rows = conn.execute('SELECT id, registro_ids, status FROM status_journal ORDER BY id LIMIT ?',
+                                        (self.batch_size,)).fetchall()
+                finally:
+                    conn.close()
+                if not rows:
+                    return True
+
+                # Último status de cada registro, agrupado por status
+                ultimo: Dict[int, str] = {}
+                for _, registro_ids, status in rows:
+                    for registro_id in json.loads(registro_ids):
+                        ultimo[registro_id] = status
+                mudancas: Dict[str, List[int]] = {}
+                for registro_id, status in ultimo.items():
+                    mudancas.setdefault(status, []).append(registro_id)
+
+                try:
+                    self.apply(mudancas)
+                except Exception as e:
+                    self.falhas += 1
+                    self.ultimo_erro = str(e)
+                    espera = min(self.retry_delay * (2 ** (self.falhas - 1)), self.max_retry_delay)
+                    self._proxima_tentativa = time.time() + espera
+                    logger.warning(f"Falha ao enviar {len(ultimo)} status ao banco "
+                                   f"(nova tentativa em {espera:.0f}s): {e}")
+                    return False
+
+                self.falhas = 0
+                self.ultimo_erro = None
+                self._proxima_tentativa = 0.0
+                with self._lock:
+                    conn = self._connect()
+                    try:
+                        conn.execute('DELETE FROM status_journal WHERE id <= ?', (rows[-1][0],))
+                        conn.commit()
+                        # Mudanças gravadas durante o envio continuam valendo
+                        self._overrides = self._load_overrides(conn)
+                    finally:
+                        conn.close()
+                logger.info(f"{len(ultimo)} status enviados ao banco")
+
+    def start(self):
+        """Inicia o envio em segundo plano"""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._flush_loop, name='status-journal', daemon=True)
+        self._thread.start()
+
+    def stop(self, flush: bool = True) -> bool:
+        """
+        Para o envio em segundo plano, tentando antes enviar o que restou
+
+        O que não puder ser enviado fica no diário para a próxima execução.
+
+        Returns:
+            bool: True se o diário ficou vazio
+        """
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if flush and self.pending_count():
+            return self.flush()
+        return self.pending_count() == 0
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Aguarda o diário esvaziar
+
+        Returns:
+            bool: True se o diário esvaziou dentro do timeout
+        """
+        limite = None if timeout is None else time.time() + timeout
+        while self.pending_count():
+            if limite is not None and time.time() >= limite:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def _flush_loop(self):
+        """Envia o diário sempre que houver mudanças, respeitando a espera após falhas"""
+        while not self._stop_event.is_set():
+            espera = self._proxima_tentativa - time.time()
+            if espera > 0:
+                self._stop_event.wait(min(espera, self.flush_interval))
+                continue
+            if self.pending_count():
+                try:
+                    self.flush()
+                except Exception as e:
+                    logger.error(f"Erro no envio do diário de status: {e}")
+                    self._stop_event.wait(self.flush_interval)
+                    continue
+            if not self.pending_count() or self._proxima_tentativa:
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
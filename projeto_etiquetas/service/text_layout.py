@@ -0,0 +1,122 @@
+"""
+Medição e quebra de texto com cache.
+
+As etiquetas repetem os mesmos textos (OP, unidade, nome) em centenas de
+páginas; aqui as larguras de caractere ficam em tabelas por fonte, as
+larguras de linha são somadas de forma incremental e o resultado de cada
+quebra fica em um cache LRU.
+"""
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from reportlab.pdfbase import pdfmetrics
+
+
+class TextLayout:
+    def __init__(self, cache_size: int = 4096):
+        """
+        Args:
+            cache_size (int): Quantidade de quebras de texto mantidas no cache LRU
+        """
+        # Largura de cada caractere em unidades de 1/1000 do tamanho da fonte
+        self._glyph_widths: Dict[str, Dict[str, float]] = {}
+        self.wrap_text = lru_cache(maxsize=cache_size)(self._wrap_text)
+
+    def _glyph_table(self, font_name: str) -> Dict[str, float]:
+        """Tabela de larguras da fonte, preenchida sob demanda"""
+        table = self._glyph_widths.get(font_name)
+        if table is None:
+            table = self._glyph_widths.setdefault(font_name, {})
+        return table
+
+    def _text_units(self, text: str, font_name: str) -> float:
+        """Largura do texto em unidades de 1/1000 (soma das larguras dos caracteres)"""
+        table = self._glyph_table(font_name)
+        total = 0.0
+        for ch in text:
+            width = table.get(ch)
+            if width is None:
+                width = pdfmetrics.stringWidth(ch, font_name, 1000)
+                table[ch] = width
+            total += width
+        return total
+
+    def string_width(self, text: str, font_name: str, font_size: float) -> float:
+        """
+        Largura do texto em pontos (equivalente a canvas.stringWidth)
+        """
+        return self._text_units(text, font_name) * font_size / 1000.0
+
+    def _break_word(self, word: str, font_name: str, max_units: float) -> List[str]:
+        """
+        Quebra uma palavra maior que a linha em pedaços que cabem na largura
+        """
+        table = self._glyph_table(font_name)
+        pieces = []
+        current = ""
+        current_units = 0.0
+        for ch in word:
+            width = table.get(ch)
+            if width is None:
+                width = pdfmetrics.stringWidth(ch, font_name, 1000)
+                table[ch] = width
+            if current and current_units + width > max_units:
+                pieces.append(current)
+                current = ch
+                current_units = width
+            else:
+                current += ch
+                current_units += width
+        if current:
+            pieces.append(current)
+        return pieces
+
+    def _wrap_text(self, text: str, font_name: str, font_size: float, max_width: float) -> Tuple[str, ...]:
+        """
+        Quebra o texto em linhas que cabem em max_width (use wrap_text, que tem cache)
+
+        Args:
+            text (str): Texto para quebrar
+            font_name (str): Nome da fonte
+            font_size (float): Tamanho da fonte
+            max_width (float): Largura máxima em pontos
+
+        Returns:
+            Tuple[str, ...]: Linhas quebradas
+        """
+        if not text:
+            return ("",)
+
+        # Trabalha em unidades de 1/1000 do tamanho da fonte para não multiplicar a cada soma
+        max_units = max_width * 1000.0 / font_size if font_size else float('inf')
+        space_units = self._text_units(" ", font_name)
+
+        lines = []
+        current_line = ""
+        current_units = 0.0
+
+        for word in text.split(' '):
+            word_units = self._text_units(word, font_name)
+
+            if current_line:
+                test_units = current_units + space_units + word_units
+                if test_units <= max_units:
+                    current_line = current_line + " " + word
+                    current_units = test_units
+                    continue
+                lines.append(current_line)
+
+            if word_units <= max_units:
+                current_line = word
+                current_units = word_units
+            else:
+                # Palavra muito longa: quebra por caractere em vez de estourar a etiqueta
+                pieces = self._break_word(word, font_name, max_units)
+                lines.extend(pieces[:-1])
+                current_line = pieces[-1] if pieces else ""
+                current_units = self._text_units(current_line, font_name)
+
+        if current_line:
+            lines.append(current_line)
+
+        return tuple(lines) if lines else ("",)
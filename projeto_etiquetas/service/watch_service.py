@@ -0,0 +1,311 @@
+import csv
+import os
+import shutil
+import threading
+import time
+import logging
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from service.excel_service import ExcelService
+from service.exceptions import EtiquetaError
+from service.readers import SUPPORTED_EXTENSIONS
+
+# Configurar logging
+logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Extensões aceitas na pasta monitorada
+WATCH_EXTENSIONS = SUPPORTED_EXTENSIONS
+
+# Chaves recentes lembradas para deduplicar entre arquivos sem ir ao banco
+SEEN_KEYS_MAX = 100_000
+
+# Colunas do log de importação (uma linha por arquivo)
+LOG_COLUMNS = [
+    'data', 'arquivo', 'status', 'registros_lidos', 'registros_importados',
+    'duplicatas', 'leitura_s', 'banco_s', 'total_s', 'registros_por_s', 'erro'
+]
+
+
+def _read_file_worker(file_path: str) -> Tuple[List[Tuple], float]:
+    """
+    Lê um arquivo em um processo do pool (precisa ser função de módulo)
+
+    Returns:
+        Tuple: (registros, segundos gastos na leitura)
+    """
+    inicio = time.perf_counter()
+    registros = ExcelService().read_data(file_path)
+    return registros, time.perf_counter() - inicio
+
+
+class HotFolderWatcher:
+    def __init__(self, folder: str, database, workers: int = 4, interval: float = 2.0,
+                 done_dir: Optional[str] = None, failed_dir: Optional[str] = None,
+                 log_path: Optional[str] = None, seen_keys_max: int = SEEN_KEYS_MAX):
+        """
+        Monitora uma pasta e importa as planilhas (Excel, CSV, Parquet) que forem chegando.
+
+        A leitura das planilhas roda em paralelo em um pool de processos
+        limitado a `workers`; a deduplicação e a gravação no banco rodam no
+        processo principal, um arquivo por vez, para que duplicatas entre
+        arquivos do mesmo lote sejam detectadas.
+
+        Args:
+            folder (str): Pasta monitorada
+            database: Instância de Database usada para deduplicar e inserir
+            workers (int): Número máximo de arquivos lidos em paralelo
+            interval (float): Intervalo entre varreduras, em segundos
+            done_dir (str): Pasta para arquivos importados (padrão: folder/done)
+            failed_dir (str): Pasta para arquivos com falha (padrão: folder/failed)
+            log_path (str): CSV com vazão/latência por arquivo (padrão: folder/import_log.csv)
+            seen_keys_max (int): Chaves recentes lembradas entre arquivos (as mais antigas
+                                 saem; o banco continua barrando as duplicatas)
+        """
+        self.folder = os.path.abspath(folder)
+        self.database = database
+        self.workers = max(1, workers)
+        self.interval = interval
+        self.done_dir = done_dir or os.path.join(self.folder, 'done')
+        self.failed_dir = failed_dir or os.path.join(self.folder, 'failed')
+        self.log_path = log_path or os.path.join(self.folder, 'import_log.csv')
+
+        # Última assinatura (mtime, tamanho) vista de cada arquivo e arquivos já tratados
+        self._pending: Dict[str, Tuple[float, int]] = {}
+        self._processed: Dict[str, Tuple[float, int]] = {}
+
+        # Chaves (op, unidade, arquivos) importadas recentemente (LRU limitado:
+        # o monitor roda por dias; check_duplicates no banco é a garantia final)
+        self._seen_keys = OrderedDict()
+        self.seen_keys_max = max(0, seen_keys_max)
+
+        self._stop_event = threading.Event()
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+        os.makedirs(self.done_dir, exist_ok=True)
+        os.makedirs(self.failed_dir, exist_ok=True)
+
+    def scan(self) -> List[str]:
+        """
+        Varre a pasta e retorna os arquivos novos ou alterados prontos para importar
+
+        Um arquivo só é considerado pronto quando sua assinatura (mtime, tamanho)
+        não muda entre duas varreduras seguidas, evitando ler uma cópia incompleta.
+
+        Returns:
+            List[str]: Caminhos dos arquivos prontos
+        """
+        prontos = []
+        vistos = set()
+
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                nome = entry.name
+                # Ignora arquivos temporários/de bloqueio do Excel
+                if nome.startswith('~$') or not nome.lower().endswith(WATCH_EXTENSIONS):
+                    continue
+
+                stat = entry.stat()
+                assinatura = (stat.st_mtime, stat.st_size)
+                vistos.add(entry.path)
+
+                if self._processed.get(entry.path) == assinatura:
+                    continue
+
+                if self._pending.get(entry.path) == assinatura:
+                    prontos.append(entry.path)
+                    del self._pending[entry.path]
+                else:
+                    self._pending[entry.path] = assinatura
+
+        # Esquece arquivos que sumiram da pasta
+        for path in list(self._pending):
+            if path not in vistos:
+                del self._pending[path]
+        for path in list(self._processed):
+            if path not in vistos:
+                del self._processed[path]
+
+        return sorted(prontos)
+
+    def process_files(self, file_paths: List[str]) -> List[dict]:
+        """
+        Importa uma lista de arquivos: leitura em paralelo, gravação sequencial
+
+        Args:
+            file_paths (List[str]): Arquivos a importar
+
+        Returns:
+            List[dict]: Resultado de cada arquivo (mesmas colunas do log)
+        """
+        resultados = []
+        if not file_paths:
+            return resultados
+
+        # O pool é mantido entre as varreduras para não pagar a criação dos processos a cada rodada
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+
+        inicio = {}
+        futures = {}
+        for path in file_paths:
+            inicio[path] = time.perf_counter()
+            futures[self._pool.submit(_read_file_worker, path)] = path
+
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                registros, leitura_s = future.result()
+                resultado = self._import_records(path, registros)
+                resultado['leitura_s'] = leitura_s
+            except Exception as e:
+                resultado = self._new_result(path)
+                resultado['status'] = 'falha'
+                resultado['erro'] = str(e)
+
+            resultado['total_s'] = time.perf_counter() - inicio[path]
+            if resultado['total_s'] > 0:
+                resultado['registros_por_s'] = resultado['registros_lidos'] / resultado['total_s']
+
+            self._finish_file(path, resultado)
+            resultados.append(resultado)
+
+        return resultados
+
+    def run_once(self) -> List[dict]:
+        """
+        Executa uma varredura e importa os arquivos prontos
+
+        Returns:
+            List[dict]: Resultado de cada arquivo importado nesta rodada
+        """
+        return self.process_files(self.scan())
+
+    def run(self):
+        """Monitora a pasta até stop() ser chamado"""
+        logger.info(f"Monitorando {self.folder} (workers={self.workers}, intervalo={self.interval}s)")
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    for resultado in self.run_once():
+                        print(f"{resultado['arquivo']}: {resultado['status']} - "
+                              f"{resultado['registros_importados']}/{resultado['registros_lidos']} registros "
+                              f"em {resultado['total_s']:.2f}s")
+                except Exception as e:
+                    logger.error(f"Erro na varredura de {self.folder}: {e}")
+                self._stop_event.wait(self.interval)
+        finally:
+            self.close()
+
+    def stop(self):
+        """Sinaliza para run() encerrar após a varredura atual"""
+        self._stop_event.set()
+
+    def close(self):
+        """Encerra o pool de processos de leitura"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def _new_result(self, path: str) -> dict:
+        """Cria o dicionário de resultado vazio de um arquivo"""
+        return {
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'arquivo': os.path.basename(path),
+            'status': '',
+            'registros_lidos': 0,
+            'registros_importados': 0,
+            'duplicatas': 0,
+            'leitura_s': 0.0,
+            'banco_s': 0.0,
+            'total_s': 0.0,
+            'registros_por_s': 0.0,
+            'erro': ''
+        }
+
+    def _import_records(self, path: str, registros: List[Tuple]) -> dict:
+        """
+        Deduplica (contra o lote e o banco) e grava os registros de um arquivo
+        """
+        resultado = self._new_result(path)
+        resultado['registros_lidos'] = len(registros)
+
+        inicio = time.perf_counter()
+
+        # Remove chaves já vistas em outros arquivos desta execução (ou repetidas no próprio arquivo)
+        unicos = []
+        chaves_arquivo = set()
+        for registro in registros:
+            chave = (registro[0], registro[1], registro[2])
+            if chave in self._seen_keys or chave in chaves_arquivo:
+                continue
+            chaves_arquivo.add(chave)
+            unicos.append(registro)
+
+        # Remove o que já existe no banco
+        novos = unicos
+        if unicos:
+            verificacao = self.database.check_duplicates(unicos)
+            novos = verificacao['novos']
+
+        if novos and not self.database.insert_multiple_registros(novos):
+            raise EtiquetaError("Falha ao salvar os dados no banco!")
+
+        self._remember_keys(chaves_arquivo)
+
+        resultado['banco_s'] = time.perf_counter() - inicio
+        resultado['registros_importados'] = len(novos)
+        resultado['duplicatas'] = len(registros) - len(novos)
+        resultado['status'] = 'importado' if novos else 'sem_novos'
+        return resultado
+
+    def _remember_keys(self, chaves):
+        """Guarda as chaves importadas, descartando as mais antigas acima do limite"""
+        for chave in chaves:
+            self._seen_keys[chave] = None
+            self._seen_keys.move_to_end(chave)
+        while len(self._seen_keys) > self.seen_keys_max:
+            self._seen_keys.popitem(last=False)
+
+    def _finish_file(self, path: str, resultado: dict):
+        """Move o arquivo para done/failed e grava a linha no log"""
+        destino_dir = self.failed_dir if resultado['status'] == 'falha' else self.done_dir
+        try:
+            self._move(path, destino_dir)
+        except OSError as e:
+            # Mantém o arquivo no lugar e marca como processado para não reimportar em loop
+            logger.error(f"Não foi possível mover {path}: {e}")
+            try:
+                stat = os.stat(path)
+                self._processed[path] = (stat.st_mtime, stat.st_size)
+            except OSError:
+                pass
+
+        self._write_log(resultado)
+
+    def _move(self, path: str, destino_dir: str):
+        """Move um arquivo sem sobrescrever outro de mesmo nome no destino"""
+        destino = os.path.join(destino_dir, os.path.basename(path))
+        if os.path.exists(destino):
+            base, ext = os.path.splitext(os.path.basename(path))
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            destino = os.path.join(destino_dir, f"{base}_{timestamp}{ext}")
+        shutil.move(path, destino)
+
+    def _write_log(self, resultado: dict):
+        """Acrescenta uma linha ao CSV de vazão/latência"""
+        novo_arquivo = not os.path.exists(self.log_path)
+        with open(self.log_path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=LOG_COLUMNS)
+            if novo_arquivo:
+                writer.writeheader()
+            linha = dict(resultado)
+            for campo in ('leitura_s', 'banco_s', 'total_s', 'registros_por_s'):
+                linha[campo] = f"{linha[campo]:.3f}"
+            linha['erro'] = ' '.join(str(linha['erro']).split())
+            writer.writerow(linha)
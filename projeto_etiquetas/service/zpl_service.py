@@ -0,0 +1,327 @@
+"""
+Geração de etiquetas em ZPL para impressoras Zebra.
+
+Mesmo layout de PDFService._draw_single_label_custom (OP, unidade, arquivo,
+nome, quantidade, data e logo), mas em comandos nativos: a impressora
+recebe alguns kilobytes de texto em vez de páginas PDF para rasterizar.
+A logo é enviada uma vez por job como gráfico armazenado (~DG) e as
+partes fixas da etiqueta (borda, logo, separador) como formato armazenado
+(^DF); cada etiqueta chama o formato com ^XF e só envia os textos.
+"""
+import io
+import os
+from datetime import datetime
+from typing import BinaryIO, Iterable, Iterator, Optional, Tuple, Union
+
+from reportlab.lib.units import mm
+
+from service.exceptions import EtiquetaError, NoRecordsError, ZPLGenerationError
+from service.label_record import LabelRecord, iter_label_records
+from service.text_layout import TextLayout
+from service.asset_pipeline import AssetPipeline
+from service.label_template import (HLineOp, LabelTemplate, LogoOp, RectOp, TextOp, compile_template,
+                                    load_template)
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Resoluções das cabeças de impressão Zebra suportadas (pontos por polegada)
+SUPPORTED_DPI = (203, 300)
+
+# Nomes do gráfico da logo e do formato fixo da etiqueta na memória RAM da impressora
+LOGO_GRAPHIC = "R:CDGLOGO.GRF"
+LABEL_FORMAT = "R:CDGETQ.ZPL"
+
+# Compressão ASCII do ZPL: repetições de 1-19 (G-Y) e múltiplos de 20 até 400 (g-z)
+_RUN_LOW = "GHIJKLMNOPQRSTUVWXY"
+_RUN_HIGH = "ghijklmnopqrstuvwxyz"
+
+
+def _run_code(count: int) -> str:
+    """Prefixo de repetição da compressão ASCII do ZPL para `count` caracteres"""
+    code = ""
+    while count > 400:
+        code += "z"
+        count -= 400
+    if count >= 20:
+        code += _RUN_HIGH[count // 20 - 1]
+        count %= 20
+    if count:
+        code += _RUN_LOW[count - 1]
+    return code
+
+
+def _compress_row(hex_row: str) -> str:
+    """Comprime uma linha hexadecimal do gráfico (',' = zeros até o fim da linha)"""
+    stripped = hex_row.rstrip("0")
+    if not stripped:
+        return ","
+    out = []
+    i = 0
+    while i < len(stripped):
+        ch = stripped[i]
+        j = i
+        while j < len(stripped) and stripped[j] == ch:
+            j += 1
+        run = j - i
+        out.append((_run_code(run) if run > 1 else "") + ch)
+        i = j
+    if len(stripped) < len(hex_row):
+        out.append(",")
+    return "".join(out)
+
+
+def _field_data(text: str) -> str:
+    """
+    Escapa o texto de um campo (^FH_): '_', '^' e '~' viram códigos hexadecimais
+    """
+    return (text.replace("_", "_5F")
+                .replace("^", "_5E")
+                .replace("~", "_7E"))
+
+
+class ZPLService:
+    def __init__(self, dpi: int = 203, label_size_mm: Tuple[float, float] = (100, 50),
+                 template: Optional[LabelTemplate] = None):
+        """
+        Inicializa o serviço de geração de ZPL
+
+        Args:
+            dpi (int): Resolução da impressora (203 ou 300)
+            label_size_mm (Tuple[float, float]): Tamanho da etiqueta em mm (largura, altura)
+            template (LabelTemplate): Layout da etiqueta (padrão: assets/templates/etiqueta_padrao.json)
+
+        Raises:
+            ValueError: Resolução não suportada
+            TemplateError: Template padrão ausente ou inválido
+        """
+        if dpi not in SUPPORTED_DPI:
+            raise ValueError(f"DPI não suportado: {dpi} (use {' ou '.join(map(str, SUPPORTED_DPI))})")
+
+        self.dpi = dpi
+        # Dimensões em pontos tipográficos, as mesmas usadas no PDF
+        self.label_width = label_size_mm[0] * mm
+        self.label_height = label_size_mm[1] * mm
+
+        # Mesma medição de texto do PDF, para quebrar as linhas nos mesmos lugares
+        self.text_layout = TextLayout()
+        # Tamanho fixo por serviço: o template é compilado uma vez
+        self.template = template or load_template()
+        self.plan = compile_template(self.template, self.label_width, self.label_height, self.text_layout)
+        self._logo_box = next((op for op in self.plan.static_ops if isinstance(op, LogoOp)), None)
+
+        # Logo convertida sob demanda uma única vez (1-bit pontilhada, cache em disco)
+        self.asset_pipeline = AssetPipeline()
+        self._logo_download = None
+        self._template = None
+
+    def _dots(self, points: float) -> int:
+        """Converte pontos tipográficos (1/72") em pontos da impressora"""
+        return int(round(points * self.dpi / 72.0))
+
+    def _load_logo_download(self) -> str:
+        """
+        Converte a logo para um gráfico 1-bit e monta o comando ~DG
+
+        Returns:
+            str: Comando ~DG (vazio se não houver logo raster, Pillow ou caixa de logo no template)
+        """
+        if not PIL_AVAILABLE or self._logo_box is None:
+            return ""
+
+        assets_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'assets')
+        for nome in ('cdg_logo.jpg', 'cdg_logo.png'):
+            img_path = os.path.join(assets_dir, nome)
+            if not os.path.exists(img_path):
+                continue
+            try:
+                # Já reduzida e pontilhada na resolução da Zebra, dentro da caixa da logo
+                box = self._logo_box
+                prepared = self.asset_pipeline.prepare(img_path, box.largura, box.altura, self.dpi, '1')
+                with Image.open(prepared.path) as img:
+                    # Invertido: bit 1 = ponto impresso, sobra da linha = 0
+                    bitmap = ImageOps.invert(img.convert('L')).convert('1', dither=Image.Dither.NONE)
+
+                box_w, box_h = self._dots(box.largura), self._dots(box.altura)
+                row_bytes = (bitmap.width + 7) // 8
+                data = bitmap.tobytes()
+
+                rows = []
+                previous = None
+                for r in range(bitmap.height):
+                    hex_row = data[r * row_bytes:(r + 1) * row_bytes].hex().upper()
+                    # ':' repete a linha anterior
+                    rows.append(":" if hex_row == previous else _compress_row(hex_row))
+                    previous = hex_row
+
+                self._logo_offset = ((box_w - bitmap.width) // 2, (box_h - bitmap.height) // 2)
+                return f"~DG{LOGO_GRAPHIC},{row_bytes * bitmap.height},{row_bytes},{''.join(rows)}\n"
+            except Exception as e:
+                print(f"Erro ao converter logo para ZPL: {e}")
+        return ""
+
+    def logo_download(self) -> str:
+        """
+        Comando que grava a logo na impressora (enviado uma vez por job)
+
+        Returns:
+            str: Comando ~DG, ou string vazia quando a logo não está disponível
+        """
+        if self._logo_download is None:
+            self._logo_offset = (0, 0)
+            self._logo_download = self._load_logo_download()
+        return self._logo_download
+
+    def _label_template(self) -> str:
+        """
+        Partes fixas da etiqueta (borda, logo e separador), montadas uma vez
+        
+        Returns:
+            str: Comando ^DF que grava o formato fixo na impressora
+        """
+        if self._template is not None:
+            return self._template
+
+        width, height = self._dots(self.label_width), self._dots(self.label_height)
+        partes = [f"^PW{width}", f"^LL{height}"]
+
+        for op in self.plan.static_ops:
+            if isinstance(op, RectOp):
+                # --- Borda da etiqueta ---
+                partes.append(f"^FO{self._dots(op.x)},{self._dots(self.label_height - op.y - op.altura)}"
+                              f"^GB{self._dots(op.largura)},{self._dots(op.altura)},{max(1, self._dots(op.espessura))}^FS")
+            elif isinstance(op, LogoOp):
+                # --- Logo ---
+                logo_x = self._dots(op.x)
+                logo_y = self._dots(self.label_height - op.y - op.altura)
+                if self.logo_download():
+                    off_x, off_y = self._logo_offset
+                    partes.append(f"^FO{logo_x + off_x},{logo_y + off_y}^XG{LOGO_GRAPHIC},1,1^FS")
+                else:
+                    # Fallback: caixa preenchida com "CDG" em negativo
+                    box_w, box_h = self._dots(op.largura), self._dots(op.altura)
+                    partes.append(f"^FO{logo_x},{logo_y}^GB{box_w},{box_h},{box_h}^FS")
+                    partes.append(f"^FO{logo_x},{logo_y + box_h // 4}^A0N,{box_h // 2}^FB{box_w},1,0,C^FR^FDCDG^FS")
+            elif isinstance(op, HLineOp):
+                # --- Linha separadora antes do rodapé (sem cinza no ZPL: preta) ---
+                espessura = max(1, self._dots(op.espessura))
+                partes.append(f"^FO{self._dots(op.x1)},{self._dots(self.label_height - op.y)}"
+                              f"^GB{self._dots(op.x2 - op.x1)},{espessura},{espessura}^FS")
+
+        self._template = f"^XA^DF{LABEL_FORMAT}^FS{''.join(partes)}^XZ\n"
+        return self._template
+
+    def job_header(self) -> str:
+        """
+        Cabeçalho do job: grava a logo e o formato fixo (enviado uma vez por job)
+        """
+        return self.logo_download() + self._label_template()
+
+    def _text(self, x_pt: float, baseline_pt: float, font_size: float, text: str) -> str:
+        """
+        Campo de texto com a linha de base em (x, y) nas coordenadas do PDF (origem embaixo)
+        """
+        x = self._dots(x_pt)
+        y = self._dots(self.label_height - baseline_pt)
+        return f"^FT{x},{y}^A0N,{self._dots(font_size)}^FH_^FD{_field_data(text)}^FS"
+
+    def _text_op(self, op: TextOp) -> str:
+        """
+        Campo de texto do plano; alinhado à direita vira um bloco (^FB) que termina em op.x
+        """
+        if op.alinhamento == 'direita':
+            size = self._dots(op.tamanho)
+            return (f"^FO0,{self._dots(self.label_height - op.y) - size}^A0N,{size}"
+                    f"^FB{self._dots(op.x)},1,0,R^FH_^FD{_field_data(op.texto)}^FS")
+        return self._text(op.x, op.y, op.tamanho, op.texto)
+
+    def render_label(self, etiqueta: LabelRecord, copies: int = 1, data_geracao: Optional[str] = None) -> str:
+        """
+        Gera o formato ZPL (^XA ... ^XZ) de uma etiqueta
+
+        Segue as mesmas posições, tamanhos e quebras de linha do PDF. O
+        formato chama o formato fixo gravado por job_header(), que precisa ter
+        sido enviado antes à impressora.
+
+        Args:
+            etiqueta (LabelRecord): Dados da etiqueta
+            copies (int): Cópias impressas desta etiqueta (^PQ)
+            data_geracao (str): Data/hora exibida no rodapé (padrão: agora)
+
+        Returns:
+            str: Formato ZPL da etiqueta
+        """
+        partes = [f"^XA^XF{LABEL_FORMAT}^FS^CI28"]
+
+        data_geracao = data_geracao or datetime.now().strftime("%d/%m/%Y %H:%M")
+        for op in self.plan.text_ops(etiqueta) + self.plan.job_ops(data_geracao):
+            partes.append(self._text_op(op))
+
+        if copies > 1:
+            partes.append(f"^PQ{copies}")
+        partes.append("^XZ\n")
+        return "".join(partes)
+
+    def iter_zpl(self, registros: Iterable[Tuple], copies: int = 1) -> Iterator[str]:
+        """
+        Percorre o job ZPL: o cabeçalho (logo e formato fixo) uma vez e depois
+        um formato por etiqueta
+
+        Args:
+            registros (Iterable[Tuple]): Registros (id, op, unidade, arquivos, qtde[, nome])
+            copies (int): Cópias de cada etiqueta
+
+        Yields:
+            str: Trechos do job, na ordem de envio
+        """
+        yield self.job_header()
+        # Uma data por job, como no cabeçalho de um lote impresso
+        data_geracao = datetime.now().strftime("%d/%m/%Y %H:%M")
+        for etiqueta in iter_label_records(registros):
+            yield self.render_label(etiqueta, copies=copies, data_geracao=data_geracao)
+
+    def generate_labels_zpl(self, registros: Iterable[Tuple], output: Union[str, BinaryIO], copies: int = 1) -> int:
+        """
+        Gera o job ZPL das etiquetas em um arquivo .zpl ou stream binário
+
+        Args:
+            registros (Iterable[Tuple]): Registros (id, op, unidade, arquivos, qtde[, nome])
+            output (str | BinaryIO): Caminho do arquivo ou stream (ex.: socket.makefile('wb'))
+            copies (int): Cópias de cada etiqueta (^PQ)
+
+        Returns:
+            int: Quantidade de etiquetas geradas
+
+        Raises:
+            NoRecordsError: Nenhuma etiqueta a gerar
+            ZPLGenerationError: Falha ao gerar ou gravar o job
+        """
+        try:
+            # Monta em memória e só grava se houver etiquetas (jobs ZPL são pequenos)
+            buffer = io.StringIO()
+            buffer.write(self.job_header())
+            data_geracao = datetime.now().strftime("%d/%m/%Y %H:%M")
+            total = 0
+            for etiqueta in iter_label_records(registros):
+                buffer.write(self.render_label(etiqueta, copies=copies, data_geracao=data_geracao))
+                total += 1
+
+            if total == 0:
+                raise NoRecordsError("Nenhuma etiqueta para gerar")
+
+            data = buffer.getvalue().encode('utf-8')
+            if isinstance(output, (str, os.PathLike)):
+                with open(output, 'wb') as f:
+                    f.write(data)
+            else:
+                output.write(data)
+            return total
+
+        except EtiquetaError:
+            raise
+        except Exception as e:
+            print(f"Erro ao gerar ZPL: {e}")
+            raise ZPLGenerationError(f"Erro ao gerar ZPL: {e}") from e
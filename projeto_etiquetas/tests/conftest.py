@@ -0,0 +1,5 @@
+"""Configuração dos testes: importa os pacotes do projeto como o main.py faz"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,175 @@
+"""
+Testes do PDFService: um mesmo serviço atendendo vários jobs ao mesmo tempo
+gera exatamente os mesmos bytes que a geração em série, e as etiquetas não
+mudam a saída de outros PDFs do ReportLab gerados ao mesmo tempo.
+"""
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+from PIL import Image
+from reportlab import rl_config
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+import service.pdf_service as pdf_service
+from service.pdf_service import PDFService
+from service.render_cache import RenderCache
+
+
+class FixedDatetime(datetime):
+    """Relógio fixo: a data de geração impressa na etiqueta não varia entre execuções"""
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2024, 1, 2, 3, 4, 5)
+
+
+@pytest.fixture(autouse=True)
+def deterministic_pdf(monkeypatch, tmp_path):
+    # invariant: data de criação e id do documento fixos no PDF
+    monkeypatch.setattr(rl_config, 'invariant', 1)
+    monkeypatch.setattr(pdf_service, 'datetime', FixedDatetime)
+    monkeypatch.setenv('ETIQUETAS_ASSET_CACHE', str(tmp_path / 'assets'))
+
+
+def make_registros(quantidade, op='OP'):
+    return [(i, f'{op}{i % 7}', f'Unidade {i % 5}', f'arquivo_{i}.pdf', (i % 4) + 1, f'Nome {i}', 'Pendente')
+            for i in range(1, quantidade + 1)]
+
+
+# Jobs com layouts diferentes: cada um leva a própria geometria, sem afetar os outros
+JOBS = [
+    dict(registros=make_registros(40, 'A'), kwargs={}),
+    dict(registros=make_registros(25, 'B'), kwargs=dict(label_size_mm=(100, 60))),
+    dict(registros=make_registros(10, 'C'), kwargs=dict(label_size_mm=(60, 40), single_per_page=True)),
+    dict(registros=make_registros(30, 'D'), kwargs=dict(copies=True, number_copies=True)),
+    dict(registros=make_registros(15, 'E'), kwargs=dict(label_size_mm=(50, 30))),
+    dict(registros=make_registros(35, 'F'), kwargs=dict(single_per_page=True)),
+]
+
+
+def render(service, job):
+    return service.render_labels_pdf(job['registros'], **job['kwargs'])
+
+
+@pytest.mark.parametrize('with_cache', [False, True])
+def test_concurrent_rendering_matches_serial(tmp_path, with_cache):
+    cache = RenderCache(str(tmp_path / 'render_cache.db')) if with_cache else None
+    service = PDFService(render_cache=cache)
+    try:
+        serial = [render(service, job) for job in JOBS]
+        assert all(pdf.startswith(b'%PDF') for pdf in serial)
+        # A mesma geração repetida é idêntica (o teste não depende de relógio)
+        assert render(service, JOBS[0]) == serial[0]
+
+        with ThreadPoolExecutor(max_workers=len(JOBS)) as pool:
+            for _ in range(3):
+                concorrente = list(pool.map(lambda job: render(service, job), JOBS * 2))
+                assert concorrente == serial * 2
+    finally:
+        service.close()
+
+
+def page_texts(pdf_path):
+    """(fonte real, texto) de cada texto de cada página, resolvendo os nomes internos pelos recursos da página"""
+    from pypdf import PdfReader
+    from pypdf.generic import ContentStream
+
+    paginas = []
+    for page in PdfReader(pdf_path).pages:
+        fontes = page['/Resources']['/Font']
+        textos = []
+        fonte = None
+        for operandos, operador in ContentStream(page.get_contents(), page.pdf).operations:
+            if operador == b'Tf':
+                fonte = fontes[operandos[0]]['/BaseFont']
+            elif operador == b'Tj':
+                textos.append((fonte, operandos[0]))
+        paginas.append(textos)
+    return paginas
+
+
+def test_parallel_merge_keeps_fonts_and_date(tmp_path, monkeypatch):
+    pytest.importorskip('pypdf')
+    from service.label_template import load_template
+
+    # Campo opcional no início, com fonte própria: a primeira etiqueta de cada lote muda a ordem de uso das fontes
+    caminho = tmp_path / 'template.json'
+    caminho.write_text('''{
+      "nome": "opcional_primeiro",
+      "margem_mm": 3,
+      "borda": {"espessura_pt": 1},
+      "bloco": {"primeira_linha_pt": 14, "campos": [
+        {"campo": "nome", "fonte": "Courier-Bold", "tamanho_pt": 9, "entrelinha_pt": 11, "omitir_vazio": true},
+        {"campo": "op", "rotulo": "OP: ", "fonte": "Helvetica-Bold", "tamanho_pt": 12, "entrelinha_pt": 14},
+        {"campo": "arquivo", "fonte": "Times-Roman", "tamanho_pt": 8, "entrelinha_pt": 10}
+      ]},
+      "rodape": [
+        {"campo": "qtde", "rotulo": "Qtde: ", "fonte": "Helvetica", "tamanho_pt": 10, "alinhamento": "direita"},
+        {"campo": "data", "fonte": "Helvetica-Oblique", "tamanho_pt": 6}
+      ]
+    }''', encoding='utf-8')
+    template = load_template(str(caminho))
+
+    registros = [(i, f'OP{i}', 'UN', f'arquivo_{i}.pdf', 1, '' if i % 2 else f'Nome {i}', 'Pendente')
+                 for i in range(1, 7)]
+    service = PDFService(template=template)
+    try:
+        service.generate_labels_pdf(registros, str(tmp_path / 'serial.pdf'), single_per_page=True)
+        # Um lote por etiqueta, em processos diferentes
+        arquivos = service.generate_labels_pdf_parallel(registros, str(tmp_path / 'paralelo.pdf'),
+                                                        single_per_page=True, workers=2, shard_size=1)
+    finally:
+        service.close()
+
+    assert arquivos == [str(tmp_path / 'paralelo.pdf')]
+    serial = page_texts(str(tmp_path / 'serial.pdf'))
+    paralelo = page_texts(arquivos[0])
+    assert len(paralelo) == len(registros)
+    assert paralelo == serial
+    # Mesma data em todas as etiquetas do job
+    datas = {texto for pagina in paralelo for fonte, texto in pagina if fonte == '/Helvetica-Oblique'}
+    assert datas == {'02/01/2024 03:04'}
+
+
+def render_report():
+    """Relatório feito direto com o canvas do ReportLab (segue a configuração global)"""
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer)
+    c.drawImage(ImageReader(Image.new('RGB', (40, 20), 'red')), 50, 700)
+    for linha in range(40):
+        c.drawString(50, 650 - linha * 14, f'Linha {linha} do relatório')
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def test_label_jobs_do_not_change_concurrent_reports():
+    esperado = render_report()
+    assert b'/ASCII85Decode' in esperado  # padrão do ReportLab (useA85)
+
+    service = PDFService()
+    parar = threading.Event()
+
+    def etiquetas():
+        while not parar.is_set():
+            pdf = render(service, JOBS[0])
+            assert b'/ASCII85Decode' not in pdf
+
+    try:
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            futuros = [pool.submit(etiquetas) for _ in range(3)]
+            try:
+                relatorios = [render_report() for _ in range(30)]
+            finally:
+                parar.set()
+            for futuro in futuros:
+                futuro.result()
+    finally:
+        service.close()
+
+    assert relatorios == [esperado] * 30
+    assert rl_config.useA85 == 1
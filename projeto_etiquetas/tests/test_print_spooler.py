@@ -0,0 +1,275 @@
+"""
+Testes do spooler de impressão contra uma impressora falsa em TCP local
+(grava os bytes recebidos por conexão; pode ser lenta ou recusar conexões).
+"""
+import socket
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from service.print_spooler import (
+    STATUS_CONCLUIDO, STATUS_FALHA, STATUS_PENDENTE, Printer, PrintSpooler
+)
+
+
+class FakePrinter:
+    """Impressora raw em 127.0.0.1: aceita conexões e guarda os bytes de cada uma"""
+
+    def __init__(self, port: int = 0, delay: float = 0.0):
+        self.delay = delay
+        self.connections = []
+        self._lock = threading.Lock()
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(('127.0.0.1', port))
+        self._sock.listen(16)
+        self._sock.settimeout(0.1)
+        self.port = self._sock.getsockname()[1]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except socket.timeout:
+                continue
+            threading.Thread(target=self._receive, args=(conn,), daemon=True).start()
+
+    def _receive(self, conn):
+        with conn:
+            time.sleep(self.delay)  # impressora lenta: demora a consumir
+            partes = []
+            while True:
+                dados = conn.recv(65536)
+                if not dados:
+                    break
+                partes.append(dados)
+            # Grava antes de fechar: quando o spooler vê o fechamento, os bytes já estão aqui
+            with self._lock:
+                self.connections.append(b''.join(partes))
+
+    def received(self):
+        with self._lock:
+            return list(self.connections)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self._sock.close()
+
+
+def free_port() -> int:
+    """Porta local sem ninguém escutando (conexões são recusadas)"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until(condicao, timeout: float = 5.0) -> bool:
+    limite = time.time() + timeout
+    while time.time() < limite:
+        if condicao():
+            return True
+        time.sleep(0.02)
+    return condicao()
+
+
+def job_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute('SELECT id, status, tentativas, proximo_envio, atualizado_em, impressora_usada '
+                            'FROM print_jobs ORDER BY id').fetchall()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def printers():
+    criadas = []
+
+    def criar(**kw):
+        printer = FakePrinter(**kw)
+        criadas.append(printer)
+        return printer
+
+    yield criar
+    for printer in criadas:
+        printer.close()
+
+
+@pytest.fixture
+def make_spooler(tmp_path):
+    spoolers = []
+
+    def criar(lista, **kw):
+        kw.setdefault('poll_interval', 0.05)
+        kw.setdefault('timeout', 2.0)
+        spooler = PrintSpooler(lista, str(tmp_path / 'spool.db'), **kw)
+        spoolers.append(spooler)
+        return spooler
+
+    yield criar
+    for spooler in spoolers:
+        spooler.stop()
+
+
+class RecordingExecutor:
+    """Executor que só registra os envios (mantém a carga das impressoras)"""
+
+    def __init__(self):
+        self.envios = []
+
+    def submit(self, fn, printer, lote, tamanho):
+        self.envios.append((printer.name, [job.id for job in lote]))
+
+    def shutdown(self, wait=True):
+        pass
+
+
+def test_dispatch_picks_least_loaded_printer(make_spooler):
+    spooler = make_spooler([Printer('a', '127.0.0.1', 9, max_concurrency=2),
+                            Printer('b', '127.0.0.1', 9, max_concurrency=2)])
+    grande = spooler.submit(b'x' * 1000, formato='pdf')
+    pequeno1 = spooler.submit(b'y' * 10, formato='pdf')
+    pequeno2 = spooler.submit(b'z' * 10, formato='pdf')
+    executor = RecordingExecutor()
+    spooler._executor = executor
+
+    assert spooler._dispatch_once() == 3
+    # O job grande ocupa "a"; os pequenos vão para "b", que tem menos bytes em andamento
+    assert executor.envios == [('a', [grande]), ('b', [pequeno1]), ('b', [pequeno2])]
+    assert spooler._inflight_bytes == {'a': 1000, 'b': 20}
+
+
+def test_dispatch_spreads_jobs_over_printers(printers, make_spooler):
+    lenta = printers(delay=0.5)
+    rapida = printers()
+    spooler = make_spooler([Printer('lenta', '127.0.0.1', lenta.port),
+                            Printer('rapida', '127.0.0.1', rapida.port)])
+    for i in range(4):
+        spooler.submit(b'%PDF-' + bytes([i]) * 100, formato='pdf')
+    spooler.start()
+
+    assert spooler.wait(timeout=10)
+    usadas = {row[5] for row in job_rows(spooler.db_path)}
+    assert usadas == {'lenta', 'rapida'}
+    assert len(lenta.received()) + len(rapida.received()) == 4
+
+
+def test_small_zpl_jobs_are_batched_in_one_connection(printers, make_spooler):
+    zebra = printers()
+    spooler = make_spooler([Printer('zebra', '127.0.0.1', zebra.port)], batch_max_bytes=30)
+    partes = [b'^XA^FD%d^FS^XZ' % i for i in range(3)]  # 13 bytes cada
+    for parte in partes:
+        spooler.submit(parte, formato='zpl')
+    spooler.submit(b'%PDF-1.4 conteudo', formato='pdf')
+    spooler.start()
+
+    assert spooler.wait(timeout=10)
+    assert wait_until(lambda: len(zebra.received()) == 3)
+    # Dois ZPL cabem em 30 bytes e vão juntos, na ordem; o terceiro vai sozinho; PDF nunca é agrupado
+    assert sorted(zebra.received()) == sorted([partes[0] + partes[1], partes[2], b'%PDF-1.4 conteudo'])
+    assert all(row[1] == STATUS_CONCLUIDO for row in job_rows(spooler.db_path))
+
+
+def test_refused_connection_is_retried_with_backoff(printers, make_spooler):
+    porta = free_port()
+    spooler = make_spooler([Printer('zebra', '127.0.0.1', porta)], retry_delay=0.3, max_retries=5)
+    job_id = spooler.submit(b'^XA^FDretry^FS^XZ', formato='zpl')
+    spooler.start()
+
+    assert wait_until(lambda: job_rows(spooler.db_path)[0][2] >= 1)
+    _, status, tentativas, proximo_envio, atualizado_em, _ = job_rows(spooler.db_path)[0]
+    assert status == STATUS_PENDENTE
+    assert proximo_envio - atualizado_em == pytest.approx(0.3 * 2 ** (tentativas - 1), abs=0.05)
+
+    # Espera crescente: a segunda falha agenda o dobro
+    assert wait_until(lambda: job_rows(spooler.db_path)[0][2] >= 2)
+    _, _, tentativas, proximo_envio, atualizado_em, _ = job_rows(spooler.db_path)[0]
+    assert proximo_envio - atualizado_em == pytest.approx(0.3 * 2 ** (tentativas - 1), abs=0.05)
+
+    # A impressora volta: o job sai na próxima tentativa
+    zebra = printers(port=porta)
+    assert spooler.wait(timeout=10)
+    assert job_rows(spooler.db_path)[0][:2] == (job_id, STATUS_CONCLUIDO)
+    assert wait_until(lambda: zebra.received() == [b'^XA^FDretry^FS^XZ'])
+
+
+def test_job_fails_after_max_retries(make_spooler):
+    spooler = make_spooler([Printer('zebra', '127.0.0.1', free_port())], retry_delay=0.05, max_retries=2)
+    spooler.submit(b'^XA^XZ', formato='zpl')
+    spooler.start()
+
+    assert spooler.wait(timeout=10)
+    _, status, tentativas, _, _, _ = job_rows(spooler.db_path)[0]
+    assert (status, tentativas) == (STATUS_FALHA, 2)
+
+
+def test_on_printed_only_after_successful_send(printers, make_spooler):
+    porta = free_port()
+    chamadas = []
+    recebido_na_chamada = []
+    zebra = None
+
+    def on_printed(ids):
+        chamadas.append(ids)
+        recebido_na_chamada.append(zebra is not None and bool(zebra.received()))
+        return True
+
+    spooler = make_spooler([Printer('zebra', '127.0.0.1', porta)], on_printed=on_printed,
+                           retry_delay=0.3, max_retries=5)
+    spooler.submit(b'^XA^FDok^FS^XZ', formato='zpl', registro_ids=[7, 8])
+    spooler.start()
+
+    # Enquanto a conexão é recusada, nada é marcado como impresso
+    assert wait_until(lambda: job_rows(spooler.db_path)[0][2] >= 1)
+    assert chamadas == []
+
+    zebra = printers(port=porta)
+    assert spooler.wait(timeout=10)
+    assert chamadas == [[7, 8]]
+    assert recebido_na_chamada == [True]
+
+
+def payload_sizes(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return dict(conn.execute('SELECT id, length(payload) FROM print_jobs').fetchall())
+    finally:
+        conn.close()
+
+
+def test_payload_is_freed_after_successful_send(printers, make_spooler):
+    zebra = printers()
+    spooler = make_spooler([Printer('zebra', '127.0.0.1', zebra.port)])
+    job_id = spooler.submit(b'%PDF-' + b'x' * 50000, formato='pdf')
+    spooler.start()
+
+    assert spooler.wait(timeout=10)
+    assert wait_until(lambda: len(zebra.received()) == 1)
+    assert len(zebra.received()[0]) == 50005
+    assert payload_sizes(spooler.db_path) == {job_id: 0}
+
+
+def test_purge_finished_keeps_pending_and_recent_jobs(make_spooler):
+    spooler = make_spooler([Printer('zebra', '127.0.0.1', 9)])
+    antigo = spooler.submit(b'^XA^XZ', formato='zpl')
+    recente = spooler.submit(b'^XA^XZ', formato='zpl')
+    falho = spooler.submit(b'^XA^XZ', formato='zpl')
+    pendente = spooler.submit(b'^XA^XZ', formato='zpl')
+    conn = sqlite3.connect(spooler.db_path)
+    agora = time.time()
+    conn.executemany('UPDATE print_jobs SET status = ?, atualizado_em = ? WHERE id = ?',
+                     [(STATUS_CONCLUIDO, agora - 3600, antigo), (STATUS_CONCLUIDO, agora, recente),
+                      (STATUS_FALHA, agora - 3600, falho)])
+    conn.commit()
+    conn.close()
+
+    assert spooler.purge_finished(older_than=60) == 2
+    assert sorted(payload_sizes(spooler.db_path)) == [recente, pendente]
+    assert spooler.purge_finished(older_than=None) == 1
+    assert list(payload_sizes(spooler.db_path)) == [pendente]
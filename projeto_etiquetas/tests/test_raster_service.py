@@ -0,0 +1,55 @@
+"""
+Testes do RasterService: TIFF de várias páginas gravado pela API pública do Pillow.
+"""
+from datetime import datetime
+
+import pytest
+from PIL import Image
+
+import service.raster_service as raster_service
+from service.exceptions import NoRecordsError
+from service.raster_service import RasterService
+
+
+class FixedDatetime(datetime):
+    """Relógio fixo: a data impressa não muda entre a geração e a comparação"""
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2024, 1, 2, 3, 4, 5)
+
+
+def make_registros(quantidade):
+    return [(i, f'OP{i % 7}', f'Unidade {i % 5}', f'arquivo_{i}.pdf', (i % 4) + 1, f'Nome {i}', 'Pendente')
+            for i in range(1, quantidade + 1)]
+
+
+@pytest.fixture(autouse=True)
+def deterministic_raster(monkeypatch, tmp_path):
+    monkeypatch.setattr(raster_service, 'datetime', FixedDatetime)
+    monkeypatch.setenv('ETIQUETAS_ASSET_CACHE', str(tmp_path / 'assets'))
+
+
+@pytest.mark.parametrize('mode, compression', [('1', 'group4'), ('L', 'tiff_lzw')])
+def test_tiff_has_one_page_per_label(tmp_path, mode, compression):
+    service = RasterService(dpi=203, label_size_mm=(60, 40), mode=mode)
+    destino = str(tmp_path / 'etiquetas.tif')
+    registros = make_registros(12)
+
+    assert service.generate_labels_tiff(registros, destino) == 12
+
+    esperadas = list(service.iter_images(registros))
+    with Image.open(destino) as tiff:
+        assert tiff.n_frames == 12
+        for pagina, esperada in enumerate(esperadas):
+            tiff.seek(pagina)
+            assert tiff.info['compression'] == compression
+            assert tiff.size == service.size
+            assert tiff.convert(mode).tobytes() == esperada.tobytes()
+
+
+def test_tiff_without_records_writes_nothing(tmp_path):
+    destino = tmp_path / 'vazio.tif'
+    with pytest.raises(NoRecordsError):
+        RasterService().generate_labels_tiff([], str(destino))
+    assert not destino.exists()
@@ -0,0 +1,100 @@
+"""Testes dos leitores de entrada e da importação em blocos"""
+import pytest
+
+from controller.etiqueta_controller import EtiquetaController
+from service.exceptions import ImportCancelledError, NoRecordsError
+from service.excel_service import ExcelService
+from service.readers import CSVReader, RecordReader
+
+
+def write_csv(path, linhas):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('op;unidade;arquivos;qtde;nome\n')
+        for op, unidade, arquivo, qtde in linhas:
+            f.write(f'{op};{unidade};{arquivo};{qtde};\n')
+    return str(path)
+
+
+def test_reader_without_iter_records_fails_on_creation():
+    class SemLeitura(RecordReader):
+        extensions = ('.x',)
+
+    with pytest.raises(TypeError):
+        SemLeitura()
+
+
+def test_stream_records_reads_csv_in_chunks(tmp_path):
+    caminho = write_csv(tmp_path / 'dados.csv', [('OP1', 'UN', f'arq{i}', 1) for i in range(25)])
+    leitor = CSVReader(chunksize=4)
+
+    registros = leitor.stream_records(caminho)
+    assert next(registros) == ('OP1', 'UN', 'arq0', 1, '')
+    assert len(list(registros)) == 24
+    assert leitor.read_records(caminho)[-1][2] == 'arq24'
+
+
+def test_stream_records_without_valid_rows(tmp_path):
+    caminho = write_csv(tmp_path / 'vazio.csv', [('OP1', 'UN', 'arq', 0)])
+    with pytest.raises(NoRecordsError):
+        list(CSVReader().stream_records(caminho))
+
+
+class MemoryDatabase:
+    def __init__(self, existentes=()):
+        self.rows = list(existentes)
+        self.lotes = []
+
+    def check_duplicates(self, registros):
+        chaves = {(r[0], r[1], r[2]) for r in self.rows}
+        duplicatas = [{'novo': r, 'existente': (0,) + tuple(r), 'mesmo_qtde': True}
+                      for r in registros if (r[0], r[1], r[2]) in chaves]
+        novos = [r for r in registros if (r[0], r[1], r[2]) not in chaves]
+        return {'duplicatas': duplicatas, 'novos': novos,
+                'total_duplicatas': len(duplicatas), 'total_novos': len(novos)}
+
+    def insert_multiple_registros(self, registros):
+        self.lotes.append(len(registros))
+        self.rows.extend(registros)
+        return True
+
+
+def make_controller(database):
+    controller = EtiquetaController.__new__(EtiquetaController)
+    controller.excel_service = ExcelService()
+    controller.database = database
+    return controller
+
+
+def test_import_is_deduplicated_and_inserted_in_chunks(tmp_path):
+    caminho = write_csv(tmp_path / 'dados.csv', [('OP1', 'UN', f'arq{i}', 2) for i in range(10)])
+    database = MemoryDatabase(existentes=[('OP1', 'UN', 'arq3', 2, '')])
+
+    resultado = make_controller(database).import_excel_file(caminho, chunk_size=4)
+
+    assert database.lotes == [3, 4, 2]
+    assert resultado['registros_lidos'] == 10
+    assert resultado['registros_importados'] == 9
+    assert resultado['total_duplicatas'] == 1
+    assert resultado['qualidade']['total_registros'] == 10
+
+
+def test_import_cancelled_before_writing_anything(tmp_path):
+    caminho = write_csv(tmp_path / 'dados.csv', [('OP1', 'UN', f'arq{i}', 1) for i in range(10)])
+    database = MemoryDatabase()
+    controller = make_controller(database)
+    # Força um problema de qualidade em um bloco do meio
+    validar = controller.excel_service.validate_data_quality
+    controller.excel_service.validate_data_quality = lambda lote, primeira_linha=1: dict(
+        validar(lote, primeira_linha), registros_com_problemas=1 if primeira_linha == 5 else 0)
+
+    with pytest.raises(ImportCancelledError):
+        controller.import_excel_file(caminho, confirmar_problemas=lambda q: False, chunk_size=4)
+    assert database.lotes == []
+
+
+def test_import_with_only_duplicates(tmp_path):
+    caminho = write_csv(tmp_path / 'dados.csv', [('OP1', 'UN', 'arq', 1)])
+    database = MemoryDatabase(existentes=[('OP1', 'UN', 'arq', 1, '')])
+    with pytest.raises(NoRecordsError):
+        make_controller(database).import_excel_file(caminho)
+    assert database.lotes == []
@@ -0,0 +1,66 @@
+"""
+Testes do RenderCache: total guardado incrementalmente e LRU sem escrita a cada leitura.
+"""
+import sqlite3
+import time
+
+import service.render_cache as render_cache
+from service.render_cache import RenderCache
+
+
+def real_total(cache):
+    conn = sqlite3.connect(cache.db_path)
+    try:
+        return conn.execute('SELECT COALESCE(SUM(tamanho), 0) FROM renders').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def used_at(cache):
+    conn = sqlite3.connect(cache.db_path)
+    try:
+        return dict(conn.execute('SELECT chave, usado_em FROM renders').fetchall())
+    finally:
+        conn.close()
+
+
+def test_running_total_follows_inserts_replacements_and_eviction(tmp_path):
+    cache = RenderCache(str(tmp_path / 'cache.db'), max_bytes=1000)
+    cache.put_many({'a': b'x' * 300, 'b': b'x' * 300})
+    cache.put_many({'a': b'x' * 100})  # substitui: desconta o tamanho antigo
+    assert cache.stats()['bytes'] == real_total(cache) == 400
+
+    # Passa do limite: sai a entrada usada há mais tempo, até 90% do limite
+    cache.put_many({'c': b'x' * 700})
+    assert sorted(used_at(cache)) == ['a', 'c']
+    assert cache.stats()['bytes'] == real_total(cache) == 800
+
+    cache.clear()
+    assert cache.stats() == {'entradas': 0, 'bytes': 0, 'max_bytes': 1000}
+
+
+def test_existing_cache_gets_its_total_on_open(tmp_path):
+    caminho = str(tmp_path / 'cache.db')
+    RenderCache(caminho).put_many({'a': b'x' * 10, 'b': b'x' * 20})
+    conn = sqlite3.connect(caminho)
+    conn.execute('DROP TABLE renders_meta')
+    conn.commit()
+    conn.close()
+
+    assert RenderCache(caminho).stats()['bytes'] == 30
+
+
+def test_recent_hits_are_not_rewritten(tmp_path, monkeypatch):
+    cache = RenderCache(str(tmp_path / 'cache.db'))
+    cache.put_many({'a': b'1', 'b': b'2'})
+    antes = used_at(cache)
+
+    assert cache.get_many(['a', 'b', 'z']) == {'a': b'1', 'b': b'2'}
+    assert used_at(cache) == antes
+
+    # Depois do intervalo, a leitura marca o uso de novo (um UPDATE para o lote)
+    monkeypatch.setattr(render_cache, '_TOUCH_INTERVAL', 0)
+    time.sleep(0.01)
+    cache.get_many(['a'])
+    depois = used_at(cache)
+    assert depois['a'] > antes['a'] and depois['b'] == antes['b']
@@ -0,0 +1,43 @@
+"""Testes da deduplicação do monitor de pasta (sem banco: banco falso em memória)"""
+from service.watch_service import HotFolderWatcher
+
+
+class MemoryDatabase:
+    """Guarda as chaves inseridas e barra duplicatas como o banco real"""
+
+    def __init__(self):
+        self.keys = set()
+        self.checked = 0
+
+    def check_duplicates(self, registros):
+        self.checked += len(registros)
+        novos = [r for r in registros if (r[0], r[1], r[2]) not in self.keys]
+        return {'novos': novos}
+
+    def insert_multiple_registros(self, registros):
+        self.keys.update((r[0], r[1], r[2]) for r in registros)
+        return True
+
+
+def registros(inicio, fim):
+    return [('OP1', 'UN', f'arquivo_{i}', 1, 'nome') for i in range(inicio, fim)]
+
+
+def test_seen_keys_are_bounded_and_db_still_dedupes(tmp_path):
+    database = MemoryDatabase()
+    watcher = HotFolderWatcher(str(tmp_path), database, seen_keys_max=10)
+
+    for lote in range(20):
+        watcher._import_records(f'lote{lote}.csv', registros(lote * 5, lote * 5 + 5))
+    assert len(watcher._seen_keys) == 10
+
+    # Chave recente: barrada na memória, sem ir ao banco
+    checados = database.checked
+    resultado = watcher._import_records('recente.csv', registros(99, 100))
+    assert (resultado['registros_importados'], database.checked) == (0, checados)
+
+    # Chave antiga, já fora da memória: o banco continua barrando
+    resultado = watcher._import_records('antigo.csv', registros(0, 1))
+    assert resultado['registros_importados'] == 0
+    assert resultado['duplicatas'] == 1
+    assert database.checked == checados + 1
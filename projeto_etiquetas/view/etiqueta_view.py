@@ -1,6 +1,11 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from controller.etiqueta_controller import EtiquetaController
+from service.exceptions import ImportCancelledError
+from service.job_queue import (
+    STATUS_CANCELADO, STATUS_CONCLUIDO, STATUS_EXECUTANDO, STATUS_FALHA, STATUS_PENDENTE
+)
+from view.virtual_tree import VirtualTreeview
 import os
 from datetime import datetime
 import threading
@@ -28,6 +33,7 @@ class EtiquetaView:
         # Estado dos cards
         self.card_widgets = {}  # mapeia op -> widget do card
         self.selected_op = None
+        self.selected_ops = []  # cards selecionados (Ctrl+clique seleciona vários)
 
         # Sistema de filtros
         self.filter_entries = {}
@@ -40,6 +46,14 @@ class EtiquetaView:
 
         # Atualiza a lista inicial
         self.refresh_data()
+
+        # Fila de etiquetas/relatórios em segundo plano (retoma o que ficou da última sessão)
+        self.job_queue = self.controller.get_job_queue()
+        self.jobs_window = None
+        self.jobs_tree = None
+        self._active_jobs = set()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(1000, self.poll_jobs)
     
     def setup_main_window(self):
         """Configura a janela principal"""
@@ -133,6 +147,10 @@ class EtiquetaView:
                              command=self.generate_list_pdf, width=20)
         list_btn.grid(row=1, column=0, pady=3)
         
+        batch_btn = ttk.Button(pdf_frame, text="📦 Lote de OPs", 
+                              command=self.generate_labels_batch, width=20)
+        batch_btn.grid(row=2, column=0, pady=3)
+        
         # Separador
         ttk.Separator(buttons_frame, orient='horizontal').grid(row=5, column=0, sticky=(tk.W, tk.E), pady=8)
         
@@ -153,6 +171,14 @@ class EtiquetaView:
                                   command=self.toggle_view, width=20)
         self.view_btn.grid(row=2, column=0, pady=3)
         
+        export_btn = ttk.Button(mgmt_frame, text="📤 Exportar Dados", 
+                               command=self.export_data, width=20)
+        export_btn.grid(row=3, column=0, pady=3)
+        
+        jobs_btn = ttk.Button(mgmt_frame, text="⏳ Fila de Trabalhos", 
+                             command=self.show_jobs, width=20)
+        jobs_btn.grid(row=4, column=0, pady=3)
+        
     # Botão de limpar tudo removido por segurança
         
         # Informações do sistema
@@ -182,9 +208,9 @@ class EtiquetaView:
         self.filters_frame.grid_remove()
         
         # Area para mostrar os dados: pode ser Treeview (lista) ou cards (agrupado)
-        # Treeview (lista)
+        # Treeview (lista): virtual, só as linhas visíveis viram itens
         columns = ("ID", "OP", "Unidade", "Arquivo", "Qtde", "Nome", "Status")
-        self.tree = ttk.Treeview(data_frame, columns=columns, show="headings", height=20)
+        self.tree = VirtualTreeview(data_frame, columns=columns, show="headings", height=20)
 
         # Configurar colunas
         self.tree.heading("ID", text="ID")
@@ -292,6 +318,10 @@ class EtiquetaView:
         self.stats_label = ttk.Label(status_frame, text="")
         self.stats_label.grid(row=0, column=1, sticky=tk.E)
         
+        # Mudanças de status ainda não enviadas ao banco (diário local)
+        self.journal_label = ttk.Label(status_frame, text="", foreground="#B36B00")
+        self.journal_label.grid(row=0, column=2, sticky=tk.E, padx=(10, 0))
+        
         # Atualiza estatísticas
         self.update_stats()
     
@@ -355,7 +385,9 @@ class EtiquetaView:
         file_path = filedialog.askopenfilename(
             title="Selecionar arquivo Excel",
             filetypes=[
+                ("Arquivos de dados", "*.xlsx *.xls *.csv *.parquet"),
                 ("Arquivos Excel", "*.xlsx *.xls"),
+                ("CSV / Parquet (op, unidade, arquivos, qtde, nome)", "*.csv *.parquet *.pq"),
                 ("Todos os arquivos", "*.*")
             ]
         )
@@ -363,27 +395,58 @@ class EtiquetaView:
         if file_path:
             def import_worker():
                 try:
-                    self.show_loading("Validando arquivo Excel...")
+                    self.root.after(0, lambda: self.show_loading("Validando arquivo Excel..."))
                     self.root.after(100, lambda: self.update_loading_message("Importando dados..."))
                     
-                    success = self.controller.import_excel_file(file_path)
+                    resultado = self.controller.import_excel_file(
+                        file_path, confirmar_problemas=self._confirm_quality_issues
+                    )
                     
-                    self.root.after(0, lambda: self._finish_import(success))
+                    self.root.after(0, lambda: self._finish_import(True, resultado=resultado))
+                except ImportCancelledError:
+                    self.root.after(0, lambda: self._finish_import(False, cancelled=True))
                 except Exception as e:
-                    self.root.after(0, lambda: self._finish_import(False, str(e)))
+                    error_msg = str(e)
+                    self.root.after(0, lambda: self._finish_import(False, error_msg))
             
             # Executa importação em thread separada
             thread = threading.Thread(target=import_worker, daemon=True)
             thread.start()
+
+    def _confirm_quality_issues(self, qualidade):
+        """
+        Pergunta ao usuário se deve importar dados com problemas
+
+        Chamado pela thread de importação: a pergunta é feita na thread do Tk
+        e a importação espera a resposta.
+        """
+        mensagem = self.controller.format_quality_issues(qualidade) + "\n\nDeseja continuar mesmo assim?"
+        if threading.current_thread() is threading.main_thread():
+            return messagebox.askyesno("Dados com Problemas", mensagem)
+
+        respondido = threading.Event()
+        resposta = {'continuar': False}
+
+        def perguntar():
+            try:
+                resposta['continuar'] = messagebox.askyesno("Dados com Problemas", mensagem)
+            finally:
+                respondido.set()
+
+        self.root.after(0, perguntar)
+        respondido.wait()
+        return resposta['continuar']
     
-    def _finish_import(self, success, error_msg=None):
+    def _finish_import(self, success, error_msg=None, resultado=None, cancelled=False):
         """Finaliza a importação do Excel"""
         self.hide_loading()
         
         if success:
             self.refresh_data()
-            self.status_label.config(text="Excel importado com sucesso")
-            messagebox.showinfo("Sucesso", "Arquivo Excel importado com sucesso!")
+            self.status_label.config(text=f"Excel importado com sucesso - {resultado['registros_importados']} registros")
+            messagebox.showinfo("Sucesso", self.controller.format_import_summary(resultado))
+        elif cancelled:
+            self.status_label.config(text="Importação cancelada")
         else:
             error_text = f"Falha ao importar Excel: {error_msg}" if error_msg else "Falha ao importar Excel"
             self.status_label.config(text=error_text)
@@ -520,7 +583,7 @@ class EtiquetaView:
         # Atualiza a visualização
         self.update_tree_data(self.filtered_data)
 
-    def update_tree_data(self, data):
+    def update_tree_data(self, data, keep_position=False):
         """Atualiza os dados do treeview com opção de agrupamento por OP"""
         # Limpa dados existentes
         # Se modo agrupado: mostrar cards com resumo de OPs
@@ -579,6 +642,7 @@ class EtiquetaView:
 
                 # Armazena widget
                 self.card_widgets[op] = card
+                card._total_itens = total_itens
 
                 # Configura colunas internas para permitir expansão
                 card.columnconfigure(0, weight=1)
@@ -648,33 +712,37 @@ class EtiquetaView:
                     pass
 
                 # Efeito de hover para melhor visual
-                def on_enter(e, w=card):
+                def on_enter(e, w=card, op=op):
                     try:
-                        if getattr(self, 'selected_op', None) != op:
+                        if op not in self.selected_ops:
                             w.configure(bg="#F5FBFF")
                     except Exception:
                         pass
 
-                def on_leave(e, w=card):
+                def on_leave(e, w=card, op=op):
                     try:
-                        if getattr(self, 'selected_op', None) != op:
+                        if op not in self.selected_ops:
                             w.configure(bg="#FFFFFF")
                     except Exception:
                         pass
 
                 card.bind("<Enter>", on_enter)
                 card.bind("<Leave>", on_leave)
-                card.bind("<Button-1>", lambda e, op=op: self.select_card(op))
-                lbl_op.bind("<Button-1>", lambda e, op=op: self.select_card(op))
-                lbl_itens.bind("<Button-1>", lambda e, op=op: self.select_card(op))
-                lbl_qtde.bind("<Button-1>", lambda e, op=op: self.select_card(op))
-                lbl_status.bind("<Button-1>", lambda e, op=op: self.select_card(op))
+                # Clique seleciona só este card; Ctrl+clique acrescenta/remove da seleção (lote)
+                for w in (card, lbl_op, lbl_itens, lbl_qtde, lbl_status):
+                    w.bind("<Button-1>", lambda e, op=op: self.select_card(op))
+                    w.bind("<Control-Button-1>", lambda e, op=op: self.toggle_card(op))
 
                 # Adiciona ao frame (layout será organizado por layout_cards)
                 card.grid(row=0, column=idx, padx=8, pady=8, sticky=(tk.N, tk.S, tk.E, tk.W))
                 # Permite que o conteúdo do card expanda horizontalmente
                 card.update_idletasks()
 
+            # Mantém a seleção das OPs que continuam na tela
+            self.selected_ops = [op for op in self.selected_ops if op in self.card_widgets]
+            for op in self.selected_ops:
+                self._paint_card(op, True)
+
             # Forçar layout responsivo
             self.cards_frame.update_idletasks()
             self.layout_cards()
@@ -706,13 +774,8 @@ class EtiquetaView:
         except Exception:
             pass
         
-        # Limpa tree
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-
-        # Exibe registros na treeview
-        for registro in data:
-            self.tree.insert("", tk.END, values=registro)
+        # Exibe registros na treeview (só as linhas visíveis são materializadas)
+        self.tree.set_rows(data, keep_position=keep_position)
     
     def update_stats(self):
         """Atualiza as estatísticas"""
@@ -748,33 +811,37 @@ class EtiquetaView:
         loading_lbl = ttk.Label(frame, text="Carregando detalhes...")
         loading_lbl.pack(pady=10)
 
-        records_tree = None
-
-        def load_details():
-            nonlocal records_tree
-            try:
-                # Busca apenas os registros para essa OP
-                registros = self.controller.get_registros_by_op(op)
+        def show_details(registros):
+            if not modal.winfo_exists():
+                return
+            # Remove label e cria tree (virtual: OPs grandes abrem na hora)
+            loading_lbl.pack_forget()
 
-                # Remove label e cria tree
-                loading_lbl.pack_forget()
+            cols = ("ID", "OP", "Unidade", "Arquivo", "Qtde", "Nome")
+            records_tree = VirtualTreeview(frame, columns=cols, show='headings')
+            for c in cols:
+                records_tree.heading(c, text=c)
+                records_tree.column(c, width=100, anchor=tk.W)
 
-                cols = ("ID", "OP", "Unidade", "Arquivo", "Qtde", "Nome")
-                records_tree = ttk.Treeview(frame, columns=cols, show='headings')
-                for c in cols:
-                    records_tree.heading(c, text=c)
-                    records_tree.column(c, width=100, anchor=tk.W)
+            vs = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=records_tree.yview)
+            records_tree.configure(yscrollcommand=vs.set)
+            records_tree.pack(fill=tk.BOTH, expand=True, side=tk.LEFT)
+            vs.pack(fill=tk.Y, side=tk.RIGHT)
 
-                vs = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=records_tree.yview)
-                records_tree.configure(yscrollcommand=vs.set)
-                records_tree.pack(fill=tk.BOTH, expand=True, side=tk.LEFT)
-                vs.pack(fill=tk.Y, side=tk.RIGHT)
+            records_tree.set_rows(registros)
 
-                for r in registros:
-                    records_tree.insert('', tk.END, values=r)
+        def show_error(error_msg):
+            if modal.winfo_exists():
+                loading_lbl.config(text=f"Erro ao carregar detalhes: {error_msg}")
 
+        def load_details():
+            try:
+                # Busca apenas os registros para essa OP
+                registros = self.controller.get_registros_by_op(op)
+                self.root.after(0, lambda: show_details(registros))
             except Exception as e:
-                loading_lbl.config(text=f"Erro ao carregar detalhes: {e}")
+                error_msg = str(e)
+                self.root.after(0, lambda: show_error(error_msg))
 
         # Carrega em thread para não bloquear UI
         thread = threading.Thread(target=load_details, daemon=True)
@@ -818,24 +885,34 @@ class EtiquetaView:
             pass
 
     def select_card(self, op: str):
-        """Marca visualmente o card selecionado e guarda estado"""
-        # Desmarca anterior
-        if self.selected_op and self.selected_op in self.card_widgets:
-            prev = self.card_widgets[self.selected_op]
-            try:
-                prev.configure(bg="#FFFFFF", bd=1, highlightbackground="#E0E0E0")
-                # restaurar cor dos textos
-                for w, col in zip(getattr(prev, '_text_widgets', []), getattr(prev, '_text_default', [])):
-                    try:
-                        w.configure(foreground=col)
-                    except Exception:
-                        pass
-            except Exception:
-                prev.configure(bg="#FFFFFF")
+        """Seleciona só o card clicado (desmarca os demais) e guarda estado"""
+        for anterior in self.selected_ops:
+            if anterior != op:
+                self._paint_card(anterior, False)
+        if op in self.card_widgets:
+            self._paint_card(op, True)
+            self.selected_ops = [op]
+            self.selected_op = op
+        self._update_selection_status()
+
+    def toggle_card(self, op: str):
+        """Acrescenta ou remove um card da seleção (Ctrl+clique), para gerar OPs em lote"""
+        if op in self.selected_ops:
+            self.selected_ops.remove(op)
+            self._paint_card(op, False)
+            self.selected_op = self.selected_ops[-1] if self.selected_ops else None
+        elif op in self.card_widgets:
+            self.selected_ops.append(op)
+            self._paint_card(op, True)
+            self.selected_op = op
+        self._update_selection_status()
 
-        # Marca novo
+    def _paint_card(self, op: str, selected: bool):
+        """Marca ou desmarca visualmente um card"""
         widget = self.card_widgets.get(op)
-        if widget:
+        if not widget:
+            return
+        if selected:
             try:
                 widget.configure(bg="#D9EFFF", bd=2, highlightbackground="#4FA3FF")
                 # pintar textos como branco
@@ -846,7 +923,61 @@ class EtiquetaView:
                         pass
             except Exception:
                 widget.configure(bg="#D9EFFF")
-            self.selected_op = op
+        else:
+            try:
+                widget.configure(bg="#FFFFFF", bd=1, highlightbackground="#E0E0E0")
+                # restaurar cor dos textos
+                for w, col in zip(getattr(widget, '_text_widgets', []), getattr(widget, '_text_default', [])):
+                    try:
+                        w.configure(foreground=col)
+                    except Exception:
+                        pass
+            except Exception:
+                widget.configure(bg="#FFFFFF")
+
+    def _update_selection_status(self):
+        """Mostra na barra de status quantas OPs estão selecionadas"""
+        if len(self.selected_ops) > 1:
+            itens = sum(getattr(self.card_widgets.get(op), '_total_itens', 0) for op in self.selected_ops)
+            self.status_label.config(text=f"{len(self.selected_ops)} OPs selecionadas ({itens} itens) - "
+                                          f"use \"📦 Lote de OPs\" para gerar em um único arquivo")
+
+    def generate_labels_batch(self):
+        """Gera em um único arquivo as etiquetas das OPs selecionadas (ou de todos os pendentes)"""
+        ops = list(self.selected_ops) if self.grouped_view else []
+        if ops:
+            itens = sum(getattr(self.card_widgets.get(op), '_total_itens', 0) for op in ops)
+            lista = ', '.join(ops[:10]) + ('...' if len(ops) > 10 else '')
+            resposta = messagebox.askyesno(
+                "Etiquetas em Lote",
+                f"Gerar {itens} etiquetas das {len(ops)} OP(s) selecionada(s) em um único arquivo?\n\n{lista}"
+            )
+        else:
+            resposta = messagebox.askyesno(
+                "Etiquetas em Lote",
+                "Nenhuma OP selecionada (Ctrl+clique nos cards seleciona várias).\n\n"
+                "Deseja gerar as etiquetas de todos os registros pendentes?"
+            )
+            ops = None
+        if not resposta:
+            return
+
+        separadores = messagebox.askyesno("Etiquetas em Lote", "Incluir uma etiqueta separadora antes de cada OP?")
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        file_path = filedialog.asksaveasfilename(
+            title="Salvar Etiquetas em Lote",
+            defaultextension=".pdf",
+            initialfile=f"etiquetas_lote_{timestamp}.pdf",
+            filetypes=[("Arquivos PDF", "*.pdf"), ("Zebra ZPL", "*.zpl"), ("Imagem TIFF", "*.tif")]
+        )
+        if not file_path:
+            return
+
+        descricao = f"Etiquetas de {len(ops)} OP(s)" if ops else "Etiquetas de todos os pendentes"
+        # Uma consulta, um arquivo e um único UPDATE de status, em segundo plano
+        self._queue_job(lambda: self.controller.submit_labels_batch_job(file_path, ops=ops, separators=separadores),
+                        descricao)
 
     def download_op_labels(self, op: str):
         """Gera/baixa etiquetas apenas para uma OP específica"""
@@ -856,32 +987,28 @@ class EtiquetaView:
                 messagebox.showwarning("Aviso", f"Nenhum registro encontrado para OP {op}")
                 return
 
+            resposta = messagebox.askyesno(
+                "Confirmar Geração",
+                f"Serão geradas {len(registros)} etiquetas (1 por registro) para a OP {op}.\n\n" +
+                "Deseja continuar?"
+            )
+            if not resposta:
+                return
+
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             default_name = f"etiquetas_{op}_{timestamp}.pdf"
             file_path = filedialog.asksaveasfilename(
                 title=f"Salvar PDF de Etiquetas - {op}",
                 defaultextension=".pdf",
                 initialfile=default_name,
-                filetypes=[("Arquivos PDF", "*.pdf")]
+                filetypes=[("Arquivos PDF", "*.pdf"), ("Zebra ZPL", "*.zpl"), ("Imagem TIFF", "*.tif")]
             )
 
             if not file_path:
                 return
 
-            def worker():
-                try:
-                    self.root.after(0, lambda: self.show_loading("Gerando etiquetas para OP..."))
-                    self.root.after(100, lambda: self.update_loading_message("Gerando PDF de etiquetas..."))
-                    success = self.controller.generate_labels_pdf(registros, file_path)
-                    if success:
-                        # Atualiza os dados para mostrar o novo status
-                        self.root.after(0, lambda: self.refresh_data())
-                    self.root.after(0, lambda: self._finish_generate_labels(success, file_path))
-                except Exception as e:
-                    self.root.after(0, lambda: self._finish_generate_labels(False, file_path, str(e)))
-
-            thread = threading.Thread(target=worker, daemon=True)
-            thread.start()
+            # A OP é lida do banco quando o trabalho começa
+            self._queue_job(lambda: self.controller.submit_labels_job(file_path, op=op), f"Etiquetas da OP {op}")
 
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao gerar etiquetas para OP {op}: {e}")
@@ -906,17 +1033,7 @@ class EtiquetaView:
             if not file_path:
                 return
 
-            def worker():
-                try:
-                    self.root.after(0, lambda: self.show_loading("Gerando relatório para OP..."))
-                    self.root.after(100, lambda: self.update_loading_message("Gerando PDF do relatório..."))
-                    success = self.controller.generate_list_pdf(registros, file_path)
-                    self.root.after(0, lambda: self._finish_generate_report(success, file_path))
-                except Exception as e:
-                    self.root.after(0, lambda: self._finish_generate_report(False, file_path, str(e)))
-
-            thread = threading.Thread(target=worker, daemon=True)
-            thread.start()
+            self._queue_job(lambda: self.controller.submit_report_job(file_path, op=op), f"Relatório da OP {op}")
 
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao gerar relatório para OP {op}: {e}")
@@ -1005,13 +1122,9 @@ class EtiquetaView:
     
     def get_selected_records(self):
         """Retorna os registros selecionados"""
-        selection = self.tree.selection()
-        if not selection:
-            return []
-        
         selected_records = []
-        for item in selection:
-            values = self.tree.item(item, "values")
+        # Seleção guardada pelo id do registro, inclusive linhas fora da tela
+        for values in self.tree.selected_rows():
             if values and len(values) >= 5 and values[0]:  # Se tem ID válido
                 try:
                     # Garante que temos todos os campos necessários (agora incluindo status)
@@ -1026,6 +1139,11 @@ class EtiquetaView:
     
     def generate_labels_pdf(self):
         """Gera PDF com etiquetas dos registros selecionados"""
+        # Na visualização por OP, os cards selecionados são gerados em lote
+        if self.grouped_view and self.selected_ops:
+            self.generate_labels_batch()
+            return
+        
         selected = self.get_selected_records()
         
         if not selected:
@@ -1062,42 +1180,12 @@ class EtiquetaView:
             title="Salvar PDF de Etiquetas",
             defaultextension=".pdf",
             initialfile=default_name,
-            filetypes=[("Arquivos PDF", "*.pdf")]
+            filetypes=[("Arquivos PDF", "*.pdf"), ("Zebra ZPL", "*.zpl"), ("Imagem TIFF", "*.tif")]
         )
         
         if file_path:
-            def generate_worker():
-                try:
-                    self.root.after(0, lambda: self.show_loading("Preparando etiquetas..."))
-                    self.root.after(100, lambda: self.update_loading_message("Gerando PDF de etiquetas..."))
-                    
-                    success = self.controller.generate_labels_pdf(selected, file_path)
-                    
-                    if success:
-                        # Atualiza os dados para mostrar o novo status
-                        self.root.after(0, lambda: self.refresh_data())
-                    
-                    self.root.after(0, lambda: self._finish_generate_labels(success, file_path))
-                except Exception as e:
-                    self.root.after(0, lambda: self._finish_generate_labels(False, file_path, str(e)))
-            
-            thread = threading.Thread(target=generate_worker, daemon=True)
-            thread.start()
-    
-    def _finish_generate_labels(self, success, file_path, error_msg=None):
-        """Finaliza a geração de etiquetas"""
-        self.hide_loading()
-        
-        if success:
-            self.status_label.config(text="PDF de etiquetas gerado com sucesso")
-            result = messagebox.askyesno("Sucesso", 
-                f"PDF de etiquetas gerado com sucesso!\n\nDeseja abrir o arquivo?\n{file_path}")
-            if result:
-                os.startfile(file_path)
-        else:
-            error_text = f"Falha ao gerar PDF: {error_msg}" if error_msg else "Falha ao gerar PDF de etiquetas"
-            self.status_label.config(text=error_text)
-            messagebox.showerror("Erro", error_text)
+            self._queue_job(lambda: self.controller.submit_labels_job(file_path, registros=selected),
+                            f"Etiquetas de {len(selected)} registro(s)")
     
     def generate_list_pdf(self):
         """Gera PDF com relatório dos registros selecionados"""
@@ -1141,35 +1229,220 @@ class EtiquetaView:
         )
         
         if file_path:
-            def generate_worker():
-                try:
-                    self.root.after(0, lambda: self.show_loading("Preparando relatório..."))
-                    self.root.after(100, lambda: self.update_loading_message("Gerando PDF do relatório..."))
-                    
-                    success = self.controller.generate_list_pdf(selected, file_path)
-                    
-                    self.root.after(0, lambda: self._finish_generate_report(success, file_path))
-                except Exception as e:
-                    self.root.after(0, lambda: self._finish_generate_report(False, file_path, str(e)))
-            
-            thread = threading.Thread(target=generate_worker, daemon=True)
-            thread.start()
+            self._queue_job(lambda: self.controller.submit_report_job(file_path, registros=selected),
+                            f"Relatório de {len(selected)} registro(s)")
     
-    def _finish_generate_report(self, success, file_path, error_msg=None):
-        """Finaliza a geração do relatório"""
+    def export_data(self):
+        """Exporta todos os registros do banco para CSV, XLSX ou Parquet em segundo plano"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        file_path = filedialog.asksaveasfilename(
+            title="Exportar Registros",
+            defaultextension=".xlsx",
+            initialfile=f"registros_{timestamp}.xlsx",
+            filetypes=[("Planilha Excel", "*.xlsx"), ("CSV", "*.csv"), ("Parquet", "*.parquet")]
+        )
+        
+        if not file_path:
+            return
+        
+        def progresso(feitos, total):
+            self.root.after(0, lambda: self.update_loading_message(f"Exportando... {feitos}/{total} registros"))
+        
+        def export_worker():
+            try:
+                resultado = self.controller.export_registros(file_path, progress=progresso)
+                self.root.after(0, lambda: self._finish_export(True, file_path, resultado['total_registros']))
+            except Exception as e:
+                self.root.after(0, lambda: self._finish_export(False, file_path, error_msg=str(e)))
+        
+        self.show_loading("Exportando registros...")
+        thread = threading.Thread(target=export_worker, daemon=True)
+        thread.start()
+    
+    def _finish_export(self, success, file_path, total=0, error_msg=None):
+        """Finaliza a exportação"""
         self.hide_loading()
         
         if success:
-            self.status_label.config(text="Relatório PDF gerado com sucesso")
-            result = messagebox.askyesno("Sucesso", 
-                f"Relatório PDF gerado com sucesso!\n\nDeseja abrir o arquivo?\n{file_path}")
-            if result:
-                os.startfile(file_path)
+            self.status_label.config(text=f"{total} registros exportados")
+            messagebox.showinfo("Sucesso", f"{total} registros exportados para:\n{file_path}")
         else:
-            error_text = f"Falha ao gerar relatório: {error_msg}" if error_msg else "Falha ao gerar relatório PDF"
+            error_text = f"Falha ao exportar registros: {error_msg}"
             self.status_label.config(text=error_text)
             messagebox.showerror("Erro", error_text)
     
+    def _queue_job(self, submit, descricao):
+        """Coloca um trabalho na fila em segundo plano; a tela continua livre"""
+        try:
+            job_id = submit()
+        except Exception as e:
+            messagebox.showerror("Erro", f"Não foi possível colocar na fila: {e}")
+            return
+        self._active_jobs.add(job_id)
+        self.status_label.config(text=f"Trabalho #{job_id} na fila: {descricao}")
+        self.poll_jobs(reschedule=False)
+    
+    def poll_jobs(self, reschedule=True):
+        """Acompanha a fila: avisa os trabalhos que terminaram e atualiza a janela da fila"""
+        try:
+            jobs = self.job_queue.list_jobs(limit=200)
+        except Exception as e:
+            jobs = None
+            self.status_label.config(text=f"Erro ao ler a fila de trabalhos: {e}")
+        
+        if jobs is not None:
+            terminados = [job for job in jobs if job.id in self._active_jobs
+                          and job.status not in (STATUS_PENDENTE, STATUS_EXECUTANDO)]
+            self._active_jobs = {job.id for job in jobs if job.status in (STATUS_PENDENTE, STATUS_EXECUTANDO)}
+            # Etiquetas concluídas mudam o status dos registros: atualiza a tela
+            # a partir do diário de status, sem esperar o banco nem recarregar tudo
+            if any(job.status == STATUS_CONCLUIDO and job.tipo in ('etiquetas', 'etiquetas_lote') for job in terminados):
+                if not self.is_loading:
+                    self.apply_pending_status()
+            for job in terminados:
+                self._notify_job_finished(job)
+            self._update_jobs_window(jobs)
+        
+        pendentes = self.controller.pending_status_count()
+        self.journal_label.config(text=f"⏳ {pendentes} status aguardando o banco" if pendentes else "")
+        
+        if reschedule:
+            self.root.after(1000, self.poll_jobs)
+    
+    def apply_pending_status(self):
+        """Aplica aos dados da tela os status do diário (atualização otimista, sem consultar o banco)"""
+        self.current_data = self.controller.apply_pending_status(self.current_data)
+        self.filtered_data = self.controller.apply_pending_status(self.filtered_data)
+        if self.grouped_view:
+            return  # Os cards não mostram status
+        if any(entry.get().strip() for entry in self.filter_entries.values()):
+            self.apply_filters()
+        else:
+            self.update_tree_data(self.filtered_data, keep_position=True)
+    
+    def _notify_job_finished(self, job):
+        """Mostra na barra de status o fim de um trabalho"""
+        if job.status == STATUS_CONCLUIDO:
+            texto = f"Trabalho #{job.id} concluído: {job.descricao}"
+            resultado = job.resultado or {}
+            if 'total_etiquetas' in resultado:
+                texto += f" ({resultado['total_etiquetas']} etiquetas)"
+                if not resultado.get('status_atualizado', True):
+                    texto += " - atenção: status dos registros não atualizado"
+        elif job.status == STATUS_FALHA:
+            texto = f"Trabalho #{job.id} falhou: {job.erro}"
+        else:
+            texto = f"Trabalho #{job.id} cancelado"
+        self.status_label.config(text=texto)
+    
+    _JOB_STATUS_TEXT = {
+        STATUS_PENDENTE: "Na fila", STATUS_EXECUTANDO: "Gerando", STATUS_CONCLUIDO: "Concluído",
+        STATUS_FALHA: "Falha", STATUS_CANCELADO: "Cancelado"
+    }
+    
+    def show_jobs(self):
+        """Abre a janela da fila de trabalhos (progresso, cancelar e repetir)"""
+        if self.jobs_window is not None:
+            self.jobs_window.lift()
+            return
+        
+        self.jobs_window = tk.Toplevel(self.root)
+        self.jobs_window.title("Fila de Trabalhos")
+        self.jobs_window.geometry("760x360")
+        self.jobs_window.transient(self.root)
+        self.jobs_window.protocol("WM_DELETE_WINDOW", self._close_jobs_window)
+        
+        frame = ttk.Frame(self.jobs_window, padding="10")
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        colunas = ("id", "descricao", "status", "progresso", "tentativas", "erro")
+        self.jobs_tree = ttk.Treeview(frame, columns=colunas, show="headings", selectmode="browse")
+        for coluna, titulo, largura in zip(colunas, ("#", "Trabalho", "Status", "Progresso", "Tentativas", "Erro"),
+                                           (40, 300, 80, 90, 70, 160)):
+            self.jobs_tree.heading(coluna, text=titulo)
+            self.jobs_tree.column(coluna, width=largura, anchor=tk.W if coluna in ("descricao", "erro") else tk.CENTER)
+        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self.jobs_tree.yview)
+        self.jobs_tree.configure(yscrollcommand=scrollbar.set)
+        self.jobs_tree.grid(row=0, column=0, sticky=(tk.N, tk.S, tk.E, tk.W))
+        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        frame.columnconfigure(0, weight=1)
+        frame.rowconfigure(0, weight=1)
+        
+        botoes = ttk.Frame(frame)
+        botoes.grid(row=1, column=0, columnspan=2, sticky=tk.W, pady=(8, 0))
+        ttk.Button(botoes, text="⛔ Cancelar", command=self._cancel_selected_job).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(botoes, text="🔁 Repetir", command=self._retry_selected_job).pack(side=tk.LEFT, padx=5)
+        ttk.Button(botoes, text="📂 Abrir Arquivo", command=self._open_selected_job).pack(side=tk.LEFT, padx=5)
+        ttk.Button(botoes, text="🧹 Limpar Finalizados", command=self._clear_finished_jobs).pack(side=tk.LEFT, padx=5)
+        
+        self.poll_jobs(reschedule=False)
+    
+    def _close_jobs_window(self):
+        """Fecha a janela da fila (os trabalhos continuam)"""
+        self.jobs_window.destroy()
+        self.jobs_window = None
+        self.jobs_tree = None
+    
+    def _update_jobs_window(self, jobs):
+        """Preenche a janela da fila, mantendo a seleção"""
+        if self.jobs_tree is None:
+            return
+        selecionado = self.jobs_tree.selection()
+        self.jobs_tree.delete(*self.jobs_tree.get_children())
+        for job in jobs:
+            progresso = f"{job.feitos}/{job.total}" if job.total else str(job.feitos or "")
+            self.jobs_tree.insert("", tk.END, iid=str(job.id), values=(
+                job.id, job.descricao, self._JOB_STATUS_TEXT.get(job.status, job.status),
+                progresso, job.tentativas, job.erro or ""
+            ))
+        if selecionado and self.jobs_tree.exists(selecionado[0]):
+            self.jobs_tree.selection_set(selecionado[0])
+    
+    def _selected_job_id(self):
+        """Id do trabalho selecionado na janela da fila (None se nenhum)"""
+        selecionado = self.jobs_tree.selection() if self.jobs_tree is not None else ()
+        if not selecionado:
+            messagebox.showwarning("Aviso", "Selecione um trabalho!", parent=self.jobs_window)
+            return None
+        return int(selecionado[0])
+    
+    def _cancel_selected_job(self):
+        """Cancela o trabalho selecionado (pendente ou em andamento)"""
+        job_id = self._selected_job_id()
+        if job_id is None:
+            return
+        if not self.job_queue.cancel(job_id):
+            messagebox.showinfo("Fila de Trabalhos", "O trabalho já terminou.", parent=self.jobs_window)
+        self.poll_jobs(reschedule=False)
+    
+    def _retry_selected_job(self):
+        """Devolve à fila o trabalho selecionado (com falha ou cancelado)"""
+        job_id = self._selected_job_id()
+        if job_id is None:
+            return
+        if self.job_queue.retry(job_id):
+            self._active_jobs.add(job_id)
+        else:
+            messagebox.showinfo("Fila de Trabalhos", "Só trabalhos com falha ou cancelados podem ser repetidos.",
+                                parent=self.jobs_window)
+        self.poll_jobs(reschedule=False)
+    
+    def _open_selected_job(self):
+        """Abre o arquivo gerado pelo trabalho selecionado"""
+        job_id = self._selected_job_id()
+        if job_id is None:
+            return
+        job = self.job_queue.get_job(job_id)
+        if job is None or job.status != STATUS_CONCLUIDO:
+            messagebox.showinfo("Fila de Trabalhos", "O trabalho ainda não foi concluído.", parent=self.jobs_window)
+            return
+        os.startfile((job.resultado or {}).get('arquivo', job.params['arquivo']))
+    
+    def _clear_finished_jobs(self):
+        """Remove da fila os trabalhos concluídos, com falha ou cancelados"""
+        self.job_queue.remove_finished()
+        self.poll_jobs(reschedule=False)
+    
     def delete_selected(self):
         """Exclui os registros selecionados"""
         selected = self.get_selected_records()
@@ -1233,6 +1506,11 @@ Funcionalidades:
         
         messagebox.showinfo("Sobre o Sistema", info_text)
     
+    def on_close(self):
+        """Fecha a aplicação; trabalhos não terminados continuam na fila para a próxima sessão"""
+        self.controller.close()
+        self.root.destroy()
+    
     def run(self):
         """Inicia a aplicação"""
         self.root.mainloop()
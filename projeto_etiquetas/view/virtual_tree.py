@@ -0,0 +1,293 @@
+"""
+Treeview virtual: os dados ficam em uma lista Python e só as linhas visíveis
+(mais uma pequena margem) existem como itens do Treeview.
+
+Com dezenas de milhares de registros, inserir um item por registro trava a
+janela a cada atualização. Aqui o Treeview tem sempre o mesmo punhado de
+itens, que são reaproveitados ao rolar; a barra de rolagem, a roda do mouse,
+o teclado e a seleção trabalham sobre a lista, e a seleção é guardada pelo id
+do registro (sobrevive à rolagem e às atualizações dos dados).
+"""
+import tkinter as tk
+from tkinter import font as tkfont
+from tkinter import ttk
+from typing import Callable, Hashable, List, Optional, Sequence, Set
+
+
+class VirtualTreeview(ttk.Treeview):
+    def __init__(self, master=None, overscan: int = 5,
+                 key: Callable[[Sequence], Hashable] = lambda row: row[0], **kw):
+        """
+        Cria o Treeview virtual
+
+        Args:
+            master: Widget pai
+            overscan (int): Linhas materializadas além das visíveis
+            key (Callable): Extrai o id de uma linha (padrão: primeira coluna)
+            **kw: Opções do ttk.Treeview (columns, show, height, selectmode...)
+        """
+        # A rolagem real é da lista: o Treeview não fala direto com a barra
+        self._yscrollcommand = kw.pop('yscrollcommand', None)
+        self._selectmode = str(kw.pop('selectmode', 'extended'))
+        super().__init__(master, selectmode='none', **kw)
+
+        self.overscan = max(0, overscan)
+        self.key = key
+
+        self._rows: List[Sequence] = []
+        self._offset = 0           # índice da primeira linha visível
+        self._selected: Set[Hashable] = set()
+        self._anchor: Optional[int] = None   # início da seleção com Shift
+        self._cursor: Optional[int] = None   # linha ativa do teclado
+        self._item_index = {}      # item do Treeview -> índice na lista
+        self._row_height: Optional[int] = None
+
+        self.bind('<Configure>', lambda e: self._render(), add='+')
+        self.bind('<ButtonPress-1>', self._on_click)
+        self.bind('<Control-ButtonPress-1>', lambda e: self._on_click(e, toggle=True))
+        self.bind('<Shift-ButtonPress-1>', lambda e: self._on_click(e, extend=True))
+        self.bind('<MouseWheel>', self._on_mousewheel)
+        self.bind('<Button-4>', lambda e: self._scroll_rows(-3))
+        self.bind('<Button-5>', lambda e: self._scroll_rows(3))
+        self.bind('<Up>', lambda e: self._move_cursor(-1))
+        self.bind('<Down>', lambda e: self._move_cursor(1))
+        self.bind('<Shift-Up>', lambda e: self._move_cursor(-1, extend=True))
+        self.bind('<Shift-Down>', lambda e: self._move_cursor(1, extend=True))
+        self.bind('<Prior>', lambda e: self._move_cursor(-self._visible_rows()))
+        self.bind('<Next>', lambda e: self._move_cursor(self._visible_rows()))
+        self.bind('<Home>', lambda e: self._move_cursor(-len(self._rows)))
+        self.bind('<End>', lambda e: self._move_cursor(len(self._rows)))
+        self.bind('<Control-a>', self._select_all)
+
+    # ------------------------------------------------------------------
+    # Dados e seleção
+    # ------------------------------------------------------------------
+
+    def set_rows(self, rows: Sequence[Sequence], keep_position: bool = False):
+        """
+        Troca os dados exibidos (custo independente do número de linhas na tela)
+
+        Args:
+            rows (Sequence): Linhas (tuplas de valores na ordem das colunas)
+            keep_position (bool): Mantém a rolagem atual em vez de voltar ao topo
+        """
+        self._rows = rows if isinstance(rows, list) else list(rows)
+        if self._selected:
+            self._selected &= {self.key(row) for row in self._rows}
+        self._anchor = None
+        self._cursor = None
+        if not keep_position:
+            self._offset = 0
+        self._render()
+
+    @property
+    def rows(self) -> List[Sequence]:
+        """Linhas do modelo"""
+        return self._rows
+
+    def selected_ids(self) -> List[Hashable]:
+        """Ids selecionados, na ordem da lista"""
+        if not self._selected:
+            return []
+        return [self.key(row) for row in self._rows if self.key(row) in self._selected]
+
+    def selected_rows(self) -> List[Sequence]:
+        """Linhas selecionadas, na ordem da lista (inclusive as fora da tela)"""
+        if not self._selected:
+            return []
+        return [row for row in self._rows if self.key(row) in self._selected]
+
+    def select_ids(self, ids, add: bool = False):
+        """Seleciona linhas pelo id"""
+        if not add:
+            self._selected = set()
+        self._selected.update(ids)
+        self._render()
+
+    def clear_selection(self):
+        """Limpa a seleção"""
+        self._selected = set()
+        self._anchor = None
+        self._render()
+
+    def see_index(self, index: int):
+        """Rola até a linha de índice `index` ficar visível"""
+        visiveis = self._visible_rows()
+        if index < self._offset:
+            self._offset = index
+        elif index >= self._offset + visiveis:
+            self._offset = index - visiveis + 1
+        self._render()
+
+    # ------------------------------------------------------------------
+    # Rolagem (protocolo da ttk.Scrollbar)
+    # ------------------------------------------------------------------
+
+    def configure(self, cnf=None, **kw):
+        if 'yscrollcommand' in kw:
+            self._yscrollcommand = kw.pop('yscrollcommand')
+            self._update_scrollbar()
+            if cnf is None and not kw:
+                return None
+        if 'selectmode' in kw:
+            self._selectmode = str(kw.pop('selectmode'))
+            if cnf is None and not kw:
+                return None
+        return super().configure(cnf, **kw)
+
+    config = configure
+
+    def yview(self, *args):
+        """
+        Rolagem vertical sobre a lista (usado como `command` da Scrollbar)
+
+        Sem argumentos, retorna (primeira, última) como frações da lista.
+        """
+        if not args:
+            return self._fractions()
+        if args[0] == 'moveto':
+            self._offset = int(float(args[1]) * len(self._rows))
+            self._render()
+        elif args[0] == 'scroll':
+            passos = int(args[1])
+            if len(args) > 2 and args[2] == 'pages':
+                passos *= max(1, self._visible_rows() - 1)
+            self._scroll_rows(passos)
+        return None
+
+    def yview_moveto(self, fraction):
+        self.yview('moveto', fraction)
+
+    def yview_scroll(self, number, what):
+        self.yview('scroll', number, what)
+
+    def _fractions(self):
+        total = len(self._rows)
+        if not total:
+            return 0.0, 1.0
+        ultima = min(total, self._offset + self._visible_rows())
+        return self._offset / total, ultima / total
+
+    def _update_scrollbar(self):
+        if self._yscrollcommand:
+            primeira, ultima = self._fractions()
+            self._yscrollcommand(str(primeira), str(ultima))
+
+    def _scroll_rows(self, passos: int):
+        self._offset += passos
+        self._render()
+        return 'break'
+
+    def _on_mousewheel(self, event):
+        if not event.delta:
+            return 'break'
+        # Windows envia múltiplos de 120; macOS envia valores pequenos
+        passos = -event.delta // 120 if abs(event.delta) >= 120 else (-1 if event.delta > 0 else 1)
+        return self._scroll_rows(passos * 3)
+
+    # ------------------------------------------------------------------
+    # Renderização
+    # ------------------------------------------------------------------
+
+    def _row_metrics(self):
+        """(altura do cabeçalho, altura da linha) em pixels"""
+        filhos = super().get_children()
+        if filhos and self.winfo_ismapped():
+            caixa = self.bbox(filhos[0])
+            if caixa:
+                self._row_height = caixa[3]
+                return caixa[1], caixa[3]
+        if self._row_height is None:
+            altura = ttk.Style(self).lookup('Treeview', 'rowheight')
+            try:
+                self._row_height = int(altura)
+            except (TypeError, ValueError):
+                self._row_height = tkfont.nametofont('TkDefaultFont').metrics('linespace') + 4
+        return self._row_height, self._row_height
+
+    def _visible_rows(self) -> int:
+        """Linhas que cabem na área visível"""
+        altura = self.winfo_height()
+        if altura <= 1:
+            return max(1, int(self.cget('height') or 10))
+        cabecalho, linha = self._row_metrics()
+        return max(1, (altura - cabecalho) // max(1, linha))
+
+    def _render(self):
+        """Materializa só as linhas visíveis (mais a margem) a partir de _offset"""
+        total = len(self._rows)
+        visiveis = self._visible_rows()
+        self._offset = max(0, min(self._offset, total - visiveis))
+
+        necessarios = min(visiveis + self.overscan, total - self._offset)
+        itens = list(super().get_children())
+        if len(itens) > necessarios:
+            super().delete(*itens[necessarios:])
+            itens = itens[:necessarios]
+        while len(itens) < necessarios:
+            itens.append(super().insert('', tk.END))
+
+        self._item_index = {}
+        marcados = []
+        for posicao, item in enumerate(itens):
+            indice = self._offset + posicao
+            row = self._rows[indice]
+            super().item(item, values=row)
+            self._item_index[item] = indice
+            if self._selected and self.key(row) in self._selected:
+                marcados.append(item)
+        # selection_set dispara <<TreeviewSelect>>: só quando a marcação muda
+        if set(marcados) != set(super().selection()):
+            super().selection_set(marcados)
+        # Os itens ficam sempre a partir do topo; quem rola é a lista
+        self.tk.call(self._w, 'yview', 'moveto', 0)
+        self._update_scrollbar()
+
+    # ------------------------------------------------------------------
+    # Mouse e teclado
+    # ------------------------------------------------------------------
+
+    def _on_click(self, event, toggle: bool = False, extend: bool = False):
+        if self.identify_region(event.x, event.y) not in ('cell', 'tree'):
+            return None  # cabeçalho, separador: comportamento normal
+        self.focus_set()
+        indice = self._item_index.get(self.identify_row(event.y))
+        if indice is None:
+            return 'break'
+        self._select_index(indice, toggle=toggle, extend=extend)
+        return 'break'
+
+    def _select_index(self, indice: int, toggle: bool = False, extend: bool = False):
+        if self._selectmode == 'none':
+            return
+        if self._selectmode == 'browse':
+            toggle = extend = False
+
+        chave = self.key(self._rows[indice])
+        if extend and self._anchor is not None:
+            inicio, fim = sorted((self._anchor, indice))
+            self._selected = {self.key(row) for row in self._rows[inicio:fim + 1]}
+        elif toggle:
+            self._selected ^= {chave}
+            self._anchor = indice
+        else:
+            self._selected = {chave}
+            self._anchor = indice
+        self._cursor = indice
+        self.see_index(indice)
+        self.event_generate('<<TreeviewSelect>>')
+
+    def _move_cursor(self, passos: int, extend: bool = False):
+        if not self._rows:
+            return 'break'
+        atual = self._cursor if self._cursor is not None else self._offset
+        indice = max(0, min(len(self._rows) - 1, atual + passos))
+        self._select_index(indice, extend=extend)
+        return 'break'
+
+    def _select_all(self, event=None):
+        if self._selectmode == 'extended':
+            self._selected = {self.key(row) for row in self._rows}
+            self._render()
+            self.event_generate('<<TreeviewSelect>>')
+        return 'break'